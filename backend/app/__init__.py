@@ -1,17 +1,16 @@
-import logging
 from flask import Flask, current_app, render_template, flash, redirect, url_for
 from app.extensions import db, login_manager, migrate, csrf, mail
 from flask_cors import CORS
 from config import Config
 import pymysql
 pymysql.install_as_MySQLdb()
-from datetime import datetime, timedelta
-from app.models import Actividad, User, Asignacion
+from datetime import datetime
 from flask import session
 from flask_login import current_user, logout_user
 from app.routes import register_blueprints
-from sqlalchemy import or_
 from app.services.configuracion_service import reload_active_config
+from app.services.notificacion_service import notificaciones_no_leidas
+from app.services.usuario_service import cargar_usuario
 
 def timeago_filter(dt):
     now = datetime.utcnow()
@@ -60,39 +59,8 @@ def create_app(config_class=Config):
     def inject_notificaciones_hoy():
         notificaciones_count = 0
         if hasattr(current_user, 'is_authenticated') and current_user.is_authenticated:
-            
-            # Timestamp de la última vez que el usuario vio las notificaciones
-            vistas_hasta_str = session.get('notificaciones_vistas_hasta')
-            if vistas_hasta_str:
-                vistas_hasta = datetime.fromisoformat(vistas_hasta_str)
-            else:
-                # Si nunca ha visitado la página, mostramos notificaciones de las últimas 24 horas
-                vistas_hasta = datetime.utcnow() - timedelta(days=1)
-
-            # Notificaciones ocultas/eliminadas por el usuario
-            ocultas = session.get('notificaciones_leidas', [])
-            ocultas_ids = [n['id'] for n in ocultas]
-
-            # Contar actividades nuevas desde la última visita, que no estén ocultas
-            query = (
-                Actividad.query
-                .filter(Actividad.creado_por != current_user.id)
-                .filter(Actividad.creado_en > vistas_hasta)
-            )
-
-            if current_user.rol == 'docente':
-                asignaciones_docente_ids = [asig.id for asig in Asignacion.query.filter_by(id_docente=current_user.id).all()]
-                query = query.filter(
-                    or_(
-                        Actividad.id_asignacion.in_(asignaciones_docente_ids),
-                        Actividad.id_asignacion == None
-                    )
-                )
-
-            if ocultas_ids:
-                query = query.filter(Actividad.id.notin_(ocultas_ids))
-            
-            notificaciones_count = query.count()
+            # Contador mantenido en el servidor: una lectura por clave primaria
+            notificaciones_count = notificaciones_no_leidas(current_user)
 
         return dict(notificaciones_hoy=notificaciones_count)
     # (Ya se creó la instancia app arriba, no repetir)
@@ -132,13 +100,8 @@ def create_app(config_class=Config):
     # Registro de user_loader para Flask-Login
     @login_manager.user_loader
     def load_user(user_id):
-        current_app.logger.debug(f"DEBUG: load_user called for user_id: {user_id}")
-        user = User.query.get(int(user_id))
-        if user:
-            current_app.logger.debug(f"DEBUG: load_user - User {user.id} found. DB security stamp: {user.security_stamp}")
-        else:
-            current_app.logger.debug(f"DEBUG: load_user - User {user_id} not found in DB.")
-        return user
+        # Identidad cacheada por proceso; la versión es el security_stamp guardado al iniciar sesión
+        return cargar_usuario(int(user_id), session.get('security_stamp'))
 
     # CORS y CSRF
     CORS(app, resources={r"/*": {"origins": app.config['CORS_ORIGINS']}})
@@ -147,14 +110,6 @@ def create_app(config_class=Config):
     # Registrar blueprints
     register_blueprints(app)
 
-    # Filtrar logs de acceso para la ruta específica
-    class NoAccessLogFilter(logging.Filter):
-        def filter(self, record):
-            return '/actividades/count_unread_notifications' not in record.getMessage()
-
-    werkzeug_logger = logging.getLogger('werkzeug')
-    werkzeug_logger.addFilter(NoAccessLogFilter())
-
     # Cargar configuración del sistema dentro del contexto de la aplicación
     with app.app_context():
         load_system_config()
@@ -17,7 +17,12 @@ from .configuracion import SystemConfig
 from .asistencia import Asistencia
 from .matricula import Matricula
 from .inclusion import Inclusion
-from .boletin import Boletin
+from .boletin import Boletin, BoletinNota
+from .posicion_curso import PosicionCurso
+from .trabajo import Trabajo
+from .correo_saliente import CorreoSaliente
+from .asistencia_resumen import AsistenciaResumen
+from .notificacion import NotificacionEstado, NotificacionOculta
 
 
 __all__=[
@@ -38,4 +43,11 @@ __all__=[
          'SystemConfig',
          'Actividad',
          'Boletin',
+         'BoletinNota',
+         'PosicionCurso',
+         'Trabajo',
+         'CorreoSaliente',
+         'AsistenciaResumen',
+         'NotificacionEstado',
+         'NotificacionOculta',
          ]
\ No newline at end of file
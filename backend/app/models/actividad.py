@@ -10,7 +10,7 @@ class Actividad(db.Model):
     detalle = db.Column(db.Text, nullable=False)
     fecha = db.Column(db.Date, nullable=False, default=datetime.utcnow)
     creado_por = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=False)
-    creado_en = db.Column(db.DateTime, default=datetime.utcnow)
+    creado_en = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     id_asignacion = db.Column(db.Integer, db.ForeignKey('asignaciones.id'), nullable=True)
 
     asignacion = db.relationship('Asignacion', back_populates='actividades')
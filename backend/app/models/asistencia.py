@@ -1,9 +1,16 @@
 from datetime import datetime
+from sqlalchemy import UniqueConstraint
 from app import db
 
 
 class Asistencia(db.Model):
     __tablename__ = 'asistencias'
+    __table_args__ = (
+        # Una asistencia por estudiante, asignación y día; permite guardar con upsert
+        UniqueConstraint('id_matricula', 'id_asignacion', 'fecha', name='uq_asistencia_matricula_asignacion_fecha'),
+        # Lista del día y resumen por asignación
+        db.Index('ix_asistencias_asignacion_fecha', 'id_asignacion', 'fecha'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     id_matricula = db.Column(db.Integer, db.ForeignKey('matricula.id', ondelete='CASCADE'), nullable=False)
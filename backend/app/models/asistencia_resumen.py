@@ -0,0 +1,28 @@
+from sqlalchemy import UniqueConstraint
+from app import db
+
+
+class AsistenciaResumen(db.Model):
+    """
+    Cantidad de asistencias por estado de cada asignación y fecha, contando solo matrículas
+    activas. Se mantiene al guardar asistencias y al cambiar el estado de una matrícula para
+    que el dashboard y las estadísticas no recorran la tabla `asistencias`;
+    `reconstruir_resumen_asistencias.py` la recalcula desde cero.
+    """
+    __tablename__ = 'asistencias_resumen'
+
+    id = db.Column(db.Integer, primary_key=True)
+    id_curso = db.Column(db.Integer, db.ForeignKey('cursos.id', ondelete='CASCADE'), nullable=False)
+    id_asignacion = db.Column(db.Integer, db.ForeignKey('asignaciones.id', ondelete='CASCADE'), nullable=False)
+    anio_lectivo = db.Column(db.Integer, nullable=False)
+    fecha = db.Column(db.Date, nullable=False)
+    estado = db.Column(db.String(20), nullable=False)
+    total = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint('id_asignacion', 'fecha', 'estado', name='uq_asistencia_resumen'),
+        db.Index('ix_asistencias_resumen_anio_fecha', 'anio_lectivo', 'fecha'),
+    )
+
+    def __repr__(self):
+        return f'<AsistenciaResumen Asignacion {self.id_asignacion} {self.fecha} {self.estado}={self.total}>'
@@ -1,20 +1,83 @@
 from app import db
 from datetime import datetime
+from sqlalchemy import UniqueConstraint, func, select
+from sqlalchemy.orm import column_property
+from sqlalchemy.orm.attributes import set_committed_value
 import json
 
+
+class BoletinNota(db.Model):
+    """Notas, faltas y desempeño de una asignatura dentro de un boletín"""
+    __tablename__ = 'boletin_notas'
+
+    # Campos opcionales del diccionario de notas, en el orden en que se presentan
+    CAMPOS_OPCIONALES = ('p1', 'p2', 'p3', 'p4', 'pf', 'fl', 'ih')
+
+    id = db.Column(db.Integer, primary_key=True)
+    id_boletin = db.Column(db.Integer, db.ForeignKey('boletines.id', ondelete='CASCADE'), nullable=False, index=True)
+    id_asignatura = db.Column(db.Integer, db.ForeignKey('asignaturas.id', ondelete='CASCADE'), nullable=False)
+    orden = db.Column(db.Integer, nullable=False, default=0)
+    # Promedio de cada período del año (el año lectivo tiene cuatro períodos) y promedio final
+    p1 = db.Column(db.Float, nullable=True)
+    p2 = db.Column(db.Float, nullable=True)
+    p3 = db.Column(db.Float, nullable=True)
+    p4 = db.Column(db.Float, nullable=True)
+    pf = db.Column(db.Float, nullable=True)
+    fl = db.Column(db.Integer, nullable=True)  # Faltas
+    ih = db.Column(db.Integer, nullable=True)  # Intensidad horaria
+    observacion = db.Column(db.Text, nullable=True)
+    desempeno = db.Column(db.String(20), nullable=True)
+    nota = db.Column(db.Float, nullable=True)  # Nota del período del boletín
+
+    __table_args__ = (
+        UniqueConstraint('id_boletin', 'id_asignatura', name='uq_boletin_nota_asignatura'),
+    )
+
+    def asignar(self, datos):
+        """Copia los valores de un diccionario de notas del boletín"""
+        for campo in self.CAMPOS_OPCIONALES:
+            setattr(self, campo, datos.get(campo))
+        self.observacion = datos.get('observacion', '')
+        self.desempeno = datos.get('desempeno', '')
+        self.nota = datos.get('nota')
+
+    def to_dict(self):
+        """Diccionario con la misma forma que el antiguo grades_data"""
+        datos = {}
+        for campo in self.CAMPOS_OPCIONALES:
+            valor = getattr(self, campo)
+            if valor is not None:
+                datos[campo] = valor
+        datos['observacion'] = self.observacion or ''
+        datos['desempeno'] = self.desempeno or ''
+        datos['nota'] = self.nota
+        return datos
+
+    def __repr__(self):
+        return f'<BoletinNota Boletin {self.id_boletin} Asignatura {self.id_asignatura}>'
+
+
 class Boletin(db.Model):
     __tablename__ = 'boletines'
+    __table_args__ = (
+        # Boletines de un curso en un período y año
+        db.Index('ix_boletines_curso_periodo_anio', 'id_curso', 'id_periodo', 'anio_lectivo'),
+        db.Index('ix_boletines_matricula_periodo', 'id_matricula', 'id_periodo'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     id_matricula = db.Column(db.Integer, db.ForeignKey('matricula.id'), nullable=False)
     id_periodo = db.Column(db.Integer, db.ForeignKey('periodos.id', ondelete='CASCADE'), nullable=False)
     id_curso = db.Column(db.Integer, db.ForeignKey('cursos.id', ondelete='CASCADE'), nullable=False)
-    # grades_data will store a JSON string or similar structure for grades per subject
-    grades_data = db.Column(db.Text, nullable=True)
+    # JSON heredado de la versión anterior; las notas viven en boletin_notas.
+    # Solo se lee para boletines aún no convertidos (la revisión 7a8ffa673efd los convierte).
+    grades_data_json = db.Column('grades_data', db.Text, nullable=True)
     anio_lectivo = db.Column(db.String(9), nullable=False)
     comments = db.Column(db.Text, nullable=True)
     generated_date = db.Column(db.DateTime, default=datetime.utcnow)
     generated_by_user_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=False)
+    # Se activa cuando cambian notas o asistencias que afectan al boletín; solo estos se recalculan
+    requiere_recalculo = db.Column(db.Boolean, nullable=False, default=True, server_default='1')
 
     # Soft delete columns
     eliminado = db.Column(db.Boolean, default=False)
@@ -27,6 +90,16 @@ class Boletin(db.Model):
     curso = db.relationship('Curso', back_populates='boletines')
     generated_by = db.relationship('User', backref='boletines_generados', lazy=True, foreign_keys=[generated_by_user_id])
     eliminado_por_user = db.relationship('User', backref='boletines_eliminados', lazy=True, foreign_keys=[eliminado_por])  # ¡CORREGIDO!
+    notas = db.relationship('BoletinNota', backref='boletin', lazy=True, cascade='all, delete-orphan',
+                            order_by='BoletinNota.orden', passive_deletes=True)
+
+    # Promedio de las notas del boletín calculado por la base de datos al cargarlo
+    promedio = column_property(
+        select(func.coalesce(func.avg(BoletinNota.nota), 0.0))
+        .where(BoletinNota.id_boletin == id)
+        .correlate_except(BoletinNota)
+        .scalar_subquery()
+    )
 
     @property
     def estudiante_nombre(self):
@@ -41,31 +114,57 @@ class Boletin(db.Model):
         return self.periodo.nombre
 
     @property
-    def promedio(self):
-        if not self.grades_data:
-            return 0.0
-        
-        try:
-            grades = json.loads(self.grades_data)
-        except json.JSONDecodeError:
-            return 0.0
-
-        if not isinstance(grades, dict):
-            return 0.0
-
-        notas_validas = []
-        for data in grades.values():
-            nota = data.get('nota')
-            if nota is not None and nota != '':
-                try:
-                    notas_validas.append(float(nota))
-                except (ValueError, TypeError):
-                    continue
-        
-        if not notas_validas:
-            return 0.0
-            
-        return sum(notas_validas) / len(notas_validas)
+    def grades(self):
+        """
+        Notas del boletín con la forma {id_asignatura (str): {p1.., pf, fl, ih, observacion, desempeno, nota}}.
+        Si el boletín aún no se convirtió a boletin_notas, se leen del JSON heredado.
+        """
+        if self.notas:
+            return {str(n.id_asignatura): n.to_dict() for n in self.notas}
+        if self.grades_data_json:
+            try:
+                grades = json.loads(self.grades_data_json)
+                return grades if isinstance(grades, dict) else {}
+            except json.JSONDecodeError:
+                return {}
+        return {}
+
+    @grades.setter
+    def grades(self, grades):
+        """Guarda las notas actualizando en su lugar las filas de boletin_notas existentes"""
+        grades = grades or {}
+        existentes = {n.id_asignatura: n for n in self.notas}
+        nuevas = []
+        for orden, (asig_id, datos) in enumerate(grades.items()):
+            nota = existentes.pop(int(asig_id), None) or BoletinNota(id_asignatura=int(asig_id))
+            nota.orden = orden
+            nota.asignar(datos)
+            nuevas.append(nota)
+        self.notas = nuevas
+        self.grades_data_json = None
+
+    @property
+    def grades_data(self):
+        """Compatibilidad: las notas como texto JSON, igual que la antigua columna"""
+        if not self.notas and not self.grades_data_json:
+            return None
+        return json.dumps(self.grades)
+
+    @grades_data.setter
+    def grades_data(self, valor):
+        self.grades = json.loads(valor) if isinstance(valor, str) else valor
+
+    @classmethod
+    def precargar_notas(cls, boletines):
+        """Carga las notas de varios boletines con una sola consulta en lugar de una por boletín"""
+        persistidos = {b.id: b for b in boletines if b.id is not None}
+        if not persistidos:
+            return
+        notas_por_boletin = {boletin_id: [] for boletin_id in persistidos}
+        for nota in BoletinNota.query.filter(BoletinNota.id_boletin.in_(list(persistidos))).order_by(BoletinNota.orden).all():
+            notas_por_boletin[nota.id_boletin].append(nota)
+        for boletin_id, notas in notas_por_boletin.items():
+            set_committed_value(persistidos[boletin_id], 'notas', notas)
 
     @property
     def fecha_creacion(self):
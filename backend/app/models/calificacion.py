@@ -4,6 +4,16 @@ from datetime import datetime
 
 class Calificacion(db.Model):
     __tablename__ = 'calificacion'
+    __table_args__ = (
+        # Una calificación por estudiante, asignación y fecha; permite guardar con upsert
+        db.UniqueConstraint('id_matricula', 'id_asignacion', 'fecha_calificacion',
+                            name='uq_calificacion_matricula_asignacion_fecha'),
+        # Libro de notas de una fecha y guardado masivo
+        db.Index('ix_calificacion_asignacion_fecha', 'id_asignacion', 'fecha_calificacion'),
+        db.Index('ix_calificacion_asignacion_periodo', 'id_asignacion', 'id_periodo'),
+        # Promedios de un estudiante en un rango de fechas (boletines, posiciones)
+        db.Index('ix_calificacion_matricula_fecha', 'id_matricula', 'fecha_calificacion'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     id_matricula = db.Column(db.Integer, db.ForeignKey('matricula.id', ondelete='CASCADE'), nullable=False)
@@ -0,0 +1,34 @@
+from datetime import datetime
+from app import db
+
+
+class CorreoSaliente(db.Model):
+    """Correo en la bandeja de salida; lo entrega el worker de correo con reintentos"""
+    __tablename__ = 'correos_salientes'
+
+    id = db.Column(db.Integer, primary_key=True)
+    destinatario = db.Column(db.String(120), nullable=False)
+    asunto = db.Column(db.String(255), nullable=False)
+    cuerpo_html = db.Column(db.Text, nullable=False)
+    adjunto_nombre = db.Column(db.String(255), nullable=True)
+    adjunto_tipo = db.Column(db.String(100), nullable=True)
+    # LONGBLOB en MySQL: un BLOB sin tamaño admite solo 64 KB y los boletines en PDF lo superan
+    adjunto = db.Column(db.LargeBinary(length=2**32 - 1), nullable=True)  # Se borra al entregarse el correo
+    referencia = db.Column(db.String(100), nullable=True, index=True)  # Ej.: 'boletin:15', 'pago:3', 'boletin:15:trabajo:<id>'
+    estado = db.Column(db.Enum('pendiente', 'enviando', 'enviado', 'error', name='estado_correo'),
+                       nullable=False, default='pendiente')
+    intentos = db.Column(db.Integer, nullable=False, default=0)
+    proximo_intento = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    ultimo_error = db.Column(db.String(255), nullable=True)
+    lote = db.Column(db.String(36), nullable=True)  # Entrega que reclamó el correo
+    id_usuario = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=True)
+    creado_en = db.Column(db.DateTime, default=datetime.utcnow)
+    actualizado_en = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    enviado_en = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_correos_salientes_estado_proximo', 'estado', 'proximo_intento'),
+    )
+
+    def __repr__(self):
+        return f'<CorreoSaliente {self.id} {self.destinatario} {self.estado}>'
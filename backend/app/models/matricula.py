@@ -46,6 +46,7 @@ class Matricula(db.Model):
     
     __table_args__ = (
         UniqueConstraint('documento', 'año_lectivo', name='uq_documento_anio'),
+        db.Index('ix_matricula_anio_estado_curso', 'año_lectivo', 'estado', 'id_curso'),
     )
 
 
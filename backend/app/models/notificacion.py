@@ -0,0 +1,82 @@
+from datetime import datetime
+from sqlalchemy import and_, or_
+from app import db
+from app.models.actividad import Actividad
+
+
+class NotificacionEstado(db.Model):
+    """
+    Estado de las notificaciones de un usuario: hasta cuándo las vio (`vistas_hasta`) y
+    cuántas nuevas tiene sin ver. `no_leidas` se mantiene al crear o borrar actividades,
+    así que el contador del encabezado es una lectura por clave primaria.
+    """
+    __tablename__ = 'notificaciones_estado'
+
+    id_usuario = db.Column(db.Integer, db.ForeignKey('usuarios.id', ondelete='CASCADE'), primary_key=True)
+    vistas_hasta = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    no_leidas = db.Column(db.Integer, nullable=False, default=0)
+    actualizado_en = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<NotificacionEstado Usuario {self.id_usuario} no_leidas={self.no_leidas}>'
+
+
+class NotificacionOculta(db.Model):
+    """Actividad que el usuario marcó como leída y ya no aparece en sus listados"""
+    __tablename__ = 'notificaciones_ocultas'
+
+    id_usuario = db.Column(db.Integer, db.ForeignKey('usuarios.id', ondelete='CASCADE'), primary_key=True)
+    id_actividad = db.Column(db.Integer, db.ForeignKey('actividades.id', ondelete='CASCADE'), primary_key=True)
+    creado_en = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<NotificacionOculta Usuario {self.id_usuario} Actividad {self.id_actividad}>'
+
+
+def _destinatarios(connection, actividad):
+    """
+    Condición sobre notificaciones_estado.id_usuario que selecciona a quienes ven la actividad:
+    los administradores y el docente de la asignación, salvo quien la creó.
+    """
+    usuarios = db.metadata.tables['usuarios']
+    asignaciones = db.metadata.tables['asignaciones']
+    estado = NotificacionEstado.__table__
+    if actividad.id_asignacion is None:
+        return None
+    docente_id = connection.execute(
+        db.select(asignaciones.c.id_docente).where(asignaciones.c.id == actividad.id_asignacion)
+    ).scalar()
+    administradores = db.select(usuarios.c.id).where(usuarios.c.rol == 'admin')
+    return and_(
+        or_(estado.c.id_usuario.in_(administradores), estado.c.id_usuario == docente_id),
+        estado.c.id_usuario != actividad.creado_por
+    )
+
+
+def sumar_notificacion(mapper, connection, target):
+    """Una actividad nueva suma uno al contador de sus destinatarios (en la misma transacción)"""
+    condicion = _destinatarios(connection, target)
+    if condicion is None:
+        return
+    estado = NotificacionEstado.__table__
+    connection.execute(estado.update().where(condicion).values(no_leidas=estado.c.no_leidas + 1))
+
+
+def restar_notificacion(mapper, connection, target):
+    """Al borrar una actividad se descuenta de quienes aún no la habían visto ni ocultado"""
+    condicion = _destinatarios(connection, target)
+    if condicion is None:
+        return
+    estado = NotificacionEstado.__table__
+    ocultas = NotificacionOculta.__table__
+    connection.execute(estado.update().where(
+        condicion,
+        estado.c.vistas_hasta < target.creado_en,
+        estado.c.no_leidas > 0,
+        estado.c.id_usuario.notin_(db.select(ocultas.c.id_usuario).where(ocultas.c.id_actividad == target.id))
+    ).values(no_leidas=estado.c.no_leidas - 1))
+    connection.execute(ocultas.delete().where(ocultas.c.id_actividad == target.id))
+
+
+db.event.listen(Actividad, 'after_insert', sumar_notificacion)
+db.event.listen(Actividad, 'before_delete', restar_notificacion)
@@ -0,0 +1,29 @@
+from datetime import datetime
+from sqlalchemy import UniqueConstraint
+from app import db
+
+
+class PosicionCurso(db.Model):
+    """Puesto y promedio de cada estudiante dentro de su curso para un período y año lectivo"""
+    __tablename__ = 'posiciones_curso'
+
+    id = db.Column(db.Integer, primary_key=True)
+    id_curso = db.Column(db.Integer, db.ForeignKey('cursos.id', ondelete='CASCADE'), nullable=False)
+    id_periodo = db.Column(db.Integer, db.ForeignKey('periodos.id', ondelete='CASCADE'), nullable=False)
+    anio_lectivo = db.Column(db.Integer, nullable=False)
+    id_matricula = db.Column(db.Integer, db.ForeignKey('matricula.id', ondelete='CASCADE'), nullable=False)
+    puesto = db.Column(db.Integer, nullable=False)
+    # Decimal exacto: el cursor de paginación lo compara por igualdad (un FLOAT de MySQL no sirve)
+    promedio = db.Column(db.Numeric(5, 2, asdecimal=False), nullable=False, default=0.0)
+    cantidad_asignaturas = db.Column(db.Integer, nullable=False, default=0)
+    actualizado_en = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint('id_curso', 'id_periodo', 'anio_lectivo', 'id_matricula', name='uq_posicion_curso_matricula'),
+    )
+
+    matricula = db.relationship('Matricula', lazy=True)
+    curso = db.relationship('Curso', lazy=True)
+
+    def __repr__(self):
+        return f'<PosicionCurso {self.puesto} Matricula {self.id_matricula} Curso {self.id_curso} Periodo {self.id_periodo}>'
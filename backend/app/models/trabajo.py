@@ -0,0 +1,55 @@
+import json
+import uuid
+from datetime import datetime
+from app import db
+
+
+class Trabajo(db.Model):
+    """Tarea larga (exportaciones, ZIPs, reportes) encolada en la base de datos para los workers"""
+    __tablename__ = 'trabajos'
+
+    ESTADOS_FINALES = ('completado', 'error', 'cancelado')
+
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    tipo = db.Column(db.String(50), nullable=False)
+    parametros = db.Column(db.Text, nullable=False, default='{}')
+    estado = db.Column(db.Enum('pendiente', 'en_proceso', 'completado', 'error', 'cancelado', name='estado_trabajo'),
+                       nullable=False, default='pendiente', index=True)
+    progreso = db.Column(db.Integer, nullable=False, default=0)
+    mensaje = db.Column(db.String(255), nullable=True)
+    archivo = db.Column(db.String(255), nullable=True)  # Resultado dentro del directorio del trabajo
+    nombre_descarga = db.Column(db.String(255), nullable=True)
+    cancelacion_solicitada = db.Column(db.Boolean, nullable=False, default=False)
+    intentos = db.Column(db.Integer, nullable=False, default=0)
+    worker = db.Column(db.String(100), nullable=True)
+    id_usuario = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=False)
+    creado_en = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    iniciado_en = db.Column(db.DateTime, nullable=True)
+    actualizado_en = db.Column(db.DateTime, default=datetime.utcnow)  # Latido del worker
+    finalizado_en = db.Column(db.DateTime, nullable=True)
+
+    usuario = db.relationship('User', lazy=True)
+
+    @property
+    def datos(self):
+        return json.loads(self.parametros or '{}')
+
+    @property
+    def finalizado(self):
+        return self.estado in self.ESTADOS_FINALES
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'tipo': self.tipo,
+            'estado': self.estado,
+            'progreso': self.progreso,
+            'mensaje': self.mensaje,
+            'cancelacion_solicitada': self.cancelacion_solicitada,
+            'descargable': self.estado == 'completado' and bool(self.archivo),
+            'creado_en': self.creado_en.isoformat() if self.creado_en else None,
+            'finalizado_en': self.finalizado_en.isoformat() if self.finalizado_en else None,
+        }
+
+    def __repr__(self):
+        return f'<Trabajo {self.id} {self.tipo} {self.estado}>'
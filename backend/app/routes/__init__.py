@@ -25,6 +25,8 @@ from .configuracion import config_bp
 from .reciclaje import reciclaje_bp
 from .actividades import actividades_bp
 from .boletines import boletines_bp
+from .trabajos import trabajos_bp
+from .eventos import eventos_bp
 
 
 
@@ -57,4 +59,6 @@ def register_blueprints(app):
     app.register_blueprint(actividades_bp)
     app.register_blueprint(reciclaje_bp)
     app.register_blueprint(boletines_bp)
+    app.register_blueprint(trabajos_bp)
+    app.register_blueprint(eventos_bp)
     
\ No newline at end of file
@@ -4,38 +4,32 @@ from flask_login import current_user
 from app import db
 from app.models import Matricula, Curso, Asignatura, Asistencia, Calificacion, Asignacion, User
 from app.utils.decorators import roles_required
-from sqlalchemy import func
 from app.models.configuracion_libro import ConfiguracionLibro
 from datetime import datetime as dt
 from sqlalchemy.orm import joinedload
-from app.models.anio_periodo import AnioPeriodo
 # --- ReportLab: PDF ---
 from reportlab.lib.colors import HexColor
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import mm
 from reportlab.pdfgen import canvas
 import os
-from app.services.configuracion_service import get_active_config
+from app.services.academico_service import resumen_asistencia_estudiantes, resumen_calificaciones_estudiantes
+from app.services.contexto_service import contexto_academico
 
 academico_bp = Blueprint('academico', __name__, url_prefix='/informes/academico')
 
 @academico_bp.route('/')
 @roles_required('admin', 'docente')
 def index():
-    active_config = get_active_config()
+    active_config = contexto_academico().config
     if not active_config:
         flash('No hay un año lectivo configurado como activo', 'warning')
         return redirect(url_for('configuracion.index'))
     
     anio_lectivo = active_config['anio']
 
-    # Obtener período activo
-    active_anio_periodo = AnioPeriodo.query.filter_by(anio_lectivo=anio_lectivo, estado='activo').first()
-    start_date = None
-    end_date = None
-    if active_anio_periodo:
-        start_date = dt(anio_lectivo, int(active_anio_periodo.fecha_inicio.split('-')[0]), int(active_anio_periodo.fecha_inicio.split('-')[1]))
-        end_date = dt(anio_lectivo, int(active_anio_periodo.fecha_fin.split('-')[0]), int(active_anio_periodo.fecha_fin.split('-')[1]))
+    # Fechas del período activo
+    start_date, end_date = contexto_academico().rango or (None, None)
 
     curso_id = request.args.get('curso', type=int)
     asignatura_id = request.args.get('asignatura', type=int)
@@ -102,38 +96,13 @@ def index():
     asignaturas_anio = []
     
 
+    matriculas_pagina = [estudiante.id for estudiante in estudiantes.items]
+
     if tipo == 'asistencia' and asignatura_id:
-        for estudiante in estudiantes.items:
-            query = db.session.query(
-                Asistencia.estado,
-                func.count(Asistencia.id).label('cantidad')
-            ).join(Asignacion).filter(
-                Asistencia.id_matricula == estudiante.id,
-                Asignacion.id_asignatura == asignatura_id,
-                Asignacion.anio_lectivo == anio_lectivo
-            )
-            if start_date and end_date:
-                query = query.filter(Asistencia.fecha >= start_date, Asistencia.fecha <= end_date)
-            stats = query.group_by(Asistencia.estado).all()
-            
-            estadisticas = {'presente': 0, 'ausente': 0, 'justificado': 0}
-            for stat in stats:
-                estadisticas[stat.estado] = stat.cantidad
-            
-            estadisticas_asistencia[estudiante.id] = estadisticas
-            
-            query_obs = db.session.query(func.count(Asistencia.id)).join(Asignacion).filter(
-                Asistencia.id_matricula == estudiante.id,
-                Asignacion.id_asignatura == asignatura_id,
-                Asignacion.anio_lectivo == anio_lectivo,
-                Asistencia.observaciones != None,
-                Asistencia.observaciones != ''
-            )
-            if start_date and end_date:
-                query_obs = query_obs.filter(Asistencia.fecha >= start_date, Asistencia.fecha <= end_date)
-            count = query_obs.scalar()
-            
-            observaciones_count[estudiante.id] = count or 0
+        resumen = resumen_asistencia_estudiantes(matriculas_pagina, asignatura_id, anio_lectivo, start_date, end_date)
+        for matricula_id, estadisticas in resumen.items():
+            observaciones_count[matricula_id] = estadisticas.pop('observaciones')
+            estadisticas_asistencia[matricula_id] = estadisticas
 
     elif tipo == 'calificaciones':
         if curso_id:
@@ -142,35 +111,15 @@ def index():
                 Asignacion.estado == 'activo',
                 Asignacion.anio_lectivo == anio_lectivo
             ).distinct().order_by(Asignatura.nombre).all()
-        
-            for estudiante in estudiantes.items:
-                calificaciones = {}
-                promedio_total = 0
-                count_calificaciones = 0
-                
-                for asignatura in asignaturas_anio:
-                    if asignatura_id and asignatura.id != asignatura_id:
-                        continue
-                    query_cal = db.session.query(func.avg(Calificacion.nota)).join(Asignacion).filter(
-                        Calificacion.id_matricula == estudiante.id,
-                        Asignacion.id_asignatura == asignatura.id,
-                        Asignacion.anio_lectivo == anio_lectivo,
-                        Calificacion.nota.isnot(None)
-                    )
-                    if start_date and end_date:
-                        query_cal = query_cal.filter(Calificacion.fecha_calificacion >= start_date, Calificacion.fecha_calificacion <= end_date)
-                    promedio = query_cal.scalar()
-                    
-                    if promedio:
-                        calificaciones[asignatura.id] = round(promedio, 1)
-                        promedio_total += promedio
-                        count_calificaciones += 1
-                
-                calificaciones_estudiantes[estudiante.id] = calificaciones
-                
-                if count_calificaciones > 0:
-                    promedios_estudiantes[estudiante.id] = round(promedio_total / count_calificaciones, 1)
-                
+            asignaturas_ids = [a.id for a in asignaturas_anio if not asignatura_id or a.id == asignatura_id]
+
+            resumen = resumen_calificaciones_estudiantes(matriculas_pagina, anio_lectivo, asignaturas_ids, start_date, end_date)
+            for matricula_id, por_asignatura in resumen.items():
+                promedios = {aid: promedio for aid, (promedio, _) in por_asignatura.items() if promedio}
+                calificaciones_estudiantes[matricula_id] = {aid: round(promedio, 1) for aid, promedio in promedios.items()}
+                if promedios:
+                    promedios_estudiantes[matricula_id] = round(sum(promedios.values()) / len(promedios), 1)
+
     config_libro = ConfiguracionLibro.obtener_configuracion_actual()
             
     
@@ -195,7 +144,7 @@ def index():
 @academico_bp.route('/obtener_observaciones')
 @roles_required('admin', 'docente')
 def obtener_observaciones():
-    active_config = get_active_config()
+    active_config = contexto_academico().config
     if not active_config:
         return jsonify({'error': 'No hay un año lectivo configurado como activo'}), 400
 
@@ -251,10 +200,9 @@ def obtener_observaciones():
     if asignatura_id:
         query = query.filter(Asignacion.id_asignatura == asignatura_id)
 
-    active_anio_periodo = AnioPeriodo.query.filter_by(anio_lectivo=anio_lectivo, estado='activo').first()
-    if active_anio_periodo:
-        start_date = dt(anio_lectivo, int(active_anio_periodo.fecha_inicio.split('-')[0]), int(active_anio_periodo.fecha_inicio.split('-')[1]))
-        end_date = dt(anio_lectivo, int(active_anio_periodo.fecha_fin.split('-')[0]), int(active_anio_periodo.fecha_fin.split('-')[1]))
+    rango_periodo = contexto_academico().rango
+    if rango_periodo:
+        start_date, end_date = rango_periodo
         query = query.filter(Asistencia.fecha >= start_date, Asistencia.fecha <= end_date)
 
     observaciones = query.order_by(Asistencia.fecha.desc()).paginate(
@@ -288,7 +236,7 @@ def obtener_observaciones():
 @roles_required('admin', 'docente')
 def obtener_calificaciones():
     try:
-        active_config = get_active_config()
+        active_config = contexto_academico().config
         if not active_config:
             return jsonify({'error': 'No hay un año lectivo configurado como activo'}), 400
 
@@ -335,10 +283,9 @@ def obtener_calificaciones():
         if asignatura_id:
             calificaciones_query = calificaciones_query.filter(Asignacion.id_asignatura == asignatura_id)
 
-        active_anio_periodo = AnioPeriodo.query.filter_by(anio_lectivo=anio_lectivo, estado='activo').first()
-        if active_anio_periodo:
-            start_date = dt(anio_lectivo, int(active_anio_periodo.fecha_inicio.split('-')[0]), int(active_anio_periodo.fecha_inicio.split('-')[1]))
-            end_date = dt(anio_lectivo, int(active_anio_periodo.fecha_fin.split('-')[0]), int(active_anio_periodo.fecha_fin.split('-')[1]))
+        rango_periodo = contexto_academico().rango
+        if rango_periodo:
+            start_date, end_date = rango_periodo
             calificaciones_query = calificaciones_query.filter(Calificacion.fecha_calificacion >= start_date, Calificacion.fecha_calificacion <= end_date)
 
         calificaciones_query = calificaciones_query.order_by(Calificacion.fecha_calificacion.desc())
@@ -388,7 +335,7 @@ def obtener_calificaciones():
 @roles_required('admin', 'docente')
 def exportar_datos():
     try:
-        active_config = get_active_config()
+        active_config = contexto_academico().config
         if not active_config:
             flash('No hay un año lectivo configurado como activo', 'warning')
             return redirect(url_for('academico.index'))
@@ -502,6 +449,8 @@ def exportar_datos():
             
             asignatura = Asignatura.query.get(asignatura_id)
             titulo_asignatura = f"REPORTE DE ASISTENCIAS" if asignatura else "REPORTE DE ASISTENCIAS"
+            # Una consulta para todo el curso en lugar de una por estudiante al dibujar
+            resumen_asistencia = resumen_asistencia_estudiantes([e.id for e in estudiantes], asignatura_id, anio_lectivo)
             
             current_y = draw_header(titulo_asignatura)
             
@@ -539,18 +488,7 @@ def exportar_datos():
                 estudiantes_pagina = estudiantes[inicio:fin]
                 
                 for i, estudiante in enumerate(estudiantes_pagina, inicio + 1):
-                    stats = db.session.query(
-                        Asistencia.estado,
-                        func.count(Asistencia.id).label('cantidad')
-                    ).join(Asignacion).filter(
-                        Asistencia.id_matricula == estudiante.id,
-                        Asignacion.id_asignatura == asignatura_id,
-                        Asignacion.anio_lectivo == anio_lectivo
-                    ).group_by(Asistencia.estado).all()
-                    
-                    estadisticas = {'presente': 0, 'ausente': 0, 'justificado': 0}
-                    for stat in stats:
-                        estadisticas[stat.estado] = stat.cantidad
+                    estadisticas = resumen_asistencia[estudiante.id]
                     
                     datos = [
                         str(i),
@@ -602,6 +540,11 @@ def exportar_datos():
                     asignatura_nombre = asignatura.nombre
             
             titulo_calificaciones = f"REPORTE DE CALIFICACIONES"
+            # Una consulta para todo el curso en lugar de dos por estudiante y asignatura al dibujar
+            resumen_calificaciones = resumen_calificaciones_estudiantes(
+                [e.id for e in estudiantes], anio_lectivo,
+                [a.id for a in asignaturas_anio if not asignatura_id or a.id == asignatura_id]
+            )
             current_y = draw_header(titulo_calificaciones)
             
             estudiantes_por_pagina = 15
@@ -638,30 +581,9 @@ def exportar_datos():
                 estudiantes_pagina = estudiantes[inicio:fin]
                 
                 for i, estudiante in enumerate(estudiantes_pagina, inicio + 1):
-                    total_notas = 0
-                    suma_notas = 0
-                    
-                    for asignatura in asignaturas_anio:
-                        if asignatura_id and asignatura.id != asignatura_id:
-                            continue
-                            
-                        count = db.session.query(func.count(Calificacion.id)).join(Asignacion).filter(
-                            Calificacion.id_matricula == estudiante.id,
-                            Asignacion.id_asignatura == asignatura.id,
-                            Asignacion.anio_lectivo == anio_lectivo,
-                            Calificacion.nota.isnot(None)
-                        ).scalar() or 0
-                        
-                        total_notas += count
-                        
-                        promedio = db.session.query(func.avg(Calificacion.nota)).join(Asignacion).filter(
-                            Calificacion.id_matricula == estudiante.id,
-                            Asignacion.id_asignatura == asignatura.id,
-                            Asignacion.anio_lectivo == anio_lectivo,
-                            Calificacion.nota.isnot(None)
-                        ).scalar() or 0
-                        
-                        suma_notas += promedio * count if count > 0 else 0
+                    por_asignatura = resumen_calificaciones[estudiante.id].values()
+                    total_notas = sum(cantidad for _, cantidad in por_asignatura)
+                    suma_notas = sum(promedio * cantidad for promedio, cantidad in por_asignatura)
                     
                     promedio_general = round(suma_notas / total_notas, 1) if total_notas > 0 else 0
                     
@@ -4,24 +4,13 @@ from app.utils.decorators import roles_required
 from datetime import datetime
 from app.models import Actividad, User, Asignacion
 from app import db
-from app.services.configuracion_service import get_active_config
-import logging
-from functools import wraps
+from app.services.contexto_service import contexto_academico
+from app.services.notificacion_service import (
+    excluir_ocultas, filtrar_visibles, marcar_vistas, notificaciones_no_leidas, ocultar_todas
+)
 
 actividades_bp = Blueprint('actividades', __name__, url_prefix='/actividades')
 
-def suppress_werkzeug_logs(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        werkzeug_logger = logging.getLogger('werkzeug')
-        original_level = werkzeug_logger.level
-        werkzeug_logger.setLevel(logging.ERROR)
-        try:
-            return f(*args, **kwargs)
-        finally:
-            werkzeug_logger.setLevel(original_level)
-    return decorated_function
-
 @actividades_bp.route('/eliminar/<int:id>', methods=['POST'])
 @roles_required('admin', 'docente')
 def eliminar_actividad(id):
@@ -34,17 +23,8 @@ def eliminar_actividad(id):
 @actividades_bp.route('/eliminar-todas', methods=['POST'])
 @roles_required('admin', 'docente')
 def eliminar_todas_actividades():
-    leidas = session.get('notificaciones_leidas', [])
-    
-    # Obtener todas las actividades no leídas y no creadas por el usuario actual
-    actividades_a_marcar = Actividad.query.filter(Actividad.creado_por != current_user.id).all()
-    
-    for act in actividades_a_marcar:
-        notificacion = {'tipo': act.tipo, 'id': act.id}
-        if notificacion not in leidas:
-            leidas.append(notificacion)
-            
-    session['notificaciones_leidas'] = leidas
+    # Las actividades visibles hoy quedan ocultas para este usuario
+    ocultar_todas(current_user)
     flash('Todas las notificaciones han sido marcadas como leídas.', 'success')
     return redirect(url_for('actividades.index'))
 
@@ -53,17 +33,17 @@ def eliminar_todas_actividades():
 @roles_required('admin', 'docente')
 def index():
     # Marcar el tiempo de la visita para resetear el contador de notificaciones
-    session['notificaciones_vistas_hasta'] = datetime.utcnow().isoformat()
+    marcar_vistas(current_user)
+    # El estado de lectura ya no vive en la cookie de sesión
+    session.pop('notificaciones_vistas_hasta', None)
+    session.pop('notificaciones_leidas', None)
     
-    active_config = get_active_config()
+    active_config = contexto_academico().config
     if not active_config:
         flash('No hay un año lectivo configurado como activo', 'warning')
         return redirect(url_for('configuracion.index'))
 
     anio_lectivo = active_config['anio']
-    
-    leidas = session.get('notificaciones_leidas', [])
-    leidas_ids = [n['id'] for n in leidas]
 
     # Filtros opcionales
     tipo = request.args.get('tipo')
@@ -80,13 +60,8 @@ def index():
     # Filtrar por el año lectivo activo
     query = query.filter(Asignacion.anio_lectivo == anio_lectivo)
 
-    # Filtro adicional basado en el rol del usuario
-    if hasattr(current_user, 'rol') and current_user.rol == 'docente':
-        # Para docentes, mostrar solo actividades de sus asignaciones
-        query = query.filter(Asignacion.id_docente == current_user.id)
-    
-    # Todos los usuarios (admin y docentes) no ven las actividades que ellos mismos crearon
-    query = query.filter(Actividad.creado_por != current_user.id)
+    # Docentes: solo actividades de sus asignaciones. Nadie ve las que él mismo creó
+    query = filtrar_visibles(query, current_user)
 
     # Aplicar filtros de fecha
     if fecha_str:
@@ -103,8 +78,7 @@ def index():
     total_actividades = query.count()
 
     # Aplicar filtro de notificaciones leídas
-    if leidas_ids:
-        query = query.filter(Actividad.id.notin_(leidas_ids))
+    query = excluir_ocultas(query, current_user.id)
 
     # Ordenar y ejecutar la consulta con paginación
     pagination = query.order_by(Actividad.creado_en.desc()).paginate(page=page, per_page=per_page, error_out=False)
@@ -135,50 +109,8 @@ def index():
 
 @actividades_bp.route('/count_unread_notifications')
 @roles_required('admin', 'docente')
-@suppress_werkzeug_logs
 def count_unread_notifications():
     if not hasattr(current_user, 'is_authenticated') or not current_user.is_authenticated:
         return jsonify({'count': 0}), 200
 
-    # Para evitar logs repetidos, solo loguear la primera vez en la sesión
-    if 'count_logged' not in session:
-        session['count_logged'] = True
-        logging.getLogger('werkzeug').info(f"Count unread notifications requested by user {current_user.id}")
-
-    # Timestamp de la última vez que el usuario vio las notificaciones
-    vistas_hasta_str = session.get('notificaciones_vistas_hasta')
-    if vistas_hasta_str:
-        vistas_hasta = datetime.fromisoformat(vistas_hasta_str)
-    else:
-        # Si no hay timestamp, no hay notificaciones nuevas que contar para la sesión actual
-        vistas_hasta = datetime.utcnow()
-
-    # Notificaciones ocultas/eliminadas por el usuario
-    ocultas = session.get('notificaciones_leidas', [])
-    ocultas_ids = [n['id'] for n in ocultas]
-
-    # Query base
-    # Unir con Asignacion para poder filtrar por año lectivo
-    query = Actividad.query.join(Asignacion, Actividad.id_asignacion == Asignacion.id)
-
-    # Filtrar por el año lectivo activo
-    active_config = get_active_config()
-    if active_config and 'anio' in active_config:
-        query = query.filter(Asignacion.anio_lectivo == active_config['anio'])
-
-    # Filtro basado en el rol del usuario
-    if hasattr(current_user, 'rol') and current_user.rol == 'docente':
-        query = query.filter(Asignacion.id_docente == current_user.id)
-        
-    # Filtros comunes
-    query = query.filter(
-        Actividad.creado_por != current_user.id,
-        Actividad.creado_en > vistas_hasta
-    )
-
-    if ocultas_ids:
-        query = query.filter(Actividad.id.notin_(ocultas_ids))
-    
-    count = query.count()
-    
-    return jsonify({'count': count}), 200
\ No newline at end of file
+    return jsonify({'count': notificaciones_no_leidas(current_user)}), 200
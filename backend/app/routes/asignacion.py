@@ -5,8 +5,10 @@ from app.models import Asignacion, User, Curso, Asignatura, Actividad, Matricula
 from io import BytesIO
 from app.utils.decorators import admin_required, roles_required
 from datetime import datetime
-from app.services.configuracion_service import get_active_config
+from app.services.contexto_service import contexto_academico
 from app.services.asignacion_service import clear_asignaciones_cache
+from app.services.dashboard_service import clear_dashboard_cache
+from app.services.boletin_service import marcar_boletines_desactualizados
 
 # --- ReportLab: PDF ---
 from reportlab.lib.colors import HexColor
@@ -25,7 +27,7 @@ def index():
     page = request.args.get('page', 1, type=int)
     curso_id = request.args.get('curso_id', type=int)
 
-    active_config = get_active_config()
+    active_config = contexto_academico().config
     if not active_config:
         flash('No hay un año lectivo configurado como activo', 'warning')
         return redirect(url_for('configuracion.index'))
@@ -79,7 +81,7 @@ def index():
 @admin_required
 def crear():
     try:
-        active_config = get_active_config()
+        active_config = contexto_academico().config
         if not active_config:
             flash('No hay un año lectivo configurado como activo', 'warning')
             return redirect(url_for('asignacion.index'))
@@ -128,6 +130,7 @@ def crear():
         )
 
         db.session.add(nueva_asignacion)
+        marcar_boletines_desactualizados(active_config['anio'], curso_id=id_curso)
         db.session.commit()
 
         # Crear actividad para notificar al docente
@@ -152,6 +155,7 @@ def crear():
         
         # Limpiar cache para forzar una actualización en la próxima carga
         clear_asignaciones_cache(active_config['anio'])
+        clear_dashboard_cache()
         
         flash('Asignación creada exitosamente', 'success')
 
@@ -167,7 +171,7 @@ def crear():
 @admin_required
 def editar(id):
     asignacion = Asignacion.query.get_or_404(id)
-    active_config = get_active_config()
+    active_config = contexto_academico().config
 
     if not active_config or asignacion.anio_lectivo != active_config['anio']:
         flash('No puedes editar asignaciones de años lectivos no activos', 'danger')
@@ -209,6 +213,8 @@ def editar(id):
             flash('Ya existe una asignación activa para esta combinación', 'danger')
             return redirect(url_for('asignacion.index'))
 
+        curso_anterior = asignacion.id_curso
+
         # Actualizar asignación
         asignacion.id_docente = nuevo_docente
         asignacion.id_asignatura = nueva_asignatura
@@ -217,10 +223,15 @@ def editar(id):
         asignacion.horas_impartidas = horas_impartidas
         asignacion.observaciones = observaciones
 
+        # Cambia el conjunto de asignaturas de ambos cursos: sus boletines deben recalcularse
+        for curso_afectado in {curso_anterior, nuevo_curso}:
+            marcar_boletines_desactualizados(active_config['anio'], curso_id=curso_afectado)
+
         db.session.commit()
         
         # Limpiar cache para forzar una actualización en la próxima carga
         clear_asignaciones_cache(active_config['anio'])
+        clear_dashboard_cache()
         
         flash('Asignación actualizada correctamente', 'success')
 
@@ -236,7 +247,7 @@ def editar(id):
 @admin_required
 def eliminar(id):
     asignacion = Asignacion.query.get_or_404(id)
-    active_config = get_active_config()
+    active_config = contexto_academico().config
 
     if not active_config or asignacion.anio_lectivo != active_config['anio']:
         flash('No puedes eliminar asignaciones de años lectivos no activos', 'danger')
@@ -265,7 +276,7 @@ def exportar_pdf():
     try:
         # Lógica de filtrado
         curso_id = request.args.get('curso_id', type=int)
-        active_config = get_active_config()
+        active_config = contexto_academico().config
 
         if not active_config:
             flash('No hay un año lectivo configurado como activo', 'warning')
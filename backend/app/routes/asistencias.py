@@ -5,8 +5,11 @@ from flask_login import current_user
 from app.utils.decorators import roles_required
 from sqlalchemy.exc import SQLAlchemyError
 from app import db
-from app.models import Asistencia, Asignacion, Matricula, Curso, Asignatura, AnioPeriodo, Actividad, User
-from app.services.configuracion_service import get_active_config, get_active_period_id
+from app.models import Asistencia, Asignacion, Matricula, Curso, Asignatura, Actividad, User
+from app.services.contexto_service import contexto_academico
+from app.services.boletin_service import marcar_boletines_desactualizados
+from app.services.asistencia_service import actualizar_resumen_asistencia, guardar_asistencias_masivo
+from app.services.dashboard_service import clear_dashboard_cache
 
 asistencias_bp = Blueprint('asistencias', __name__, url_prefix='/asistencias')
 
@@ -20,11 +23,10 @@ def obtener_asignaturas():
     
     try:
         # Obtener año lectivo activo
-        config = get_active_config()
+        config = contexto_academico().config
         if not config:
             return jsonify({"error": "No hay un año lectivo configurado como activo"}), 400
         anio_lectivo = config['anio']
-        periodo_id = get_active_period_id()
 
         # Obtener asignaturas para el curso y año lectivo según el rol del usuario
         asignaturas_query = Asignatura.query.join(Asignacion).filter(
@@ -68,16 +70,15 @@ def listar_asistencias():
         fecha = date.today()
     
     # Obtener configuración activa
-    active_config = get_active_config()
+    active_config = contexto_academico().config
     if not active_config:
         flash('No hay un año lectivo configurado como activo', 'warning')
         return redirect(url_for('configuracion.index'))
 
     anio_lectivo = active_config.get('anio')
-    config = get_active_config()
+    config = contexto_academico().config
 
     anio_lectivo = config['anio']
-    periodo_id = get_active_period_id()
 
     # Obtener cursos disponibles según el rol y año lectivo activo
     cursos_query = Curso.query.join(Asignacion).filter(
@@ -217,7 +218,7 @@ def guardar_asistencias():
         current_app.logger.debug(f"Date validation passed: fecha={fecha}")
 
         # Obtener configuración activa
-        config = get_active_config()
+        config = contexto_academico().config
         if not config:
             current_app.logger.error("Validation failed: No active academic year configured.")
             flash("Error: No hay un año lectivo configurado como activo", 'danger')
@@ -230,15 +231,11 @@ def guardar_asistencias():
         anio_lectivo = config['anio']
         current_app.logger.debug(f"Active config found: anio_lectivo={anio_lectivo}")
 
-        periodo_id = get_active_period_id()
+        periodo_id = contexto_academico().periodo_id
         current_app.logger.debug(f"Active period ID: {periodo_id}")
 
         # Obtener el objeto AnioPeriodo activo para validar la fecha
-        active_anio_periodo = AnioPeriodo.query.filter_by(
-            anio_lectivo=anio_lectivo,
-            periodo_id=periodo_id,
-            estado='activo'
-        ).first()
+        active_anio_periodo = contexto_academico().anio_periodo
 
         if not active_anio_periodo:
             flash("No se encontró un período activo para el año lectivo actual.", 'danger')
@@ -253,8 +250,7 @@ def guardar_asistencias():
 
         # Convertir fechas de inicio y fin del período a objetos date
         try:
-            periodo_start_date = datetime.strptime(f"{anio_lectivo}-{active_anio_periodo.fecha_inicio}", "%Y-%m-%d").date()
-            periodo_end_date = datetime.strptime(f"{anio_lectivo}-{active_anio_periodo.fecha_fin}", "%Y-%m-%d").date()
+            periodo_start_date, periodo_end_date = contexto_academico().fechas(active_anio_periodo)
         except ValueError:
             current_app.logger.error(f"Error converting period dates. anio_lectivo={anio_lectivo}, fecha_inicio={active_anio_periodo.fecha_inicio}, fecha_fin={active_anio_periodo.fecha_fin}", exc_info=True)
             flash("Error: Formato de fecha de período inválido en la configuración del sistema.", 'danger')
@@ -318,65 +314,42 @@ def guardar_asistencias():
         # Estados válidos
         estados_validos = {'presente', 'ausente', 'justificado'}
 
-        estudiantes_afectados = 0
-
         # Procesar cada asistencia
         asistencias_data_list = json.loads(request.form.get('asistencias_json', '[]'))
         current_app.logger.debug(f"Processing asistencias_json: {asistencias_data_list}")
 
+        registros = []
         for asistencia_data in asistencias_data_list:
-            current_app.logger.debug(f"Processing attendance data: {asistencia_data}")
             if 'matricula_id' not in asistencia_data or 'estado' not in asistencia_data:
                 current_app.logger.warning(f"Skipping attendance data due to missing matricula_id or estado: {asistencia_data}")
                 continue
-            matricula_id = asistencia_data['matricula_id']
-            estado = asistencia_data['estado']
-            observacion = asistencia_data.get('observacion', '')
-            
-            if estado not in estados_validos:
-                current_app.logger.warning(f"Skipping attendance data due to invalid state '{estado}': {asistencia_data}")
+            if asistencia_data['estado'] not in estados_validos:
+                current_app.logger.warning(f"Skipping attendance data due to invalid state '{asistencia_data['estado']}': {asistencia_data}")
                 continue
-            
-            matricula = Matricula.query.filter_by(
-                id=matricula_id,
-                id_curso=curso_id,
-                estado='activo',
-                año_lectivo=anio_lectivo
-            ).first()
-            if not matricula:
-                current_app.logger.warning(f"Skipping attendance data: Matricula {matricula_id} not found or inactive for curso {curso_id}, anio {anio_lectivo}")
+            try:
+                matricula_id = int(asistencia_data['matricula_id'])
+            except (TypeError, ValueError):
+                current_app.logger.warning(f"Skipping attendance data due to invalid matricula_id: {asistencia_data}")
                 continue
-            current_app.logger.debug(f"Matricula found for ID: {matricula_id}")
-
-            asistencia = Asistencia.query.filter_by(
-                id_matricula=matricula_id,
-                id_asignacion=asignacion.id,
-                fecha=fecha
-            ).first()
-
-            if asistencia:
-                current_app.logger.debug(f"Updating existing attendance for matricula {matricula_id}")
-                asistencia.estado = estado
-                asistencia.observaciones = observacion[:500]
-                asistencia.actualizado_por = current_user.id
-                asistencia.actualizado_en = datetime.utcnow()
-            else:
-                current_app.logger.debug(f"Creating new attendance for matricula {matricula_id}")
-                asistencia = Asistencia(
-                    id_matricula=matricula_id,
-                    id_asignacion=asignacion.id,
-                    fecha=fecha,
-                    estado=estado,
-                    observaciones=observacion[:500],
-                    creado_por=current_user.id
-                )
-                db.session.add(asistencia)
-            
-            estudiantes_afectados += 1
-            current_app.logger.debug(f"Attendance processed for matricula {matricula_id}. Total affected: {estudiantes_afectados}")
+            registros.append((matricula_id, asistencia_data['estado'], asistencia_data.get('observacion') or ''))
+
+        # Una consulta valida todas las matrículas y un upsert escribe todas las asistencias
+        matriculas_afectadas = guardar_asistencias_masivo(asignacion, fecha, registros, current_user.id)
+        estudiantes_afectados = len(matriculas_afectadas)
+        omitidas = {r[0] for r in registros} - set(matriculas_afectadas)
+        if omitidas:
+            current_app.logger.warning(f"Skipping attendance data: Matriculas {sorted(omitidas)} not found or inactive for curso {curso_id}, anio {anio_lectivo}")
+        current_app.logger.debug(f"Attendance processed. Total affected: {estudiantes_afectados}")
+
+        # Los boletines de estas matrículas deben recalcularse en la próxima generación
+        marcar_boletines_desactualizados(anio_lectivo, matriculas_ids=matriculas_afectadas, fecha=fecha)
+        # El resumen usado por el dashboard y las estadísticas se confirma junto con las asistencias
+        if estudiantes_afectados:
+            actualizar_resumen_asistencia([(asignacion.id, fecha)])
 
         current_app.logger.debug("Attempting to commit changes to database.")
         db.session.commit()
+        clear_dashboard_cache()
         current_app.logger.debug("Changes committed successfully.")
 
         # Crear una sola actividad para el registro masivo
@@ -494,26 +467,20 @@ def gestionar_observacion(asistencia_id=None):
                 return jsonify({"error": "Formato de fecha inválido (YYYY-MM-DD)"}), 400
             
             # Obtener configuración activa
-            config = get_active_config()
+            config = contexto_academico().config
             if not config:
                 return jsonify({"error": "No hay un año lectivo configurado como activo"}), 400
             anio_lectivo = config['anio']
-            periodo_id = get_active_period_id()
 
             # Obtener el objeto AnioPeriodo activo para validar la fecha
-            active_anio_periodo = AnioPeriodo.query.filter_by(
-                anio_lectivo=anio_lectivo,
-                periodo_id=periodo_id,
-                estado='activo'
-            ).first()
+            active_anio_periodo = contexto_academico().anio_periodo
 
             if not active_anio_periodo:
                 return jsonify({"error": "No se encontró un período activo para el año lectivo actual."}), 400
 
             # Convertir fechas de inicio y fin del período a objetos date
             try:
-                periodo_start_date = datetime.strptime(f"{anio_lectivo}-{active_anio_periodo.fecha_inicio}", "%Y-%m-%d").date()
-                periodo_end_date = datetime.strptime(f"{anio_lectivo}-{active_anio_periodo.fecha_fin}", "%Y-%m-%d").date()
+                periodo_start_date, periodo_end_date = contexto_academico().fechas(active_anio_periodo)
             except ValueError:
                 flash("Error: Formato de fecha de período inválido en la configuración del sistema.", 'danger')
                 return redirect(url_for('asistencias.listar_asistencias', curso=curso_id, asignatura=asignatura_id, fecha=fecha_str, busqueda=busqueda))
@@ -563,8 +530,11 @@ def gestionar_observacion(asistencia_id=None):
                 creado_por=current_user.id
             )
             db.session.add(asistencia)
+            marcar_boletines_desactualizados(anio_lectivo, matriculas_ids=[asistencia.id_matricula], fecha=fecha)
+            actualizar_resumen_asistencia([(asignacion.id, fecha)])
         
         db.session.commit()
+        clear_dashboard_cache()
 
         # Crear notificaciones para administradores si es docente
         if current_user.rol == 'docente':
@@ -7,8 +7,8 @@ from app import db
 from app.extensions import LoginManager, mail
 from flask_mail import Message
 import logging
-from app.services.configuracion_service import get_active_config
-from app.models import AnioPeriodo
+from app.services.contexto_service import contexto_academico
+from app.services.usuario_service import cargar_usuario
 from app.forms.usuarios import LoginForm, RequestResetForm, ResetPasswordForm
 
 
@@ -62,14 +62,14 @@ def login():
             return render_template('auth/login.html', form=form)
         
         if user.rol == 'docente':
-            active_config = get_active_config()
+            active_config = contexto_academico().config
             anio_lectivo = active_config.get('anio') if active_config else None
 
             if not anio_lectivo:
                 flash('No puede iniciar sesión porque no hay un año lectivo configurado como activo.', 'warning')
                 return render_template('auth/login.html', form=form)
 
-            anio_periodo_activo = AnioPeriodo.query.filter_by(estado='activo', anio_lectivo=anio_lectivo).first()
+            anio_periodo_activo = contexto_academico().anio_periodo
             if not anio_periodo_activo:
                 flash('No puede iniciar sesión porque no hay un período activo para el año lectivo actual.', 'warning')
                 return render_template('auth/login.html', form=form)
@@ -256,13 +256,7 @@ def force_logout():
 login_manager = LoginManager()
 @login_manager.user_loader
 def load_user(user_id):
-    print(f"[DEBUG] Flask-Login intenta cargar user_id={user_id}")
-    user = User.query.get(int(user_id))
-    if user:
-        print(f"[DEBUG] Usuario encontrado: {user.email} (estado={user.estado})")
-    else:
-        print("[DEBUG] Usuario NO encontrado")
-
+    user = cargar_usuario(int(user_id), session.get('security_stamp'))
     if user and user.is_active:
         return user
-    return None
\ No newline at end of file
+    return None
@@ -2,8 +2,10 @@ from datetime import datetime, date
 from flask import Blueprint, request, jsonify, render_template, flash, current_app, redirect, url_for
 from flask_login import current_user
 from app.utils.decorators import roles_required
-from app.models import Calificacion, Asignacion, Curso, Matricula, Asignatura, AnioPeriodo, Actividad
-from app.services.configuracion_service import get_active_config, get_active_period_id
+from app.models import Calificacion, Asignacion, Curso, Matricula, Asignatura, Actividad
+from app.services.contexto_service import contexto_academico
+from app.services.boletin_service import marcar_boletines_desactualizados
+from app.services.calificacion_service import guardar_calificaciones_masivo
 from app import db
 
 calificacion_bp = Blueprint('calificacion', __name__, url_prefix='/calificaciones')
@@ -16,11 +18,10 @@ def obtener_asignaturas():
         return jsonify({"error": "Se requiere el ID del curso"}), 400
 
     try:
-        active_config = get_active_config()
+        active_config = contexto_academico().config
         if not active_config:
             return jsonify({'error': 'No hay un año lectivo configurado como activo'}), 400
         anio_lectivo = active_config['anio']
-        periodo_id = get_active_period_id()
         
         # Query for active assignments for the given course and year
         asignaturas_query = Asignatura.query.join(Asignacion).filter(
@@ -56,12 +57,11 @@ def index():
     per_page = 10
 
     # Obtener año lectivo activo
-    active_config = get_active_config()
+    active_config = contexto_academico().config
     if not active_config:
         flash('No hay un año lectivo configurado como activo', 'warning')
         return redirect(url_for('configuracion.index'))
     anio_lectivo = active_config['anio']
-    periodo_id = get_active_period_id()
 
     # Get available courses based on user's role and year
     cursos_query = Curso.query.join(Asignacion).filter(
@@ -139,182 +139,189 @@ def index():
     
     return render_template('views/estudiantes/calificacion.html', **contexto)
 
+def _preparar_guardado(curso_id, asignatura_id, fecha_str):
+    """
+    Valida los parámetros comunes al guardado de calificaciones (formulario y API).
+    Devuelve (asignacion, fecha, anio_lectivo, periodo_id) o lanza ValueError con el
+    mensaje para el usuario.
+    """
+    if not all([curso_id, asignatura_id, fecha_str]):
+        current_app.logger.debug("Missing parameters for grades.")
+        raise ValueError("Error: Faltan parámetros de calificación.")
+
+    try:
+        fecha = datetime.strptime(fecha_str, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        raise ValueError("Error: Formato de fecha inválido (YYYY-MM-DD).")
+    current_app.logger.debug(f"Parsed date: {fecha}")
+
+    contexto = contexto_academico()
+    if not contexto.config:
+        current_app.logger.debug("No active academic year configured.")
+        raise ValueError("No hay un año lectivo configurado como activo")
+    anio_lectivo = contexto.anio
+    active_anio_periodo = contexto.anio_periodo
+    current_app.logger.debug(f"Active academic year: {anio_lectivo}, Period ID: {contexto.periodo_id}")
+
+    if not active_anio_periodo:
+        current_app.logger.debug("No active period found for current academic year.")
+        raise ValueError("No se encontró un período activo para el año lectivo actual.")
+
+    try:
+        periodo_start_date, periodo_end_date = contexto.fechas(active_anio_periodo)
+    except ValueError as ve:
+        current_app.logger.error(f"Invalid period date format: {ve}", exc_info=True)
+        raise ValueError("Error: Formato de fecha de período inválido en la configuración del sistema.")
+
+    current_app.logger.debug(f"Validando fecha: {fecha}, Periodo Inicio: {periodo_start_date}, Periodo Fin: {periodo_end_date}")
+    if not (periodo_start_date <= fecha <= periodo_end_date):
+        raise ValueError(f"La fecha de calificación ({fecha_str}) debe estar dentro del período activo ({active_anio_periodo.periodo.nombre}: {active_anio_periodo.fecha_inicio} - {active_anio_periodo.fecha_fin}) del año lectivo {anio_lectivo}.")
+
+    asignacion = Asignacion.query.filter_by(
+        id_curso=curso_id,
+        id_asignatura=asignatura_id,
+        estado='activo',
+        anio_lectivo=anio_lectivo
+    ).first()
+    current_app.logger.debug(f"Assignment found: {asignacion is not None}")
+
+    if not asignacion:
+        raise ValueError("No se encontró una asignación activa para este curso y asignatura.")
+
+    if not current_user.is_admin() and asignacion.id_docente != current_user.id:
+        current_app.logger.debug("Permission denied for assignment.")
+        raise ValueError("No tiene permisos para guardar calificaciones en esta asignación.")
+
+    return asignacion, fecha, anio_lectivo, contexto.periodo_id
+
+
+def _registrar_actividad(asignacion, estudiantes_afectados):
+    """Una sola actividad por registro masivo de calificaciones"""
+    try:
+        current_app.logger.debug("Attempting to save activity log.")
+        if estudiantes_afectados > 0:
+            actividad = Actividad(
+                tipo='calificacion',
+                titulo=f'Registro de calificaciones',
+                detalle=f"Se registraron calificaciones para {estudiantes_afectados} estudiantes en la asignatura {asignacion.asignatura.nombre} del curso {asignacion.curso.nombre}",
+                fecha=datetime.utcnow().date(),
+                creado_por=current_user.id,
+                id_asignacion=asignacion.id
+            )
+            existing = Actividad.query.filter_by(
+                tipo=actividad.tipo,
+                titulo=actividad.titulo,
+                detalle=actividad.detalle,
+                fecha=actividad.fecha,
+                id_asignacion=actividad.id_asignacion
+            ).first()
+            if not existing:
+                db.session.add(actividad)
+                db.session.commit()
+                current_app.logger.debug("Activity log saved successfully.")
+            else:
+                current_app.logger.debug("Activity log already exists, skipping.")
+    except Exception as e:
+        current_app.logger.error(f"Error saving activity for grades: {str(e)}", exc_info=True)
+
+
+def _guardar(asignacion, fecha, anio_lectivo, periodo_id, entradas):
+    """
+    Escribe las calificaciones con calificacion_service y confirma. Si hay errores de
+    validación no se guarda nada.
+    """
+    resultado = guardar_calificaciones_masivo(asignacion, periodo_id, fecha, entradas, current_user.id)
+    if resultado['errores']:
+        db.session.rollback()
+        return resultado
+
+    current_app.logger.debug("Attempting to commit grades to DB.")
+    if resultado['guardadas']:
+        # Los boletines de estas matrículas deben recalcularse en la próxima generación
+        marcar_boletines_desactualizados(anio_lectivo, matriculas_ids=resultado['guardadas'], fecha=fecha)
+    db.session.commit()
+    current_app.logger.debug(f"Grades committed successfully: {len(resultado['guardadas'])} saved, {resultado['sin_cambios']} unchanged.")
+
+    _registrar_actividad(asignacion, len(resultado['guardadas']))
+    return resultado
+
+
 @calificacion_bp.route('/guardar', methods=['POST'])
 @roles_required('admin', 'docente')
 def guardar_calificaciones():
+    current_app.logger.debug("Starting guardar_calificaciones")
+    curso_id = request.form.get('curso', type=int)
+    asignatura_id = request.form.get('asignatura', type=int)
+    fecha_str = request.form.get('fecha')
+    busqueda = request.form.get('busqueda', '')
+    volver = redirect(url_for('calificacion.index', curso=curso_id, asignatura=asignatura_id, fecha=fecha_str, busqueda=busqueda))
+
     try:
-        current_app.logger.debug("Starting guardar_calificaciones")
-        curso_id = request.form.get('curso', type=int)
-        asignatura_id = request.form.get('asignatura', type=int)
-        fecha_str = request.form.get('fecha')
-        busqueda = request.form.get('busqueda', '')
+        asignacion, fecha, anio_lectivo, periodo_id = _preparar_guardado(curso_id, asignatura_id, fecha_str)
+    except ValueError as e:
+        flash(str(e), 'danger')
+        return volver
 
-        if not all([curso_id, asignatura_id, fecha_str]):
-            current_app.logger.debug("Missing parameters for grades.")
-            flash("Error: Faltan parámetros de calificación.", 'danger')
-            return redirect(url_for('calificacion.index', curso=curso_id, asignatura=asignatura_id, fecha=fecha_str, busqueda=busqueda))
+    entradas = [
+        (key.split('_', 1)[1], value, request.form.get(f"observacion_{key.split('_', 1)[1]}", ''))
+        for key, value in request.form.items() if key.startswith('calificacion_')
+    ]
 
-        fecha = datetime.strptime(fecha_str, '%Y-%m-%d').date()
-        current_app.logger.debug(f"Parsed date: {fecha}")
+    try:
+        resultado = _guardar(asignacion, fecha, anio_lectivo, periodo_id, entradas)
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error saving grades: {str(e)}", exc_info=True)
+        flash("Error al guardar las calificaciones en la base de datos.", 'danger')
+        return volver
 
-        active_config = get_active_config()
-        if not active_config:
-            current_app.logger.debug("No active academic year configured.")
-            flash("No hay un año lectivo configurado como activo", 'danger')
-            return redirect(url_for('calificacion.index', curso=curso_id, asignatura=asignatura_id, fecha=fecha_str, busqueda=busqueda))
-        anio_lectivo = active_config['anio']
-        periodo_id = get_active_period_id()
-        current_app.logger.debug(f"Active academic year: {anio_lectivo}, Period ID: {periodo_id}")
+    if resultado['errores']:
+        for error in resultado['errores']:
+            flash(f"Error: {error['error']}", 'danger')
+        current_app.logger.debug(f"Invalid grades, nothing saved: {resultado['errores']}")
+        return volver
 
-        active_anio_periodo = AnioPeriodo.query.filter_by(
-            anio_lectivo=anio_lectivo,
-            periodo_id=periodo_id,
-            estado='activo'
-        ).first()
+    flash('Calificaciones guardadas exitosamente.', 'success')
+    return volver
 
-        if not active_anio_periodo:
-            current_app.logger.debug("No active period found for current academic year.")
-            flash("No se encontró un período activo para el año lectivo actual.", 'danger')
-            return redirect(url_for('calificacion.index', curso=curso_id, asignatura=asignatura_id, fecha=fecha_str, busqueda=busqueda))
-
-        try:
-            periodo_start_date = datetime.strptime(f"{anio_lectivo}-{active_anio_periodo.fecha_inicio}", "%Y-%m-%d").date()
-            periodo_end_date = datetime.strptime(f"{anio_lectivo}-{active_anio_periodo.fecha_fin}", "%Y-%m-%d").date()
-            current_app.logger.debug(f"Period start date: {periodo_start_date}, Period end date: {periodo_end_date}")
-        except ValueError as ve:
-            current_app.logger.error(f"Invalid period date format: {ve}", exc_info=True)
-            flash("Error: Formato de fecha de período inválido en la configuración del sistema.", 'danger')
-            return redirect(url_for('calificacion.index', curso=curso_id, asignatura=asignatura_id, fecha=fecha_str, busqueda=busqueda))
-
-        current_app.logger.debug(f"Validando fecha: {fecha}, Periodo Inicio: {periodo_start_date}, Periodo Fin: {periodo_end_date}")
-        if not (periodo_start_date <= fecha <= periodo_end_date):
-            db.session.rollback()
-            flash(f"La fecha de calificación ({fecha_str}) debe estar dentro del período activo ({active_anio_periodo.periodo.nombre}: {active_anio_periodo.fecha_inicio} - {active_anio_periodo.fecha_fin}) del año lectivo {anio_lectivo}.", 'danger')
-            return redirect(url_for('calificacion.index', curso=curso_id, asignatura=asignatura_id, fecha=fecha_str, busqueda=busqueda))
 
-        asignacion = Asignacion.query.filter_by(
-            id_curso=curso_id,
-            id_asignatura=asignatura_id,
-            estado='activo',
-            anio_lectivo=anio_lectivo
-        ).first()
-        current_app.logger.debug(f"Assignment found: {asignacion is not None}")
+@calificacion_bp.route('/api/guardar', methods=['POST'])
+@roles_required('admin', 'docente')
+def api_guardar_calificaciones():
+    """
+    Guarda en una sola petición todas las calificaciones de una página del libro de notas.
+
+    Espera JSON {curso, asignatura, fecha, calificaciones: [{matricula_id, nota, observacion}]}.
+    Si alguna fila no es válida no se guarda nada y se responde 400 con los errores de cada
+    fila; si todo es válido responde con las matrículas guardadas y cuántas no cambiaron.
+    """
+    datos = request.get_json(silent=True) or {}
+    calificaciones = datos.get('calificaciones')
+    if not isinstance(calificaciones, list):
+        return jsonify({'success': False, 'error': 'Se requiere la lista de calificaciones.'}), 400
 
-        if not asignacion:
-            current_app.logger.debug("No active assignment found.")
-            flash("No se encontró una asignación activa para este curso y asignatura.", 'danger')
-            return redirect(url_for('calificacion.index', curso=curso_id, asignatura=asignatura_id, fecha=fecha_str, busqueda=busqueda))
-        
-        if not current_user.is_admin() and asignacion.id_docente != current_user.id:
-            current_app.logger.debug("Permission denied for assignment.")
-            flash("No tiene permisos para guardar calificaciones en esta asignación.", 'danger')
-            return redirect(url_for('calificacion.index', curso=curso_id, asignatura=asignatura_id, fecha=fecha_str, busqueda=busqueda))
-            
-        estudiantes_afectados = 0
-        
-        # Iterate over form data to find all grades
-        for key, value in request.form.items():
-            if key.startswith('calificacion_'):
-                matricula_id = key.split('_')[1]
-                current_app.logger.debug(f"Processing grade for matricula_id: {matricula_id}")
-                
-                # Validate and convert note
-                try:
-                    nota = float(value) if value else None
-                    if nota is not None and (nota < 0 or nota > 5):
-                        flash(f'Error: La calificación para el estudiante {matricula_id} debe estar entre 0 y 5.', 'danger')
-                        db.session.rollback()
-                        current_app.logger.debug(f"Invalid grade value for {matricula_id}: {nota}")
-                        return redirect(url_for('calificacion.index', curso=curso_id, asignatura=asignatura_id, fecha=fecha_str, busqueda=busqueda))
-                    if nota is not None and nota == 0:
-                        flash(f'Error: La calificación para el estudiante {matricula_id} debe ser mayor a 0.', 'danger')
-                        db.session.rollback()
-                        current_app.logger.debug(f"Grade 0 not allowed for {matricula_id}")
-                        return redirect(url_for('calificacion.index', curso=curso_id, asignatura=asignatura_id, fecha=fecha_str, busqueda=busqueda))
-                except ValueError:
-                    flash(f'Error: La calificación para el estudiante {matricula_id} no es un número válido.', 'danger')
-                    db.session.rollback()
-                    current_app.logger.debug(f"Non-numeric grade for {matricula_id}: {value}")
-                    return redirect(url_for('calificacion.index', curso=curso_id, asignatura=asignatura_id, fecha=fecha_str, busqueda=busqueda))
-
-                observacion = request.form.get(f'observacion_{matricula_id}', '')
-
-                # Mover todo el procesamiento de calificaciones dentro del bloque if
-                try:
-                    calificacion = Calificacion.query.filter_by(
-                        id_matricula=matricula_id,
-                        id_asignacion=asignacion.id,
-                        fecha_calificacion=fecha
-                    ).first()
-                    
-                    if calificacion:
-                        calificacion.nota = nota
-                        calificacion.observacion = observacion
-                        calificacion.actualizado_por = current_user.id
-                        calificacion.actualizado_en = datetime.utcnow()
-                        current_app.logger.debug(f"Updating grade for {matricula_id}")
-                    else:
-                        nueva_calificacion = Calificacion(
-                            id_matricula=matricula_id,
-                            id_asignacion=asignacion.id,
-                            id_periodo=periodo_id,
-                            fecha_calificacion=fecha,
-                            nota=nota,
-                            observacion=observacion,
-                            creado_por=current_user.id
-                        )
-                        db.session.add(nueva_calificacion)
-                        current_app.logger.debug(f"Adding new grade for {matricula_id}")
-                    
-                    estudiantes_afectados += 1
-                    
-                except Exception as e:
-                    current_app.logger.error(f"Error during DB operation for matricula {matricula_id}: {e}", exc_info=True)
-                    flash("Error al procesar calificaciones en la base de datos.", 'danger')
-                    return redirect(url_for('calificacion.index', curso=curso_id, asignatura=asignatura_id, fecha=fecha_str, busqueda=busqueda))
-
-        current_app.logger.debug("Attempting to commit grades to DB.")
-        try:
-            db.session.commit()
-            current_app.logger.debug("Grades committed successfully.")
-        except Exception as e:
-            db.session.rollback()
-            current_app.logger.error(f"Error committing grades to DB: {e}", exc_info=True)
-            flash("Error al guardar las calificaciones en la base de datos.", 'danger')
-            return redirect(url_for('calificacion.index', curso=curso_id, asignatura=asignatura_id, fecha=fecha_str, busqueda=busqueda))
-
-        try:
-            current_app.logger.debug("Attempting to save activity log.")
-            if estudiantes_afectados > 0:
-                actividad = Actividad(
-                    tipo='calificacion',
-                    titulo=f'Registro de calificaciones',
-                    detalle=f"Se registraron calificaciones para {estudiantes_afectados} estudiantes en la asignatura {asignacion.asignatura.nombre} del curso {asignacion.curso.nombre}",
-                    fecha=datetime.utcnow().date(),
-                    creado_por=current_user.id,
-                    id_asignacion=asignacion.id
-                )
-                existing = Actividad.query.filter_by(
-                    tipo=actividad.tipo,
-                    titulo=actividad.titulo,
-                    detalle=actividad.detalle,
-                    fecha=actividad.fecha,
-                    id_asignacion=actividad.id_asignacion
-                ).first()
-                if not existing:
-                    db.session.add(actividad)
-                    db.session.commit()
-                    current_app.logger.debug("Activity log saved successfully.")
-                else:
-                    current_app.logger.debug("Activity log already exists, skipping.")
-        except Exception as e:
-            current_app.logger.error(f"Error saving activity for grades: {str(e)}", exc_info=True)
-
-        flash('Calificaciones guardadas exitosamente.', 'success')
-        return redirect(url_for('calificacion.index', curso=curso_id, asignatura=asignatura_id, fecha=fecha_str, busqueda=busqueda))
+    try:
+        asignacion, fecha, anio_lectivo, periodo_id = _preparar_guardado(
+            datos.get('curso'), datos.get('asignatura'), datos.get('fecha')
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
 
+    entradas = [
+        (fila.get('matricula_id'), fila.get('nota'), fila.get('observacion') or '')
+        for fila in calificaciones if isinstance(fila, dict)
+    ]
+    try:
+        resultado = _guardar(asignacion, fecha, anio_lectivo, periodo_id, entradas)
     except Exception as e:
         db.session.rollback()
-        current_app.logger.error(f"Unhandled error saving grades: {str(e)}", exc_info=True)
-        flash("Error interno al guardar las calificaciones.", 'danger')
-        return redirect(url_for('calificacion.index', curso=curso_id, asignatura=asignatura_id, fecha=fecha_str, busqueda=busqueda))
\ No newline at end of file
+        current_app.logger.error(f"Error saving grades: {str(e)}", exc_info=True)
+        return jsonify({'success': False, 'error': 'Error al guardar las calificaciones en la base de datos.'}), 500
+
+    if resultado['errores']:
+        return jsonify({'success': False, 'errores': resultado['errores']}), 400
+    return jsonify({
+        'success': True,
+        'guardadas': resultado['guardadas'],
+        'sin_cambios': resultado['sin_cambios']
+    })
@@ -1,12 +1,12 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, make_response
+from flask import Blueprint, render_template, request, flash, redirect, url_for, make_response, jsonify, Response, stream_with_context
 from flask_login import current_user
 from sqlalchemy import func
 from app import db
-from app.models import Matricula, Curso, Asignacion, AnioPeriodo
+from app.models import Matricula, Curso, Asignacion
 from app.models.calificacion import Calificacion as CalificacionModel
 from app.models.configuracion_libro import ConfiguracionLibro
 from app.models.configuracion import RectorConfig
-from app.services.configuracion_service import get_active_config
+from app.services.contexto_service import contexto_academico
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import mm
@@ -15,13 +15,18 @@ import os
 from datetime import datetime
 from io import BytesIO
 from app.utils.decorators import roles_required
-import zipfile
+from app.utils.zip_streaming import generar_zip_streaming
+from app.utils.pdf_cache import obtener_pdf_cacheado
+from app.services.trabajo_service import encolar_trabajo, guardar_zip, registrar_trabajo
 
 documentos_bp = Blueprint('documentos', __name__, url_prefix='/documentos')
 
 # Tipos de documentos permitidos
 TIPOS_DOCUMENTOS = ['certificados', 'constancias']
 
+# Subir este número al cambiar el diseño de constancias o certificados invalida sus PDFs en caché
+VERSION_PLANTILLA_DOCUMENTOS = 1
+
 # Función para convertir números a texto en español
 def numero_a_texto(numero):
     unidades = ['', 'uno', 'dos', 'tres', 'cuatro', 'cinco', 'seis', 'siete', 'ocho', 'nueve']
@@ -52,10 +57,7 @@ def calcular_promedio_periodo(matricula_id, periodo_id, anio_lectivo):
     """Calcula el promedio de un estudiante en un período específico - Mismo método que libro_final"""
     try:
         # Obtener las fechas del período (igual que en libro_final.py)
-        anio_periodo = AnioPeriodo.query.filter_by(
-            anio_lectivo=anio_lectivo, 
-            periodo_id=periodo_id
-        ).first()
+        anio_periodo = contexto_academico().anio_periodo_de(anio_lectivo, periodo_id)
         
         if not anio_periodo or not anio_periodo.fecha_inicio or not anio_periodo.fecha_fin:
             return 0.0
@@ -91,7 +93,7 @@ def verificar_aprobacion_estudiante(matricula_id):
     """Usa el mismo método directo que libro_final.py"""
     try:
         config = ConfiguracionLibro.obtener_configuracion_actual()
-        config_general = get_active_config()
+        config_general = contexto_academico().config
         anio_lectivo = config_general['anio'] if config_general and 'anio' in config_general else None
         
         if not anio_lectivo:
@@ -142,7 +144,7 @@ def listar_documentos():
     page = request.args.get('page', 1, type=int)
     per_page = 10
 
-    config = get_active_config()
+    config = contexto_academico().config
     anio_lectivo = config['anio'] if config and 'anio' in config else None
     
     # Obtener cursos disponibles según el rol y año lectivo activo
@@ -176,7 +178,7 @@ def listar_documentos():
 
     matriculas = query.order_by(Matricula.apellidos, Matricula.nombres).paginate(page=page, per_page=per_page, error_out=False)
     
-    active_config = get_active_config()
+    active_config = contexto_academico().config
     if not active_config:
         flash('No hay un año lectivo configurado como activo', 'warning')
         return redirect(url_for('configuracion.index'))
@@ -201,7 +203,7 @@ def generar_documento(matricula_id, tipo):
     
     # Verificar que el docente tiene acceso a este curso
     if not current_user.is_admin():
-        config = get_active_config()
+        config = contexto_academico().config
         anio_lectivo = config['anio'] if config and 'anio' in config else None
         
         asignacion = Asignacion.query.filter_by(
@@ -240,10 +242,34 @@ def _obtener_datos_rector():
     return '', '', None
 
 
+def _datos_documento(matricula):
+    """Datos de entrada de una constancia o certificado; también forman la clave de la caché de PDFs"""
+    return {
+        'nombres': matricula.nombres,
+        'apellidos': matricula.apellidos,
+        'documento': matricula.documento,
+        'anio_lectivo': matricula.año_lectivo,
+        'curso_nombre': matricula.curso.nombre,
+        'rector': list(_obtener_datos_rector()),
+        'fecha': datetime.now().strftime('%Y-%m-%d'),
+    }
+
+
 def generar_constancia(matricula):
     """Genera constancia de matrícula con el diseño actual"""
-     # Obtener datos del rector desde la configuración activa
-    rector_nombre, rector_identidad, rector_firma_url = _obtener_datos_rector()
+    datos = _datos_documento(matricula)
+    # Con los mismos datos (y el mismo día de expedición) el PDF sale de la caché
+    pdf = obtener_pdf_cacheado('constancia', VERSION_PLANTILLA_DOCUMENTOS, datos, lambda: _renderizar_constancia(datos))
+
+    response = make_response(pdf)
+    response.headers['Content-Type'] = 'application/pdf'
+    response.headers['Content-Disposition'] = f'attachment; filename=constancia_{matricula.nombres}_{matricula.apellidos}.pdf'
+    return response
+
+
+def _renderizar_constancia(datos):
+    """Dibuja el PDF de la constancia a partir de datos planos y devuelve sus bytes"""
+    rector_nombre, rector_identidad, rector_firma_url = datos['rector']
     # Crear PDF con diseño decorado y profesional
     buffer = BytesIO()
     c = canvas.Canvas(buffer, pagesize=A4)
@@ -313,15 +339,15 @@ def generar_constancia(matricula):
     # Información del estudiante
     meses = ['enero', 'febrero', 'marzo', 'abril', 'mayo', 'junio', 
              'julio', 'agosto', 'septiembre', 'octubre', 'noviembre', 'diciembre']
-    hoy = datetime.now()
+    hoy = datetime.strptime(datos['fecha'], '%Y-%m-%d')
     
     # Convertir día a texto
     dia_texto = numero_a_texto(hoy.day)
     fecha_formateada = f"{dia_texto} [ {hoy.day:02d} ] días del mes de {meses[hoy.month-1]} del año {hoy.year}"
     
-    texto_estudiante = f"El estudiante {matricula.nombres} {matricula.apellidos} identificado/a con "
-    texto_estudiante += f"Registro Civil N° {matricula.documento}, se encuentra matriculado en nuestra institución "
-    texto_estudiante += f"para el año escolar {matricula.año_lectivo} cursando el grado {matricula.curso.nombre}."
+    texto_estudiante = f"El estudiante {datos['nombres']} {datos['apellidos']} identificado/a con "
+    texto_estudiante += f"Registro Civil N° {datos['documento']}, se encuentra matriculado en nuestra institución "
+    texto_estudiante += f"para el año escolar {datos['anio_lectivo']} cursando el grado {datos['curso_nombre']}."
     
     # Dividir texto en líneas
     max_width = width - 2 * margin_left
@@ -410,18 +436,25 @@ def generar_constancia(matricula):
   
     c.save()
     buffer.seek(0)
-    
-    response = make_response(buffer.getvalue())
-    response.headers['Content-Type'] = 'application/pdf'
-    response.headers['Content-Disposition'] = f'attachment; filename=constancia_{matricula.nombres}_{matricula.apellidos}.pdf'
-    return response
+    return buffer.getvalue()
+
 
 def generar_certificado(matricula, promedio_final):
     """Genera certificado de estudios con formato profesional"""
-    
-     # Obtener datos del rector desde la configuración activa
-    rector_nombre, rector_identidad, rector_firma_url = _obtener_datos_rector()
-            
+    datos = _datos_documento(matricula)
+    datos['promedio_final'] = promedio_final
+    # Con los mismos datos (y el mismo día de expedición) el PDF sale de la caché
+    pdf = obtener_pdf_cacheado('certificado', VERSION_PLANTILLA_DOCUMENTOS, datos, lambda: _renderizar_certificado(datos))
+
+    response = make_response(pdf)
+    response.headers['Content-Type'] = 'application/pdf'
+    response.headers['Content-Disposition'] = f'attachment; filename=certificado_{matricula.nombres}_{matricula.apellidos}.pdf'
+    return response
+
+
+def _renderizar_certificado(datos):
+    """Dibuja el PDF del certificado a partir de datos planos y devuelve sus bytes"""
+    rector_nombre, rector_identidad, rector_firma_url = datos['rector']
     # Crear PDF con diseño decorado y profesional
     buffer = BytesIO()
     c = canvas.Canvas(buffer, pagesize=A4) # Corregido: usar el buffer local
@@ -489,14 +522,14 @@ def generar_certificado(matricula, promedio_final):
     current_y -= 15*mm
     
     # Información del estudiante en formato SENA - INCLUIR PROMEDIO
-    hoy = datetime.now()
+    hoy = datetime.strptime(datos['fecha'], '%Y-%m-%d')
     meses = ['enero', 'febrero', 'marzo', 'abril', 'mayo', 'junio', 
              'julio', 'agosto', 'septiembre', 'octubre', 'noviembre', 'diciembre']
     
-    texto_estudiante = f"Que {matricula.nombres} {matricula.apellidos} identificado/a con "
-    texto_estudiante += f"Registro Civil N° {matricula.documento}, "
-    texto_estudiante += f"realizó y aprobó satisfactoriamente el año escolar {matricula.año_lectivo} "
-    texto_estudiante += f"cursando el grado {matricula.curso.nombre} con un promedio final de {promedio_final} (APROBADO)."
+    texto_estudiante = f"Que {datos['nombres']} {datos['apellidos']} identificado/a con "
+    texto_estudiante += f"Registro Civil N° {datos['documento']}, "
+    texto_estudiante += f"realizó y aprobó satisfactoriamente el año escolar {datos['anio_lectivo']} "
+    texto_estudiante += f"cursando el grado {datos['curso_nombre']} con un promedio final de {datos['promedio_final']} (APROBADO)."
     
     # Dividir texto en líneas
     max_width = width - 2 * margin_left
@@ -585,12 +618,67 @@ def generar_certificado(matricula, promedio_final):
   
     c.save()
     buffer.seek(0)
-    
-    
-    response = make_response(buffer.getvalue())
-    response.headers['Content-Type'] = 'application/pdf'
-    response.headers['Content-Disposition'] = f'attachment; filename=certificado_{matricula.nombres}_{matricula.apellidos}.pdf'
-    return response
+    return buffer.getvalue()
+
+
+def _docente_puede_generar(curso_id, anio_lectivo):
+    """Los administradores generan documentos de cualquier curso; los docentes, de sus cursos"""
+    if current_user.is_admin():
+        return True
+    return Asignacion.query.filter_by(
+        id_curso=curso_id, id_docente=current_user.id,
+        estado='activo', anio_lectivo=anio_lectivo
+    ).first() is not None
+
+
+def _seleccionar_documentos(tipo, curso_id, anio_lectivo):
+    """
+    Devuelve [(matricula, promedio)] de los estudiantes a los que se les genera el documento.
+    Lanza ValueError con el motivo si no hay ninguno.
+    """
+    # Obtener todas las matrículas activas del curso
+    matriculas = Matricula.query.filter_by(id_curso=curso_id, estado='activo', año_lectivo=anio_lectivo).all()
+
+    if not matriculas:
+        raise ValueError('No hay estudiantes activos en este curso para generar documentos.')
+
+    seleccion = []
+    for matricula in matriculas:
+        if tipo == 'certificados':
+            aprobado, promedio = verificar_aprobacion_estudiante(matricula.id)
+            if aprobado:
+                seleccion.append((matricula, promedio))
+        elif tipo == 'constancias':
+            seleccion.append((matricula, None))
+
+    if not seleccion:
+        if tipo == 'certificados':
+            raise ValueError('Ningún estudiante cumplió con el requisito de aprobación para generar certificados.')
+        raise ValueError('No se generaron documentos.')
+    return seleccion
+
+
+def _entradas_zip_documentos(tipo, seleccion):
+    # Cada PDF se genera y se agrega al ZIP apenas está listo
+    for matricula, promedio in seleccion:
+        if tipo == 'certificados':
+            yield f"certificado_{matricula.apellidos}_{matricula.nombres}.pdf", generar_certificado(matricula, promedio).data
+        else:
+            yield f"constancia_{matricula.apellidos}_{matricula.nombres}.pdf", generar_constancia(matricula).data
+
+
+def _nombre_zip_documentos(tipo, curso_id, anio_lectivo):
+    curso_nombre = Curso.query.get(curso_id).nombre.replace(' ', '_')
+    return f"{tipo.capitalize()}_{curso_nombre}_{anio_lectivo}.zip"
+
+
+@registrar_trabajo('documentos_zip')
+def _trabajo_documentos_zip(parametros, contexto):
+    tipo, curso_id, anio_lectivo = parametros['tipo'], parametros['curso_id'], parametros['anio_lectivo']
+    contexto.progreso(0, 'Seleccionando estudiantes...')
+    seleccion = _seleccionar_documentos(tipo, curso_id, anio_lectivo)
+    return guardar_zip(contexto, _entradas_zip_documentos(tipo, seleccion), len(seleccion), 'Generando documento',
+                       _nombre_zip_documentos(tipo, curso_id, anio_lectivo))
 
 
 @documentos_bp.route('/descargar_todos/<tipo>', methods=['GET'])
@@ -604,95 +692,63 @@ def descargar_todos(tipo):
         flash('Debe seleccionar un curso para la descarga masiva.', 'danger')
         return redirect(url_for('documentos.listar_documentos'))
 
-    config = get_active_config()
+    config = contexto_academico().config
     anio_lectivo = config['anio'] if config and 'anio' in config else None
     if not anio_lectivo:
         flash('No hay un año lectivo activo configurado.', 'danger')
         return redirect(url_for('documentos.listar_documentos'))
 
     # Verificar permisos del docente
-    if not current_user.is_admin():
-        asignacion = Asignacion.query.filter_by(
-            id_curso=curso_id, id_docente=current_user.id,
-            estado='activo', anio_lectivo=anio_lectivo
-        ).first()
-        if not asignacion:
-            flash('No tiene permisos para generar documentos de este curso.', 'danger')
-            return redirect(url_for('documentos.listar_documentos'))
-
-    # Obtener todas las matrículas activas del curso
-    matriculas = Matricula.query.filter_by(id_curso=curso_id, estado='activo', año_lectivo=anio_lectivo).all()
-
-    if not matriculas:
-        flash('No hay estudiantes activos en este curso para generar documentos.', 'warning')
-        return redirect(url_for('documentos.listar_documentos', curso=curso_id, tipo=tipo))
-
-    zip_buffer = BytesIO()
-    documentos_generados = 0
-
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
-        for matricula in matriculas:
-            pdf_buffer = None
-            filename = ""
-
-            if tipo == 'certificados':
-                aprobado, promedio = verificar_aprobacion_estudiante(matricula.id)
-                if aprobado:
-                    pdf_buffer = generar_certificado(matricula, promedio).data
-                    filename = f"certificado_{matricula.apellidos}_{matricula.nombres}.pdf"
-            elif tipo == 'constancias':
-                pdf_buffer = generar_constancia(matricula).data
-                filename = f"constancia_{matricula.apellidos}_{matricula.nombres}.pdf"
-
-            if pdf_buffer and filename:
-                zf.writestr(filename, pdf_buffer)
-                documentos_generados += 1
+    if not _docente_puede_generar(curso_id, anio_lectivo):
+        flash('No tiene permisos para generar documentos de este curso.', 'danger')
+        return redirect(url_for('documentos.listar_documentos'))
 
-    if documentos_generados == 0:
-        if tipo == 'certificados':
-            flash('Ningún estudiante cumplió con el requisito de aprobación para generar certificados.', 'warning')
-        else:
-            flash('No se generaron documentos.', 'warning')
+    # Seleccionar primero los documentos a generar para poder avisar si no hay ninguno
+    # antes de empezar a enviar el ZIP
+    try:
+        seleccion = _seleccionar_documentos(tipo, curso_id, anio_lectivo)
+    except ValueError as e:
+        flash(str(e), 'warning')
         return redirect(url_for('documentos.listar_documentos', curso=curso_id, tipo=tipo))
 
-    zip_buffer.seek(0)
-    curso_nombre = Curso.query.get(curso_id).nombre.replace(' ', '_')
-    zip_filename = f"{tipo.capitalize()}_{curso_nombre}_{anio_lectivo}.zip"
-
-    response = make_response(zip_buffer.read())
-    response.headers['Content-Type'] = 'application/zip'
-    response.headers['Content-Disposition'] = f'attachment; filename={zip_filename}'
-    return response
-
-
+    zip_filename = _nombre_zip_documentos(tipo, curso_id, anio_lectivo)
 
+    # El ZIP se envía por partes: la memoria usada no depende del tamaño del curso
+    return Response(
+        stream_with_context(generar_zip_streaming(_entradas_zip_documentos(tipo, seleccion))),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename={zip_filename}'}
+    )
 
 
 @documentos_bp.route('/start-task/descargar-todos/<tipo>', methods=['POST'])
 @roles_required('admin', 'docente')
 def start_descargar_todos(tipo):
-    curso_id = request.json.get('curso', type=int)
+    """Encola la descarga masiva; el progreso se consulta en /documentos/task-status/<task_id>"""
+    if tipo not in TIPOS_DOCUMENTOS:
+        return jsonify({'status': 'error', 'message': 'Tipo de documento no válido.'}), 400
+    try:
+        curso_id = int((request.get_json(silent=True) or {}).get('curso'))
+    except (TypeError, ValueError):
+        curso_id = None
     if not curso_id:
         return jsonify({'status': 'error', 'message': 'Debe seleccionar un curso.'}), 400
 
-    config = get_active_config()
+    config = contexto_academico().config
     anio_lectivo = config['anio'] if config and 'anio' in config else None
     if not anio_lectivo:
         return jsonify({'status': 'error', 'message': 'No hay un año lectivo activo.'}), 400
 
-    task_id = str(uuid.uuid4())
-    tasks[task_id] = {'status': 'iniciando', 'progress': 0, 'message': 'Iniciando tarea...'}
-
-    thread = threading.Thread(target=_generar_zip_documentos_en_background, args=(task_id, current_app.app_context(), tipo, curso_id, anio_lectivo, current_user.id))
-    thread.start()
+    if not _docente_puede_generar(curso_id, anio_lectivo):
+        return jsonify({'status': 'error', 'message': 'No tiene permisos para generar documentos de este curso.'}), 403
 
-    return jsonify({'status': 'ok', 'task_id': task_id})
+    trabajo = encolar_trabajo('documentos_zip', {
+        'tipo': tipo, 'curso_id': curso_id, 'anio_lectivo': anio_lectivo
+    }, current_user.id)
+    return jsonify({'status': 'ok', 'task_id': trabajo.id})
 
 
 @documentos_bp.route('/task-status/<task_id>')
 @roles_required('admin', 'docente')
 def task_status(task_id):
-    task = tasks.get(task_id)
-    if not task:
-        return jsonify({'status': 'error', 'message': 'Tarea no encontrada.'}), 404
-    return jsonify(task)
\ No newline at end of file
+    return redirect(url_for('trabajos.estado_trabajo', trabajo_id=task_id))
@@ -0,0 +1,50 @@
+import time
+from flask import Blueprint, Response, current_app
+from flask_login import current_user
+from app.models import Trabajo
+from app.services.eventos_service import cancelar_suscripcion, formatear_evento, suscribir
+from app.services.notificacion_service import notificaciones_no_leidas
+from app.utils.decorators import roles_required
+
+eventos_bp = Blueprint('eventos', __name__, url_prefix='/eventos')
+
+
+@eventos_bp.route('/')
+@roles_required('admin', 'docente')
+def stream():
+    """
+    Conexión SSE del usuario: envía el contador de notificaciones y el progreso de sus
+    trabajos cuando cambian. La conexión se cierra tras EVENTOS_DURACION_MAXIMA segundos y
+    el navegador la reabre sola, así un proceso web no acumula conexiones huérfanas.
+    """
+    # Suscribirse antes de leer el estado inicial para no perder cambios intermedios
+    suscripcion = suscribir(current_user.id)
+    iniciales = [formatear_evento('notificaciones', {'count': notificaciones_no_leidas(current_user)})]
+    iniciales += [
+        formatear_evento('trabajo', trabajo.to_dict())
+        for trabajo in Trabajo.query.filter(
+            Trabajo.id_usuario == current_user.id,
+            Trabajo.estado.in_(('pendiente', 'en_proceso'))
+        ).all()
+    ]
+    latido = current_app.config.get('EVENTOS_LATIDO', 15)
+    duracion = current_app.config.get('EVENTOS_DURACION_MAXIMA', 300)
+
+    # El generador no usa el contexto de la petición: la sesión de la base de datos se
+    # libera al terminar la vista y no queda ocupada mientras la conexión sigue abierta
+    def generar():
+        try:
+            yield 'retry: 5000\n\n'
+            yield from iniciales
+            limite = time.monotonic() + duracion
+            while time.monotonic() < limite:
+                evento = suscripcion.esperar(latido)
+                # Un comentario cada `latido` segundos mantiene viva la conexión en los proxies
+                yield formatear_evento(*evento) if evento else ': ping\n\n'
+        finally:
+            cancelar_suscripcion(suscripcion)
+
+    return Response(generar(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # nginx no debe acumular los eventos
+    })
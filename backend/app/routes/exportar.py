@@ -1,7 +1,7 @@
 from flask import Blueprint, current_app, make_response, render_template, request, redirect, url_for, flash, send_file, jsonify
 from flask_login import current_user
 from app.utils.decorators import admin_required
-from app.services.configuracion_service import get_active_config
+from app.services.contexto_service import contexto_academico
 from app import db
 from app.models import Matricula, Curso, Calificacion, Asignacion
 from io import BytesIO
@@ -28,7 +28,7 @@ def vista_exportar():
     estado = request.args.get('estado', 'activo')  # Solo activos por defecto
 
 
-    config = get_active_config()
+    config = contexto_academico().config
     anio_lectivo = config['anio'] if config and 'anio' in config else None
 
     # Solo cursos con matrículas activas en el año lectivo actual
@@ -62,7 +62,7 @@ def vista_exportar():
     start_index = (page - 1) * per_page + 1 if estudiantes.total > 0 else 0
     end_index = min(page * per_page, estudiantes.total) if estudiantes.total > 0 else 0
     
-    active_config = get_active_config()
+    active_config = contexto_academico().config
     if not active_config:
         flash('No hay un año lectivo configurado como activo', 'warning')
         return redirect(url_for('configuracion.index'))
@@ -87,7 +87,7 @@ def vista_previa():
     if not campos:
         campos = ['Nombres', 'Apellidos', 'Documento', 'Grado']
 
-    config = get_active_config()
+    config = contexto_academico().config
     anio_lectivo = config['anio'] if config and 'anio' in config else None
 
     query = Matricula.query.options(
@@ -160,7 +160,7 @@ def exportar_estudiantes():
     campos = request.form.getlist('campos[]')
     formato = data.get('formato')
 
-    config = get_active_config()
+    config = contexto_academico().config
     anio_lectivo = config['anio'] if config and 'anio' in config else None
     
     # Obtener primer nombre y primer apellido del usuario actual
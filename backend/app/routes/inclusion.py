@@ -1,6 +1,6 @@
 from flask import Blueprint, current_app, make_response, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import current_user
-from app.services.configuracion_service import get_active_config
+from app.services.contexto_service import contexto_academico
 from datetime import datetime
 from io import BytesIO
 from reportlab.pdfgen import canvas
@@ -23,7 +23,7 @@ inclusion_bp = Blueprint('inclusion', __name__, url_prefix='/inclusion')
 @roles_required('admin', 'docente')
 def listar_inclusiones():
     form = FiltroInclusion()
-    config = get_active_config()
+    config = contexto_academico().config
     anio_lectivo = config['anio'] if config and 'anio' in config else None
 
     # Obtener cursos según el rol del usuario
@@ -67,7 +67,7 @@ def listar_inclusiones():
     inclusiones = query.order_by(Inclusion.fecha_ingreso.desc()).paginate(page=page, per_page=10)
     matriculas = Matricula.query.filter_by(estado='activo').filter(Matricula.año_lectivo == anio_lectivo).all() if anio_lectivo else []
     
-    active_config = get_active_config()
+    active_config = contexto_academico().config
     if not active_config:
         flash('No hay un año lectivo configurado como activo', 'warning')
         return redirect(url_for('configuracion.index'))
@@ -98,7 +98,7 @@ def crear_inclusion():
         fecha_ingreso = datetime.strptime(fecha_ingreso_str, '%Y-%m-%d').date()
 
         # Obtener el año lectivo activo para validación
-        config = get_active_config()
+        config = contexto_academico().config
         if not config or 'anio' not in config:
             flash('No hay un año lectivo configurado como activo. No se puede crear el registro de inclusión.', 'danger')
             return redirect(url_for('inclusion.listar_inclusiones'))
@@ -130,7 +130,7 @@ def crear_inclusion():
         # Notificar a los docentes del curso
         try:
             from app.models import Actividad
-            config = get_active_config()
+            config = contexto_academico().config
             if config and 'anio' in config:
                 anio_lectivo = config['anio']
                 asignaciones_del_curso = Asignacion.query.filter_by(
@@ -200,7 +200,7 @@ def editar_inclusion(id):
         inclusion.fecha_ingreso = datetime.strptime(fecha_ingreso_str, '%Y-%m-%d').date()
 
         # Obtener el año lectivo activo para validación
-        config = get_active_config()
+        config = contexto_academico().config
         if not config or 'anio' not in config:
             flash('No hay un año lectivo configurado como activo. No se puede editar el registro de inclusión.', 'danger')
             return redirect(url_for('inclusion.listar_inclusiones'))
@@ -245,7 +245,7 @@ def eliminar_inclusion(id):
 @inclusion_bp.route('/exportar', methods=['GET'])
 @roles_required('admin', 'docente')
 def exportar_inclusiones():
-    config = get_active_config()
+    config = contexto_academico().config
     anio_lectivo = config['anio'] if config and 'anio' in config else None
     
     curso_id = request.args.get('curso')
@@ -450,7 +450,7 @@ def exportar_inclusiones():
 def matriculas_por_curso(id_curso):
     # Verificar que el docente tiene acceso a este curso
     if not current_user.is_admin():
-        config = get_active_config()
+        config = contexto_academico().config
         anio_lectivo = config['anio'] if config and 'anio' in config else None
         
         asignacion = Asignacion.query.filter_by(
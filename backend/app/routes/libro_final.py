@@ -5,9 +5,13 @@ from app.utils.decorators import roles_required
 from datetime import datetime
 from app import db
 from app.models import Curso, Matricula, Asignatura, Asignacion, Calificacion, ConfiguracionLibro
-from app.services.configuracion_service import get_active_config
+from app.services.contexto_service import contexto_academico
+from app.services.boletin_service import marcar_boletines_desactualizados
+from app.services.libro_final_service import tabla_libro_final
 from io import BytesIO
-import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
 # --- ReportLab: PDF -- - 
 from reportlab.lib.colors import HexColor
 from reportlab.lib.pagesizes import A4
@@ -24,54 +28,34 @@ def _obtener_datos_libro_final(curso_id, anio_lectivo):
     """
     Función auxiliar para obtener los datos consolidados del libro final, promediando todos los períodos.
     """
-    # Subconsulta para calcular el promedio de calificaciones de cada estudiante para el año lectivo.
-    subquery = db.session.query(
-        Calificacion.id_matricula,
-        func.avg(Calificacion.nota).label('promedio_final')
-    ).join(Asignacion, Calificacion.id_asignacion == Asignacion.id)\
-     .filter(Asignacion.anio_lectivo == anio_lectivo)\
-     .group_by(Calificacion.id_matricula).subquery()
-
-    # Consulta principal para obtener los estudiantes del curso con su promedio final.
-    estudiantes_con_promedio = db.session.query(
-        Matricula,
-        subquery.c.promedio_final
-    ).outerjoin(subquery, Matricula.id == subquery.c.id_matricula)\
-     .filter(
-        Matricula.id_curso == curso_id,
-        Matricula.estado == 'activo',
-        Matricula.año_lectivo == anio_lectivo
-    ).order_by(Matricula.apellidos, Matricula.nombres).all()
-
     config = ConfiguracionLibro.obtener_configuracion_actual()
-
-    datos_estudiantes = []
-    for matricula, promedio in estudiantes_con_promedio:
-        promedio_final = round(promedio, 1) if promedio is not None else 0.0
-        
-        if promedio is None:
-            estado = "Sin Calificar"
-        elif promedio_final >= config.nota_basico:
-            estado = "Aprobado"
-        else:
-            estado = "No Aprobado"
-
-        datos_estudiantes.append({
-            'id': matricula.id,
-            'nombres': f"{matricula.nombres} {matricula.apellidos}",
-            'documento': matricula.documento,
-            'foto': matricula.foto or 'default-profile.png',
-            'promedio_periodo': promedio_final,
-            'estado': estado,
-        })
-        
-    return datos_estudiantes
+    tabla = tabla_libro_final(curso_id, anio_lectivo, config.nota_basico)
+    return tabla.rename(columns={'promedio_final': 'promedio_periodo'}).to_dict('records')
+
+
+def _libro_final_excel(datos_estudiantes):
+    """Libro de Excel en modo de solo escritura: las filas se escriben sin guardar celdas en memoria"""
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet('Libro Final')
+    encabezado = []
+    for titulo in ('N°', 'Estudiante', 'Documento', 'Promedio', 'Estado'):
+        celda = WriteOnlyCell(hoja, value=titulo)
+        celda.font = Font(bold=True)
+        encabezado.append(celda)
+    hoja.append(encabezado)
+    for i, estudiante in enumerate(datos_estudiantes, 1):
+        hoja.append([i, estudiante['nombres'], estudiante['documento'],
+                     estudiante['promedio_periodo'], estudiante['estado']])
+    output = BytesIO()
+    libro.save(output)
+    output.seek(0)
+    return output
 
 @libro_final_bp.route('/')
 @roles_required('admin', 'docente')
 def index():
     """Vista principal del libro final que carga los cursos y datos iniciales."""
-    config = get_active_config()
+    config = contexto_academico().config
     anio_lectivo = config['anio'] if config and 'anio' in config else None
     
     if current_user.rol == 'admin':
@@ -97,7 +81,7 @@ def index():
     
     selected_curso_id = None
 
-    active_config = get_active_config()
+    active_config = contexto_academico().config
     if not active_config:
         flash('No hay un año lectivo configurado como activo', 'warning')
         return redirect(url_for('configuracion.index'))
@@ -125,7 +109,7 @@ def obtener_datos_libro():
             return jsonify({'error': 'No tiene permisos para ver este curso.'}), 403
     
     try:
-        config = get_active_config()
+        config = contexto_academico().config
         anio_lectivo = config['anio'] if config and 'anio' in config else datetime.now().year
         datos_estudiantes = _obtener_datos_libro_final(curso_id, anio_lectivo)
         
@@ -166,7 +150,7 @@ def detalle_estudiante(estudiante_id):
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 5, type=int)
 
-        config = get_active_config()
+        config = contexto_academico().config
         anio_lectivo = config['anio'] if config and 'anio' in config else datetime.now().year
 
         matricula = Matricula.query.get_or_404(estudiante_id)
@@ -188,9 +172,16 @@ def detalle_estudiante(estudiante_id):
         ).join(Asignacion, Asignacion.id_asignatura == Asignatura.id).join(Calificacion, Calificacion.id_asignacion == Asignacion.id).filter(
              Calificacion.id_matricula == estudiante_id,
              Asignacion.anio_lectivo == anio_lectivo
-         ).group_by(Asignatura.nombre).all()
+         )
         if current_user.rol != 'admin':
-            calificaciones_query = [cal for cal in calificaciones_query if Asignacion.query.filter_by(id_asignatura=Asignatura.query.filter_by(nombre=cal.asignatura).first().id, id_docente=current_user.id, estado='activo', anio_lectivo=anio_lectivo).first()]
+            # Solo las asignaturas que el docente dicta este año, en la misma consulta
+            asignaturas_docente = db.session.query(Asignacion.id_asignatura).filter(
+                Asignacion.id_docente == current_user.id,
+                Asignacion.estado == 'activo',
+                Asignacion.anio_lectivo == anio_lectivo
+            )
+            calificaciones_query = calificaciones_query.filter(Asignatura.id.in_(asignaturas_docente))
+        calificaciones_query = calificaciones_query.group_by(Asignatura.nombre).all()
 
         calificaciones = []
         promedio_general = 0
@@ -258,6 +249,9 @@ def configuracion():
             config.nota_alto = nota_alto
             config.nota_basico = nota_basico
             config.id_usuario = current_user.id
+
+            # El desempeño de los boletines depende de estos umbrales
+            marcar_boletines_desactualizados(config.año_lectivo_actual)
             
             db.session.commit()
             return jsonify({'success': True, 'message': 'Configuración guardada correctamente'})
@@ -289,25 +283,12 @@ def exportar_excel():
             return "No tiene permisos para exportar este curso.", 403
     
     try:
-        config = get_active_config()
+        config = contexto_academico().config
         anio_lectivo = config['anio'] if config and 'anio' in config else datetime.now().year
         datos_estudiantes = _obtener_datos_libro_final(curso_id, anio_lectivo)
         curso = Curso.query.get(curso_id)
 
-        df_data = []
-        for i, estudiante in enumerate(datos_estudiantes, 1):
-            df_data.append({
-                'N°': i,
-                'Estudiante': estudiante['nombres'],
-                'Documento': estudiante['documento'],
-                'Promedio': estudiante['promedio_periodo'],
-                'Estado': estudiante['estado']
-            })
-
-        df = pd.DataFrame(df_data)
-        output = BytesIO()
-        df.to_excel(output, index=False, sheet_name='Libro Final')
-        output.seek(0)
+        output = _libro_final_excel(datos_estudiantes)
         
         filename = f"Libro_Final_{curso.nombre}_{anio_lectivo}.xlsx"
         
@@ -338,7 +319,7 @@ def exportar_pdf():
             return redirect(url_for('libro_final.index'))
 
     try:
-        config = get_active_config()
+        config = contexto_academico().config
         anio_lectivo = config['anio'] if config and 'anio' in config else datetime.now().year
         datos_estudiantes = _obtener_datos_libro_final(curso_id, anio_lectivo)
         if not datos_estudiantes:
@@ -527,7 +508,7 @@ def exportar_pdf():
 def exportar_individual_pdf(estudiante_id):
     """Exportar detalle individual de calificaciones a PDF con diseño premium similar al de exportar datos."""
     try:
-        config = get_active_config()
+        config = contexto_academico().config
         anio_lectivo = config['anio'] if config and 'anio' in config else datetime.now().year
 
         matricula = Matricula.query.get_or_404(estudiante_id)
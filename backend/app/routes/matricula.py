@@ -7,8 +7,10 @@ from app.utils.decorators import admin_required
 from app.utils.file_uploads import upload_profile_picture, remove_profile_picture, allowed_file
 from io import BytesIO
 from app.forms.filtros import FiltroMatriculaForm
-from app.services.configuracion_service import get_active_config
+from app.services.contexto_service import contexto_academico
 from app.services.matricula_service import clear_matriculas_cache
+from app.services.dashboard_service import clear_dashboard_cache
+from app.services.asistencia_service import actualizar_resumen_matriculas
 
 # --- ReportLab: PDF ---
 from reportlab.lib.colors import HexColor
@@ -24,7 +26,7 @@ matricula_bp = Blueprint('matricula', __name__, url_prefix='/matriculas')
 @admin_required
 def listar_matricula():
     """Lista todas las matrículas del año lectivo activo con paginación"""
-    active_config = get_active_config()
+    active_config = contexto_academico().config
     if not active_config:
         flash('No hay un año lectivo configurado como activo', 'warning')
         return redirect(url_for('configuracion.index'))
@@ -83,7 +85,7 @@ def listar_matricula():
 @admin_required
 def crear_matricula():
     try:
-        active_config = get_active_config()
+        active_config = contexto_academico().config
         if not active_config:
             flash('No hay un año lectivo configurado como activo', 'warning')
             return redirect(url_for('matricula.listar_matricula'))
@@ -178,6 +180,8 @@ def crear_matricula():
             current_app.logger.error(f"Error creando actividad para matrícula: {str(act_e)}")
 
         clear_matriculas_cache()
+
+        clear_dashboard_cache()
         flash('Matrícula creada correctamente', 'success')
 
     except Exception as e:
@@ -195,7 +199,7 @@ def editar_matricula(id):
     matricula = Matricula.query.get_or_404(id)
     
     try:
-        active_config = get_active_config()
+        active_config = contexto_academico().config
         if not active_config:
             flash('No hay un año lectivo configurado como activo', 'warning')
             return redirect(url_for('matricula.listar_matricula'))
@@ -237,6 +241,7 @@ def editar_matricula(id):
         matricula.telefono = request.form['telefono'].strip()
         matricula.direccion = request.form['direccion'].strip()
         matricula.id_curso = nuevo_curso_id
+        estado_anterior = matricula.estado
         matricula.estado = request.form['estado']
         
         # ✅ Convertir y validar fechas
@@ -259,9 +264,14 @@ def editar_matricula(id):
                 filename = upload_profile_picture(file, documento)
                 matricula.foto = filename
 
+        # El resumen de asistencias solo cuenta matrículas activas
+        if matricula.estado != estado_anterior:
+            actualizar_resumen_matriculas([matricula.id])
+
         # ✅ Guardar cambios en la base de datos
         db.session.commit()
         clear_matriculas_cache()
+        clear_dashboard_cache()
         
         flash('Matrícula actualizada correctamente', 'success')
         
@@ -294,6 +304,7 @@ def eliminar_matricula(id):
         matricula.fecha_eliminacion = datetime.utcnow()
         db.session.commit()
         clear_matriculas_cache()
+        clear_dashboard_cache()
         flash('Matrícula enviada a la papelera de reciclaje.', 'success')
     except Exception as e:
         db.session.rollback()
@@ -308,7 +319,7 @@ def eliminar_matricula(id):
 def actualizar_por_cambio_curso():
     """Maneja cambios masivos cuando se desactiva un curso"""
     try:
-        active_config = get_active_config()
+        active_config = contexto_academico().config
         if not active_config:
             return jsonify({'success': False, 'error': 'No hay año activo'}), 400
 
@@ -328,6 +339,7 @@ def actualizar_por_cambio_curso():
             
             db.session.commit()
             clear_matriculas_cache()
+            clear_dashboard_cache()
             
         return jsonify({'success': True})
     except Exception as e:
@@ -343,7 +355,7 @@ def actualizar_por_cambio_curso():
 def exportar_matricula():
     """Exporta matrículas a PDF con diseño premium y 20 registros por página"""
     try:
-        active_config = get_active_config()
+        active_config = contexto_academico().config
         if not active_config:
             flash('No hay un año lectivo configurado como activo', 'warning')
             return redirect(url_for('matricula.listar_matricula'))
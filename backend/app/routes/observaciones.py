@@ -5,7 +5,7 @@ from datetime import datetime
 from io import BytesIO
 from app import db
 from app.models import Curso, Matricula, Observacion, Asignacion, User, Actividad
-from app.services.configuracion_service import get_active_config
+from app.services.contexto_service import contexto_academico
 from app.utils.decorators import roles_required, admin_required
 from app.utils.file_uploads import allowed_file, upload_documento
 from app.forms.observacion import ObservacionForm, DummyDeleteForm
@@ -24,7 +24,7 @@ def listar_observaciones():
     curso_id = request.args.get('curso')
     tipo = request.args.get('tipo')
 
-    active_config = get_active_config()
+    active_config = contexto_academico().config
     if not active_config:
         flash('No hay un año lectivo configurado como activo', 'warning')
         return redirect(url_for('configuracion.index'))
@@ -95,7 +95,7 @@ def crear_observacion():
         fecha = datetime.strptime(fecha_str, '%Y-%m-%d').date()
 
         # Obtener el año lectivo activo para validación
-        config = get_active_config()
+        config = contexto_academico().config
         if not config or 'anio' not in config:
             flash('No hay un año lectivo configurado como activo. No se puede crear la observación.', 'danger')
             return redirect(url_for('observacion.listar_observaciones'))
@@ -104,7 +104,7 @@ def crear_observacion():
         if fecha.year != anio_lectivo:
             flash(f'La fecha de la observación ({fecha.year}) no corresponde al año lectivo activo ({anio_lectivo}).', 'danger')
             return redirect(url_for('observacion.listar_observaciones'))
-        config = get_active_config()
+        config = contexto_academico().config
         if not config:
             raise ValueError('No hay un año lectivo configurado como activo')
         anio_lectivo = config['anio']
@@ -240,7 +240,7 @@ def editar_observacion(id):
 
         # Verificar que el docente tiene acceso a esta observación (si no es admin)
         if not current_user.is_admin():
-            config = get_active_config()
+            config = contexto_academico().config
             anio_lectivo = config['anio'] if config and 'anio' in config else None
             asignacion = Asignacion.query.filter_by(
                 id_curso=observacion.id_curso,
@@ -263,7 +263,7 @@ def editar_observacion(id):
         fecha = datetime.strptime(fecha_str, '%Y-%m-%d').date()
 
         # Obtener el año lectivo activo para validación
-        config = get_active_config()
+        config = contexto_academico().config
         if not config or 'anio' not in config:
             flash('No hay un año lectivo configurado como activo. No se puede editar la observación.', 'danger')
             return redirect(url_for('observacion.listar_observaciones'))
@@ -272,7 +272,7 @@ def editar_observacion(id):
         if fecha.year != anio_lectivo:
             flash(f'La fecha de la observación ({fecha.year}) no corresponde al año lectivo activo ({anio_lectivo}).', 'danger')
             return redirect(url_for('observacion.listar_observaciones'))
-        config = get_active_config()
+        config = contexto_academico().config
         if not config:
             raise ValueError('No hay un año lectivo configurado como activo')
         anio_lectivo = config['anio']
@@ -354,7 +354,7 @@ def eliminar_observacion(id):
 def matriculas_por_curso(id_curso):
     # Verificar que el docente tiene acceso a este curso
     if not current_user.is_admin():
-        config = get_active_config()
+        config = contexto_academico().config
         anio_lectivo = config['anio'] if config and 'anio' in config else None
         
         asignacion = Asignacion.query.filter_by(
@@ -403,7 +403,7 @@ def exportar_observaciones():
         grado = data.get('grado')
         estado = data.get('estado')
 
-        config = get_active_config()
+        config = contexto_academico().config
         anio_lectivo = config['anio'] if config and 'anio' in config else None
 
         query = Observacion.query.join(Matricula).join(Curso).filter(Observacion.eliminado == False)
@@ -3,25 +3,25 @@ from flask_login import current_user
 from datetime import datetime
 from io import BytesIO
 from reportlab.pdfgen import canvas
-from app import db, mail
+from app import db
 from app.models import Curso, Matricula, Pago, Asignacion, Actividad
-from app.services.configuracion_service import get_active_config
+from app.services.contexto_service import contexto_academico
 from app.utils.decorators import admin_required, roles_required
 from app.forms.pagos import FiltroPagoForm 
 from flask import current_app
 import os
 from app.utils.pdf_generador import generar_comprobante_pago_pdf
+from app.services.correo_service import encolar_correo
 from reportlab.lib.colors import HexColor
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import mm
 
-from flask_mail import Message
 pago_bp = Blueprint('pago', __name__, url_prefix='/pagos')
 
 @pago_bp.route('/', methods=['GET'])
 @roles_required('admin', 'docente')
 def listar_pagos():
-    config = get_active_config()
+    config = contexto_academico().config
     anio_lectivo = config['anio'] if config and 'anio' in config else None
 
     # Obtener cursos según el rol del usuario
@@ -71,7 +71,7 @@ def listar_pagos():
     page = request.args.get('page', 1, type=int)
     pagos = query.order_by(Pago.creado_en.desc()).paginate(page=page, per_page=10)
     
-    active_config = get_active_config()
+    active_config = contexto_academico().config
     if not active_config:
         flash('No hay un año lectivo configurado como activo', 'warning')
         return redirect(url_for('configuracion.index'))
@@ -93,7 +93,7 @@ def crear_pago():
         estado = request.form['estado']
 
         # Obtener el año lectivo activo para validación
-        config = get_active_config()
+        config = contexto_academico().config
         if not config or 'anio' not in config:
             flash('No hay un año lectivo configurado como activo. No se puede crear el pago.', 'danger')
             return redirect(url_for('pago.listar_pagos'))
@@ -127,7 +127,7 @@ def crear_pago():
 
         # Notificar a los docentes del curso
         try:
-            config = get_active_config()
+            config = contexto_academico().config
             if config and 'anio' in config:
                 anio_lectivo = config['anio']
                 asignaciones_del_curso = Asignacion.query.filter_by(
@@ -198,7 +198,7 @@ def editar_pago(id):
         estado = request.form['estado']
 
         # Obtener el año lectivo activo para validación
-        config = get_active_config()
+        config = contexto_academico().config
         if not config or 'anio' not in config:
             flash('No hay un año lectivo configurado como activo. No se puede editar el pago.', 'danger')
             return redirect(url_for('pago.listar_pagos'))
@@ -303,6 +303,9 @@ def enviar_comprobante(id):
 
     if not matricula:
         return jsonify({'success': False, 'message': 'Matrícula no encontrada'})
+
+    if not matricula.email:
+        return jsonify({'success': False, 'message': 'El estudiante no tiene una dirección de correo electrónico registrada.'})
     
     # Preparar datos para el comprobante (igual que en ver_comprobante)
     pago_data = {
@@ -487,33 +490,20 @@ def enviar_comprobante(id):
     </body>
     </html>
     """
-    try:
-        # Configurar email con Flask-Mail
-        msg = Message(
-            subject=f'Comprobante de Pago - {pago.concepto} - Jardín Infantil Sonrisas',
-            sender=current_app.config['MAIL_DEFAULT_SENDER'],
-            recipients=[matricula.email],
-            html=body
-        )
-
-        # Adjuntar PDF
-        msg.attach(
-            filename=f'comprobante_pago_{id}.pdf',
-            content_type='application/pdf',
-            data=pdf_data
-        )
-
-        mail.send(msg)
-        return jsonify({
-            'success': True,
-            'message': f'Comprobante enviado exitosamente a {matricula.email}'
-        })
-    except Exception as e:
-        current_app.logger.error(f"Error al enviar correo de comprobante: {str(e)}")
-        return jsonify({
-            'success': False,
-            'message': f'Error al enviar correo: {str(e)}'
-        })
+    # El correo queda en la bandeja de salida y lo entrega el worker de correo
+    encolar_correo(
+        matricula.email,
+        f'Comprobante de Pago - {pago.concepto} - Jardín Infantil Sonrisas',
+        body,
+        adjunto_nombre=f'comprobante_pago_{id}.pdf',
+        adjunto=pdf_data,
+        referencia=f"pago:{pago.id}",
+        usuario_id=current_user.id
+    )
+    return jsonify({
+        'success': True,
+        'message': f'El comprobante se enviará a {matricula.email} en unos momentos.'
+    })
 
 
 
@@ -538,7 +528,7 @@ def info_contacto(id):
 def matriculas_por_curso(id_curso):
     # Verificar que el docente tiene acceso a este curso
     if not current_user.is_admin():
-        config = get_active_config()
+        config = contexto_academico().config
         anio_lectivo = config['anio'] if config and 'anio' in config else None
         
         asignacion = Asignacion.query.filter_by(
@@ -593,7 +583,7 @@ def exportar_pagos():
         grado = data.get('grado')
         estado = data.get('estado')
         
-        config = get_active_config()
+        config = contexto_academico().config
         anio_lectivo = config['anio'] if config and 'anio' in config else None
 
         query = Pago.query
@@ -4,6 +4,7 @@ from app import db
 from app.models import Periodo, AnioPeriodo
 from app.models.configuracion import SystemConfig
 from app.utils.decorators import admin_required
+from app.services.boletin_service import marcar_boletines_desactualizados
 from datetime import datetime
 from io import BytesIO
 
@@ -182,6 +183,9 @@ def editar_periodo(id):
             'fecha_fin': fecha_fin_str
         })
 
+        # Las fechas del período definen qué notas entran en cada boletín
+        marcar_boletines_desactualizados(None)
+
         db.session.commit()
         flash('Período actualizado correctamente', 'success')
     except Exception as e:
@@ -4,10 +4,12 @@ from flask_login import current_user
 from app.utils.decorators import roles_required
 from datetime import datetime
 from app import db
-from app.models import Curso, Matricula, Periodo, Asignatura, Asignacion, Calificacion
+from app.models import Curso, Matricula, Periodo, Asignatura, Asignacion, Calificacion, User
 from sqlalchemy import func
 from flask import make_response
-from app.services.configuracion_service import get_active_config
+from app.services.contexto_service import contexto_academico
+from app.services.posicion_service import codificar_cursor, consultar_posiciones, pagina_posiciones
+from app.services.trabajo_service import encolar_trabajo, registrar_trabajo
 # --- ReportLab: PDF ---
 from reportlab.lib.colors import HexColor
 from reportlab.lib.pagesizes import A4
@@ -20,7 +22,7 @@ posiciones_bp = Blueprint('posiciones', __name__, url_prefix='/posiciones')
 @posiciones_bp.route('/')
 @roles_required('admin', 'docente')
 def index():
-    active_config = get_active_config()
+    active_config = contexto_academico().config
     if not active_config:
         flash('No hay un año lectivo configurado como activo', 'warning')
         return redirect(url_for('configuracion.index'))
@@ -51,7 +53,7 @@ def index():
 @posiciones_bp.route('/datos')
 @roles_required('admin', 'docente')
 def obtener_datos_posiciones():
-    config = get_active_config()
+    config = contexto_academico().config
     periodo_id = config.get('periodo_id')
     curso_str = request.args.get('curso')
 
@@ -70,72 +72,46 @@ def obtener_datos_posiciones():
         if not asignacion:
             return jsonify({'error': 'No tiene permisos para ver este curso.'}), 403
 
-    periodo = Periodo.query.get_or_404(periodo_id)
     anio_lectivo = config.get('anio')
     if not anio_lectivo:
         return jsonify({'error': 'No hay un año lectivo activo configurado.'}), 400
 
-    try:
-        fecha_inicio = datetime.strptime(f"{anio_lectivo}-{periodo.fecha_inicio}", "%Y-%m-%d").date()
-        fecha_fin = datetime.strptime(f"{anio_lectivo}-{periodo.fecha_fin}", "%Y-%m-%d").date()
-    except (ValueError, TypeError):
-        return jsonify({'error': f"Las fechas del período '{periodo.nombre}' no están configuradas correctamente."}), 400
-
-    # Subquery para promedios
-    subquery = db.session.query(
-        Calificacion.id_matricula,
-        func.avg(Calificacion.nota).label('promedio'),
-        func.count(Calificacion.id).label('cantidad_asignaturas')
-    ).join(Asignacion, Calificacion.id_asignacion == Asignacion.id).filter(
-        Calificacion.fecha_calificacion.between(fecha_inicio, fecha_fin)
-    ).group_by(Calificacion.id_matricula).subquery()
-
-    # Query principal
-    query = db.session.query(
-        Matricula,
-        subquery.c.promedio,
-        subquery.c.cantidad_asignaturas,
-        Curso.nombre.label('curso_nombre')
-    ).join(
-        subquery, Matricula.id == subquery.c.id_matricula
-    ).join(
-        Curso, Matricula.id_curso == Curso.id
-    ).filter(
-        Matricula.estado == 'activo',
-        subquery.c.cantidad_asignaturas >= 1
-    )
-
-    if anio_lectivo:
-        query = query.filter(Matricula.año_lectivo == anio_lectivo)
-    
     if curso_id:
-        query = query.filter(Matricula.id_curso == curso_id)
+        cursos_ids = [curso_id]
     elif current_user.rol != 'admin':
-        cursos_docente = [asig.id_curso for asig in Asignacion.query.filter_by(id_docente=current_user.id).all()]
-        query = query.filter(Matricula.id_curso.in_(cursos_docente))
-
-    query = query.order_by(subquery.c.promedio.desc())
+        cursos_ids = list({asig.id_curso for asig in Asignacion.query.filter_by(id_docente=current_user.id).all()})
+    else:
+        cursos_ids = None
 
-    # Paginación
+    # Paginación por cursor (flechas) o por número de página; el puesto lo calcula la base de datos
     page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
-    total = query.count()
-    resultados = query.offset((page - 1) * per_page).limit(per_page).all()
+    per_page = min(max(request.args.get('per_page', 10, type=int), 1), 100)
+    try:
+        resultado = pagina_posiciones(
+            periodo_id, anio_lectivo, cursos_ids, por_pagina=per_page, pagina=page,
+            despues=request.args.get('despues'), antes=request.args.get('antes')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
+    filas = resultado['filas']
     datos = []
-    for i, (matricula, promedio, cantidad_asignaturas, curso_nombre) in enumerate(resultados):
+    for posicion, matricula, curso_nombre, puesto, puesto_denso in filas:
         datos.append({
-            'posicion': (page - 1) * per_page + i + 1,
+            'posicion': puesto,
+            'posicion_densa': puesto_denso,
             'id': matricula.id,
             'nombre': f"{matricula.nombres} {matricula.apellidos}",
             'documento': matricula.documento,
             'curso': curso_nombre,
-            'promedio': round(promedio, 2) if promedio else 0.0,
+            'promedio': round(posicion.promedio, 2) if posicion.promedio else 0.0,
             'foto': matricula.foto,
-            'cantidad_asignaturas': cantidad_asignaturas or 0
+            'cantidad_asignaturas': posicion.cantidad_asignaturas or 0
         })
-    
+
+    total = resultado['total']
     pages = (total + per_page - 1) // per_page
+    page = (resultado['desde'] - 1) // per_page + 1
     return jsonify({
         'data': datos,
         'total_estudiantes': total,
@@ -144,10 +120,13 @@ def obtener_datos_posiciones():
             'per_page': per_page,
             'total': total,
             'pages': pages,
-            'has_prev': page > 1,
-            'has_next': page < pages,
+            'desde': resultado['desde'],
+            'has_prev': resultado['hay_anterior'],
+            'has_next': resultado['hay_siguiente'],
             'prev_num': page - 1,
-            'next_num': page + 1
+            'next_num': page + 1,
+            'prev_cursor': codificar_cursor(*filas[0][:2]) if filas and resultado['hay_anterior'] else None,
+            'next_cursor': codificar_cursor(*filas[-1][:2]) if filas and resultado['hay_siguiente'] else None
         }
     })
 
@@ -155,7 +134,7 @@ def obtener_datos_posiciones():
 @posiciones_bp.route('/historial/<int:matricula_id>')
 @roles_required('admin', 'docente')
 def obtener_historial(matricula_id):
-    config = get_active_config()
+    config = contexto_academico().config
     periodo_id = config.get('periodo_id')
     if not periodo_id:
         return jsonify({'error': 'No hay un período activo configurado.'}), 400
@@ -215,235 +194,260 @@ def obtener_historial(matricula_id):
 
 
 
-@posiciones_bp.route('/exportar')
-@roles_required('admin', 'docente')
-def exportar_posiciones():
-    config = get_active_config()
+def _usuario_exportador(usuario):
+    nombres = usuario.nombre.split()
+    apellidos = usuario.apellidos.split() if usuario.apellidos else []
+    primer_nombre = nombres[0] if nombres else ""
+    primer_apellido = apellidos[0] if apellidos else ""
+    return f"{primer_nombre} {primer_apellido}".strip()
+
+
+def _cursos_ranking(curso_id, usuario):
+    """Cursos que entran en el ranking exportado: el elegido, los del docente o todos (None)"""
+    if curso_id:
+        return [curso_id]
+    if usuario.rol != 'admin':
+        return list({asig.id_curso for asig in Asignacion.query.filter_by(id_docente=usuario.id).all()})
+    return None
+
+
+def _nombre_pdf_ranking(periodo, curso):
+    filename = f"ranking_{periodo.nombre.lower().replace(' ', '_')}"
+    if curso:
+        filename += f"_{curso.nombre.lower().replace(' ', '_')}"
+    return filename + ".pdf"
+
+
+def dibujar_ranking_pdf(resultados, periodo, curso, usuario_exportador):
+    """Dibuja el PDF del ranking académico y devuelve sus bytes"""
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+
+    margin_left = 10 * mm
+    margin_right = width - (10 * mm)
+    margin_top = height - (15 * mm)
+
+    color_primary = HexColor("#2C3E50")
+    color_gold = HexColor("#FFD700")
+    color_silver = HexColor("#C0C0C0")
+    color_bronze = HexColor("#CD7F32")
+    black = HexColor("#000000")
+    white = HexColor("#FFFFFF")
+
+    estudiantes_por_pagina = 20
+    total_paginas = (len(resultados) + estudiantes_por_pagina - 1) // estudiantes_por_pagina
+
+    for pagina in range(total_paginas):
+        if pagina > 0:
+            c.showPage()
+
+        c.setFillColor(HexColor("#FBFCFC"))
+        c.rect(0, 0, width, height, fill=1, stroke=0)
+
+        c.setStrokeColor(color_primary)
+        c.setLineWidth(0.5)
+        c.roundRect(10*mm, 10*mm, width-20*mm, height-20*mm, 5*mm, stroke=1, fill=0)
+
+        try:
+            base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+            logo_path = os.path.join(base_dir, 'frontend', 'static', 'img', 'logotipo.png')
+
+            if os.path.exists(logo_path):
+                c.drawImage(logo_path, margin_left, height-50*mm, width=35*mm, height=40*mm, 
+                           mask='auto', preserveAspectRatio=True)
+            else:
+                c.setFont("Helvetica-Bold", 16)
+                c.setFillColor(color_primary)
+                c.drawString(margin_left, height-30*mm, "JARDÍN INFANTIL")
+                c.drawString(margin_left, height-35*mm, "SONRISAS")
+        except Exception as e:
+            print(f"Error al cargar el logo: {str(e)}")
+
+        c.setFont("Helvetica-Bold", 14)
+        c.setFillColor(black)
+        c.drawCentredString(width/2, height-20*mm, "JARDÍN INFANTIL SONRISAS")
+
+        c.setFont("Helvetica-Oblique", 10)
+        c.setFillColor(black)
+        c.drawCentredString(width/2, height-25*mm, '"Aprendiendo y sonriendo"')
+
+        c.setFont("Helvetica", 9)
+        c.setFillColor(black)
+        c.drawCentredString(width/2, height-30*mm, "Código DANE N° 320001800766")
+        c.drawCentredString(width/2, height-35*mm, "Teléfono: 300 149 8933")
+
+        c.setFont("Helvetica-Bold", 20)
+        c.setFillColor(black)
+        c.drawCentredString(width/2, height-50*mm, "RANKING ACADÉMICO")
+
+        info_text = [f"Período: {periodo.nombre}"]
+        if curso:
+            info_text.append(f"Curso: {curso.nombre}")
+        else:
+            info_text.append("Todos los cursos")
+
+        c.setFont("Helvetica", 10)
+        c.setFillColor(HexColor("#666666"))
+        c.drawCentredString(width/2, height-58*mm, " | ".join(info_text))
+
+        current_y = height - 65*mm
+
+        header_height = 8*mm 
+        c.setFillColor(black)
+        c.rect(margin_left, current_y - header_height + 2*mm, width - 2*margin_left, header_height, fill=1, stroke=0)
+
+        available_width = width - (2 * margin_left)
+        column_width = available_width / 6
+
+        col_positions = [ margin_left + (i * column_width) for i in range(6) ]
+
+        c.setFont("Helvetica-Bold", 8)
+        c.setFillColor(white)
+
+        headers = ["POSICIÓN", "ESTUDIANTE", "DOCUMENTO", "CURSO", "PROMEDIO", "ASIGNATURAS"]
+        for i, header in enumerate(headers):
+            c.drawCentredString(col_positions[i] + (column_width / 2), current_y - 4*mm, header)
+
+        current_y -= 15*mm
+
+        c.setFont("Helvetica", 8)
+
+        inicio = pagina * estudiantes_por_pagina
+        fin = inicio + estudiantes_por_pagina
+        estudiantes_pagina = resultados[inicio:fin]
+
+        for i, (posicion, matricula, curso_nombre) in enumerate(estudiantes_pagina, inicio + 1):
+            nombre_completo = f"{matricula.nombres} {matricula.apellidos}"
+            promedio = posicion.promedio
+            cantidad_asignaturas = posicion.cantidad_asignaturas
+
+            datos = [
+                str(posicion.puesto if curso else i),
+                nombre_completo[:25] + '...' if len(nombre_completo) > 28 else nombre_completo,
+                matricula.documento or 'N/A',
+                curso_nombre[:15] + '...' if len(curso_nombre) > 18 else curso_nombre,
+                f"{round(promedio, 2) if promedio else 0.0}",
+                str(cantidad_asignaturas or 0)
+            ]
+
+            c.setFillColor(black)
+            for j, dato in enumerate(datos):
+                if j == 0:
+                    if i == 1:
+                        c.setFillColor(color_gold)
+                    elif i == 2:
+                        c.setFillColor(color_silver)
+                    elif i == 3:
+                        c.setFillColor(color_bronze)
+
+                c.drawCentredString(col_positions[j] + (column_width / 2), current_y, dato)
+                c.setFillColor(black)
+
+            current_y -= 5*mm
+
+            c.setStrokeColor(HexColor("#DDDDDD"))
+            c.setLineWidth(0.2)
+            c.line(margin_left, current_y, margin_right, current_y)
+
+            current_y -= 4*mm
+
+        c.setFont("Helvetica-Oblique", 7)
+        c.setFillColor(HexColor("#777777"))
+        c.drawCentredString(width/2, 25*mm, f"Reporte generado por {usuario_exportador} - {datetime.now().strftime('%d/%m/%Y %H:%M')}")
+        c.drawCentredString(width/2, 20*mm, f"Total de estudiantes: {len(resultados)}")
+        c.drawCentredString(width/2, 15*mm, f"Página {pagina + 1} de {total_paginas}")
+
+    c.save()
+    return buffer.getvalue()
+
+
+@registrar_trabajo('posiciones_pdf')
+def _trabajo_posiciones_pdf(parametros, contexto):
+    usuario = User.query.get(contexto.id_usuario)
+    periodo = Periodo.query.get(parametros['periodo_id'])
+    curso = Curso.query.get(parametros['curso_id']) if parametros.get('curso_id') else None
+    contexto.progreso(0, 'Consultando posiciones...')
+    resultados = consultar_posiciones(
+        parametros['periodo_id'], parametros['anio_lectivo'], _cursos_ranking(parametros.get('curso_id'), usuario)
+    ).all()
+    if not resultados:
+        raise ValueError('No hay posiciones para exportar')
+
+    contexto.progreso(50, 'Generando el PDF del ranking...')
+    pdf = dibujar_ranking_pdf(resultados, periodo, curso, _usuario_exportador(usuario))
+    with open(contexto.ruta('resultado.pdf'), 'wb') as archivo:
+        archivo.write(pdf)
+    return 'resultado.pdf', _nombre_pdf_ranking(periodo, curso)
+
+
+def _validar_exportacion(curso_id):
+    """Devuelve (periodo_id, anio_lectivo) o lanza ValueError si no se puede exportar"""
+    config = contexto_academico().config
     periodo_id = config.get('periodo_id')
-    curso_id = request.args.get('curso', type=int)
-    
     if not periodo_id:
-        flash('No hay un período activo para exportar', 'error')
-        return redirect(url_for('posiciones.index'))
+        raise ValueError('No hay un período activo para exportar')
 
     anio_lectivo = config.get('anio')
     if not anio_lectivo:
-        flash('No hay un año lectivo activo configurado.', 'error')
-        return redirect(url_for('posiciones.index'))
+        raise ValueError('No hay un año lectivo activo configurado.')
 
     if current_user.rol != 'admin' and curso_id:
         asignacion = Asignacion.query.filter_by(id_curso=curso_id, id_docente=current_user.id).first()
         if not asignacion:
-            flash('No tiene permisos para exportar este curso.', 'error')
-            return redirect(url_for('posiciones.index'))
+            raise ValueError('No tiene permisos para exportar este curso.')
+    return periodo_id, anio_lectivo
+
+
+@posiciones_bp.route('/exportar')
+@roles_required('admin', 'docente')
+def exportar_posiciones():
+    curso_id = request.args.get('curso', type=int)
+    try:
+        periodo_id, anio_lectivo = _validar_exportacion(curso_id)
+    except ValueError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('posiciones.index'))
 
     try:
         periodo = Periodo.query.get_or_404(periodo_id)
-        curso = Curso.query.get(curso_id) if curso_id and curso_id != 'todos' else None
-        
+        curso = Curso.query.get(curso_id) if curso_id else None
+
         try:
-            fecha_inicio = datetime.strptime(f"{anio_lectivo}-{periodo.fecha_inicio}", "%Y-%m-%d").date()
-            fecha_fin = datetime.strptime(f"{anio_lectivo}-{periodo.fecha_fin}", "%Y-%m-%d").date()
-        except (ValueError, TypeError):
-            flash(f"Las fechas del período '{periodo.nombre}' no están configuradas correctamente.", 'error')
+            resultados = consultar_posiciones(periodo_id, anio_lectivo, _cursos_ranking(curso_id, current_user)).all()
+        except ValueError as e:
+            flash(str(e), 'error')
             return redirect(url_for('posiciones.index'))
 
-        nombres = current_user.nombre.split()
-        apellidos = current_user.apellidos.split() if current_user.apellidos else []
-        primer_nombre = nombres[0] if nombres else ""
-        primer_apellido = apellidos[0] if apellidos else ""
-        usuario_exportador = f"{primer_nombre} {primer_apellido}".strip()
-
-        subquery = db.session.query(
-            Calificacion.id_matricula,
-            func.avg(Calificacion.nota).label('promedio'),
-            func.count(Calificacion.id).label('cantidad_asignaturas')
-        ).join(
-            Asignacion, Calificacion.id_asignacion == Asignacion.id
-        ).filter(
-            Calificacion.fecha_calificacion.between(fecha_inicio, fecha_fin)
-        ).group_by(Calificacion.id_matricula).subquery()
-
-        query = db.session.query(
-            Matricula,
-            subquery.c.promedio,
-            subquery.c.cantidad_asignaturas,
-            Curso.nombre.label('curso_nombre')
-        ).join(
-            subquery, Matricula.id == subquery.c.id_matricula
-        ).join(
-            Curso, Matricula.id_curso == Curso.id
-        ).filter(
-            Matricula.estado == 'activo',
-            subquery.c.cantidad_asignaturas >= 1
-        )
-
-        if curso_id and curso_id != 'todos':
-            query = query.filter(Matricula.id_curso == curso_id)
-        elif current_user.rol != 'admin':
-            cursos_docente = [asig.id_curso for asig in Asignacion.query.filter_by(id_docente=current_user.id).all()]
-            query = query.filter(Matricula.id_curso.in_(cursos_docente))
-            
-        if anio_lectivo:
-            query = query.filter(Matricula.año_lectivo == anio_lectivo)
-
-        resultados = query.order_by(subquery.c.promedio.desc()).all()
-
         if not resultados:
             flash('No hay posiciones para exportar', 'warning')
             return redirect(url_for('posiciones.index'))
 
-        buffer = BytesIO()
-        c = canvas.Canvas(buffer, pagesize=A4)
-        width, height = A4
-        
-        margin_left = 10 * mm
-        margin_right = width - (10 * mm)
-        margin_top = height - (15 * mm)
-        
-        color_primary = HexColor("#2C3E50")
-        color_gold = HexColor("#FFD700")
-        color_silver = HexColor("#C0C0C0")
-        color_bronze = HexColor("#CD7F32")
-        black = HexColor("#000000")
-        white = HexColor("#FFFFFF")
-        
-        estudiantes_por_pagina = 20
-        total_paginas = (len(resultados) + estudiantes_por_pagina - 1) // estudiantes_por_pagina
-        
-        for pagina in range(total_paginas):
-            if pagina > 0:
-                c.showPage()
-            
-            c.setFillColor(HexColor("#FBFCFC"))
-            c.rect(0, 0, width, height, fill=1, stroke=0)
-            
-            c.setStrokeColor(color_primary)
-            c.setLineWidth(0.5)
-            c.roundRect(10*mm, 10*mm, width-20*mm, height-20*mm, 5*mm, stroke=1, fill=0)
-            
-            try:
-                base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
-                logo_path = os.path.join(base_dir, 'frontend', 'static', 'img', 'logotipo.png')
-                
-                if os.path.exists(logo_path):
-                    c.drawImage(logo_path, margin_left, height-50*mm, width=35*mm, height=40*mm, 
-                               mask='auto', preserveAspectRatio=True)
-                else:
-                    c.setFont("Helvetica-Bold", 16)
-                    c.setFillColor(color_primary)
-                    c.drawString(margin_left, height-30*mm, "JARDÍN INFANTIL")
-                    c.drawString(margin_left, height-35*mm, "SONRISAS")
-            except Exception as e:
-                print(f"Error al cargar el logo: {str(e)}")
-            
-            c.setFont("Helvetica-Bold", 14)
-            c.setFillColor(black)
-            c.drawCentredString(width/2, height-20*mm, "JARDÍN INFANTIL SONRISAS")
-            
-            c.setFont("Helvetica-Oblique", 10)
-            c.setFillColor(black)
-            c.drawCentredString(width/2, height-25*mm, '"Aprendiendo y sonriendo"')
-            
-            c.setFont("Helvetica", 9)
-            c.setFillColor(black)
-            c.drawCentredString(width/2, height-30*mm, "Código DANE N° 320001800766")
-            c.drawCentredString(width/2, height-35*mm, "Teléfono: 300 149 8933")
-            
-            c.setFont("Helvetica-Bold", 20)
-            c.setFillColor(black)
-            c.drawCentredString(width/2, height-50*mm, "RANKING ACADÉMICO")
-            
-            info_text = [f"Período: {periodo.nombre}"]
-            if curso:
-                info_text.append(f"Curso: {curso.nombre}")
-            else:
-                info_text.append("Todos los cursos")
-                
-            c.setFont("Helvetica", 10)
-            c.setFillColor(HexColor("#666666"))
-            c.drawCentredString(width/2, height-58*mm, " | ".join(info_text))
-            
-            current_y = height - 65*mm
-            
-            header_height = 8*mm 
-            c.setFillColor(black)
-            c.rect(margin_left, current_y - header_height + 2*mm, width - 2*margin_left, header_height, fill=1, stroke=0)
-            
-            available_width = width - (2 * margin_left)
-            column_width = available_width / 6
-            
-            col_positions = [ margin_left + (i * column_width) for i in range(6) ]
-            
-            c.setFont("Helvetica-Bold", 8)
-            c.setFillColor(white)
-            
-            headers = ["POSICIÓN", "ESTUDIANTE", "DOCUMENTO", "CURSO", "PROMEDIO", "ASIGNATURAS"]
-            for i, header in enumerate(headers):
-                c.drawCentredString(col_positions[i] + (column_width / 2), current_y - 4*mm, header)
-            
-            current_y -= 15*mm
-            
-            c.setFont("Helvetica", 8)
-            
-            inicio = pagina * estudiantes_por_pagina
-            fin = inicio + estudiantes_por_pagina
-            estudiantes_pagina = resultados[inicio:fin]
-            
-            for i, (matricula, promedio, cantidad_asignaturas, curso_nombre) in enumerate(estudiantes_pagina, inicio + 1):
-                nombre_completo = f"{matricula.nombres} {matricula.apellidos}"
-                
-                datos = [
-                    str(i),
-                    nombre_completo[:25] + '...' if len(nombre_completo) > 28 else nombre_completo,
-                    matricula.documento or 'N/A',
-                    curso_nombre[:15] + '...' if len(curso_nombre) > 18 else curso_nombre,
-                    f"{round(promedio, 2) if promedio else 0.0}",
-                    str(cantidad_asignaturas or 0)
-                ]
-                
-                c.setFillColor(black)
-                for j, dato in enumerate(datos):
-                    if j == 0:
-                        if i == 1:
-                            c.setFillColor(color_gold)
-                        elif i == 2:
-                            c.setFillColor(color_silver)
-                        elif i == 3:
-                            c.setFillColor(color_bronze)
-                    
-                    c.drawCentredString(col_positions[j] + (column_width / 2), current_y, dato)
-                    c.setFillColor(black)
-                
-                current_y -= 5*mm
-                
-                c.setStrokeColor(HexColor("#DDDDDD"))
-                c.setLineWidth(0.2)
-                c.line(margin_left, current_y, margin_right, current_y)
-                
-                current_y -= 4*mm
-            
-            c.setFont("Helvetica-Oblique", 7)
-            c.setFillColor(HexColor("#777777"))
-            c.drawCentredString(width/2, 25*mm, f"Reporte generado por {usuario_exportador} - {datetime.now().strftime('%d/%m/%Y %H:%M')}")
-            c.drawCentredString(width/2, 20*mm, f"Total de estudiantes: {len(resultados)}")
-            c.drawCentredString(width/2, 15*mm, f"Página {pagina + 1} de {total_paginas}")
-        
-        c.save()
-        buffer.seek(0)
-        
-        response = make_response(buffer.getvalue())
+        response = make_response(dibujar_ranking_pdf(resultados, periodo, curso, _usuario_exportador(current_user)))
         response.headers['Content-Type'] = 'application/pdf'
-        
-        filename = f"ranking_{periodo.nombre.lower().replace(' ', '_')}"
-        if curso:
-            filename += f"_{curso.nombre.lower().replace(' ', '_')}"
-        filename += ".pdf"
-        
-        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+        response.headers['Content-Disposition'] = f'attachment; filename="{_nombre_pdf_ranking(periodo, curso)}"'
         return response
 
     except Exception as e:
         current_app.logger.error(f"Error al generar PDF de ranking: {e}", exc_info=True)
         flash('Error al generar el ranking en PDF: ' + str(e), 'danger')
         return redirect(url_for('posiciones.index'))
+
+
+@posiciones_bp.route('/start-task/exportar', methods=['POST'])
+@roles_required('admin', 'docente')
+def start_exportar_posiciones():
+    """Encola la exportación del ranking; el progreso se consulta en /trabajos/<task_id>"""
+    try:
+        curso_id = int((request.get_json(silent=True) or {}).get('curso'))
+    except (TypeError, ValueError):
+        curso_id = None
+    try:
+        periodo_id, anio_lectivo = _validar_exportacion(curso_id)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    trabajo = encolar_trabajo('posiciones_pdf', {
+        'curso_id': curso_id, 'periodo_id': periodo_id, 'anio_lectivo': anio_lectivo
+    }, current_user.id)
+    return jsonify({'status': 'ok', 'task_id': trabajo.id})
@@ -1,9 +1,11 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
-from app.models import User, Curso, Matricula, Asignacion, Inclusion, Asignatura, Periodo, Observacion, Pago, Boletin, Calificacion, Informe
+from app.models import User, Curso, Matricula, Asignacion, Inclusion, Asignatura, Periodo, Observacion, Pago, Boletin, BoletinNota, Calificacion, Informe
 from app import db
 from sqlalchemy import extract
 from app.utils.decorators import admin_required
-from app.services.configuracion_service import get_active_config
+from app.services.contexto_service import contexto_academico
+from app.services.asistencia_service import actualizar_resumen_asistencia, claves_resumen_matriculas
+from app.services.dashboard_service import clear_dashboard_cache
 from sqlalchemy import extract
 from app.utils.file_uploads import remove_profile_picture
 
@@ -66,7 +68,7 @@ MODELOS = {
 @reciclaje_bp.route('/')
 @admin_required
 def index():
-    active_config = get_active_config()
+    active_config = contexto_academico().config
     if not active_config or 'anio' not in active_config:
         flash('No hay un año lectivo configurado como activo.', 'warning')
         return redirect(url_for('configuracion.index'))
@@ -160,6 +162,7 @@ def restaurar_item(tipo_modelo, item_id):
         item.estado = 'activo'
     
     db.session.commit()
+    clear_dashboard_cache()
     flash(f'{tipo_modelo.capitalize()} restaurado correctamente.', 'success')
     return redirect(url_for('reciclaje.index'))
 
@@ -195,15 +198,20 @@ def eliminar_definitivo_item(tipo_modelo, item_id):
         for i in informes:
             db.session.delete(i)
 
+    # Las asistencias de la matrícula se borran en cascada: el resumen debe recalcularse
+    claves_resumen = claves_resumen_matriculas([item.id]) if tipo_modelo == 'matricula' else set()
+
     db.session.delete(item)
+    actualizar_resumen_asistencia(claves_resumen)
     db.session.commit()
+    clear_dashboard_cache()
     flash(f'{tipo_modelo.capitalize()} eliminado permanentemente.', 'success')
     return redirect(url_for('reciclaje.index'))
 
 @reciclaje_bp.route('/restaurar_todo', methods=['POST'])
 @admin_required
 def restaurar_todo():
-    active_config = get_active_config()
+    active_config = contexto_academico().config
     if not active_config or 'anio' not in active_config:
         flash('No hay un año lectivo configurado como activo.', 'warning')
         return redirect(url_for('reciclaje.index'))
@@ -241,6 +249,7 @@ def restaurar_todo():
                 restaurados += 1
 
         db.session.commit()
+        clear_dashboard_cache()
         flash(f'{restaurados} elementos restaurados correctamente.', 'success')
     except Exception as e:
         db.session.rollback()
@@ -250,7 +259,7 @@ def restaurar_todo():
 @reciclaje_bp.route('/eliminar_todo_definitivo', methods=['POST'])
 @admin_required
 def eliminar_todo_definitivo():
-    active_config = get_active_config()
+    active_config = contexto_academico().config
     if not active_config or 'anio' not in active_config:
         flash('No hay un año lectivo configurado como activo.', 'warning')
         return redirect(url_for('reciclaje.index'))
@@ -284,6 +293,9 @@ def eliminar_todo_definitivo():
         # Manejar periodos primero para evitar problemas de cascada
         if 'periodo' in items_a_eliminar_por_modelo:
             for periodo in items_a_eliminar_por_modelo['periodo']:
+                BoletinNota.query.filter(BoletinNota.id_boletin.in_(
+                    db.session.query(Boletin.id).filter_by(id_periodo=periodo.id)
+                )).delete(synchronize_session=False)
                 Boletin.query.filter_by(id_periodo=periodo.id).delete()
                 Calificacion.query.filter_by(id_periodo=periodo.id).delete()
                 Asignacion.query.filter_by(id_periodo=periodo.id).delete()
@@ -291,6 +303,8 @@ def eliminar_todo_definitivo():
                 db.session.delete(periodo)
                 eliminados += 1
 
+        claves_resumen = claves_resumen_matriculas([m.id for m in items_a_eliminar_por_modelo.get('matricula', [])])
+
         # Manejar otros modelos
         for tipo_modelo, items in items_a_eliminar_por_modelo.items():
             if tipo_modelo == 'periodo': continue
@@ -301,7 +315,9 @@ def eliminar_todo_definitivo():
                 db.session.delete(item)
                 eliminados += 1
 
+        actualizar_resumen_asistencia(claves_resumen)
         db.session.commit()
+        clear_dashboard_cache()
         flash(f'{eliminados} elementos eliminados permanentemente.', 'success')
     except Exception as e:
         db.session.rollback()
@@ -0,0 +1,47 @@
+from flask import Blueprint, flash, jsonify, redirect, send_file, url_for
+from flask_login import current_user
+from app import db
+from app.models import Trabajo
+from app.services.trabajo_service import cancelar_trabajo, ruta_resultado
+from app.utils.decorators import roles_required
+
+trabajos_bp = Blueprint('trabajos', __name__, url_prefix='/trabajos')
+
+
+def _trabajo_del_usuario(trabajo_id):
+    """El trabajo solo es visible para quien lo pidió y para los administradores"""
+    trabajo = db.session.get(Trabajo, trabajo_id)
+    if trabajo is None or (trabajo.id_usuario != current_user.id and not current_user.is_admin()):
+        return None
+    return trabajo
+
+
+@trabajos_bp.route('/<trabajo_id>')
+@roles_required('admin', 'docente')
+def estado_trabajo(trabajo_id):
+    trabajo = _trabajo_del_usuario(trabajo_id)
+    if not trabajo:
+        return jsonify({'status': 'error', 'message': 'Tarea no encontrada.'}), 404
+    return jsonify(trabajo.to_dict())
+
+
+@trabajos_bp.route('/<trabajo_id>/cancelar', methods=['POST'])
+@roles_required('admin', 'docente')
+def cancelar(trabajo_id):
+    trabajo = _trabajo_del_usuario(trabajo_id)
+    if not trabajo:
+        return jsonify({'status': 'error', 'message': 'Tarea no encontrada.'}), 404
+    if not cancelar_trabajo(trabajo):
+        return jsonify({'status': 'error', 'message': 'La tarea ya terminó.'}), 409
+    return jsonify({'status': 'ok', **trabajo.to_dict()})
+
+
+@trabajos_bp.route('/<trabajo_id>/descargar')
+@roles_required('admin', 'docente')
+def descargar(trabajo_id):
+    trabajo = _trabajo_del_usuario(trabajo_id)
+    ruta = ruta_resultado(trabajo) if trabajo else None
+    if not ruta:
+        flash('El archivo solicitado no está disponible o ya expiró.', 'warning')
+        return redirect(url_for('dashboard.index'))
+    return send_file(ruta, as_attachment=True, download_name=trabajo.nombre_descarga)
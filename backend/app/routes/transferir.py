@@ -5,7 +5,10 @@ from app.utils.decorators import admin_required
 from app import db
 from app.models import Curso, Matricula, SystemConfig
 from sqlalchemy import false
-from app.services.configuracion_service import get_active_config
+from app.services.contexto_service import contexto_academico
+from app.services.asistencia_service import actualizar_resumen_matriculas
+from app.services.dashboard_service import clear_dashboard_cache
+from app.services.matricula_service import clear_matriculas_cache
 from io import BytesIO
 from datetime import datetime
 import json
@@ -27,7 +30,7 @@ def index():
     page = request.args.get('page', 1, type=int)
     page_historial = request.args.get('page_historial', 1, type=int)
 
-    active_config = get_active_config()
+    active_config = contexto_academico().config
     if not active_config:
         flash('No hay un año lectivo configurado como activo', 'warning')
         return redirect(url_for('configuracion.index'))
@@ -136,6 +139,7 @@ def transferir_multiples():
             return redirect(url_for('transferir.index'))
             
         transferidos = 0
+        transferidas_ids = []
         for matricula_id in matriculas_ids:
             matricula = Matricula.query.get(matricula_id)
 
@@ -182,9 +186,14 @@ def transferir_multiples():
                     curso_origen=f"{matricula.curso.nombre if matricula.curso else 'N/A'} ({matricula.año_lectivo})"
                 )
                 db.session.add(nueva_matricula)
+                transferidas_ids.append(matricula.id)
                 transferidos += 1
 
+        # Las asistencias de las matrículas transferidas dejan de contar en el resumen
+        actualizar_resumen_matriculas(transferidas_ids)
         db.session.commit()
+        clear_dashboard_cache()
+        clear_matriculas_cache()
         flash(f'{transferidos} estudiantes transferidos exitosamente al curso {curso_destino.nombre} del año {anio_destino}', 'success')
     
     except json.JSONDecodeError:
@@ -230,7 +239,7 @@ def exportar_historial_pdf():
         # Aceptar un año desde la URL, si no, usar el activo
         anio_a_exportar = request.args.get('anio', type=int)
         if not anio_a_exportar:
-            config = get_active_config()
+            config = contexto_academico().config
             anio_a_exportar = config['anio'] if config and 'anio' in config else None
         
         if not anio_a_exportar:
@@ -0,0 +1,70 @@
+"""
+Resúmenes por estudiante del informe académico: asistencia por estado y promedios por
+asignatura de un conjunto de matrículas, cada uno en una sola consulta agrupada sin importar
+cuántos estudiantes o asignaturas haya. Los usan la página del informe y su exportación a PDF.
+"""
+from sqlalchemy import case, func
+from app import db
+from app.models import Asignacion, Asistencia, Calificacion
+
+ESTADOS_ASISTENCIA = ('presente', 'ausente', 'justificado')
+
+
+def resumen_asistencia_estudiantes(matriculas_ids, asignatura_id, anio_lectivo, desde=None, hasta=None):
+    """
+    Asistencias de cada matrícula en una asignatura, por estado, y cuántas tienen observación.
+    Devuelve {id_matricula: {'presente': n, 'ausente': n, 'justificado': n, 'observaciones': n}}
+    con todas las matrículas pedidas, aunque no tengan registros.
+    """
+    resumen = {mid: dict.fromkeys(ESTADOS_ASISTENCIA + ('observaciones',), 0) for mid in matriculas_ids}
+    if not resumen:
+        return resumen
+
+    con_observacion = case((func.coalesce(Asistencia.observaciones, '') != '', 1), else_=0)
+    query = db.session.query(
+        Asistencia.id_matricula,
+        Asistencia.estado,
+        func.count(Asistencia.id),
+        func.sum(con_observacion)
+    ).join(Asignacion, Asistencia.id_asignacion == Asignacion.id).filter(
+        Asistencia.id_matricula.in_(list(resumen)),
+        Asignacion.id_asignatura == asignatura_id,
+        Asignacion.anio_lectivo == anio_lectivo
+    )
+    if desde and hasta:
+        query = query.filter(Asistencia.fecha >= desde, Asistencia.fecha <= hasta)
+
+    for id_matricula, estado, cantidad, observaciones in query.group_by(Asistencia.id_matricula, Asistencia.estado):
+        resumen[id_matricula][estado] = cantidad
+        resumen[id_matricula]['observaciones'] += observaciones or 0
+    return resumen
+
+
+def resumen_calificaciones_estudiantes(matriculas_ids, anio_lectivo, asignaturas_ids=None, desde=None, hasta=None):
+    """
+    Promedio y cantidad de notas de cada matrícula por asignatura (solo notas registradas).
+    Devuelve {id_matricula: {id_asignatura: (promedio, cantidad)}} con todas las matrículas
+    pedidas; las asignaturas sin notas no aparecen.
+    """
+    resumen = {mid: {} for mid in matriculas_ids}
+    if not resumen or asignaturas_ids is not None and not asignaturas_ids:
+        return resumen
+
+    query = db.session.query(
+        Calificacion.id_matricula,
+        Asignacion.id_asignatura,
+        func.avg(Calificacion.nota),
+        func.count(Calificacion.id)
+    ).join(Asignacion, Calificacion.id_asignacion == Asignacion.id).filter(
+        Calificacion.id_matricula.in_(list(resumen)),
+        Asignacion.anio_lectivo == anio_lectivo,
+        Calificacion.nota.isnot(None)
+    )
+    if asignaturas_ids is not None:
+        query = query.filter(Asignacion.id_asignatura.in_(list(asignaturas_ids)))
+    if desde and hasta:
+        query = query.filter(Calificacion.fecha_calificacion >= desde, Calificacion.fecha_calificacion <= hasta)
+
+    for id_matricula, id_asignatura, promedio, cantidad in query.group_by(Calificacion.id_matricula, Asignacion.id_asignatura):
+        resumen[id_matricula][id_asignatura] = (promedio, cantidad)
+    return resumen
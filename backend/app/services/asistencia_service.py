@@ -0,0 +1,179 @@
+from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from app import db
+from app.models import Asignacion, Asistencia, AsistenciaResumen, Matricula
+
+
+COLUMNAS_RESUMEN = ['id_curso', 'id_asignacion', 'anio_lectivo', 'fecha', 'estado', 'total']
+
+
+def _conteo_por_estado():
+    """
+    Consulta base del resumen: asistencias de matrículas activas por curso, asignación, año,
+    fecha y estado. Las de estudiantes retirados o transferidos no cuentan, igual que en las
+    estadísticas.
+    """
+    return db.session.query(
+        Asignacion.id_curso,
+        Asistencia.id_asignacion,
+        Asignacion.anio_lectivo,
+        Asistencia.fecha,
+        Asistencia.estado,
+        func.count(Asistencia.id)
+    ).join(Asignacion, Asistencia.id_asignacion == Asignacion.id).join(
+        Matricula, Asistencia.id_matricula == Matricula.id
+    ).filter(Matricula.estado == 'activo').group_by(
+        Asignacion.id_curso, Asistencia.id_asignacion, Asignacion.anio_lectivo, Asistencia.fecha, Asistencia.estado
+    )
+
+
+def actualizar_resumen_asistencia(claves):
+    """
+    Recalcula el resumen de los pares (id_asignacion, fecha) modificados. Se ejecuta en la
+    transacción de quien guardó las asistencias, así que el resumen se confirma (o se
+    revierte) junto con ellas.
+    """
+    fechas_por_asignacion = {}
+    for id_asignacion, fecha in claves:
+        fechas_por_asignacion.setdefault(id_asignacion, set()).add(fecha)
+    if not fechas_por_asignacion:
+        return
+    db.session.flush()
+    tabla = AsistenciaResumen.__table__
+    # Dos sentencias por asignación, sin importar cuántas fechas cambiaron
+    for id_asignacion, fechas in fechas_por_asignacion.items():
+        fechas = sorted(fechas)
+        db.session.execute(tabla.delete().where(tabla.c.id_asignacion == id_asignacion, tabla.c.fecha.in_(fechas)))
+        db.session.execute(tabla.insert().from_select(COLUMNAS_RESUMEN, _conteo_por_estado().filter(
+            Asistencia.id_asignacion == id_asignacion,
+            Asistencia.fecha.in_(fechas)
+        ).statement))
+
+
+def claves_resumen_matriculas(matriculas_ids):
+    """Pares (id_asignacion, fecha) con asistencias de las matrículas; sirve para actualizar el resumen al borrarlas"""
+    if not matriculas_ids:
+        return set()
+    return set(db.session.query(Asistencia.id_asignacion, Asistencia.fecha).filter(
+        Asistencia.id_matricula.in_(matriculas_ids)
+    ).distinct().all())
+
+
+def actualizar_resumen_matriculas(matriculas_ids):
+    """
+    Recalcula el resumen de todas las asistencias de las matrículas indicadas; se usa cuando
+    cambian de estado, porque solo cuentan las activas. No confirma la transacción.
+    """
+    actualizar_resumen_asistencia(claves_resumen_matriculas(matriculas_ids))
+
+
+def reconstruir_resumen_asistencia(anio_lectivo=None):
+    """Vuelve a calcular el resumen completo (o el de un año lectivo) desde la tabla de asistencias"""
+    tabla = AsistenciaResumen.__table__
+    borrar = tabla.delete()
+    consulta = _conteo_por_estado()
+    if anio_lectivo is not None:
+        borrar = borrar.where(tabla.c.anio_lectivo == anio_lectivo)
+        consulta = consulta.filter(Asignacion.anio_lectivo == anio_lectivo)
+    db.session.execute(borrar)
+    db.session.execute(tabla.insert().from_select(COLUMNAS_RESUMEN, consulta.statement))
+    db.session.commit()
+
+
+def totales_asistencia_por_fecha(anio_lectivo, desde, hasta, asignaciones_ids=None):
+    """Total de asistencias registradas por fecha entre `desde` y `hasta` (opcionalmente solo de unas asignaciones)"""
+    consulta = db.session.query(AsistenciaResumen.fecha, func.sum(AsistenciaResumen.total)).filter(
+        AsistenciaResumen.anio_lectivo == anio_lectivo,
+        AsistenciaResumen.fecha >= desde,
+        AsistenciaResumen.fecha <= hasta
+    )
+    if asignaciones_ids is not None:
+        consulta = consulta.filter(AsistenciaResumen.id_asignacion.in_(asignaciones_ids))
+    return {fecha: int(total or 0) for fecha, total in consulta.group_by(AsistenciaResumen.fecha).all()}
+
+
+def _upsert_asistencias(filas):
+    """
+    INSERT de todas las filas en una sola sentencia; las que ya existen (misma matrícula,
+    asignación y fecha, por uq_asistencia_matricula_asignacion_fecha) se actualizan conservando
+    quién y cuándo las creó. Devuelve False si el motor no tiene upsert nativo.
+    """
+    tabla = Asistencia.__table__
+    dialecto = db.session.get_bind().dialect.name
+    actualizar = ('estado', 'observaciones', 'actualizado_por', 'actualizado_en')
+    if dialecto == 'mysql':
+        sentencia = mysql.insert(tabla).values(filas)
+        sentencia = sentencia.on_duplicate_key_update({c: sentencia.inserted[c] for c in actualizar})
+    elif dialecto in ('sqlite', 'postgresql'):
+        insertar = sqlite.insert if dialecto == 'sqlite' else postgresql.insert
+        sentencia = insertar(tabla).values(filas)
+        sentencia = sentencia.on_conflict_do_update(
+            index_elements=['id_matricula', 'id_asignacion', 'fecha'],
+            set_={c: sentencia.excluded[c] for c in actualizar}
+        )
+    else:
+        return False
+    db.session.execute(sentencia)
+    return True
+
+
+def guardar_asistencias_masivo(asignacion, fecha, registros, usuario_id):
+    """
+    Guarda las asistencias de un día para una asignación con un número fijo de sentencias,
+    sin importar cuántos estudiantes tenga el curso: una consulta valida todas las matrículas
+    y un upsert escribe todas las filas. `registros` es una lista de (id_matricula, estado,
+    observacion); si una matrícula aparece varias veces gana la última. Las matrículas que no
+    están activas en el curso y año de la asignación se omiten.
+
+    No confirma la transacción. Devuelve los IDs de las matrículas guardadas.
+    """
+    por_matricula = {}
+    for matricula_id, estado, observacion in registros:
+        por_matricula[matricula_id] = (estado, (observacion or '')[:500])
+    if not por_matricula:
+        return []
+
+    validas = {matricula_id for (matricula_id,) in db.session.query(Matricula.id).filter(
+        Matricula.id.in_(list(por_matricula)),
+        Matricula.id_curso == asignacion.id_curso,
+        Matricula.estado == 'activo',
+        Matricula.año_lectivo == asignacion.anio_lectivo
+    ).all()}
+    guardadas = [matricula_id for matricula_id in por_matricula if matricula_id in validas]
+    if not guardadas:
+        return []
+
+    ahora = datetime.utcnow()
+    filas = [{
+        'id_matricula': matricula_id,
+        'id_asignacion': asignacion.id,
+        'fecha': fecha,
+        'estado': por_matricula[matricula_id][0],
+        'observaciones': por_matricula[matricula_id][1],
+        'creado_en': ahora,
+        'actualizado_en': ahora,
+        'creado_por': usuario_id,
+        'actualizado_por': usuario_id
+    } for matricula_id in guardadas]
+
+    if not _upsert_asistencias(filas):
+        # Otros motores: las existentes del día se leen con una consulta y se escribe en bloque
+        existentes = dict(db.session.query(Asistencia.id_matricula, Asistencia.id).filter(
+            Asistencia.id_asignacion == asignacion.id,
+            Asistencia.fecha == fecha,
+            Asistencia.id_matricula.in_(guardadas)
+        ).all())
+        nuevas = [fila for fila in filas if fila['id_matricula'] not in existentes]
+        if nuevas:
+            db.session.execute(Asistencia.__table__.insert(), nuevas)
+        cambios = [{
+            'id': existentes[fila['id_matricula']],
+            'estado': fila['estado'],
+            'observaciones': fila['observaciones'],
+            'actualizado_por': usuario_id,
+            'actualizado_en': ahora
+        } for fila in filas if fila['id_matricula'] in existentes]
+        if cambios:
+            db.session.execute(db.update(Asistencia), cambios)
+    return guardadas
@@ -0,0 +1,419 @@
+from datetime import datetime
+from sqlalchemy import func
+from app import db
+from app.models import Asignatura, Asignacion, Asistencia, Boletin, Calificacion, Matricula, Periodo, AnioPeriodo, ConfiguracionLibro, PosicionCurso
+from app.models.configuracion import RectorConfig
+
+
+def desempeno_segun_config(nota, config):
+    """Clasifica una nota según los umbrales de la configuración del libro"""
+    if nota is None:
+        return ''
+
+    if nota >= config.nota_superior:
+        return 'Superior'
+    elif nota >= config.nota_alto:
+        return 'Alto'
+    elif nota >= config.nota_basico:
+        return 'Básico'
+    else:
+        return 'Bajo'
+
+
+def rango_fechas_periodo(anio_lectivo, anio_periodo):
+    """Convierte las fechas MM-DD de un AnioPeriodo en fechas completas del año lectivo"""
+    fecha_inicio = datetime.strptime(f"{anio_lectivo}-{anio_periodo.fecha_inicio}", "%Y-%m-%d").date()
+    fecha_fin = datetime.strptime(f"{anio_lectivo}-{anio_periodo.fecha_fin}", "%Y-%m-%d").date()
+    return fecha_inicio, fecha_fin
+
+
+def _anio_periodos_por_periodo(anio_lectivo):
+    """Devuelve {periodo_id: AnioPeriodo} para el año lectivo, conservando el primero de cada período"""
+    anio_periodos = {}
+    for ap in AnioPeriodo.query.filter_by(anio_lectivo=anio_lectivo).order_by(AnioPeriodo.id).all():
+        anio_periodos.setdefault(ap.periodo_id, ap)
+    return anio_periodos
+
+
+def asignaciones_activas_por_asignatura(curso_id, anio_lectivo):
+    """Devuelve {id_asignatura: Asignacion} con la primera asignación activa de cada asignatura del curso"""
+    asignaciones = Asignacion.query.filter_by(
+        id_curso=curso_id,
+        estado='activo',
+        anio_lectivo=anio_lectivo
+    ).order_by(Asignacion.id).all()
+
+    por_asignatura = {}
+    for asignacion in asignaciones:
+        por_asignatura.setdefault(asignacion.id_asignatura, asignacion)
+    return por_asignatura
+
+
+def contar_inasistencias_curso(curso_id, anio_lectivo, fecha_inicio, fecha_fin, matriculas_ids, asignaciones=None):
+    """
+    Cuenta las inasistencias de varias matrículas en una sola consulta agrupada.
+    Devuelve {(id_matricula, id_asignatura): total} usando la asignación activa de cada asignatura.
+    """
+    if not matriculas_ids or not fecha_inicio or not fecha_fin:
+        return {}
+
+    if asignaciones is None:
+        asignaciones = asignaciones_activas_por_asignatura(curso_id, anio_lectivo)
+    if not asignaciones:
+        return {}
+
+    asignatura_por_asignacion = {a.id: id_asignatura for id_asignatura, a in asignaciones.items()}
+
+    filas = db.session.query(
+        Asistencia.id_matricula,
+        Asistencia.id_asignacion,
+        func.count(Asistencia.id)
+    ).filter(
+        Asistencia.id_asignacion.in_(list(asignatura_por_asignacion.keys())),
+        Asistencia.id_matricula.in_(matriculas_ids),
+        Asistencia.fecha.between(fecha_inicio, fecha_fin),
+        Asistencia.estado == 'ausente'
+    ).group_by(Asistencia.id_matricula, Asistencia.id_asignacion).all()
+
+    return {
+        (id_matricula, asignatura_por_asignacion[id_asignacion]): total
+        for id_matricula, id_asignacion, total in filas
+    }
+
+
+def promedios_por_asignatura(matriculas_ids, asignaturas_ids, anio_lectivo, fecha_inicio, fecha_fin):
+    """
+    Promedio de notas por matrícula y asignatura en un rango de fechas, en una consulta agrupada.
+    Devuelve {(id_matricula, id_asignatura): promedio}.
+    """
+    if not matriculas_ids or not asignaturas_ids:
+        return {}
+
+    filas = db.session.query(
+        Calificacion.id_matricula,
+        Asignacion.id_asignatura,
+        func.avg(Calificacion.nota)
+    ).join(Asignacion, Calificacion.id_asignacion == Asignacion.id).filter(
+        Calificacion.id_matricula.in_(matriculas_ids),
+        Asignacion.id_asignatura.in_(asignaturas_ids),
+        Asignacion.anio_lectivo == anio_lectivo,
+        Calificacion.fecha_calificacion.between(fecha_inicio, fecha_fin)
+    ).group_by(Calificacion.id_matricula, Asignacion.id_asignatura).all()
+
+    return {(mid, aid): avg for mid, aid, avg in filas}
+
+
+def calcular_grades_data_curso(curso_id, periodo_id, anio_lectivo, matriculas_ids, incluir_detalle=False):
+    """
+    Calcula el grades_data de varios estudiantes de un curso con consultas agrupadas.
+
+    Reemplaza el cálculo estudiante por estudiante: una consulta de promedios por cada
+    período hasta el actual, una para las observaciones y, con incluir_detalle, una para
+    las inasistencias. Devuelve {id_matricula: grades_data}; si el período no está
+    configurado para el año devuelve un diccionario vacío.
+
+    Con incluir_detalle=True se agregan las claves pf, fl e ih que guarda la generación
+    inicial de boletines.
+    """
+    if not matriculas_ids:
+        return {}
+
+    anio_periodos = _anio_periodos_por_periodo(anio_lectivo)
+    anio_periodo = anio_periodos.get(periodo_id)
+    if not anio_periodo:
+        return {}  # No se puede calcular si el período no está configurado para el año
+
+    try:
+        fecha_inicio, fecha_fin = rango_fechas_periodo(anio_lectivo, anio_periodo)
+    except (ValueError, TypeError):
+        periodo = Periodo.query.get(periodo_id)
+        raise ValueError(f"Las fechas del período '{periodo.nombre if periodo else 'ID:'+str(periodo_id)}' no están configuradas correctamente.")
+
+    asignaturas = Asignatura.query.join(Asignacion).filter(
+        Asignacion.id_curso == curso_id,
+        Asignacion.estado == 'activo',
+        Asignacion.anio_lectivo == anio_lectivo
+    ).options(db.joinedload(Asignatura.asignaciones)).all()
+    asignaturas_ids = [asig.id for asig in asignaturas]
+
+    periods = Periodo.query.join(AnioPeriodo).filter(AnioPeriodo.anio_lectivo == anio_lectivo).order_by(AnioPeriodo.fecha_inicio).all()
+    current_period_index = next((i for i, p in enumerate(periods) if p.id == periodo_id), 0)
+
+    # Promedios matrícula x asignatura, una consulta agrupada por cada período hasta el actual
+    promedios_por_periodo = {}
+    for i in range(current_period_index + 1):
+        anio_p = anio_periodos.get(periods[i].id)
+        if not asignaturas_ids or not anio_p or not anio_p.fecha_inicio or not anio_p.fecha_fin:
+            continue
+
+        fecha_inicio_p, fecha_fin_p = rango_fechas_periodo(anio_lectivo, anio_p)
+        promedios_por_periodo[i] = promedios_por_asignatura(
+            matriculas_ids, asignaturas_ids, anio_lectivo, fecha_inicio_p, fecha_fin_p
+        )
+
+    # Observación más reciente del período actual por matrícula y asignatura
+    observaciones = {}
+    if asignaturas_ids:
+        filas = db.session.query(
+            Calificacion.id_matricula,
+            Asignacion.id_asignatura,
+            Calificacion.observacion
+        ).join(Asignacion, Calificacion.id_asignacion == Asignacion.id).filter(
+            Calificacion.id_matricula.in_(matriculas_ids),
+            Asignacion.id_asignatura.in_(asignaturas_ids),
+            Asignacion.anio_lectivo == anio_lectivo,
+            Calificacion.fecha_calificacion.between(fecha_inicio, fecha_fin),
+            Calificacion.observacion.isnot(None),
+            Calificacion.observacion != ''
+        ).order_by(Calificacion.fecha_calificacion.desc()).all()
+
+        for mid, aid, observacion in filas:
+            observaciones.setdefault((mid, aid), observacion)
+
+    inasistencias = {}
+    asignaciones = {}
+    if incluir_detalle:
+        asignaciones = asignaciones_activas_por_asignatura(curso_id, anio_lectivo)
+        inasistencias = contar_inasistencias_curso(
+            curso_id, anio_lectivo, fecha_inicio, fecha_fin, matriculas_ids, asignaciones=asignaciones
+        )
+
+    config = ConfiguracionLibro.obtener_configuracion_actual()
+    periodo_actual_key = f'p{current_period_index + 1}'
+    # Sin notas en un período: la generación de boletines guardaba 0 y el recálculo 0.0
+    sin_nota = 0 if incluir_detalle else 0.0
+
+    resultado = {}
+    for mid in matriculas_ids:
+        grades_data = {}
+        for asig in asignaturas:
+            datos = {}
+            for i, promedios in promedios_por_periodo.items():
+                cal_avg = promedios.get((mid, asig.id))
+                datos[f'p{i+1}'] = round(cal_avg, 2) if cal_avg is not None else sin_nota
+
+            if incluir_detalle:
+                # Calcular PF si es período 4
+                if current_period_index + 1 == 4:
+                    p_values = [datos.get(f'p{j+1}', 0) for j in range(4)]
+                    datos['pf'] = round(sum(p_values) / len(p_values), 2)
+
+                asignacion = asignaciones.get(asig.id)
+                datos['fl'] = inasistencias.get((mid, asig.id), 0)
+                datos['ih'] = asignacion.horas_impartidas if asignacion and asignacion.horas_impartidas else 0
+
+            datos['observacion'] = observaciones.get((mid, asig.id), '')
+
+            # Desempeño basado en la nota del período actual
+            nota_periodo_actual = datos.get(periodo_actual_key, sin_nota)
+            datos['desempeno'] = desempeno_segun_config(nota_periodo_actual, config)
+            datos['nota'] = nota_periodo_actual
+
+            grades_data[str(asig.id)] = datos
+        resultado[mid] = grades_data
+
+    return resultado
+
+
+def marcar_boletines_desactualizados(anio_lectivo, matriculas_ids=None, curso_id=None, fecha=None):
+    """
+    Marca para recálculo los boletines afectados por un cambio de notas, asistencias o configuración.
+
+    Se limita al año, a las matrículas o al curso indicados; sin año se marcan todos los años.
+    Con una fecha solo se marcan los períodos que terminan en o después de ella, porque cada
+    boletín arrastra las notas de los períodos anteriores. También descarta las posiciones
+    guardadas de los cursos afectados para que se vuelvan a calcular al consultarlas.
+    No hace commit: el cambio viaja en la misma transacción que la escritura.
+    """
+    query = Boletin.query
+    posiciones_query = PosicionCurso.query
+    if anio_lectivo is not None:
+        query = query.filter(Boletin.anio_lectivo == anio_lectivo)
+        posiciones_query = posiciones_query.filter(PosicionCurso.anio_lectivo == int(anio_lectivo))
+
+    if matriculas_ids is not None:
+        if not matriculas_ids:
+            return 0
+        query = query.filter(Boletin.id_matricula.in_(matriculas_ids))
+        # El puesto depende de todo el curso, no solo de las matrículas modificadas
+        posiciones_query = posiciones_query.filter(PosicionCurso.id_curso.in_(
+            db.session.query(Matricula.id_curso).filter(Matricula.id.in_(matriculas_ids))
+        ))
+
+    if curso_id is not None:
+        query = query.filter(Boletin.id_matricula.in_(
+            db.session.query(Matricula.id).filter(Matricula.id_curso == curso_id)
+        ))
+        posiciones_query = posiciones_query.filter(PosicionCurso.id_curso == curso_id)
+
+    if fecha is not None and anio_lectivo is not None:
+        periodos_ids = [
+            ap.periodo_id for ap in AnioPeriodo.query.filter(
+                AnioPeriodo.anio_lectivo == anio_lectivo,
+                AnioPeriodo.fecha_fin >= fecha.strftime('%m-%d')
+            ).all()
+        ]
+        if not periodos_ids:
+            return 0
+        query = query.filter(Boletin.id_periodo.in_(periodos_ids))
+        posiciones_query = posiciones_query.filter(PosicionCurso.id_periodo.in_(periodos_ids))
+
+    posiciones_query.delete(synchronize_session=False)
+    return query.update({Boletin.requiere_recalculo: True}, synchronize_session=False)
+
+
+def recalcular_boletines(boletines, forzar=False):
+    """
+    Recalcula y guarda las notas de los boletines marcados para recálculo en un solo commit.
+    Los boletines sin cambios devuelven las notas guardadas en boletin_notas.
+    Agrupa los pendientes por (curso, período, año) para calcularlos en lote.
+    Devuelve {boletin.id: grades_data}.
+    """
+    resultado = {}
+    grupos = {}
+    Boletin.precargar_notas(boletines)
+    for boletin in boletines:
+        if not forzar and not boletin.requiere_recalculo:
+            resultado[boletin.id] = boletin.grades
+            continue
+
+        matricula = boletin.matricula
+        clave = (matricula.id_curso, boletin.id_periodo, matricula.año_lectivo)
+        grupos.setdefault(clave, []).append(boletin)
+
+    if not grupos:
+        return resultado
+
+    for (curso_id, periodo_id, anio_lectivo), grupo in grupos.items():
+        datos_curso = calcular_grades_data_curso(
+            curso_id, periodo_id, anio_lectivo, [b.id_matricula for b in grupo]
+        )
+        for boletin in grupo:
+            if boletin.id_matricula not in datos_curso:
+                resultado[boletin.id] = {}
+                continue
+            grades_data = datos_curso[boletin.id_matricula]
+            boletin.grades = grades_data
+            boletin.requiere_recalculo = False
+            resultado[boletin.id] = grades_data
+
+    db.session.commit()
+    return resultado
+
+
+def _promedio_periodo(grades, period_count):
+    """Promedio de las notas del último período incluido en el boletín"""
+    subject_notes = [d.get(f'p{period_count}', 0) for d in grades.values()]
+    return round(sum(subject_notes) / len(subject_notes), 2) if subject_notes else 0
+
+
+def _contexto_grupo_pdf(curso_id, periodo_id, anio_lectivo, matriculas_ids):
+    """Datos compartidos por todos los boletines de un mismo curso, período y año"""
+    periods = Periodo.query.join(AnioPeriodo).filter(AnioPeriodo.anio_lectivo == anio_lectivo).order_by(AnioPeriodo.fecha_inicio).all()
+    current_period_index = next((i for i, p in enumerate(periods) if p.id == periodo_id), 0)
+    period_count = current_period_index + 1
+
+    anio_periodo = AnioPeriodo.query.filter_by(anio_lectivo=anio_lectivo, periodo_id=periodo_id).first()
+    if anio_periodo:
+        fecha_inicio, fecha_fin = rango_fechas_periodo(anio_lectivo, anio_periodo)
+    else:
+        fecha_inicio = None
+        fecha_fin = None
+
+    inasistencias = contar_inasistencias_curso(curso_id, anio_lectivo, fecha_inicio, fecha_fin, matriculas_ids)
+
+    # Puestos del ranking guardado del curso; solo se calcula si cambiaron las notas
+    from app.services.posicion_service import obtener_posiciones_curso  # Import here to avoid circular dependency
+    puestos = {mid: p.puesto for mid, p in obtener_posiciones_curso(curso_id, periodo_id, anio_lectivo).items()}
+
+    return {
+        'period_count': period_count,
+        'inasistencias': inasistencias,
+        'puestos': puestos,
+    }
+
+
+def preparar_datos_boletines_pdf(boletines):
+    """
+    Reúne en datos planos (serializables) todo lo que necesita el PDF de cada boletín.
+
+    Las consultas se hacen por lote: asignaturas, configuración y rector una vez, e
+    inasistencias y ranking una vez por curso y período. Devuelve una lista en el mismo
+    orden que `boletines`; si el contexto de un grupo no se puede calcular, sus elementos
+    llevan la clave 'error'.
+    """
+    if not boletines:
+        return []
+
+    config = ConfiguracionLibro.obtener_configuracion_actual()
+    nota_basico = config.nota_basico if config else 3.0
+    asignaturas_map = {str(a.id): a for a in Asignatura.query.all()}
+    rector = RectorConfig.query.first()
+    rector_nombre = (rector.nombre or '') if rector else ''
+    rector_firma_url = (rector.firma_url or None) if rector else None
+    fecha_impresion = datetime.now().strftime('%Y-%m-%d')
+
+    grupos = {}
+    for boletin in boletines:
+        clave = (boletin.id_curso, boletin.id_periodo, boletin.anio_lectivo)
+        grupos.setdefault(clave, []).append(boletin.id_matricula)
+
+    contextos = {}
+    for (curso_id, periodo_id, anio_lectivo), matriculas_ids in grupos.items():
+        try:
+            contextos[(curso_id, periodo_id, anio_lectivo)] = _contexto_grupo_pdf(curso_id, periodo_id, anio_lectivo, matriculas_ids)
+        except Exception as e:
+            contextos[(curso_id, periodo_id, anio_lectivo)] = {'error': str(e)}
+
+    Boletin.precargar_notas(boletines)
+    lista_datos = []
+    for boletin in boletines:
+        contexto = contextos[(boletin.id_curso, boletin.id_periodo, boletin.anio_lectivo)]
+        if 'error' in contexto:
+            lista_datos.append({'error': contexto['error']})
+            continue
+
+        grades = boletin.grades
+        period_count = contexto['period_count']
+
+        items = []
+        for asig_id, d in grades.items():
+            asig_obj = asignaturas_map.get(str(asig_id))
+            if not asig_obj:
+                continue
+            item = {
+                "asignatura": asig_obj.nombre,
+                "porcentaje": "[100%]",
+                **d
+            }
+            item['fl'] = contexto['inasistencias'].get((boletin.id_matricula, asig_obj.id), 0)
+            items.append(item)
+
+        promedio_general = _promedio_periodo(grades, period_count)
+
+        asignaturas_reprobadas = 0
+        for data in grades.values():
+            nota = data.get('nota')
+            if nota is not None and nota < nota_basico:
+                asignaturas_reprobadas += 1
+
+        matricula = boletin.matricula
+        lista_datos.append({
+            'nombres': matricula.nombres,
+            'apellidos': matricula.apellidos,
+            'documento': matricula.documento,
+            'curso_nombre': boletin.curso.nombre if boletin.curso else '',
+            'periodo_nombre': boletin.periodo.nombre if boletin.periodo else None,
+            'anio_lectivo': boletin.anio_lectivo,
+            'fecha_impresion': fecha_impresion,
+            'period_count': period_count,
+            'items': items,
+            'promedio_general': promedio_general,
+            'desempeno_general': desempeno_segun_config(promedio_general, config).upper(),
+            'puesto': contexto['puestos'].get(boletin.id_matricula, 1),
+            'asignaturas_reprobadas': asignaturas_reprobadas,
+            'rector_nombre': rector_nombre,
+            'rector_firma_url': rector_firma_url,
+        })
+
+    return lista_datos
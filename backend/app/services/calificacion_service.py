@@ -0,0 +1,149 @@
+from datetime import datetime
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from app import db
+from app.models import Calificacion, Matricula
+
+
+def _validar_nota(valor):
+    """Convierte la nota recibida (texto, número o vacío) o lanza ValueError con el motivo"""
+    if valor is None or (isinstance(valor, str) and not valor.strip()):
+        return None
+    try:
+        nota = float(valor)
+    except (TypeError, ValueError):
+        raise ValueError('no es un número válido')
+    if nota < 0 or nota > 5:
+        raise ValueError('debe estar entre 0 y 5')
+    if nota == 0:
+        raise ValueError('debe ser mayor a 0')
+    return nota
+
+
+def _upsert_calificaciones(filas):
+    """
+    INSERT de todas las filas en una sola sentencia; si otra petición ya guardó la misma
+    matrícula, asignación y fecha (uq_calificacion_matricula_asignacion_fecha) se actualizan
+    la nota y la observación y quien guarda queda como último en modificarla. Devuelve False
+    si el motor no tiene upsert nativo.
+    """
+    tabla = Calificacion.__table__
+    dialecto = db.session.get_bind().dialect.name
+    if dialecto == 'mysql':
+        sentencia = mysql.insert(tabla).values(filas)
+        valores = sentencia.inserted
+    elif dialecto in ('sqlite', 'postgresql'):
+        insertar = sqlite.insert if dialecto == 'sqlite' else postgresql.insert
+        sentencia = insertar(tabla).values(filas)
+        valores = sentencia.excluded
+    else:
+        return False
+    actualizar = {
+        'nota': valores.nota,
+        'observacion': valores.observacion,
+        'actualizado_por': valores.creado_por,
+        'actualizado_en': valores.creado_en
+    }
+    if dialecto == 'mysql':
+        sentencia = sentencia.on_duplicate_key_update(actualizar)
+    else:
+        sentencia = sentencia.on_conflict_do_update(
+            index_elements=['id_matricula', 'id_asignacion', 'fecha_calificacion'],
+            set_=actualizar
+        )
+    db.session.execute(sentencia)
+    return True
+
+
+def guardar_calificaciones_masivo(asignacion, periodo_id, fecha, entradas, usuario_id):
+    """
+    Guarda las calificaciones de una fecha para una asignación con un número fijo de
+    sentencias: una consulta valida las matrículas, otra trae las calificaciones ya
+    registradas y un upsert escribe las nuevas y las modificadas. Así dos guardados
+    simultáneos de la misma fecha no crean calificaciones repetidas.
+
+    `entradas` es una lista de (id_matricula, nota, observacion); si una matrícula aparece
+    varias veces gana la última. Las filas cuya nota y observación no cambiaron se omiten.
+    Si alguna fila no es válida no se escribe nada y se devuelven los errores de cada fila.
+
+    No confirma la transacción. Devuelve {'guardadas': [id_matricula...], 'sin_cambios': n,
+    'errores': [{'matricula_id': id, 'error': mensaje}]}.
+    """
+    resultado = {'guardadas': [], 'sin_cambios': 0, 'errores': []}
+    valores = {}
+    for matricula_id, nota, observacion in entradas:
+        try:
+            matricula_id = int(matricula_id)
+        except (TypeError, ValueError):
+            resultado['errores'].append({'matricula_id': matricula_id, 'error': 'La matrícula no es válida.'})
+            continue
+        try:
+            valores[matricula_id] = (_validar_nota(nota), observacion or '')
+        except ValueError as e:
+            resultado['errores'].append({
+                'matricula_id': matricula_id,
+                'error': f'La calificación para el estudiante {matricula_id} {e}.'
+            })
+    if not valores:
+        return resultado
+
+    validas = {matricula_id for (matricula_id,) in db.session.query(Matricula.id).filter(
+        Matricula.id.in_(list(valores)),
+        Matricula.id_curso == asignacion.id_curso,
+        Matricula.estado == 'activo',
+        Matricula.año_lectivo == asignacion.anio_lectivo
+    ).all()}
+    for matricula_id in valores:
+        if matricula_id not in validas:
+            resultado['errores'].append({
+                'matricula_id': matricula_id,
+                'error': f'El estudiante {matricula_id} no está matriculado en el curso.'
+            })
+    if resultado['errores']:
+        return resultado
+
+    existentes = {c.id_matricula: c for c in db.session.query(
+        Calificacion.id, Calificacion.id_matricula, Calificacion.nota, Calificacion.observacion
+    ).filter(
+        Calificacion.id_asignacion == asignacion.id,
+        Calificacion.fecha_calificacion == fecha,
+        Calificacion.id_matricula.in_(list(valores))
+    ).all()}
+
+    ahora = datetime.utcnow()
+    filas = []
+    for matricula_id, (nota, observacion) in valores.items():
+        actual = existentes.get(matricula_id)
+        if actual is None:
+            if nota is None and not observacion:
+                resultado['sin_cambios'] += 1
+                continue
+        elif actual.nota == nota and (actual.observacion or '') == observacion:
+            resultado['sin_cambios'] += 1
+            continue
+        filas.append({
+            'id_matricula': matricula_id,
+            'id_asignacion': asignacion.id,
+            'id_periodo': periodo_id,
+            'fecha_calificacion': fecha,
+            'nota': nota,
+            'observacion': observacion,
+            'creado_en': ahora,
+            'creado_por': usuario_id
+        })
+        resultado['guardadas'].append(matricula_id)
+
+    if filas and not _upsert_calificaciones(filas):
+        # Otros motores: INSERT de las nuevas y UPDATE por id de las existentes, en bloque
+        nuevas = [fila for fila in filas if fila['id_matricula'] not in existentes]
+        if nuevas:
+            db.session.execute(Calificacion.__table__.insert(), nuevas)
+        cambios = [{
+            'id': existentes[fila['id_matricula']].id,
+            'nota': fila['nota'],
+            'observacion': fila['observacion'],
+            'actualizado_por': usuario_id,
+            'actualizado_en': ahora
+        } for fila in filas if fila['id_matricula'] in existentes]
+        if cambios:
+            db.session.execute(db.update(Calificacion), cambios)
+    return resultado
@@ -1,14 +1,36 @@
+"""
+Configuración activa del sistema (año lectivo y período).
+
+Cada proceso guarda la configuración activa en memoria junto con una marca de versión: el
+contador ACTIVE_SYSTEM_CONFIG:version en Redis (si REDIS_ENABLED) o, sin Redis, la última
+modificación de system_config y el período activo. La marca se consulta como máximo cada
+CONFIG_VERIFICAR_SEGUNDOS; entre consultas get_active_config es una lectura de diccionario.
+Al confirmar cambios en SystemConfig, AnioPeriodo o Periodo (o al llamar a
+clear_config_cache) se actualiza la marca y todos los procesos recargan en su siguiente
+verificación. `version_config_activa()` es un número que sube en cada recarga con datos
+distintos.
+"""
 from flask import current_app
 from functools import wraps
 from app.models.configuracion import SystemConfig
 from datetime import datetime, timedelta
 import json
+import threading
+import time
 import redis
+from sqlalchemy import func
 from app import db
 from app.services.asignacion_service import clear_asignaciones_cache
 from app.services.matricula_service import clear_matriculas_cache
 
 CACHE_KEY = 'ACTIVE_SYSTEM_CONFIG'
+VERSION_KEY = f'{CACHE_KEY}:version'
+
+_SIN_CARGAR = object()
+_lock = threading.Lock()
+_pools = {}  # {(host, puerto, db): redis.ConnectionPool} de este proceso
+# Configuración activa de este proceso
+_activa = {'datos': _SIN_CARGAR, 'marca': None, 'version': 0, 'verificado': 0.0}
 
 def clear_related_caches(func):
     """Decorador para limpiar caches relacionados después de operaciones de configuración"""
@@ -27,124 +49,122 @@ def clear_related_caches(func):
     return wrapper
 
 def get_redis_connection():
-    """Obtiene conexión a Redis con manejo de errores"""
+    """Cliente de Redis sobre el pool de conexiones del proceso (None si Redis está desactivado)"""
     try:
         if not current_app.config.get('REDIS_ENABLED', False):
             return None
-            
-        return redis.Redis(
-            host=current_app.config.get('REDIS_HOST', 'localhost'),
-            port=current_app.config.get('REDIS_PORT', 6379),
-            db=current_app.config.get('REDIS_DB', 0),
-            password=current_app.config.get('REDIS_PASSWORD', None),
-            decode_responses=True,
-            socket_timeout=5,
-            socket_connect_timeout=5
+
+        clave = (
+            current_app.config.get('REDIS_HOST', 'localhost'),
+            current_app.config.get('REDIS_PORT', 6379),
+            current_app.config.get('REDIS_DB', 0)
         )
+        pool = _pools.get(clave)
+        if pool is None:
+            with _lock:
+                pool = _pools.get(clave)
+                if pool is None:
+                    pool = _pools[clave] = redis.ConnectionPool(
+                        host=clave[0],
+                        port=clave[1],
+                        db=clave[2],
+                        password=current_app.config.get('REDIS_PASSWORD', None),
+                        decode_responses=True,
+                        socket_timeout=5,
+                        socket_connect_timeout=5
+                    )
+        return redis.Redis(connection_pool=pool)
     except Exception as e:
         current_app.logger.error(f"Error al conectar con Redis: {e}")
         return None
 
+def _marca_configuracion():
+    """Marca barata de la versión de la configuración activa: contador en Redis o consulta de una fila"""
+    redis_conn = get_redis_connection()
+    if redis_conn:
+        try:
+            return ('redis', redis_conn.get(VERSION_KEY) or '0')
+        except Exception as e:
+            current_app.logger.error(f"Error al acceder a redis: {e}")
+    from app.models import AnioPeriodo # Import here to avoid circular dependency
+    periodo_activo = db.select(func.max(AnioPeriodo.id)).where(AnioPeriodo.estado == 'activo').scalar_subquery()
+    return ('db', *db.session.execute(db.select(func.max(SystemConfig.updated_at), periodo_activo)).one())
+
+def version_config_activa():
+    """Número de versión de la configuración activa en este proceso"""
+    get_active_config()
+    return _activa['version']
+
 def get_config_value(key, default=None):
-    """Obtiene un valor específico de la configuración activa"""
+    """Obtiene un valor específico de la configuración activa (anio, id, periodo_id, periodo_nombre)"""
     config = get_active_config()
     if not config:
         return default
-    
-    # Si config es un objeto SystemConfig
-    if isinstance(config, SystemConfig):
-        field_map = {
-            'anio': 'anio',
-            'id': 'id'
-        }
-        # Handle periodo_id and periodo_nombre separately as they come from AnioPeriodo
-        if key == 'periodo_id':
-            from app.models import AnioPeriodo # Import here to avoid circular dependency
-            active_anio_periodo = AnioPeriodo.query.filter_by(anio_lectivo=config.anio, estado='activo').first()
-            return active_anio_periodo.periodo_id if active_anio_periodo else default
-        if key == 'periodo_nombre':
-            from app.models import AnioPeriodo # Import here to avoid circular dependency
-            active_anio_periodo = AnioPeriodo.query.filter_by(anio_lectivo=config.anio, estado='activo').first()
-            return active_anio_periodo.periodo.nombre if active_anio_periodo and active_anio_periodo.periodo else default
-        
-        if key in field_map:
-            field = field_map[key]
-            if callable(field):
-                return field(config)
-            return getattr(config, field, default)
-        return default
-    
-    # Si config es un diccionario (del cache)
     return config.get(key, default)
 
 def get_active_config(return_object=False):
-    """Obtiene la configuración activa desde redis o base de datos"""
+    """Obtiene la configuración activa desde la memoria del proceso o la base de datos"""
     # Si se solicita el objeto completo, ir directamente a la BD
     if return_object:
         active_config_obj = SystemConfig.get_active_config()
         return active_config_obj
-    
-    # Primero intentar desde Redis si está disponible
-    try:
-        redis_conn = get_redis_connection()
-        if redis_conn:
-            cached_config = redis_conn.get(CACHE_KEY)
-            if cached_config:
-                config_data = json.loads(cached_config)
-                # Convertir updated_at de string a datetime si existe
-                if 'updated_at' in config_data and config_data['updated_at']:
-                    config_data['updated_at'] = datetime.fromisoformat(config_data['updated_at'])
-                return config_data
-    except Exception as e:
-        current_app.logger.error(f"Error al acceder a redis: {e}")
-    
-    # Si no hay en cache o hay error, cargar desde BD
-    reloaded_config = reload_active_config()
-    return reloaded_config
 
-def reload_active_config():
-    """Recarga la configuración activa en cache"""
+    datos = _activa['datos']
+    if datos is not _SIN_CARGAR:
+        ahora = time.monotonic()
+        if ahora - _activa['verificado'] < current_app.config.get('CONFIG_VERIFICAR_SEGUNDOS', 5):
+            return dict(datos) if datos else None
+        marca = _marca_configuracion()
+        if marca == _activa['marca']:
+            _activa['verificado'] = ahora
+            return dict(datos) if datos else None
+        return reload_active_config(marca)
+
+    # Primera lectura del proceso o cache limpiada: cargar desde BD
+    return reload_active_config()
+
+def reload_active_config(marca=None):
+    """Recarga la configuración activa en la memoria del proceso"""
+    # La marca se toma antes de leer: si cambia mientras tanto, la próxima verificación recarga
+    marca = marca if marca is not None else _marca_configuracion()
     active_config = SystemConfig.get_active_config()
-    if not active_config:
-        clear_config_cache()
-        return None
-    
-    # Solo almacenar datos serializables, no objetos SQLAlchemy
-    config_data = {
-        'id': active_config.id,
-        'anio': active_config.anio,
-        'updated_at': active_config.updated_at.isoformat() if active_config.updated_at else None
-    }
-    # Add active periodo_id and periodo_nombre from AnioPeriodo if available
-    from app.models import AnioPeriodo # Import here to avoid circular dependency
-    active_anio_periodo = AnioPeriodo.query.filter_by(anio_lectivo=active_config.anio, estado='activo').first()
-    if active_anio_periodo:
-        config_data['periodo_id'] = active_anio_periodo.periodo_id
-        config_data['periodo_nombre'] = active_anio_periodo.periodo.nombre
-    
-    # Cachear en Redis si está disponible
-    try:
-        redis_conn = get_redis_connection()
-        if redis_conn:
-            redis_conn.setex(
-                CACHE_KEY, 
-                timedelta(hours=1), 
-                json.dumps(config_data, default=str)
-            )
-    except Exception as e:
-        current_app.logger.error(f"Error al guardar en Redis: {e}")
-    
-    return config_data
+    config_data = None
+    if active_config:
+        # Solo almacenar datos serializables, no objetos SQLAlchemy
+        config_data = {
+            'id': active_config.id,
+            'anio': active_config.anio,
+            'updated_at': active_config.updated_at.isoformat() if active_config.updated_at else None
+        }
+        # Add active periodo_id and periodo_nombre from AnioPeriodo if available
+        from app.models import AnioPeriodo # Import here to avoid circular dependency
+        active_anio_periodo = AnioPeriodo.query.filter_by(anio_lectivo=active_config.anio, estado='activo').first()
+        if active_anio_periodo:
+            config_data['periodo_id'] = active_anio_periodo.periodo_id
+            config_data['periodo_nombre'] = active_anio_periodo.periodo.nombre
+
+    with _lock:
+        if config_data != _activa['datos']:
+            _activa['version'] += 1
+        _activa.update(datos=config_data, marca=marca, verificado=time.monotonic())
+    return dict(config_data) if config_data else None
 
 @clear_related_caches
 def clear_config_cache():
-    """Limpia la cache de configuración de Redis"""
+    """Descarta la configuración activa de este proceso y avisa a los demás cambiando la marca"""
+    with _lock:
+        _activa.update(datos=_SIN_CARGAR, marca=None)
     try:
         redis_conn = get_redis_connection()
         if redis_conn:
-            redis_conn.delete(CACHE_KEY)
+            redis_conn.incr(VERSION_KEY)
+            return
     except Exception as e:
         current_app.logger.error(f"Error al limpiar cache de Redis: {e}")
+    # Sin Redis la marca es la última modificación de system_config (conexión propia, ya confirmada)
+    tabla = SystemConfig.__table__
+    with db.engine.begin() as conexion:
+        conexion.execute(tabla.update().where(tabla.c.estado == 'activo').values(updated_at=datetime.utcnow()))
 
 def get_active_year():
     """Obtiene el año activo actual"""
@@ -158,13 +178,7 @@ def get_active_year():
 def get_active_period_id():
     """Obtiene el ID del periodo activo actual"""
     config = get_active_config()
-    if isinstance(config, dict) and 'periodo_id' in config:
-        return config['periodo_id']
-    # If config is a SystemConfig object (not from cache), or if 'periodo_id' is not in cache
-    # we need to query AnioPeriodo directly
-    from app.models import AnioPeriodo # Import here to avoid circular dependency
-    active_anio_periodo = AnioPeriodo.query.filter_by(anio_lectivo=config.get('anio'), estado='activo').first()
-    return active_anio_periodo.periodo_id if active_anio_periodo else None
+    return config.get('periodo_id') if config else None
 
 def get_active_config_object():
     """Obtiene el objeto completo de configuración activa"""
@@ -237,3 +251,39 @@ def set_active_config(anio):
         db.session.rollback()
         current_app.logger.error(f"Error al cambiar configuración activa: {e}")
         raise e
+
+
+def _cambios_configuracion(session):
+    """Marca la sesión si tiene cambios en las tablas de las que sale la configuración activa"""
+    from app.models import AnioPeriodo, Periodo # Import here to avoid circular dependency
+    return any(
+        isinstance(objeto, (SystemConfig, AnioPeriodo, Periodo))
+        for objeto in (*session.new, *session.dirty, *session.deleted)
+    )
+
+def _despues_de_flush(session, flush_context):
+    if _cambios_configuracion(session):
+        session.info['config_modificada'] = True
+
+def _antes_de_ejecutar(orm_execute_state):
+    # UPDATE o DELETE masivos (Query.update) no pasan por el flush
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        from app.models import AnioPeriodo, Periodo # Import here to avoid circular dependency
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.class_ in (SystemConfig, AnioPeriodo, Periodo):
+            orm_execute_state.session.info['config_modificada'] = True
+
+def _despues_de_commit(session):
+    if session.info.pop('config_modificada', False):
+        try:
+            clear_config_cache()
+        except Exception as e:
+            current_app.logger.error(f"Error al invalidar la configuración activa: {e}")
+
+def _despues_de_rollback(session):
+    session.info.pop('config_modificada', None)
+
+db.event.listen(db.session, 'after_flush', _despues_de_flush)
+db.event.listen(db.session, 'do_orm_execute', _antes_de_ejecutar)
+db.event.listen(db.session, 'after_commit', _despues_de_commit)
+db.event.listen(db.session, 'after_rollback', _despues_de_rollback)
@@ -0,0 +1,93 @@
+"""
+Contexto académico de la petición: año lectivo activo, período activo con sus fechas y la
+lista ordenada de períodos del año.
+
+contexto_academico() crea un ContextoAcademico la primera vez que se usa en una petición y
+lo guarda en flask.g. Cada dato se calcula una sola vez y solo si alguien lo pide: los
+períodos del año salen de una única consulta (con su Periodo) de la que también se toma el
+período activo. Fuera de una petición (workers, scripts) devuelve un contexto nuevo.
+"""
+from datetime import datetime
+from functools import cached_property
+from flask import g, has_request_context
+from sqlalchemy.orm import joinedload
+from app.models import AnioPeriodo
+from app.services.configuracion_service import get_active_config
+
+
+class ContextoAcademico:
+
+    @cached_property
+    def config(self):
+        """Configuración activa (dict) o None"""
+        return get_active_config()
+
+    @property
+    def anio(self):
+        return self.config.get('anio') if self.config else None
+
+    @cached_property
+    def anio_periodos(self):
+        """AnioPeriodo del año lectivo activo ordenados por fecha de inicio"""
+        if not self.anio:
+            return []
+        return AnioPeriodo.query.options(joinedload(AnioPeriodo.periodo)).filter(
+            AnioPeriodo.anio_lectivo == self.anio
+        ).order_by(AnioPeriodo.fecha_inicio, AnioPeriodo.id).all()
+
+    @cached_property
+    def anio_periodo(self):
+        """AnioPeriodo activo del año lectivo o None"""
+        return next((ap for ap in self.anio_periodos if ap.estado == 'activo'), None)
+
+    def anio_periodo_de(self, anio_lectivo, periodo_id):
+        """AnioPeriodo de un período: del año activo sale de anio_periodos, de otro año se consulta"""
+        if anio_lectivo == self.anio:
+            return next((ap for ap in self.anio_periodos if ap.periodo_id == periodo_id), None)
+        return AnioPeriodo.query.filter_by(anio_lectivo=anio_lectivo, periodo_id=periodo_id).first()
+
+    @property
+    def periodo(self):
+        return self.anio_periodo.periodo if self.anio_periodo else None
+
+    @property
+    def periodo_id(self):
+        return self.anio_periodo.periodo_id if self.anio_periodo else None
+
+    @cached_property
+    def periodos(self):
+        """Periodo de cada AnioPeriodo del año, sin repetir, en orden de fechas"""
+        vistos = set()
+        periodos = []
+        for ap in self.anio_periodos:
+            if ap.periodo_id not in vistos:
+                vistos.add(ap.periodo_id)
+                periodos.append(ap.periodo)
+        return periodos
+
+    def fechas(self, anio_periodo=None):
+        """
+        (fecha_inicio, fecha_fin) de un AnioPeriodo (el activo por defecto) dentro del año
+        lectivo. Lanza ValueError si las fechas MM-DD guardadas no son válidas.
+        """
+        anio_periodo = anio_periodo or self.anio_periodo
+        if anio_periodo is None:
+            return None
+        return (
+            datetime.strptime(f"{self.anio}-{anio_periodo.fecha_inicio}", "%Y-%m-%d").date(),
+            datetime.strptime(f"{self.anio}-{anio_periodo.fecha_fin}", "%Y-%m-%d").date()
+        )
+
+    @cached_property
+    def rango(self):
+        """Fechas del período activo (ver fechas())"""
+        return self.fechas()
+
+
+def contexto_academico():
+    """ContextoAcademico de la petición actual"""
+    if not has_request_context():
+        return ContextoAcademico()
+    if 'contexto_academico' not in g:
+        g.contexto_academico = ContextoAcademico()
+    return g.contexto_academico
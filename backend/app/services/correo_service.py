@@ -0,0 +1,187 @@
+"""
+Bandeja de salida de correos.
+
+Las rutas guardan cada correo en `correos_salientes` (encolar_correo) y responden de
+inmediato. El proceso de correo de `worker.py` los entrega por lotes sobre una sola
+conexión SMTP autenticada y reintenta los fallos con espera exponencial. Tras
+CORREO_MAX_INTENTOS un correo queda en estado 'error'.
+
+Para probar sin un servidor real basta apuntar MAIL_SERVER/MAIL_PORT a un SMTP local
+(por ejemplo `python -m aiosmtpd -n -l localhost:8025`) con MAIL_USE_TLS=false y sin usuario.
+"""
+import smtplib
+import time
+import uuid
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from email.utils import formataddr
+from flask import current_app
+from app import db
+from app.models import CorreoSaliente
+from app.utils.email_utils import ConexionSMTP
+
+
+def encolar_correo(destinatario, asunto, cuerpo_html, adjunto_nombre=None, adjunto=None,
+                   adjunto_tipo='application/pdf', referencia=None, usuario_id=None):
+    """Guarda un correo en la bandeja de salida para que lo entregue el worker"""
+    correo = CorreoSaliente(
+        destinatario=destinatario,
+        asunto=asunto,
+        cuerpo_html=cuerpo_html,
+        adjunto_nombre=adjunto_nombre if adjunto is not None else None,
+        adjunto_tipo=adjunto_tipo if adjunto is not None else None,
+        adjunto=adjunto,
+        referencia=referencia,
+        id_usuario=usuario_id
+    )
+    db.session.add(correo)
+    db.session.commit()
+    return correo
+
+
+def referencias_encoladas(referencias):
+    """Las `referencias` que ya tienen un correo en la bandeja de salida, en cualquier estado"""
+    if not referencias:
+        return set()
+    return {referencia for (referencia,) in db.session.query(CorreoSaliente.referencia).filter(
+        CorreoSaliente.referencia.in_(list(referencias))
+    ).distinct().all()}
+
+
+def _remitente():
+    remitente = current_app.config.get('MAIL_DEFAULT_SENDER')
+    if isinstance(remitente, (tuple, list)):
+        return formataddr((remitente[0], remitente[1] or ''))
+    return remitente or current_app.config.get('MAIL_USERNAME') or ''
+
+
+def _construir_mensaje(correo, remitente):
+    msg = EmailMessage()
+    msg['Subject'] = correo.asunto
+    msg['From'] = remitente
+    msg['To'] = correo.destinatario
+    msg.set_content('Este mensaje requiere un cliente de correo compatible con HTML.')
+    msg.add_alternative(correo.cuerpo_html, subtype='html')
+    if correo.adjunto is not None:
+        tipo, _, subtipo = (correo.adjunto_tipo or 'application/octet-stream').partition('/')
+        msg.add_attachment(correo.adjunto, maintype=tipo, subtype=subtipo, filename=correo.adjunto_nombre)
+    return msg
+
+
+def reclamar_lote(limite):
+    """Marca como 'enviando' hasta `limite` correos listos para enviarse y los devuelve"""
+    ahora = datetime.utcnow()
+    ids = [correo_id for (correo_id,) in db.session.query(CorreoSaliente.id).filter(
+        CorreoSaliente.estado == 'pendiente',
+        CorreoSaliente.proximo_intento <= ahora
+    ).order_by(CorreoSaliente.proximo_intento, CorreoSaliente.id).limit(limite).all()]
+    if not ids:
+        return []
+
+    lote = str(uuid.uuid4())
+    # Solo se toman los que siguen pendientes: otro worker pudo reclamar alguno
+    CorreoSaliente.query.filter(
+        CorreoSaliente.id.in_(ids),
+        CorreoSaliente.estado == 'pendiente'
+    ).update({'estado': 'enviando', 'lote': lote, 'actualizado_en': ahora}, synchronize_session=False)
+    db.session.commit()
+    return CorreoSaliente.query.filter_by(lote=lote, estado='enviando').order_by(CorreoSaliente.id).all()
+
+
+def _programar_reintento(correo, error, definitivo=False):
+    """Vuelve a encolar el correo con espera exponencial o lo marca con error si ya no hay intentos"""
+    correo.intentos += 1
+    correo.ultimo_error = str(error)[:255]
+    correo.lote = None
+    if definitivo or correo.intentos >= current_app.config.get('CORREO_MAX_INTENTOS', 5):
+        correo.estado = 'error'
+        current_app.logger.error(f"No se pudo entregar el correo {correo.id} a {correo.destinatario}: {error}")
+        return
+    espera = current_app.config.get('CORREO_REINTENTO_SEGUNDOS', 60) * 2 ** (correo.intentos - 1)
+    correo.estado = 'pendiente'
+    correo.proximo_intento = datetime.utcnow() + timedelta(seconds=min(espera, 3600))
+
+
+def entregar_lote(conexion, limite=None):
+    """
+    Envía un lote de correos pendientes por `conexion` (ConexionSMTP). Devuelve cuántos
+    correos se tomaron de la bandeja.
+    """
+    correos = reclamar_lote(limite or current_app.config.get('CORREO_LOTE', 50))
+    if not correos:
+        return 0
+
+    try:
+        conexion.abrir()
+    except (smtplib.SMTPException, OSError) as e:
+        current_app.logger.warning(f"No se pudo conectar al servidor de correo: {e}")
+        for correo in correos:
+            _programar_reintento(correo, e)
+        db.session.commit()
+        return len(correos)
+
+    remitente = _remitente()
+    for indice, correo in enumerate(correos):
+        try:
+            conexion.enviar(_construir_mensaje(correo, remitente))
+        except smtplib.SMTPRecipientsRefused as e:
+            _programar_reintento(correo, e, definitivo=True)
+            db.session.commit()
+            continue
+        except smtplib.SMTPResponseException as e:
+            # Rechazo de este mensaje: 5xx es permanente, 4xx se reintenta
+            _programar_reintento(correo, e, definitivo=e.smtp_code >= 500)
+            db.session.commit()
+            continue
+        except (smtplib.SMTPException, OSError) as e:
+            # Se perdió la conexión: este correo y el resto del lote se reintentan más tarde
+            conexion.cerrar()
+            for pendiente in correos[indice:]:
+                _programar_reintento(pendiente, e)
+            db.session.commit()
+            return len(correos)
+
+        correo.estado = 'enviado'
+        correo.enviado_en = datetime.utcnow()
+        correo.ultimo_error = None
+        correo.adjunto = None  # El adjunto ya no se necesita
+        db.session.commit()
+    return len(correos)
+
+
+def recuperar_correos_abandonados():
+    """Devuelve a la cola los correos de lotes cuyo worker murió a mitad del envío"""
+    limite = datetime.utcnow() - timedelta(minutes=current_app.config.get('TRABAJOS_SIN_LATIDO_MINUTOS', 10))
+    CorreoSaliente.query.filter(
+        CorreoSaliente.estado == 'enviando',
+        CorreoSaliente.actualizado_en < limite
+    ).update({'estado': 'pendiente', 'lote': None}, synchronize_session=False)
+    db.session.commit()
+
+
+def procesar_correos(detener=None):
+    """
+    Bucle del worker de correo. La conexión SMTP se mantiene abierta mientras haya correos
+    en la bandeja y se cierra cuando queda vacía.
+    """
+    intervalo = current_app.config.get('CORREO_INTERVALO', 5)
+    conexion = ConexionSMTP()
+    ultimo_mantenimiento = 0.0
+    try:
+        while detener is None or not detener.is_set():
+            try:
+                if time.monotonic() - ultimo_mantenimiento > 60:
+                    recuperar_correos_abandonados()
+                    ultimo_mantenimiento = time.monotonic()
+                if entregar_lote(conexion) == 0:
+                    conexion.cerrar()
+                    time.sleep(intervalo)
+            except Exception as e:
+                db.session.rollback()
+                conexion.cerrar()
+                current_app.logger.error(f"Error en el worker de correo: {e}", exc_info=True)
+                time.sleep(intervalo)
+            finally:
+                db.session.remove()
+    finally:
+        conexion.cerrar()
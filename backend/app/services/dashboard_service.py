@@ -0,0 +1,148 @@
+"""
+Datos de los widgets del dashboard.
+
+snapshot_dashboard calcula todos los contadores y gráficas con consultas agrupadas y guarda
+el resultado en el espacio 'dashboard' de la cache de la aplicación, por (rol, docente, año
+lectivo, período), durante DASHBOARD_CACHE_SEGUNDOS.
+Las rutas que modifican matrículas, asistencias o asignaciones llaman a
+clear_dashboard_cache después de confirmar sus cambios.
+"""
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from flask import current_app
+from sqlalchemy import case, distinct, func
+from app import db
+from app.models import Asignacion, Asignatura, Curso, Inclusion, Matricula, User
+from app.services.asistencia_service import totales_asistencia_por_fecha
+from app.services.estadistica_service import rango_periodo_activo
+from app.utils.cache import espacio
+
+_cache = espacio('dashboard')
+DIAS_SEMANA = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+
+
+def clear_dashboard_cache():
+    """Descarta los snapshots del dashboard de todos los roles"""
+    _cache.invalidar()
+
+
+def _nombre_corto(usuario_nombre, usuario_apellidos):
+    return f"{usuario_nombre.split()[0] if usuario_nombre else ''} {usuario_apellidos.split()[0] if usuario_apellidos else ''}".strip()
+
+
+def _calcular_snapshot(usuario, anio_lectivo):
+    es_docente = usuario.rol == 'docente'
+    ahora = datetime.now()
+    hoy = ahora.date()
+    ayer = hoy - timedelta(days=1)
+    datos = {'total_cursos_asignados': 0, 'nuevos_cursos_asignados': 0}
+
+    filtros_matriculas = [Matricula.estado == 'activo']
+    if anio_lectivo:
+        filtros_matriculas.append(Matricula.año_lectivo == anio_lectivo)
+
+    asignaciones_docente_ids = None
+    if es_docente:
+        asignaciones = db.session.query(
+            Asignacion.id, Asignacion.id_curso, Asignacion.estado, Asignacion.fecha_asignacion
+        ).filter(Asignacion.id_docente == usuario.id, Asignacion.anio_lectivo == anio_lectivo).all()
+        cursos_docente_ids = {asig.id_curso for asig in asignaciones}
+        asignaciones_docente_ids = [asig.id for asig in asignaciones if asig.estado == 'activo']
+        filtros_matriculas.append(Matricula.id_curso.in_(cursos_docente_ids))
+        datos['total_cursos_asignados'] = len(cursos_docente_ids)
+        hace_un_anio = ahora - timedelta(days=365)
+        datos['nuevos_cursos_asignados'] = sum(
+            1 for asig in asignaciones
+            if asig.estado == 'activo' and asig.fecha_asignacion and asig.fecha_asignacion >= hace_un_anio
+        )
+
+    # Estudiantes y docentes: un conteo total y uno de recientes por consulta
+    total_estudiantes, nuevos_estudiantes = db.session.query(
+        func.count(Matricula.id),
+        func.sum(case((Matricula.fecha_matricula >= ahora - timedelta(days=30), 1), else_=0))
+    ).filter(*filtros_matriculas).one()
+    datos['total_estudiantes'] = total_estudiantes or 0
+    datos['nuevos_estudiantes'] = int(nuevos_estudiantes or 0)
+
+    total_docentes, nuevos_docentes = db.session.query(
+        func.count(User.id),
+        func.sum(case((User.creado_en >= ahora - timedelta(days=365), 1), else_=0))
+    ).filter(User.rol == 'docente', User.estado == 'activo').one()
+    datos['total_docentes'] = total_docentes or 0
+    datos['nuevos_docentes'] = int(nuevos_docentes or 0)
+
+    # Asistencias de ayer, hoy y la semana actual desde el resumen de asistencias
+    inicio_semana = hoy - timedelta(days=hoy.weekday())
+    desde, hasta = min(ayer, inicio_semana), inicio_semana + timedelta(days=6)
+    rango_periodo = rango_periodo_activo(anio_lectivo)
+    if rango_periodo:
+        desde, hasta = max(desde, rango_periodo[0]), min(hasta, rango_periodo[1])
+    asistencias_por_fecha = totales_asistencia_por_fecha(anio_lectivo, desde, hasta, asignaciones_docente_ids) if anio_lectivo else {}
+    datos['asistencias_hoy_count'] = asistencias_por_fecha.get(hoy, 0)
+    datos['asistencias_ayer_count'] = asistencias_por_fecha.get(ayer, 0)
+    datos['porcentaje_asistencia'] = round(datos['asistencias_hoy_count'], 1)
+    datos['tendencia_asistencia'] = round(datos['asistencias_hoy_count'] - datos['asistencias_ayer_count'], 1)
+    datos['dias_semana'] = list(DIAS_SEMANA)
+    datos['asistencia_semanal'] = [asistencias_por_fecha.get(inicio_semana + timedelta(days=i), 0) for i in range(7)]
+
+    # Inclusiones de las matrículas del tablero (join en lugar de una lista IN de matrículas)
+    datos['total_inclusiones'] = db.session.query(func.count(Inclusion.id)).join(
+        Matricula, Inclusion.id_matricula == Matricula.id
+    ).filter(*filtros_matriculas).scalar() or 0
+    datos['porcentaje_inclusion'] = round((datos['total_inclusiones'] / datos['total_estudiantes'] * 100), 1) if datos['total_estudiantes'] else 0
+
+    # Matrículas por curso (cursos activos o inactivos con matrículas activas)
+    por_curso = db.session.query(Curso.nombre, func.count(Matricula.id)).join(
+        Matricula, Matricula.id_curso == Curso.id
+    ).filter(*filtros_matriculas).group_by(Curso.id, Curso.nombre).order_by(Curso.nombre).all()
+    datos['cursos_nombres'] = [nombre for nombre, _ in por_curso]
+    datos['matriculas_por_curso'] = [total for _, total in por_curso]
+
+    # Asignaturas, docentes por asignatura y detalle para los tooltips
+    filtros_asignaciones = [Asignacion.estado == 'activo', Asignacion.anio_lectivo == anio_lectivo]
+    if es_docente:
+        filtros_asignaciones.append(Asignacion.id_docente == usuario.id)
+        asignaturas = db.session.query(Asignatura.id, Asignatura.nombre).join(
+            Asignacion, Asignacion.id_asignatura == Asignatura.id
+        ).filter(*filtros_asignaciones).distinct().order_by(Asignatura.nombre).limit(6).all()
+        conteo = func.count(Asignacion.id)
+    else:
+        asignaturas = db.session.query(Asignatura.id, Asignatura.nombre).order_by(Asignatura.nombre).limit(6).all()
+        conteo = func.count(distinct(Asignacion.id_docente))
+    asignaturas_ids = [asignatura_id for asignatura_id, _ in asignaturas]
+
+    conteos = dict(db.session.query(Asignacion.id_asignatura, conteo).filter(
+        Asignacion.id_asignatura.in_(asignaturas_ids), *filtros_asignaciones
+    ).group_by(Asignacion.id_asignatura).all()) if asignaturas_ids else {}
+
+    detalle = defaultdict(list)
+    if asignaturas_ids:
+        filas = db.session.query(
+            Asignacion.id_asignatura, User.nombre, User.apellidos, Curso.nombre
+        ).join(User, Asignacion.id_docente == User.id).outerjoin(
+            Curso, Asignacion.id_curso == Curso.id
+        ).filter(Asignacion.id_asignatura.in_(asignaturas_ids), *filtros_asignaciones).order_by(Asignacion.id).all()
+        for asignatura_id, docente_nombre, docente_apellidos, curso_nombre in filas:
+            detalle[asignatura_id].append((_nombre_corto(docente_nombre, docente_apellidos), curso_nombre or ''))
+
+    datos['asignaturas_nombres'] = [nombre for _, nombre in asignaturas]
+    datos['docentes_por_asignatura'] = [conteos.get(asignatura_id, 0) for asignatura_id in asignaturas_ids]
+    datos['docentes_info'] = [
+        [{'nombre': docente, 'asignatura': nombre, 'curso': curso} for docente, curso in detalle[asignatura_id]]
+        for asignatura_id, nombre in asignaturas
+    ]
+    return datos
+
+
+def snapshot_dashboard(usuario, anio_lectivo, periodo_id=None):
+    """
+    Datos de los widgets del dashboard para el usuario. El resultado se comparte entre
+    todos los administradores, y entre las visitas de un mismo docente, hasta que vence o
+    se invalida con clear_dashboard_cache.
+    """
+    clave = (usuario.rol, usuario.id if usuario.rol == 'docente' else None, anio_lectivo, periodo_id, date.today())
+    return _cache.obtener(
+        clave,
+        lambda: _calcular_snapshot(usuario, anio_lectivo),
+        ttl=current_app.config.get('DASHBOARD_CACHE_SEGUNDOS', 60)
+    )
@@ -0,0 +1,224 @@
+from datetime import date, timedelta
+import numpy as np
+from sqlalchemy import func
+from app import db
+from app.models import AnioPeriodo, Asignacion, Asignatura, AsistenciaResumen, Calificacion, Matricula
+from app.services.contexto_service import contexto_academico
+
+ESTADOS_PRESENTES = ('asistencia', 'presente')
+DIAS_SEMANA = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes']
+
+
+def ventanas_asistencia(hoy=None):
+    """
+    Etiquetas y fechas de cada serie de las gráficas de asistencia:
+    'semanal' (lunes a viernes de la semana actual), 'mensual' (días del mes hasta hoy)
+    y 'diario' (últimos 7 días). Devuelve {nombre: (etiquetas, fechas)}.
+    """
+    hoy = hoy or date.today()
+    lunes = hoy - timedelta(days=hoy.weekday())
+    primer_dia_mes = hoy.replace(day=1)
+    dias_mes = [primer_dia_mes + timedelta(days=i) for i in range((hoy - primer_dia_mes).days + 1)]
+    dias_diarios = [hoy - timedelta(days=i) for i in range(6, -1, -1)]
+    return {
+        'semanal': (list(DIAS_SEMANA), [lunes + timedelta(days=i) for i in range(5)]),
+        'mensual': ([d.strftime('%d/%m') for d in dias_mes], dias_mes),
+        'diario': ([d.strftime('%a %d') for d in dias_diarios], dias_diarios)
+    }
+
+
+def conteos_asistencia(cursos_ids, anio_lectivo, ventanas, rango_periodo=None):
+    """
+    Cuenta las asistencias de los cursos en todas las fechas de `ventanas` con una sola
+    consulta al resumen de asistencias, agrupada por curso, fecha y estado. Si se indica
+    `rango_periodo` (fecha_inicio, fecha_fin) solo se cuentan las fechas dentro del período.
+    Devuelve {(id_curso, fecha): {estado: total}}.
+    """
+    fechas = [fecha for _, fechas_ventana in ventanas.values() for fecha in fechas_ventana]
+    if not cursos_ids or not fechas:
+        return {}
+    desde, hasta = min(fechas), max(fechas)
+    if rango_periodo:
+        desde, hasta = max(desde, rango_periodo[0]), min(hasta, rango_periodo[1])
+        if desde > hasta:
+            return {}
+
+    filas = db.session.query(
+        AsistenciaResumen.id_curso,
+        AsistenciaResumen.fecha,
+        AsistenciaResumen.estado,
+        func.sum(AsistenciaResumen.total)
+    ).filter(
+        AsistenciaResumen.id_curso.in_(cursos_ids),
+        AsistenciaResumen.anio_lectivo == anio_lectivo,
+        AsistenciaResumen.fecha >= desde,
+        AsistenciaResumen.fecha <= hasta
+    ).group_by(AsistenciaResumen.id_curso, AsistenciaResumen.fecha, AsistenciaResumen.estado).all()
+
+    conteos = {}
+    for curso_id, fecha, estado, total in filas:
+        conteos.setdefault((curso_id, fecha), {})[estado] = int(total or 0)
+    return conteos
+
+
+def series_asistencia(conteos, curso_id, ventanas, estados=ESTADOS_PRESENTES):
+    """Arma las series {nombre: {'labels', 'data'}} de un curso a partir de conteos_asistencia"""
+    series = {}
+    for nombre, (etiquetas, fechas) in ventanas.items():
+        datos = []
+        for fecha in fechas:
+            por_estado = conteos.get((curso_id, fecha), {})
+            datos.append(sum(por_estado.get(estado, 0) for estado in estados))
+        series[nombre] = {'labels': list(etiquetas), 'data': datos}
+    return series
+
+
+VENTANAS_RENDIMIENTO = ('semanal', 'mensual', 'diario')
+TITULOS_VENTANAS_RENDIMIENTO = {'semanal': 'Semana actual', 'mensual': 'Mes actual', 'diario': 'Últimos 7 días'}
+
+
+def rango_periodo_activo(anio_lectivo):
+    """(fecha_inicio, fecha_fin) del período activo del año lectivo en el año en curso, o None"""
+    contexto = contexto_academico()
+    if anio_lectivo and anio_lectivo == contexto.anio:
+        anio_periodo = contexto.anio_periodo
+    else:
+        anio_periodo = AnioPeriodo.query.filter_by(anio_lectivo=anio_lectivo, estado='activo').first() if anio_lectivo else None
+    if not anio_periodo:
+        return None
+    anio_actual = date.today().year
+    inicio = date(anio_actual, int(anio_periodo.fecha_inicio[:2]), int(anio_periodo.fecha_inicio[3:]))
+    fin = date(anio_actual, int(anio_periodo.fecha_fin[:2]), int(anio_periodo.fecha_fin[3:]))
+    if fin < inicio:
+        fin = fin.replace(year=anio_actual + 1)
+    return inicio, fin
+
+
+def ventanas_rendimiento(hoy=None):
+    """Rangos de fechas (desde, hasta) de la semana actual, el mes actual y los últimos 7 días"""
+    hoy = hoy or date.today()
+    lunes = hoy - timedelta(days=hoy.weekday())
+    primer_dia_mes = hoy.replace(day=1)
+    siguiente_mes = (primer_dia_mes + timedelta(days=32)).replace(day=1)
+    return {
+        'semanal': (lunes, lunes + timedelta(days=6)),
+        'mensual': (primer_dia_mes, siguiente_mes - timedelta(days=1)),
+        'diario': (hoy - timedelta(days=7), hoy)
+    }
+
+
+class MatrizRendimiento:
+    """
+    Promedio de notas por curso × asignatura × ventana de tiempo.
+
+    `sumas` y `conteos` son arreglos NumPy con esa forma; el promedio de una celda es
+    sumas / conteos (NaN si no hay notas) y `asignada` marca qué asignaturas tiene cada
+    curso en el año lectivo. Guardar sumas y conteos permite obtener el promedio general
+    de varios cursos ponderado por la cantidad de notas.
+    """
+
+    def __init__(self, cursos, asignaturas, asignada, sumas, conteos, ventanas=VENTANAS_RENDIMIENTO):
+        self.cursos = cursos  # [(id, nombre)]
+        self.asignaturas = asignaturas  # [(id, nombre)]
+        self.ventanas = list(ventanas)
+        self.asignada = asignada
+        self.sumas = sumas
+        self.conteos = conteos
+        self._indice_curso = {curso_id: i for i, (curso_id, _) in enumerate(cursos)}
+
+    @property
+    def promedios(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.conteos > 0, self.sumas / np.maximum(self.conteos, 1), np.nan)
+
+    def _series(self, columnas, sumas, conteos):
+        etiquetas = [self.asignaturas[j][1][:15] + '...' for j in columnas]
+        series = {}
+        for k, ventana in enumerate(self.ventanas):
+            valores = np.where(conteos[columnas, k] > 0, sumas[columnas, k] / np.maximum(conteos[columnas, k], 1), 0.0)
+            series[ventana] = {'labels': list(etiquetas), 'data': [round(float(v), 2) for v in valores]}
+        return series
+
+    def series_curso(self, curso_id):
+        """Series {ventana: {'labels', 'data'}} del curso para la gráfica de rendimiento"""
+        i = self._indice_curso[curso_id]
+        columnas = np.flatnonzero(self.asignada[i])
+        return self._series(columnas, self.sumas[i], self.conteos[i])
+
+    def series_generales(self, cursos_ids=None):
+        """Series de todas las asignaturas de los cursos indicados (o todos) ponderadas por nota"""
+        filas = [self._indice_curso[c] for c in (cursos_ids if cursos_ids is not None else self._indice_curso)]
+        columnas = np.flatnonzero(self.asignada[filas].any(axis=0))
+        return self._series(columnas, self.sumas[filas].sum(axis=0), self.conteos[filas].sum(axis=0))
+
+    def tabla(self, cursos_ids=None):
+        """
+        Filas (curso, asignatura, promedio por ventana...) de las asignaturas de cada curso, para
+        reportes. Los promedios sin notas quedan en None.
+        """
+        promedios = self.promedios
+        filas = []
+        for curso_id, nombre_curso in self.cursos:
+            if cursos_ids is not None and curso_id not in cursos_ids:
+                continue
+            i = self._indice_curso[curso_id]
+            for j in np.flatnonzero(self.asignada[i]):
+                valores = [None if np.isnan(v) else round(float(v), 2) for v in promedios[i, j]]
+                filas.append((nombre_curso, self.asignaturas[j][1], *valores))
+        return filas
+
+
+def matriz_rendimiento(cursos, anio_lectivo, rango_periodo=None, hoy=None):
+    """
+    Calcula la MatrizRendimiento de los cursos (objetos Curso) con una consulta agrupada por
+    curso y asignatura en cada ventana, sin importar cuántas asignaturas haya.
+    """
+    cursos = [(curso.id, curso.nombre) for curso in cursos]
+    cursos_ids = [curso_id for curso_id, _ in cursos]
+    asignaciones = db.session.query(Asignacion.id_curso, Asignatura.id, Asignatura.nombre).join(
+        Asignatura, Asignacion.id_asignatura == Asignatura.id
+    ).filter(
+        Asignacion.id_curso.in_(cursos_ids),
+        Asignacion.anio_lectivo == anio_lectivo
+    ).distinct().all() if cursos_ids else []
+
+    asignaturas = sorted({(asignatura_id, nombre) for _, asignatura_id, nombre in asignaciones}, key=lambda a: (a[1], a[0]))
+    indice_curso = {curso_id: i for i, curso_id in enumerate(cursos_ids)}
+    indice_asignatura = {asignatura_id: j for j, (asignatura_id, _) in enumerate(asignaturas)}
+
+    forma = (len(cursos), len(asignaturas), len(VENTANAS_RENDIMIENTO))
+    asignada = np.zeros(forma[:2], dtype=bool)
+    sumas = np.zeros(forma)
+    conteos = np.zeros(forma, dtype=np.int64)
+    for curso_id, asignatura_id, _ in asignaciones:
+        asignada[indice_curso[curso_id], indice_asignatura[asignatura_id]] = True
+
+    rangos = ventanas_rendimiento(hoy)
+    for k, ventana in enumerate(VENTANAS_RENDIMIENTO):
+        if not asignaturas:
+            break
+        desde, hasta = rangos[ventana]
+        if rango_periodo:
+            desde, hasta = max(desde, rango_periodo[0]), min(hasta, rango_periodo[1])
+            if desde > hasta:
+                continue
+        filas = db.session.query(
+            Asignacion.id_curso,
+            Asignacion.id_asignatura,
+            func.sum(Calificacion.nota),
+            func.count(Calificacion.nota)
+        ).join(Asignacion, Calificacion.id_asignacion == Asignacion.id).join(
+            Matricula, Calificacion.id_matricula == Matricula.id
+        ).filter(
+            Asignacion.id_curso.in_(cursos_ids),
+            Asignacion.anio_lectivo == anio_lectivo,
+            Matricula.año_lectivo == anio_lectivo,
+            Calificacion.fecha_calificacion >= desde,
+            Calificacion.fecha_calificacion <= hasta
+        ).group_by(Asignacion.id_curso, Asignacion.id_asignatura).all()
+        for curso_id, asignatura_id, suma, conteo in filas:
+            if asignatura_id in indice_asignatura:
+                sumas[indice_curso[curso_id], indice_asignatura[asignatura_id], k] = float(suma or 0)
+                conteos[indice_curso[curso_id], indice_asignatura[asignatura_id], k] = conteo
+
+    return MatrizRendimiento(cursos, asignaturas, asignada, sumas, conteos)
@@ -0,0 +1,152 @@
+"""
+Eventos en vivo para el navegador (Server-Sent Events).
+
+Cada pestaña abierta mantiene una conexión a /eventos/ en lugar de consultar el contador de
+notificaciones y el progreso de sus trabajos cada pocos segundos. Dentro de cada proceso web
+hay un canal de publicación/suscripción en memoria: las conexiones se suscriben por usuario
+y un único vigilante en segundo plano revisa, cada EVENTOS_INTERVALO segundos, los
+contadores de notificaciones y los trabajos de todos los usuarios conectados con dos
+consultas, sin importar cuántas pestañas haya. Solo se publica lo que cambió.
+
+Los trabajos los actualizan los procesos de worker.py y los contadores cualquier proceso
+web, por eso el vigilante lee de la base de datos en lugar de esperar avisos del mismo
+proceso. Usa threading y queue, así que con workers gevent (gunicorn -k gevent) el
+vigilante y las conexiones abiertas son greenlets y no ocupan un hilo cada una.
+"""
+import json
+import queue
+import threading
+import time
+from flask import current_app
+from sqlalchemy import or_
+from app import db
+from app.models import NotificacionEstado, Trabajo
+
+_suscripciones = {}  # {id_usuario: set(Suscripcion)}
+_candado = threading.Lock()
+_vigilante = None
+
+
+class Suscripcion:
+    """Cola de eventos de una conexión abierta"""
+
+    def __init__(self, usuario_id):
+        self.usuario_id = usuario_id
+        self.cola = queue.Queue(maxsize=100)
+
+    def enviar(self, evento, datos):
+        try:
+            self.cola.put_nowait((evento, datos))
+        except queue.Full:
+            pass  # El cliente no está leyendo; recibirá el estado completo al reconectarse
+
+    def esperar(self, timeout):
+        """Siguiente (evento, datos) o None si no llegó nada en `timeout` segundos"""
+        try:
+            return self.cola.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+def suscribir(usuario_id):
+    """Registra una conexión del usuario y arranca el vigilante del proceso si hace falta"""
+    suscripcion = Suscripcion(usuario_id)
+    with _candado:
+        _suscripciones.setdefault(usuario_id, set()).add(suscripcion)
+    _iniciar_vigilante(current_app._get_current_object())
+    return suscripcion
+
+
+def cancelar_suscripcion(suscripcion):
+    with _candado:
+        conexiones = _suscripciones.get(suscripcion.usuario_id)
+        if conexiones:
+            conexiones.discard(suscripcion)
+            if not conexiones:
+                _suscripciones.pop(suscripcion.usuario_id, None)
+
+
+def publicar(usuario_id, evento, datos):
+    """Envía un evento a todas las conexiones del usuario en este proceso"""
+    with _candado:
+        conexiones = list(_suscripciones.get(usuario_id, ()))
+    for suscripcion in conexiones:
+        suscripcion.enviar(evento, datos)
+
+
+def usuarios_conectados():
+    with _candado:
+        return list(_suscripciones)
+
+
+def formatear_evento(evento, datos):
+    """Mensaje SSE listo para escribir en la respuesta"""
+    return f"event: {evento}\ndata: {json.dumps(datos)}\n\n"
+
+
+class _Vigilante(threading.Thread):
+    """Revisa la base de datos para los usuarios conectados y publica los cambios"""
+
+    def __init__(self, app):
+        super().__init__(name='eventos-vigilante', daemon=True)
+        self.app = app
+        self.no_leidas = {}  # {id_usuario: contador publicado}
+        self.trabajos = {}  # {id_trabajo: (estado, progreso, mensaje)} de trabajos no finalizados
+
+    def run(self):
+        intervalo = self.app.config.get('EVENTOS_INTERVALO', 2)
+        while True:
+            time.sleep(intervalo)
+            usuarios = usuarios_conectados()
+            if not usuarios:
+                break
+            with self.app.app_context():
+                try:
+                    self.revisar(usuarios)
+                except Exception as e:
+                    db.session.rollback()
+                    current_app.logger.error(f"Error al revisar eventos: {e}", exc_info=True)
+                finally:
+                    db.session.remove()
+        _terminar_vigilante(self)
+
+    def revisar(self, usuarios):
+        filas = db.session.query(NotificacionEstado.id_usuario, NotificacionEstado.no_leidas).filter(
+            NotificacionEstado.id_usuario.in_(usuarios)
+        ).all()
+        for usuario_id, no_leidas in filas:
+            if self.no_leidas.get(usuario_id) != no_leidas:
+                publicar(usuario_id, 'notificaciones', {'count': no_leidas})
+        self.no_leidas = dict(filas)
+
+        # Trabajos en curso de los usuarios conectados y los que estaban en curso en la revisión anterior
+        condicion = Trabajo.estado.in_(('pendiente', 'en_proceso'))
+        if self.trabajos:
+            condicion = or_(condicion, Trabajo.id.in_(list(self.trabajos)))
+        en_curso = {}
+        for trabajo in Trabajo.query.filter(Trabajo.id_usuario.in_(usuarios), condicion).all():
+            firma = (trabajo.estado, trabajo.progreso, trabajo.mensaje)
+            if self.trabajos.get(trabajo.id) != firma:
+                publicar(trabajo.id_usuario, 'trabajo', trabajo.to_dict())
+            if not trabajo.finalizado:
+                en_curso[trabajo.id] = firma
+        self.trabajos = en_curso
+
+
+def _iniciar_vigilante(app):
+    global _vigilante
+    with _candado:
+        if _vigilante is None or not _vigilante.is_alive():
+            _vigilante = _Vigilante(app)
+            _vigilante.start()
+
+
+def _terminar_vigilante(vigilante):
+    """El vigilante sale cuando no queda nadie conectado; si alguien llegó justo ahora, se reinicia"""
+    global _vigilante
+    with _candado:
+        if _vigilante is vigilante:
+            _vigilante = None
+        reiniciar = bool(_suscripciones)
+    if reiniciar:
+        _iniciar_vigilante(vigilante.app)
@@ -0,0 +1,82 @@
+"""
+Libro final: promedio del año de cada estudiante de un curso y su estado de aprobación.
+
+Los estudiantes y sus notas llegan en una sola lectura (las notas ya sumadas por
+estudiante, asignatura y período en la base de datos) y el resto se calcula con pandas:
+un pivote estudiante × (asignatura, período) de sumas y cantidades de notas del que salen
+el promedio final y el estado de todos los estudiantes a la vez.
+"""
+import numpy as np
+import pandas as pd
+from sqlalchemy import func
+from app import db
+from app.models import Asignacion, Calificacion, Matricula
+
+COLUMNAS = ['id', 'nombres', 'apellidos', 'documento', 'foto', 'id_asignatura', 'id_periodo', 'suma', 'cantidad']
+
+
+def _leer_notas(curso_id, anio_lectivo):
+    """Una fila por estudiante activo del curso y por cada (asignatura, período) con notas"""
+    notas = db.session.query(
+        Calificacion.id_matricula,
+        Asignacion.id_asignatura,
+        Calificacion.id_periodo,
+        func.sum(Calificacion.nota).label('suma'),
+        func.count(Calificacion.nota).label('cantidad')
+    ).join(Asignacion, Calificacion.id_asignacion == Asignacion.id).join(
+        Matricula, Calificacion.id_matricula == Matricula.id
+    ).filter(
+        Asignacion.anio_lectivo == anio_lectivo,
+        Matricula.id_curso == curso_id
+    ).group_by(Calificacion.id_matricula, Asignacion.id_asignatura, Calificacion.id_periodo).subquery()
+
+    filas = db.session.query(
+        Matricula.id, Matricula.nombres, Matricula.apellidos, Matricula.documento, Matricula.foto,
+        notas.c.id_asignatura, notas.c.id_periodo, notas.c.suma, notas.c.cantidad
+    ).outerjoin(notas, Matricula.id == notas.c.id_matricula).filter(
+        Matricula.id_curso == curso_id,
+        Matricula.estado == 'activo',
+        Matricula.año_lectivo == anio_lectivo
+    ).order_by(Matricula.apellidos, Matricula.nombres, Matricula.id).all()
+    return pd.DataFrame.from_records(filas, columns=COLUMNAS)
+
+
+def pivote_notas(filas):
+    """
+    Sumas y cantidades de notas como pivote estudiante × (asignatura, período). Los
+    estudiantes sin notas quedan con una fila de ceros.
+    """
+    con_notas = filas.dropna(subset=['id_asignatura'])
+    sumas = con_notas.pivot_table(index='id', columns=['id_asignatura', 'id_periodo'],
+                                  values='suma', aggfunc='sum', fill_value=0)
+    cantidades = con_notas.pivot_table(index='id', columns=['id_asignatura', 'id_periodo'],
+                                       values='cantidad', aggfunc='sum', fill_value=0)
+    estudiantes = filas['id'].unique()
+    return sumas.reindex(estudiantes, fill_value=0), cantidades.reindex(estudiantes, fill_value=0)
+
+
+def tabla_libro_final(curso_id, anio_lectivo, nota_basico):
+    """
+    DataFrame con una fila por estudiante activo del curso, en orden alfabético: id,
+    nombres, documento, foto, promedio_final (promedio de todas sus notas del año,
+    redondeado a un decimal, 0.0 sin notas) y estado ('Aprobado', 'No Aprobado' o
+    'Sin Calificar').
+    """
+    filas = _leer_notas(curso_id, anio_lectivo)
+    sumas, cantidades = pivote_notas(filas)
+    # Las notas tienen pocos decimales: redondear la suma quita el ruido de sumar en otro
+    # orden, así un promedio justo en la mitad (2.95) no se redondea distinto según el orden
+    total = sumas.sum(axis=1).astype(float).round(6)
+    notas = cantidades.sum(axis=1)
+    promedio = (total / notas.where(notas > 0)).map(lambda p: round(p, 1), na_action='ignore')
+
+    tabla = filas.drop_duplicates('id').set_index('id', drop=False)[['id', 'nombres', 'apellidos', 'documento', 'foto']]
+    tabla['nombres'] = tabla['nombres'] + ' ' + tabla['apellidos']
+    tabla['foto'] = tabla['foto'].fillna('default-profile.png').replace('', 'default-profile.png')
+    tabla['promedio_final'] = promedio.fillna(0.0)
+    tabla['estado'] = np.select(
+        [promedio.isna(), promedio >= nota_basico],
+        ['Sin Calificar', 'Aprobado'],
+        default='No Aprobado'
+    )
+    return tabla.drop(columns='apellidos').reset_index(drop=True)
@@ -1,17 +1,18 @@
-from datetime import datetime, timedelta
 from functools import wraps
-from flask import current_app
 import logging
+from app.utils.cache import espacio
 
 
 CACHE_KEY = 'MATRICULAS_DATA'
 
 logger = logging.getLogger(__name__)
 
+_cache = espacio('matriculas')
+
 def clear_matriculas_cache():
     """Limpia completamente la cache de matrículas"""
     try:
-        current_app.config.pop('MATRICULAS_CACHE', None)
+        _cache.invalidar()
         logger.debug("Cache de matrículas limpiada")
     except Exception as e:
         logger.error(f"Error limpiando cache: {str(e)}")
@@ -20,18 +21,11 @@ def clear_matriculas_cache():
         
 def cache_matriculas_data(data):
     """Almacena datos de matrículas en cache con timeout"""
-    current_app.config[CACHE_KEY] = {
-        'data': data,
-        'timestamp': datetime.now().isoformat(),
-        'expires_at': (datetime.now() + timedelta(hours=1)).isoformat()
-    }
+    _cache.set(CACHE_KEY, data, ttl=3600)
 
 def get_cached_matriculas():
     """Obtiene matrículas desde cache si no han expirado"""
-    cached = current_app.config.get(CACHE_KEY)
-    if cached and datetime.fromisoformat(cached['expires_at']) > datetime.now():
-        return cached['data']
-    return None        
+    return _cache.get(CACHE_KEY)
 
 
 def matriculas_cache_decorator(func):
@@ -41,26 +35,11 @@ def matriculas_cache_decorator(func):
         cache_key = f"matriculas_{kwargs.get('page',1)}_{kwargs.get('estado','')}_{kwargs.get('curso','')}"
         
         try:
-            # Intentar obtener de cache
-            cached = current_app.config.get('MATRICULAS_CACHE', {}).get(cache_key)
-            if cached and datetime.now() < cached['expires']:
-                logger.debug("Retornando matrículas desde cache")
-                return cached['data']
-                
-            # Ejecutar función si no hay cache válida
-            result = func(*args, **kwargs)
-            
-            # Guardar en cache
-            cache_data = {
-                'data': result,
-                'expires': datetime.now() + timedelta(minutes=30)
-            }
-            current_app.config.setdefault('MATRICULAS_CACHE', {})[cache_key] = cache_data
-            
-            return result
+            # Ejecutar la función solo si no hay cache válida
+            return _cache.obtener(cache_key, lambda: func(*args, **kwargs), ttl=1800)
             
         except Exception as e:
             logger.error(f"Error en cache decorator: {str(e)}")
             return func(*args, **kwargs)
             
-    return wrapper    
\ No newline at end of file
+    return wrapper
@@ -0,0 +1,91 @@
+"""
+Estado de lectura de las notificaciones (actividades) guardado en el servidor.
+
+Cada usuario tiene una fila en `notificaciones_estado` con la marca de la última vez que
+abrió las notificaciones y un contador de no leídas que mantienen los eventos de
+Actividad; las que marca como leídas se guardan en `notificaciones_ocultas`. La sesión ya
+no guarda listas de IDs.
+
+Un usuario ve las actividades de asignaciones que no creó él: los administradores todas,
+los docentes solo las de sus asignaciones.
+"""
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import Actividad, Asignacion, NotificacionEstado, NotificacionOculta
+
+
+def filtrar_visibles(query, usuario):
+    """Restringe una consulta de Actividad (ya unida con Asignacion) a lo que el usuario puede ver"""
+    query = query.filter(Actividad.creado_por != usuario.id)
+    if usuario.rol == 'docente':
+        query = query.filter(Asignacion.id_docente == usuario.id)
+    return query
+
+
+def excluir_ocultas(query, usuario_id):
+    """Quita de una consulta de Actividad las que el usuario marcó como leídas"""
+    ocultas = db.session.query(NotificacionOculta.id_actividad).filter(NotificacionOculta.id_usuario == usuario_id)
+    return query.filter(Actividad.id.notin_(ocultas))
+
+
+def contar_no_leidas(usuario, desde):
+    """Cuenta (recorriendo actividades) las visibles y no ocultas creadas después de `desde`"""
+    query = Actividad.query.join(Asignacion, Actividad.id_asignacion == Asignacion.id).filter(Actividad.creado_en > desde)
+    query = excluir_ocultas(filtrar_visibles(query, usuario), usuario.id)
+    return query.count()
+
+
+def _crear_estado(usuario):
+    """
+    Primera vez: el contador arranca con lo nuevo de las últimas 24 horas. Se inserta por una
+    conexión propia para no confirmar lo que la petición tenga pendiente en la sesión.
+    """
+    vistas_hasta = datetime.utcnow() - timedelta(days=1)
+    tabla = NotificacionEstado.__table__
+    try:
+        with db.engine.begin() as conexion:
+            conexion.execute(tabla.insert().values(
+                id_usuario=usuario.id,
+                vistas_hasta=vistas_hasta,
+                no_leidas=contar_no_leidas(usuario, vistas_hasta),
+                actualizado_en=datetime.utcnow()
+            ))
+    except IntegrityError:
+        pass  # Otra petición la creó al mismo tiempo
+
+
+def obtener_estado(usuario):
+    estado = db.session.get(NotificacionEstado, usuario.id)
+    if estado is None:
+        _crear_estado(usuario)
+        estado = db.session.get(NotificacionEstado, usuario.id)
+    return estado
+
+
+def notificaciones_no_leidas(usuario):
+    """Cantidad de notificaciones nuevas del usuario (una lectura por clave primaria)"""
+    estado = obtener_estado(usuario)
+    return estado.no_leidas if estado else 0
+
+
+def marcar_vistas(usuario):
+    """El usuario abrió las notificaciones: avanza su marca y reinicia el contador"""
+    estado = obtener_estado(usuario)
+    estado.vistas_hasta = datetime.utcnow()
+    estado.no_leidas = 0
+    db.session.commit()
+
+
+def ocultar_todas(usuario):
+    """Marca como leídas todas las actividades que el usuario ve hoy; las futuras seguirán apareciendo"""
+    estado = obtener_estado(usuario)
+    visibles = excluir_ocultas(
+        filtrar_visibles(Actividad.query.join(Asignacion, Actividad.id_asignacion == Asignacion.id), usuario),
+        usuario.id
+    ).with_entities(db.literal(usuario.id), Actividad.id, db.literal(datetime.utcnow()))
+    db.session.execute(NotificacionOculta.__table__.insert().from_select(
+        ['id_usuario', 'id_actividad', 'creado_en'], visibles.statement
+    ))
+    estado.no_leidas = 0
+    db.session.commit()
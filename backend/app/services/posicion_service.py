@@ -0,0 +1,316 @@
+import base64
+import json
+import sqlite3
+from sqlalchemy import and_, func, or_
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import AnioPeriodo, Curso, Matricula, Periodo, PosicionCurso
+from app.services.boletin_service import asignaciones_activas_por_asignatura, promedios_por_asignatura, rango_fechas_periodo
+
+
+def calcular_posiciones_curso(curso_id, periodo_id, anio_lectivo):
+    """
+    Calcula y guarda el puesto de cada estudiante activo del curso en el período.
+
+    El promedio es el mismo del boletín: la media de los promedios del período en cada
+    asignatura activa del curso (0.0 si no tiene notas en ella). Los empates comparten
+    puesto. Devuelve {id_matricula: PosicionCurso}.
+    """
+    anio_lectivo = int(anio_lectivo)
+    anio_periodo = AnioPeriodo.query.filter_by(anio_lectivo=anio_lectivo, periodo_id=periodo_id).first()
+    if not anio_periodo:
+        return {}
+
+    try:
+        fecha_inicio, fecha_fin = rango_fechas_periodo(anio_lectivo, anio_periodo)
+    except (ValueError, TypeError):
+        periodo = Periodo.query.get(periodo_id)
+        raise ValueError(f"Las fechas del período '{periodo.nombre if periodo else 'ID:'+str(periodo_id)}' no están configuradas correctamente.")
+
+    matriculas_ids = [mid for (mid,) in db.session.query(Matricula.id).filter(
+        Matricula.id_curso == curso_id,
+        Matricula.año_lectivo == anio_lectivo,
+        Matricula.estado == 'activo'
+    ).all()]
+    asignaturas_ids = list(asignaciones_activas_por_asignatura(curso_id, anio_lectivo).keys())
+    promedios = promedios_por_asignatura(matriculas_ids, asignaturas_ids, anio_lectivo, fecha_inicio, fecha_fin)
+
+    calculo = []
+    for mid in matriculas_ids:
+        notas = [round(promedios[(mid, aid)], 2) if (mid, aid) in promedios else 0.0 for aid in asignaturas_ids]
+        promedio = round(sum(notas) / len(notas), 2) if notas else 0.0
+        cantidad = sum(1 for aid in asignaturas_ids if (mid, aid) in promedios)
+        calculo.append((mid, promedio, cantidad))
+    calculo.sort(key=lambda x: x[1], reverse=True)
+
+    posiciones = {}
+    puesto = 0
+    promedio_anterior = None
+    for indice, (mid, promedio, cantidad) in enumerate(calculo, start=1):
+        if promedio != promedio_anterior:
+            puesto = indice
+            promedio_anterior = promedio
+        posiciones[mid] = PosicionCurso(
+            id_curso=curso_id, id_periodo=periodo_id, anio_lectivo=anio_lectivo,
+            id_matricula=mid, puesto=puesto, promedio=promedio, cantidad_asignaturas=cantidad
+        )
+
+    # 'fetch' saca de la sesión las filas ya cargadas del ranking anterior
+    PosicionCurso.query.filter_by(
+        id_curso=curso_id, id_periodo=periodo_id, anio_lectivo=anio_lectivo
+    ).delete(synchronize_session='fetch')
+    db.session.add_all(posiciones.values())
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Otra petición guardó el mismo ranking al mismo tiempo: usar el suyo
+        db.session.rollback()
+        return {p.id_matricula: p for p in PosicionCurso.query.filter_by(
+            id_curso=curso_id, id_periodo=periodo_id, anio_lectivo=anio_lectivo
+        ).all()}
+
+    return posiciones
+
+
+def _matriculas_activas_por_curso(cursos_ids, anio_lectivo):
+    """{id_curso: {id_matricula}} de las matrículas activas de los cursos en el año"""
+    activas = {curso_id: set() for curso_id in cursos_ids}
+    for curso_id, matricula_id in db.session.query(Matricula.id_curso, Matricula.id).filter(
+        Matricula.id_curso.in_(cursos_ids),
+        Matricula.año_lectivo == anio_lectivo,
+        Matricula.estado == 'activo'
+    ).all():
+        activas[curso_id].add(matricula_id)
+    return activas
+
+
+def obtener_posiciones_curso(curso_id, periodo_id, anio_lectivo):
+    """
+    Devuelve {id_matricula: PosicionCurso} del curso en el período.
+
+    Lee el ranking guardado y lo calcula de nuevo si no existe, si fue descartado por un
+    cambio de notas o si sus matrículas ya no son las activas del curso (retiros,
+    transferencias, matrículas nuevas).
+    """
+    anio_lectivo = int(anio_lectivo)
+    posiciones = {p.id_matricula: p for p in PosicionCurso.query.filter_by(
+        id_curso=curso_id, id_periodo=periodo_id, anio_lectivo=anio_lectivo
+    ).all()}
+    if posiciones and set(posiciones) == _matriculas_activas_por_curso([curso_id], anio_lectivo)[curso_id]:
+        return posiciones
+    return calcular_posiciones_curso(curso_id, periodo_id, anio_lectivo)
+
+
+def asegurar_posiciones(cursos_ids, periodo_id, anio_lectivo):
+    """
+    Calcula el ranking de los cursos indicados que no lo tienen guardado o cuyo ranking
+    guardado no corresponde a sus matrículas activas
+    """
+    if not cursos_ids:
+        return
+    anio_lectivo = int(anio_lectivo)
+    guardadas = {curso_id: set() for curso_id in cursos_ids}
+    for curso_id, matricula_id in db.session.query(PosicionCurso.id_curso, PosicionCurso.id_matricula).filter(
+        PosicionCurso.id_curso.in_(cursos_ids),
+        PosicionCurso.id_periodo == periodo_id,
+        PosicionCurso.anio_lectivo == anio_lectivo
+    ).all():
+        guardadas[curso_id].add(matricula_id)
+
+    for curso_id, activas in _matriculas_activas_por_curso(cursos_ids, anio_lectivo).items():
+        if activas and guardadas[curso_id] != activas:
+            calcular_posiciones_curso(curso_id, periodo_id, anio_lectivo)
+
+
+def _consulta_posiciones(periodo_id, anio_lectivo, cursos_ids, *columnas):
+    """
+    Consulta de `columnas` sobre las posiciones de las matrículas activas con al menos una
+    asignatura calificada. Sin cursos se incluyen todos los cursos con matrículas activas
+    en el año; antes de consultar se calcula el ranking de los cursos que no lo tengan.
+    """
+    anio_lectivo = int(anio_lectivo)
+    if cursos_ids is None:
+        cursos_ids = [cid for (cid,) in db.session.query(Matricula.id_curso).filter(
+            Matricula.año_lectivo == anio_lectivo,
+            Matricula.estado == 'activo'
+        ).distinct().all()]
+
+    asegurar_posiciones(cursos_ids, periodo_id, anio_lectivo)
+
+    return db.session.query(*columnas).select_from(PosicionCurso).join(
+        Matricula, PosicionCurso.id_matricula == Matricula.id
+    ).join(
+        Curso, PosicionCurso.id_curso == Curso.id
+    ).filter(
+        PosicionCurso.id_curso.in_(cursos_ids),
+        PosicionCurso.id_periodo == periodo_id,
+        PosicionCurso.anio_lectivo == anio_lectivo,
+        PosicionCurso.cantidad_asignaturas >= 1,
+        Matricula.estado == 'activo'
+    )
+
+
+def consultar_posiciones(periodo_id, anio_lectivo, cursos_ids=None):
+    """
+    Consulta ordenada por promedio de (PosicionCurso, Matricula, nombre del curso) de las
+    matrículas activas con al menos una asignatura calificada. Sin cursos se incluyen todos
+    los cursos con matrículas activas en el año.
+    """
+    return _consulta_posiciones(
+        periodo_id, anio_lectivo, cursos_ids,
+        PosicionCurso, Matricula, Curso.nombre.label('curso_nombre')
+    ).order_by(PosicionCurso.promedio.desc(), Matricula.apellidos.asc(), Matricula.nombres.asc(), Matricula.id.asc())
+
+
+def codificar_cursor(posicion, matricula):
+    """Cursor opaco con la clave de orden (promedio, apellidos, nombres, id) de una fila del ranking"""
+    clave = [posicion.promedio, matricula.apellidos, matricula.nombres, matricula.id]
+    return base64.urlsafe_b64encode(json.dumps(clave).encode('utf-8')).decode('ascii')
+
+
+def decodificar_cursor(cursor):
+    try:
+        promedio, apellidos, nombres, matricula_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return float(promedio), str(apellidos), str(nombres), int(matricula_id)
+    except (ValueError, TypeError, UnicodeError):
+        raise ValueError('Cursor de paginación inválido.')
+
+
+def _despues_de(columnas, clave):
+    """Filas que van después de `clave` en el orden promedio desc, apellidos, nombres, id"""
+    promedio, apellidos, nombres, matricula_id = columnas
+    p, a, n, i = clave
+    return or_(promedio < p, and_(promedio == p, or_(
+        apellidos > a, and_(apellidos == a, or_(
+            nombres > n, and_(nombres == n, matricula_id > i))))))
+
+
+def _antes_de(columnas, clave):
+    promedio, apellidos, nombres, matricula_id = columnas
+    p, a, n, i = clave
+    return or_(promedio > p, and_(promedio == p, or_(
+        apellidos < a, and_(apellidos == a, or_(
+            nombres < n, and_(nombres == n, matricula_id < i))))))
+
+
+def _soporta_funciones_ventana():
+    """RANK() y DENSE_RANK() existen desde SQLite 3.25, MySQL 8.0 y MariaDB 10.2"""
+    dialecto = db.engine.dialect
+    if dialecto.name == 'sqlite':
+        return sqlite3.sqlite_version_info >= (3, 25)
+    if dialecto.name in ('mysql', 'mariadb'):
+        version = dialecto.server_version_info or (0,)
+        return version >= ((10, 2) if getattr(dialecto, 'is_mariadb', False) else (8, 0))
+    return True
+
+
+def pagina_posiciones(periodo_id, anio_lectivo, cursos_ids=None, por_pagina=10, pagina=1, despues=None, antes=None):
+    """
+    Una página del ranking general de los cursos indicados.
+
+    El puesto es RANK() sobre el promedio (los empates comparten puesto) y el puesto denso
+    es DENSE_RANK(). La página se elige con un cursor (`despues`/`antes`, de codificar_cursor)
+    o por número de página; con funciones de ventana ninguna de las dos formas usa OFFSET y
+    el total sale de la misma consulta. Devuelve un diccionario con `filas` [(PosicionCurso, Matricula, curso_nombre,
+    puesto, puesto_denso)], `total`, `desde` (número de la primera fila, desde 1),
+    `hay_anterior` y `hay_siguiente`.
+    """
+    if _soporta_funciones_ventana():
+        filas, total, desde = _pagina_con_ventanas(periodo_id, anio_lectivo, cursos_ids, por_pagina, pagina, despues, antes)
+    else:
+        filas, total, desde = _pagina_sin_ventanas(periodo_id, anio_lectivo, cursos_ids, por_pagina, pagina, despues, antes)
+    return {
+        'filas': filas,
+        'total': total,
+        'desde': desde,
+        'hay_anterior': desde > 1,
+        'hay_siguiente': desde + len(filas) - 1 < total,
+    }
+
+
+def _pagina_con_ventanas(periodo_id, anio_lectivo, cursos_ids, por_pagina, pagina, despues, antes):
+    orden_promedio = PosicionCurso.promedio.desc()
+    ranking = _consulta_posiciones(
+        periodo_id, anio_lectivo, cursos_ids,
+        PosicionCurso.id.label('id_posicion'),
+        PosicionCurso.promedio.label('promedio'),
+        Matricula.apellidos.label('apellidos'),
+        Matricula.nombres.label('nombres'),
+        Matricula.id.label('id_matricula'),
+        func.rank().over(order_by=orden_promedio).label('puesto'),
+        func.dense_rank().over(order_by=orden_promedio).label('puesto_denso'),
+        func.row_number().over(order_by=(
+            orden_promedio, Matricula.apellidos.asc(), Matricula.nombres.asc(), Matricula.id.asc()
+        )).label('fila'),
+        func.count().over().label('total')
+    ).subquery()
+    clave = (ranking.c.promedio, ranking.c.apellidos, ranking.c.nombres, ranking.c.id_matricula)
+
+    consulta = db.session.query(
+        PosicionCurso, Matricula, Curso.nombre.label('curso_nombre'),
+        ranking.c.puesto, ranking.c.puesto_denso, ranking.c.fila, ranking.c.total
+    ).select_from(ranking).join(
+        PosicionCurso, PosicionCurso.id == ranking.c.id_posicion
+    ).join(
+        Matricula, Matricula.id == ranking.c.id_matricula
+    ).join(
+        Curso, Curso.id == PosicionCurso.id_curso
+    )
+    if despues:
+        consulta = consulta.filter(_despues_de(clave, decodificar_cursor(despues))).order_by(ranking.c.fila)
+    elif antes:
+        consulta = consulta.filter(_antes_de(clave, decodificar_cursor(antes))).order_by(ranking.c.fila.desc())
+    else:
+        consulta = consulta.filter(ranking.c.fila > (max(pagina, 1) - 1) * por_pagina).order_by(ranking.c.fila)
+
+    resultados = consulta.limit(por_pagina).all()
+    if antes:
+        resultados.reverse()
+    if not resultados:
+        # Página fuera de rango: el total se consulta aparte
+        total = _consulta_posiciones(periodo_id, anio_lectivo, cursos_ids, func.count(PosicionCurso.id)).scalar()
+        return [], total, total + 1
+    filas = [(posicion, matricula, curso_nombre, puesto, puesto_denso)
+             for posicion, matricula, curso_nombre, puesto, puesto_denso, _, _ in resultados]
+    return filas, resultados[0].total, resultados[0].fila
+
+
+def _pagina_sin_ventanas(periodo_id, anio_lectivo, cursos_ids, por_pagina, pagina, despues, antes):
+    """
+    Alternativa para bases sin funciones de ventana: los puestos salen del conteo de
+    estudiantes por promedio (una fila por promedio distinto) y la página de la clave de orden.
+    """
+    conteos = _consulta_posiciones(
+        periodo_id, anio_lectivo, cursos_ids, PosicionCurso.promedio, func.count(PosicionCurso.id)
+    ).group_by(PosicionCurso.promedio).all()
+    puestos = {}
+    anteriores = 0
+    for denso, (promedio, cantidad) in enumerate(sorted(conteos, key=lambda c: c[0], reverse=True), start=1):
+        puestos[promedio] = (anteriores + 1, denso)
+        anteriores += cantidad
+    total = anteriores
+
+    consulta = consultar_posiciones(periodo_id, anio_lectivo, cursos_ids)
+    clave = (PosicionCurso.promedio, Matricula.apellidos, Matricula.nombres, Matricula.id)
+    if despues:
+        resultados = consulta.filter(_despues_de(clave, decodificar_cursor(despues))).limit(por_pagina).all()
+    elif antes:
+        resultados = consulta.filter(_antes_de(clave, decodificar_cursor(antes))).order_by(None).order_by(
+            PosicionCurso.promedio.asc(), Matricula.apellidos.desc(), Matricula.nombres.desc(), Matricula.id.desc()
+        ).limit(por_pagina).all()
+        resultados.reverse()
+    else:
+        resultados = consulta.offset((max(pagina, 1) - 1) * por_pagina).limit(por_pagina).all()
+
+    if not resultados:
+        return [], total, total + 1
+    if despues or antes:
+        primera = resultados[0]
+        desde = consultar_posiciones(periodo_id, anio_lectivo, cursos_ids).order_by(None).filter(
+            _antes_de(clave, (primera[0].promedio, primera[1].apellidos, primera[1].nombres, primera[1].id))
+        ).count() + 1
+    else:
+        desde = (max(pagina, 1) - 1) * por_pagina + 1
+    filas = [(posicion, matricula, curso_nombre, *puestos[posicion.promedio])
+             for posicion, matricula, curso_nombre in resultados]
+    return filas, total, desde
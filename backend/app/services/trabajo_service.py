@@ -0,0 +1,337 @@
+"""
+Cola de trabajos en segundo plano respaldada por la base de datos.
+
+Las exportaciones largas (ZIP de boletines y documentos, reportes en PDF) se guardan como
+filas de la tabla `trabajos` y las procesan los workers de `worker.py`, que reclaman cada
+trabajo con un UPDATE condicional sobre su estado. El progreso, la cancelación y el resultado
+quedan en la base de datos y en TRABAJOS_DIR, así que cualquier proceso web puede consultarlos
+y sobreviven a un reinicio. No se necesita un broker externo.
+
+Cada tipo de trabajo se registra con @registrar_trabajo en el módulo que genera la
+exportación. El manejador recibe los parámetros y un ContextoTrabajo, escribe su resultado
+en el directorio del trabajo y devuelve (archivo, nombre_descarga); los trabajos sin archivo
+devuelven (None, None) y pueden dejar un resumen en `contexto.mensaje_final`.
+
+Mientras un trabajo se ejecuta, un hilo de latido actualiza su fila cada
+TRABAJOS_LATIDO_SEGUNDOS aunque el manejador esté en una fase sin progreso; solo se
+reintentan los trabajos cuyo worker murió. Todas las escrituras del worker (latido, progreso,
+estado final) exigen que el trabajo siga siendo suyo: si otro worker lo tomó, el primero se
+detiene sin tocar el estado ni los archivos del nuevo intento, que usa su propio directorio.
+"""
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from app import db
+from app.models import Trabajo
+from app.utils.zip_streaming import generar_zip_streaming
+
+_manejadores = {}
+
+
+class TrabajoCancelado(Exception):
+    """El usuario pidió cancelar el trabajo mientras se ejecutaba"""
+
+
+class TrabajoPerdido(Exception):
+    """El trabajo dejó de pertenecer a este worker (se devolvió a la cola o ya terminó)"""
+
+
+def registrar_trabajo(tipo):
+    """Decorador que registra la función que ejecuta los trabajos de `tipo`"""
+    def decorador(funcion):
+        _manejadores[tipo] = funcion
+        return funcion
+    return decorador
+
+
+def _latir(trabajo_id, worker_id, **valores):
+    """
+    Actualiza la fila del trabajo (latido y los `valores` indicados) solo si sigue en proceso
+    a cargo de `worker_id`. Devuelve si el trabajo sigue siendo de este worker.
+    """
+    tabla = Trabajo.__table__
+    # Conexión propia: no confirma ni expira lo que el manejador tenga en la sesión
+    with db.engine.begin() as conexion:
+        actualizados = conexion.execute(
+            tabla.update().where(
+                tabla.c.id == trabajo_id,
+                tabla.c.worker == worker_id,
+                tabla.c.estado == 'en_proceso'
+            ).values(actualizado_en=datetime.utcnow(), **valores)
+        ).rowcount
+    return actualizados == 1
+
+
+class _Latido(threading.Thread):
+    """Hilo que mantiene vivo el latido del trabajo mientras el manejador se ejecuta"""
+
+    def __init__(self, app, trabajo_id, worker_id):
+        super().__init__(name=f'latido-{trabajo_id}', daemon=True)
+        self.app = app
+        self.trabajo_id = trabajo_id
+        self.worker_id = worker_id
+        self.intervalo = app.config.get('TRABAJOS_LATIDO_SEGUNDOS', 30)
+        self._detener = threading.Event()
+
+    def run(self):
+        with self.app.app_context():
+            while not self._detener.wait(self.intervalo):
+                try:
+                    if not _latir(self.trabajo_id, self.worker_id):
+                        return  # El siguiente reporte de progreso lanza TrabajoPerdido
+                except Exception as e:
+                    self.app.logger.warning(f"No se pudo registrar el latido del trabajo {self.trabajo_id}: {e}")
+
+    def detener(self):
+        self._detener.set()
+        self.join()
+
+
+class ContextoTrabajo:
+    """Lo que un manejador necesita mientras se ejecuta: directorio de salida y reporte de progreso"""
+
+    def __init__(self, trabajo_id, id_usuario, directorio, worker_id=None):
+        self.trabajo_id = trabajo_id
+        self.id_usuario = id_usuario
+        self.directorio = directorio
+        self.worker_id = worker_id
+        self.mensaje_final = None
+        self._ultimo_reporte = 0.0
+
+    def ruta(self, nombre):
+        return os.path.join(self.directorio, nombre)
+
+    def progreso(self, porcentaje, mensaje=None):
+        """
+        Guarda el avance del trabajo y lanza TrabajoCancelado si el usuario pidió cancelarlo
+        o TrabajoPerdido si el trabajo ya no es de este worker. Las escrituras se espacian
+        para no saturar la base de datos cuando hay muchos pasos cortos.
+        """
+        ahora = time.monotonic()
+        if ahora - self._ultimo_reporte < current_app.config.get('TRABAJOS_INTERVALO_PROGRESO', 1):
+            return
+        self._ultimo_reporte = ahora
+
+        if not _latir(self.trabajo_id, self.worker_id, progreso=max(0, min(int(porcentaje), 99)),
+                      mensaje=(mensaje or '')[:255] or None):
+            raise TrabajoPerdido()
+        tabla = Trabajo.__table__
+        with db.engine.connect() as conexion:
+            cancelar = conexion.execute(
+                db.select(tabla.c.cancelacion_solicitada).where(tabla.c.id == self.trabajo_id)
+            ).scalar()
+        if cancelar:
+            raise TrabajoCancelado()
+
+
+def directorio_trabajo(trabajo_id):
+    return os.path.join(current_app.config['TRABAJOS_DIR'], trabajo_id)
+
+
+def ruta_resultado(trabajo):
+    """Ruta del archivo generado por un trabajo completado o None si no existe"""
+    if trabajo.estado != 'completado' or not trabajo.archivo:
+        return None
+    ruta = os.path.join(directorio_trabajo(trabajo.id), trabajo.archivo)
+    return ruta if os.path.exists(ruta) else None
+
+
+def encolar_trabajo(tipo, parametros, usuario_id):
+    """Crea un trabajo pendiente; lo ejecutará el primer worker libre"""
+    if tipo not in _manejadores:
+        raise ValueError(f"Tipo de trabajo desconocido: {tipo}")
+    trabajo = Trabajo(
+        tipo=tipo,
+        parametros=json.dumps(parametros),
+        id_usuario=usuario_id,
+        mensaje='En cola...'
+    )
+    db.session.add(trabajo)
+    db.session.commit()
+    return trabajo
+
+
+def cancelar_trabajo(trabajo):
+    """
+    Cancela un trabajo. Si aún no empezó se marca cancelado de inmediato; si se está
+    ejecutando, el worker lo detiene en su siguiente reporte de progreso.
+    """
+    if trabajo.finalizado:
+        return False
+    actualizados = Trabajo.query.filter_by(id=trabajo.id, estado='pendiente').update({
+        'estado': 'cancelado',
+        'mensaje': 'Cancelado por el usuario.',
+        'finalizado_en': datetime.utcnow()
+    }, synchronize_session=False)
+    if not actualizados:
+        Trabajo.query.filter_by(id=trabajo.id, estado='en_proceso').update(
+            {'cancelacion_solicitada': True}, synchronize_session=False
+        )
+    db.session.commit()
+    db.session.refresh(trabajo)
+    return True
+
+
+def reclamar_trabajo(worker_id):
+    """
+    Toma el trabajo pendiente más antiguo. El UPDATE solo afecta la fila si sigue
+    pendiente, así que dos workers nunca ejecutan el mismo trabajo.
+    """
+    for _ in range(5):
+        candidato = db.session.query(Trabajo.id).filter_by(estado='pendiente') \
+            .order_by(Trabajo.creado_en).first()
+        if not candidato:
+            return None
+        ahora = datetime.utcnow()
+        reclamado = Trabajo.query.filter_by(id=candidato.id, estado='pendiente').update({
+            'estado': 'en_proceso',
+            'worker': worker_id,
+            'intentos': Trabajo.intentos + 1,
+            'iniciado_en': ahora,
+            'actualizado_en': ahora,
+            'mensaje': 'Iniciando...'
+        }, synchronize_session=False)
+        db.session.commit()
+        if reclamado:
+            return db.session.get(Trabajo, candidato.id)
+    return None
+
+
+def _finalizar(trabajo_id, worker_id, **valores):
+    """Guarda el estado final si el trabajo sigue en proceso a cargo de `worker_id`; devuelve si lo guardó"""
+    valores.setdefault('finalizado_en', datetime.utcnow())
+    actualizados = Trabajo.query.filter_by(id=trabajo_id, worker=worker_id, estado='en_proceso') \
+        .update(valores, synchronize_session=False)
+    db.session.commit()
+    if not actualizados:
+        current_app.logger.warning(f"El trabajo {trabajo_id} ya no pertenece al worker {worker_id}; no se guarda su resultado")
+    return actualizados == 1
+
+
+def ejecutar_trabajo(trabajo):
+    """Ejecuta un trabajo ya reclamado y guarda su estado final"""
+    trabajo_id, worker_id, intento = trabajo.id, trabajo.worker, str(trabajo.intentos)
+    # Cada intento escribe en su propio directorio: un intento anterior que siga vivo no pisa este
+    directorio = os.path.join(directorio_trabajo(trabajo_id), intento)
+    shutil.rmtree(directorio, ignore_errors=True)
+    os.makedirs(directorio, exist_ok=True)
+    contexto = ContextoTrabajo(trabajo_id, trabajo.id_usuario, directorio, worker_id)
+    latido = _Latido(current_app._get_current_object(), trabajo_id, worker_id)
+    latido.start()
+
+    try:
+        manejador = _manejadores.get(trabajo.tipo)
+        if manejador is None:
+            raise ValueError(f"Tipo de trabajo desconocido: {trabajo.tipo}")
+        archivo, nombre_descarga = manejador(trabajo.datos, contexto)
+    except TrabajoPerdido:
+        db.session.rollback()
+        shutil.rmtree(directorio, ignore_errors=True)
+        current_app.logger.warning(f"El trabajo {trabajo_id} pasó a otro worker; {worker_id} lo abandona")
+        return
+    except TrabajoCancelado:
+        db.session.rollback()
+        shutil.rmtree(directorio, ignore_errors=True)
+        _finalizar(trabajo_id, worker_id, estado='cancelado', mensaje='Cancelado por el usuario.')
+        current_app.logger.info(f"Trabajo {trabajo_id} cancelado")
+        return
+    except Exception as e:
+        db.session.rollback()
+        shutil.rmtree(directorio, ignore_errors=True)
+        current_app.logger.error(f"Error en el trabajo {trabajo_id} ({trabajo.tipo}): {e}", exc_info=True)
+        _finalizar(trabajo_id, worker_id, estado='error', mensaje=str(e)[:255] or 'Error inesperado.')
+        return
+    finally:
+        latido.detener()
+
+    mensaje = contexto.mensaje_final or ('Listo para descargar.' if archivo else 'Completado.')
+    if not _finalizar(trabajo_id, worker_id, estado='completado', progreso=100, mensaje=mensaje[:255],
+                      archivo=f"{intento}/{archivo}" if archivo else None, nombre_descarga=nombre_descarga):
+        shutil.rmtree(directorio, ignore_errors=True)
+
+
+def recuperar_trabajos_abandonados():
+    """
+    Devuelve a la cola los trabajos cuyo worker dejó de latir (el proceso murió). Los que
+    tenían una cancelación pedida se cancelan y tras TRABAJOS_MAX_INTENTOS se marcan con error.
+    """
+    limite = datetime.utcnow() - timedelta(minutes=current_app.config.get('TRABAJOS_SIN_LATIDO_MINUTOS', 10))
+    max_intentos = current_app.config.get('TRABAJOS_MAX_INTENTOS', 3)
+    abandonados = Trabajo.query.filter(Trabajo.estado == 'en_proceso', Trabajo.actualizado_en < limite)
+
+    abandonados.filter(Trabajo.cancelacion_solicitada.is_(True)).update({
+        'estado': 'cancelado',
+        'mensaje': 'Cancelado por el usuario.',
+        'finalizado_en': datetime.utcnow()
+    }, synchronize_session=False)
+    abandonados.filter(Trabajo.intentos >= max_intentos).update({
+        'estado': 'error',
+        'mensaje': 'El trabajo se interrumpió demasiadas veces.',
+        'finalizado_en': datetime.utcnow()
+    }, synchronize_session=False)
+    abandonados.filter(Trabajo.intentos < max_intentos).update({
+        'estado': 'pendiente',
+        'worker': None,
+        'mensaje': 'Reintentando...'
+    }, synchronize_session=False)
+    db.session.commit()
+
+
+def limpiar_trabajos_antiguos():
+    """Borra los trabajos finalizados (y sus archivos) más viejos que TRABAJOS_RETENCION_HORAS"""
+    limite = datetime.utcnow() - timedelta(hours=current_app.config.get('TRABAJOS_RETENCION_HORAS', 24))
+    antiguos = Trabajo.query.filter(Trabajo.estado.in_(Trabajo.ESTADOS_FINALES), Trabajo.finalizado_en < limite)
+    for (trabajo_id,) in antiguos.with_entities(Trabajo.id).all():
+        shutil.rmtree(directorio_trabajo(trabajo_id), ignore_errors=True)
+    antiguos.delete(synchronize_session=False)
+    db.session.commit()
+
+
+def procesar_cola(worker_id, detener=None):
+    """Bucle de un worker: reclama y ejecuta trabajos hasta que se active `detener`"""
+    intervalo = current_app.config.get('TRABAJOS_INTERVALO', 2)
+    ultimo_mantenimiento = 0.0
+    while detener is None or not detener.is_set():
+        try:
+            if time.monotonic() - ultimo_mantenimiento > 60:
+                recuperar_trabajos_abandonados()
+                limpiar_trabajos_antiguos()
+                ultimo_mantenimiento = time.monotonic()
+
+            trabajo = reclamar_trabajo(worker_id)
+            if trabajo is None:
+                time.sleep(intervalo)
+                continue
+            current_app.logger.info(f"Worker {worker_id} ejecuta el trabajo {trabajo.id} ({trabajo.tipo})")
+            ejecutar_trabajo(trabajo)
+        except Exception as e:
+            # Un fallo de la base de datos no debe terminar el worker
+            db.session.rollback()
+            current_app.logger.error(f"Error en el worker {worker_id}: {e}", exc_info=True)
+            time.sleep(intervalo)
+        finally:
+            db.session.remove()
+
+
+def guardar_zip(contexto, entradas, total, mensaje, nombre_descarga):
+    """
+    Escribe en el directorio del trabajo el ZIP de las entradas (nombre, contenido),
+    reportando el progreso por cada archivo. Devuelve (archivo, nombre_descarga).
+    """
+    def con_progreso():
+        for indice, entrada in enumerate(entradas, start=1):
+            yield entrada
+            contexto.progreso(indice * 100 / max(total, 1), f"{mensaje} {indice} de {total}...")
+
+    archivo = 'resultado.zip'
+    descriptor, temporal = tempfile.mkstemp(dir=contexto.directorio, suffix='.tmp')
+    with os.fdopen(descriptor, 'wb') as salida:
+        for parte in generar_zip_streaming(con_progreso()):
+            salida.write(parte)
+    os.replace(temporal, contexto.ruta(archivo))
+    return archivo, nombre_descarga
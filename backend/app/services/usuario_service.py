@@ -0,0 +1,77 @@
+"""
+Cache de identidad de los usuarios autenticados.
+
+Flask-Login carga el usuario de la sesión en cada petición. cargar_usuario guarda por
+USUARIOS_CACHE_SEGUNDOS, en el espacio 'usuarios' de la cache (solo nivel local, porque son
+objetos ORM), una copia desconectada de sus columnas, junto con su security_stamp
+como versión, y la incorpora a la sesión de SQLAlchemy de la petición sin consultar la tabla
+de usuarios. La versión que trae la cookie de sesión debe coincidir con la guardada; si no,
+se vuelve a leer el usuario.
+
+Cualquier UPDATE o DELETE de un usuario (cambio de rol, de estado, regenerate_security_stamp)
+descarta su entrada al hacer flush y de nuevo al confirmar. La cache es de cada proceso: los
+cambios hechos por otro proceso se ven a más tardar cuando vence la entrada.
+"""
+from flask import current_app
+from sqlalchemy.orm import make_transient_to_detached, object_session
+from app import db
+from app.models import User
+from app.utils.cache import espacio
+
+_cache = espacio('usuarios', compartido=False)
+
+
+def clear_usuario_cache(usuario_id=None):
+    """Descarta la identidad cacheada de un usuario (o la de todos)"""
+    if usuario_id is None:
+        _cache.invalidar()
+    else:
+        _cache.delete(usuario_id)
+
+
+def _copia_desconectada(usuario):
+    """Copia de las columnas del usuario que no pertenece a ninguna sesión"""
+    copia = User()
+    for columna in User.__table__.columns:
+        setattr(copia, columna.key, getattr(usuario, columna.key))
+    make_transient_to_detached(copia)
+    return copia
+
+
+def cargar_usuario(usuario_id, version=None):
+    """
+    Usuario para Flask-Login. Si hay una copia vigente con la misma versión se incorpora a la
+    sesión con merge(load=False), que no ejecuta SQL; las relaciones se cargan normalmente si
+    se usan.
+    """
+    guardado = _cache.get(usuario_id)
+    if guardado and (version is None or guardado['version'] == version):
+        return db.session.merge(guardado['usuario'], load=False)
+
+    usuario = db.session.get(User, usuario_id)
+    if usuario is None:
+        _cache.delete(usuario_id)
+        return None
+    _cache.set(usuario_id, {
+        'usuario': _copia_desconectada(usuario),
+        'version': usuario.security_stamp
+    }, ttl=current_app.config.get('USUARIOS_CACHE_SEGUNDOS', 30))
+    return usuario
+
+
+def _usuario_modificado(mapper, connection, target):
+    clear_usuario_cache(target.id)
+    sesion = object_session(target)
+    if sesion is not None:
+        sesion.info.setdefault('usuarios_modificados', set()).add(target.id)
+
+
+def _invalidar_confirmados(session):
+    # Otra petición pudo cachear la fila vieja entre el flush y el commit
+    for usuario_id in session.info.pop('usuarios_modificados', ()):
+        clear_usuario_cache(usuario_id)
+
+
+db.event.listen(User, 'after_update', _usuario_modificado)
+db.event.listen(User, 'after_delete', _usuario_modificado)
+db.event.listen(db.session, 'after_commit', _invalidar_confirmados)
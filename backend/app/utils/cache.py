@@ -0,0 +1,294 @@
+"""
+Cache de datos de la aplicación en dos niveles.
+
+- Nivel local: LRU con vencimiento en la memoria de cada proceso, limitado a
+  CACHE_LOCAL_MAX_ENTRADAS entradas.
+- Nivel compartido (opcional, CACHE_COMPARTIDA): 'redis' usa el servidor de REDIS_HOST, así
+  todos los workers de gunicorn ven los mismos datos e invalidaciones; 'memoria' usa
+  RedisEnMemoria, un sustituto local con la misma interfaz pensado para pruebas y desarrollo.
+
+Las claves se agrupan en espacios (espacio('dashboard'), espacio('matriculas')...). Cada
+espacio tiene una versión que forma parte de todas sus claves: invalidar() la incrementa y
+así descarta de una vez todo lo guardado, en este y en los demás procesos, sin recorrer
+claves. Con nivel compartido, el nivel local guarda cada valor como máximo
+CACHE_LOCAL_SEGUNDOS para que los borrados de una clave hechos por otro proceso se noten
+pronto, y la versión leída de Redis se reutiliza durante el mismo tiempo: un acierto local no
+consulta la red, y la invalidación hecha por otro proceso se nota en ese plazo (en el propio
+proceso, al instante). Los espacios con compartido=False (por ejemplo, objetos ORM) solo usan el nivel
+local.
+
+Cada espacio cuenta aciertos y fallos en este proceso; ver estadisticas().
+"""
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, has_app_context
+import redis
+
+logger = logging.getLogger(__name__)
+
+_FALTA = object()
+
+
+class CacheLocal:
+    """LRU con vencimiento por entrada, seguro entre hilos"""
+
+    def __init__(self, max_entradas=1024):
+        self.max_entradas = max_entradas
+        self._datos = OrderedDict()  # {clave: (vence, valor)}
+        self._lock = threading.Lock()
+
+    def get(self, clave, default=None):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return default
+            if entrada[0] <= time.monotonic():
+                del self._datos[clave]
+                return default
+            self._datos.move_to_end(clave)
+            return entrada[1]
+
+    def set(self, clave, valor, ttl):
+        with self._lock:
+            self._datos[clave] = (time.monotonic() + ttl, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+
+    def delete(self, clave):
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def clear(self):
+        with self._lock:
+            self._datos.clear()
+
+    def __len__(self):
+        return len(self._datos)
+
+
+class RedisEnMemoria:
+    """
+    Sustituto en memoria del cliente de Redis con los comandos que usa la cache (get, set con
+    ex, delete, incr). Se comparte entre los hilos de un proceso; sirve para pruebas y para
+    desarrollar sin un servidor de Redis.
+    """
+
+    def __init__(self):
+        self._datos = {}  # {clave: (vence o None, valor)}
+        self._lock = threading.Lock()
+
+    def _vigente(self, clave):
+        entrada = self._datos.get(clave)
+        if entrada and entrada[0] is not None and entrada[0] <= time.monotonic():
+            del self._datos[clave]
+            return None
+        return entrada
+
+    def get(self, clave):
+        with self._lock:
+            entrada = self._vigente(clave)
+            return entrada[1] if entrada else None
+
+    def set(self, clave, valor, ex=None):
+        if isinstance(valor, str):
+            valor = valor.encode('utf-8')
+        with self._lock:
+            self._datos[clave] = (time.monotonic() + ex if ex else None, valor)
+        return True
+
+    def delete(self, *claves):
+        with self._lock:
+            return sum(1 for clave in claves if self._datos.pop(clave, None) is not None)
+
+    def incr(self, clave, cantidad=1):
+        with self._lock:
+            entrada = self._vigente(clave)
+            valor = int(entrada[1]) + cantidad if entrada else cantidad
+            self._datos[clave] = (entrada[0] if entrada else None, str(valor).encode('utf-8'))
+            return valor
+
+    def ping(self):
+        return True
+
+    def flushdb(self):
+        with self._lock:
+            self._datos.clear()
+        return True
+
+
+class _Estado:
+    """Niveles y contadores de la cache de una aplicación"""
+
+    def __init__(self, app):
+        self.local = CacheLocal(app.config.get('CACHE_LOCAL_MAX_ENTRADAS', 1024))
+        self.compartida = self._crear_compartida(app)
+        self.prefijo = app.config.get('CACHE_PREFIJO', 'sge')
+        self.versiones = {}  # Versión de cada espacio cuando no hay nivel compartido
+        self.versiones_compartidas = {}  # {espacio: (leída en, versión)} de la última lectura de Redis
+        self.contadores = {}  # {espacio: {'aciertos': n, 'fallos': n}}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _crear_compartida(app):
+        tipo = app.config.get('CACHE_COMPARTIDA') or ''
+        if tipo == 'memoria':
+            return RedisEnMemoria()
+        if tipo == 'redis':
+            return redis.Redis(
+                host=app.config.get('REDIS_HOST', 'localhost'),
+                port=app.config.get('REDIS_PORT', 6379),
+                db=app.config.get('REDIS_DB', 0),
+                password=app.config.get('REDIS_PASSWORD', None),
+                socket_timeout=2,
+                socket_connect_timeout=2
+            )
+        return None
+
+
+def _estado():
+    estado = current_app.extensions.get('cache')
+    if estado is None:
+        estado = current_app.extensions.setdefault('cache', _Estado(current_app))
+    return estado
+
+
+class EspacioCache:
+    """Grupo de claves con vencimiento, versión e invalidación propios"""
+
+    def __init__(self, nombre, compartido=True):
+        self.nombre = nombre
+        self.compartido = compartido
+
+    def _compartida(self, estado):
+        return estado.compartida if self.compartido else None
+
+    def _clave_version(self, estado):
+        return f"{estado.prefijo}:{self.nombre}:version"
+
+    def _version(self, estado):
+        compartida = self._compartida(estado)
+        if compartida is not None:
+            ahora = time.monotonic()
+            leida = estado.versiones_compartidas.get(self.nombre)
+            if leida and ahora - leida[0] < current_app.config.get('CACHE_LOCAL_SEGUNDOS', 5):
+                return leida[1]
+            try:
+                version = int(compartida.get(self._clave_version(estado)) or 0)
+            except Exception as e:
+                logger.warning(f"Cache compartida no disponible ({self.nombre}): {e}")
+            else:
+                estado.versiones_compartidas[self.nombre] = (ahora, version)
+                return version
+        return estado.versiones.get(self.nombre, 0)
+
+    def _clave(self, estado, clave, version):
+        if isinstance(clave, (tuple, list)):
+            clave = ':'.join(str(parte) for parte in clave)
+        return f"{estado.prefijo}:{self.nombre}:v{version}:{clave}"
+
+    def _contar(self, estado, resultado):
+        with estado.lock:
+            contadores = estado.contadores.setdefault(self.nombre, {'aciertos': 0, 'fallos': 0})
+            contadores[resultado] += 1
+
+    def get(self, clave, default=None):
+        if not has_app_context():
+            return default
+        estado = _estado()
+        completa = self._clave(estado, clave, self._version(estado))
+        valor = estado.local.get(completa, _FALTA)
+        compartida = self._compartida(estado)
+        if valor is _FALTA and compartida is not None:
+            try:
+                guardado = compartida.get(completa)
+            except Exception as e:
+                logger.warning(f"Cache compartida no disponible ({self.nombre}): {e}")
+                guardado = None
+            if guardado is not None:
+                valor = pickle.loads(guardado)
+                estado.local.set(completa, valor, current_app.config.get('CACHE_LOCAL_SEGUNDOS', 5))
+        self._contar(estado, 'fallos' if valor is _FALTA else 'aciertos')
+        return default if valor is _FALTA else valor
+
+    def set(self, clave, valor, ttl=None):
+        """Guarda `valor` durante `ttl` segundos (CACHE_TTL_SEGUNDOS si no se indica; 0 no guarda)"""
+        if not has_app_context():
+            return
+        ttl = current_app.config.get('CACHE_TTL_SEGUNDOS', 300) if ttl is None else ttl
+        if not ttl:
+            return
+        estado = _estado()
+        completa = self._clave(estado, clave, self._version(estado))
+        compartida = self._compartida(estado)
+        ttl_local = ttl
+        if compartida is not None:
+            try:
+                compartida.set(completa, pickle.dumps(valor), ex=max(1, int(ttl)))
+                ttl_local = min(ttl, current_app.config.get('CACHE_LOCAL_SEGUNDOS', 5))
+            except Exception as e:
+                logger.warning(f"Cache compartida no disponible ({self.nombre}): {e}")
+        estado.local.set(completa, valor, ttl_local)
+
+    def delete(self, clave):
+        if not has_app_context():
+            return
+        estado = _estado()
+        completa = self._clave(estado, clave, self._version(estado))
+        estado.local.delete(completa)
+        compartida = self._compartida(estado)
+        if compartida is not None:
+            try:
+                compartida.delete(completa)
+            except Exception as e:
+                logger.warning(f"Cache compartida no disponible ({self.nombre}): {e}")
+
+    def obtener(self, clave, calcular, ttl=None):
+        """Devuelve el valor guardado o lo calcula con `calcular()` y lo guarda"""
+        valor = self.get(clave, _FALTA)
+        if valor is _FALTA:
+            valor = calcular()
+            self.set(clave, valor, ttl)
+        return valor
+
+    def invalidar(self):
+        """Descarta todas las claves del espacio subiendo su versión"""
+        if not has_app_context():
+            return
+        estado = _estado()
+        with estado.lock:
+            estado.versiones[self.nombre] = estado.versiones.get(self.nombre, 0) + 1
+        compartida = self._compartida(estado)
+        if compartida is not None:
+            try:
+                version = compartida.incr(self._clave_version(estado))
+            except Exception as e:
+                logger.warning(f"Cache compartida no disponible ({self.nombre}): {e}")
+                estado.versiones_compartidas.pop(self.nombre, None)
+            else:
+                estado.versiones_compartidas[self.nombre] = (time.monotonic(), int(version))
+
+
+_espacios = {}
+
+
+def espacio(nombre, compartido=True):
+    """Espacio de claves `nombre`; los módulos lo crean una vez al importarse"""
+    return _espacios.setdefault(nombre, EspacioCache(nombre, compartido))
+
+
+def estadisticas():
+    """Aciertos, fallos y tasa de aciertos de cada espacio en este proceso"""
+    if not has_app_context():
+        return {}
+    estado = _estado()
+    with estado.lock:
+        resultado = {}
+        for nombre, contadores in estado.contadores.items():
+            total = contadores['aciertos'] + contadores['fallos']
+            resultado[nombre] = dict(contadores, tasa_aciertos=round(contadores['aciertos'] / total, 3) if total else None)
+    resultado['_local'] = {'entradas': len(estado.local), 'max_entradas': estado.local.max_entradas}
+    return resultado
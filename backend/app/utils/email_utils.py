@@ -1,10 +1,70 @@
 import smtplib
 from flask import current_app
 
+
+class ConexionSMTP:
+    """
+    Conexión SMTP reutilizable: se abre, se cifra con STARTTLS y se autentica una sola vez
+    para enviar muchos mensajes. Si el servidor corta la conexión, se reconecta una vez.
+    Sin usuario configurado no hay login (servidores SMTP locales de prueba).
+    """
+
+    def __init__(self, config=None):
+        config = config or current_app.config
+        self.servidor = config['MAIL_SERVER']
+        self.puerto = config['MAIL_PORT']
+        self.usar_tls = config.get('MAIL_USE_TLS', True)
+        self.usuario = config.get('MAIL_USERNAME')
+        self.contrasena = config.get('MAIL_PASSWORD')
+        self.timeout = config.get('MAIL_TIMEOUT', 30)
+        self._smtp = None
+
+    def abrir(self):
+        if self._smtp is None:
+            smtp = smtplib.SMTP(self.servidor, self.puerto, timeout=self.timeout)
+            try:
+                if self.usar_tls:
+                    smtp.starttls()
+                if self.usuario:
+                    smtp.login(self.usuario, self.contrasena)
+            except Exception:
+                smtp.close()
+                raise
+            self._smtp = smtp
+        return self
+
+    def enviar(self, msg):
+        """Envía un email.message.Message por la conexión abierta"""
+        self.abrir()
+        try:
+            self._smtp.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            self._smtp = None
+            self.abrir()
+            self._smtp.send_message(msg)
+
+    def cerrar(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except smtplib.SMTPException:
+                self._smtp.close()
+            except OSError:
+                pass
+            self._smtp = None
+
+    def __enter__(self):
+        return self.abrir()
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+
 def send_email(msg):
     """
     Función centralizada para enviar correos electrónicos usando smtplib.
-    Utiliza la configuración de la aplicación Flask.
+    Utiliza la configuración de la aplicación Flask. Para enviar muchos mensajes use
+    ConexionSMTP directamente (o la bandeja de salida de correo_service).
 
     Args:
         msg (email.message.Message): El objeto del mensaje a enviar.
@@ -14,15 +74,9 @@ def send_email(msg):
         str: Un mensaje de éxito o el error ocurrido.
     """
     try:
-        with smtplib.SMTP(
-            current_app.config['MAIL_SERVER'],
-            current_app.config['MAIL_PORT'],
-            timeout=current_app.config.get('MAIL_TIMEOUT', 30)
-        ) as server:
-            server.starttls()
-            server.login(current_app.config['MAIL_USERNAME'], current_app.config['MAIL_PASSWORD'])
-            server.send_message(msg)
+        with ConexionSMTP() as conexion:
+            conexion.enviar(msg)
         return True, "Correo enviado exitosamente."
     except Exception as e:
         current_app.logger.error(f"Error al enviar correo: {str(e)}", exc_info=True)
-        return False, str(e)
\ No newline at end of file
+        return False, str(e)
@@ -0,0 +1,144 @@
+"""
+Caché en disco de PDFs direccionada por contenido.
+
+La clave de cada PDF es el hash de todo lo que se usa para dibujarlo (datos del estudiante,
+notas, rector, fecha impresa) más el tipo de documento y la versión de su plantilla. Si los
+datos no cambian, la descarga se sirve desde el disco sin pasar por ReportLab; cuando se
+modifica el diseño de un documento basta con subir su versión de plantilla.
+
+El tamaño total se limita con PDF_CACHE_MAX_MB expulsando los archivos usados hace más
+tiempo (cada lectura actualiza la fecha de modificación del archivo).
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from flask import current_app, has_app_context
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+# Tamaño estimado de la caché en este proceso; se sincroniza al recorrer el directorio
+_tamano_estimado = {}
+
+
+def _configuracion():
+    """Devuelve (directorio, tamaño máximo en bytes) o None si la caché está desactivada"""
+    if not has_app_context() or not current_app.config.get('PDF_CACHE_ENABLED', False):
+        return None
+    directorio = current_app.config.get('PDF_CACHE_DIR')
+    if not directorio:
+        return None
+    return directorio, current_app.config.get('PDF_CACHE_MAX_MB', 500) * 1024 * 1024
+
+
+def clave_pdf(tipo, version, datos):
+    """Hash SHA-256 de los datos de entrada de un PDF, su tipo y la versión de la plantilla"""
+    contenido = json.dumps([tipo, version, datos], sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+
+def _ruta(directorio, clave):
+    return os.path.join(directorio, clave[:2], f"{clave}.pdf")
+
+
+def existe_pdf_cache(clave):
+    """Indica si hay un PDF guardado con esa clave, sin leerlo"""
+    configuracion = _configuracion()
+    return bool(configuracion) and os.path.exists(_ruta(configuracion[0], clave))
+
+
+def leer_pdf_cache(clave):
+    """Devuelve los bytes del PDF guardado con esa clave o None si no está en caché"""
+    configuracion = _configuracion()
+    if not configuracion:
+        return None
+    ruta = _ruta(configuracion[0], clave)
+    try:
+        with open(ruta, 'rb') as archivo:
+            pdf = archivo.read()
+        os.utime(ruta)  # Marca el archivo como usado recientemente
+        return pdf
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        logger.warning(f"No se pudo leer el PDF en caché {ruta}: {e}")
+        return None
+
+
+def guardar_pdf_cache(clave, pdf):
+    """Guarda un PDF en la caché y expulsa los más antiguos si se supera el tamaño máximo"""
+    configuracion = _configuracion()
+    if not configuracion or not pdf:
+        return
+    directorio, tamano_maximo = configuracion
+    ruta = _ruta(directorio, clave)
+    try:
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        # Escritura atómica: otro proceso nunca ve un PDF a medio escribir
+        descriptor, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta), suffix='.tmp')
+        with os.fdopen(descriptor, 'wb') as archivo:
+            archivo.write(pdf)
+        os.replace(temporal, ruta)
+    except OSError as e:
+        logger.warning(f"No se pudo guardar el PDF en caché {ruta}: {e}")
+        return
+
+    with _lock:
+        if directorio not in _tamano_estimado:
+            _tamano_estimado[directorio] = _tamano_directorio(directorio)
+        else:
+            _tamano_estimado[directorio] += len(pdf)
+        if _tamano_estimado[directorio] > tamano_maximo:
+            _tamano_estimado[directorio] = _expulsar_antiguos(directorio, tamano_maximo)
+
+
+def _archivos_cache(directorio):
+    for subdirectorio in os.scandir(directorio):
+        if not subdirectorio.is_dir():
+            continue
+        for entrada in os.scandir(subdirectorio.path):
+            if entrada.name.endswith('.pdf'):
+                try:
+                    estado = entrada.stat()
+                except FileNotFoundError:
+                    continue
+                yield entrada.path, estado.st_size, estado.st_mtime
+
+
+def _tamano_directorio(directorio):
+    return sum(tamano for _, tamano, _ in _archivos_cache(directorio))
+
+
+def _expulsar_antiguos(directorio, tamano_maximo):
+    """Borra los PDFs usados hace más tiempo hasta dejar la caché en el 90% del máximo"""
+    archivos = sorted(_archivos_cache(directorio), key=lambda a: a[2])
+    total = sum(tamano for _, tamano, _ in archivos)
+    objetivo = tamano_maximo * 0.9
+    for ruta, tamano, _ in archivos:
+        if total <= objetivo:
+            break
+        try:
+            os.remove(ruta)
+            total -= tamano
+        except FileNotFoundError:
+            total -= tamano
+        except OSError as e:
+            logger.warning(f"No se pudo expulsar el PDF en caché {ruta}: {e}")
+    return total
+
+
+def obtener_pdf_cacheado(tipo, version, datos, generar):
+    """
+    Devuelve los bytes del PDF de `datos`: desde la caché si ya se generó con los mismos
+    datos y versión de plantilla, o llamando a `generar()` y guardando el resultado.
+    """
+    clave = clave_pdf(tipo, version, datos)
+    pdf = leer_pdf_cache(clave)
+    if pdf is not None:
+        return pdf
+    pdf = generar()
+    guardar_pdf_cache(clave, pdf)
+    return pdf
@@ -4,9 +4,26 @@ from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import mm
 from reportlab.lib.colors import black, HexColor
 import os
+from app.utils.pdf_cache import obtener_pdf_cacheado
+
+# Subir este número al cambiar el diseño del comprobante invalida sus PDFs en caché
+VERSION_PLANTILLA_COMPROBANTE = 1
 
 
 def generar_comprobante_pago_pdf(id_pago, pago_data):
+    """
+    Devuelve un BytesIO con el comprobante de pago, desde la caché de PDFs si los datos
+    del pago no cambiaron desde la última vez que se generó
+    """
+    datos = {'id_pago': id_pago, **pago_data}
+    pdf = obtener_pdf_cacheado(
+        'comprobante_pago', VERSION_PLANTILLA_COMPROBANTE, datos,
+        lambda: _renderizar_comprobante_pago(id_pago, pago_data).getvalue()
+    )
+    return BytesIO(pdf)
+
+
+def _renderizar_comprobante_pago(id_pago, pago_data):
     """
     Genera un comprobante de pago premium con diseño elegante
     """
@@ -0,0 +1,396 @@
+from io import BytesIO
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.units import inch
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, TableStyle, Image
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.colors import HexColor, black
+import os
+from app.utils.pdf_cache import clave_pdf, existe_pdf_cache, leer_pdf_cache, guardar_pdf_cache
+
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+# Subir este número al cambiar el diseño del boletín invalida sus PDFs en caché
+VERSION_PLANTILLA_BOLETIN = 1
+
+
+def renderizar_boletin_pdf(datos):
+    """
+    Dibuja el PDF de un boletín a partir de datos planos (sin consultas ni contexto de Flask).
+    Los datos los prepara `boletin_service.preparar_datos_boletines_pdf`.
+    Devuelve los bytes del PDF.
+    """
+    buffer = BytesIO()
+
+    # Documento con márgenes ajustados
+    doc = SimpleDocTemplate(
+        buffer, pagesize=letter,
+        rightMargin=20, leftMargin=20,
+        topMargin=30, bottomMargin=30
+    )
+
+    # --- ESTILOS ---
+    styles = getSampleStyleSheet()
+    estilo_base = ParagraphStyle(
+        'Base', parent=styles['Normal'],
+        fontName='Helvetica', fontSize=8, leading=10, spaceAfter=1
+    )
+    estilo_negrita = ParagraphStyle('Negrita', parent=estilo_base, fontName='Helvetica-Bold', fontSize=8)
+    estilo_centrado = ParagraphStyle('Centrado', parent=estilo_base, alignment=TA_CENTER)
+    estilo_titulo_centro = ParagraphStyle('TituloCentro', parent=estilo_negrita, fontSize=10, alignment=TA_CENTER, spaceAfter=2)
+    estilo_small_gray = ParagraphStyle('SmallGray', parent=estilo_base, textColor=HexColor("#666666"), fontSize=7)
+    estilo_centrado_small_gray = ParagraphStyle('CentradoSmallGray', parent=estilo_base, alignment=TA_CENTER, textColor=HexColor("#666666"), fontSize=7)
+    estilo_centrado_negrita = ParagraphStyle('CentradoNegrita', parent=estilo_negrita, alignment=TA_CENTER)
+    estilo_normal = ParagraphStyle('Normal', parent=estilo_base, fontName='Helvetica', fontSize=8)
+    estilo_header_cell = ParagraphStyle('HeaderCell', parent=estilo_negrita, fontSize=7, alignment=TA_CENTER)
+
+    # Marca de agua
+    def add_background(canvas, doc_):
+        marca_agua_path = os.path.join(BASE_DIR, 'frontend', 'static', 'img', 'logotipo.png')
+        if os.path.exists(marca_agua_path):
+            canvas.saveState()
+            canvas.setFillAlpha(0.10)
+            page_width, page_height = letter
+            logo_width, logo_height = 400, 400
+            x_center = (page_width - logo_width) / 2
+            y_center = (page_height - logo_height) / 2
+            canvas.drawImage(marca_agua_path, x_center, y_center, width=logo_width, height=logo_height, mask='auto')
+            canvas.restoreState()
+
+    # --- CREACIÓN DE TABLAS INDIVIDUALES (las seguiremos anidando) ---
+    logo_left_path = os.path.join(BASE_DIR, 'frontend', 'static', 'img', 'logotipo.png')
+    logo_right_path = os.path.join(BASE_DIR, 'frontend', 'static', 'img', 'logo-colombia.png')
+
+    logo_left = Image(logo_left_path, width=0.8*inch, height=0.8*inch) if os.path.exists(logo_left_path) else ""
+    logo_right = Image(logo_right_path, width=0.8*inch, height=0.8*inch) if os.path.exists(logo_right_path) else ""
+
+    # CENTER INFO (header central)
+    center_info = Table([
+        [Paragraph("REPUBLICA DE COLOMBIA", estilo_titulo_centro)],
+        [Paragraph("<b>JARDÍN INFANTIL SONRISAS</b>", estilo_titulo_centro)],
+        [Paragraph("VALLEDUPAR (CESAR)", estilo_centrado)],
+        [Paragraph("26723 DEL 18 DE DICIEMBRE DE 2023", estilo_centrado)],
+        [Paragraph("DANE: 28532400019 NIT: 800045481-3", estilo_centrado)]
+    ], colWidths=[5.5*inch])
+    center_info.setStyle(TableStyle([
+        ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+        ('TOPPADDING', (0,0), (-1,-1), 1),
+        ('BOTTOMPADDING', (0,0), (-1,-1), 1)
+    ]))
+
+    # Header (sin borde)
+    header_table = Table([[logo_left, center_info, logo_right]],
+                         colWidths=[1.0*inch, 5.5*inch, 1.0*inch])
+    header_table.setStyle(TableStyle([
+        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+        ('ALIGN', (0,0), (0,0), 'CENTER'),
+        ('ALIGN', (2,0), (2,0), 'CENTER'),
+        ('LEFTPADDING', (0,0), (-1,-1), 4),
+        ('RIGHTPADDING', (0,0), (-1,-1), 4),
+        ('TOPPADDING', (0,0), (-1,-1), 4),
+        ('BOTTOMPADDING', (0,0), (-1,-1), 4),
+    ]))
+
+    # Info estudiante (con borde)
+    info_estudiante = Table([[
+        Paragraph(f"{datos['apellidos']} {datos['nombres']}", estilo_centrado_negrita),
+        Paragraph(f"JIS-{datos['documento']}", estilo_centrado_negrita),
+        Paragraph(datos['curso_nombre'] or '', estilo_centrado_negrita)
+    ]], colWidths=[3.5*inch, 2.5*inch, 1.5*inch])
+    info_estudiante.setStyle(TableStyle([
+        ('BOX', (0,0), (-1,-1), 1, black),
+        ('INNERGRID', (0,0), (-1,-1), 1, black),
+        ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+        ('LEFTPADDING', (0,0), (-1,-1), 4),
+        ('RIGHTPADDING', (0,0), (-1,-1), 4),
+        ('TOPPADDING', (0,0), (-1,-1), 4),
+        ('BOTTOMPADDING', (0,0), (-1,-1), 4),
+    ]))
+
+    # Periodo (con borde)
+    periodo_table = Table([[
+        Paragraph("PRINCIPAL", estilo_centrado_negrita),
+        Paragraph(f"PERÍODO {datos['periodo_nombre'] or 'PRIMERO'}", estilo_centrado_negrita),
+        Paragraph(str(datos['anio_lectivo']), estilo_centrado_negrita)
+    ]], colWidths=[3.5*inch, 2.5*inch, 1.5*inch])
+    periodo_table.setStyle(TableStyle([
+        ('BOX', (0,0), (-1,-1), 1, black),
+        ('INNERGRID', (0,0), (-1,-1), 1, black),
+        ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+        ('LEFTPADDING', (0,0), (-1,-1), 4),
+        ('RIGHTPADDING', (0,0), (-1,-1), 4),
+        ('TOPPADDING', (0,0), (-1,-1), 4),
+        ('BOTTOMPADDING', (0,0), (-1,-1), 4),
+    ]))
+
+    # Fecha impresion
+    fecha_impresion = Table([[Paragraph(f"FECHA IMPRESIÓN: {datos['fecha_impresion']}", estilo_centrado_small_gray)]],
+                             colWidths=[7.5*inch])
+    fecha_impresion.setStyle(TableStyle([
+        ('BOX', (0,0), (-1,-1), 1, black),
+        ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+        ('LEFTPADDING', (0,0), (-1,-1), 4),
+        ('RIGHTPADDING', (0,0), (-1,-1), 4),
+        ('TOPPADDING', (0,0), (-1,-1), 2),
+        ('BOTTOMPADDING', (0,0), (-1,-1), 2),
+    ]))
+
+    # --- CALIFICACIONES ---
+    period_count = datos['period_count']
+    items = datos['items']
+
+    # Construir columnas dinámicamente
+    columns = ['ASIGNATURA', 'DESEMPEÑO'] + [f'P{i+1}' for i in range(period_count)]
+    if period_count == 4:
+        columns.append('PF')
+    columns += ['FL', 'IH']
+
+    tabla_data = [[Paragraph(f"<b>{col}</b>", estilo_header_cell) for col in columns]]
+
+    for item in items:
+        row = [
+            Paragraph(f"{item['asignatura']} {item['porcentaje']}", estilo_base),
+            Paragraph(item['desempeno'], estilo_base),
+        ]
+        for i in range(period_count):
+            note = item.get(f'p{i+1}')
+            row.append(Paragraph("" if note is None else f"{note:.1f}", estilo_centrado))
+        if period_count == 4:
+            pf = item.get('pf')
+            row.append(Paragraph("" if pf is None else f"{pf:.1f}", estilo_centrado))
+        row.append(Paragraph(str(item.get('fl', 0)), estilo_centrado))
+        row.append(Paragraph(str(item.get('ih', 1)), estilo_centrado))
+        tabla_data.append(row)
+        if item.get('observacion'):
+            obs_row = [Paragraph(item['observacion'], estilo_small_gray)] + [""] * (len(columns) - 1)
+            tabla_data.append(obs_row)
+
+    fixed_width = 3.0*inch + 1.5*inch  # asignatura + desempeno
+    total_width = 7.5*inch
+    extra_columns = len(columns) - 2
+    if extra_columns > 0:
+        extra_width = (total_width - fixed_width) / extra_columns
+        colWidths = [3.0*inch, 1.5*inch] + [extra_width] * extra_columns
+    else:
+        colWidths = [3.0*inch, 1.5*inch]
+    calificaciones_table = Table(tabla_data, colWidths=colWidths)
+    table_style = [
+        ('BOX', (0,0), (-1,-1), 1, black),
+        ('INNERGRID', (0,0), (-1,-1), 0.5, black),
+        ('VALIGN', (0,0), (-1,-1), 'TOP'),
+        ('LEFTPADDING', (0,0), (-1,-1), 3),
+        ('RIGHTPADDING', (0,0), (-1,-1), 3),
+        ('TOPPADDING', (0,0), (-1,-1), 2),
+        ('BOTTOMPADDING', (0,0), (-1,-1), 2),
+        ('BACKGROUND', (0,0), (-1,0), HexColor("#e0e0e0")),
+        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+    ]
+
+
+    # Observaciones spanning
+    for i, row in enumerate(tabla_data[1:], 1):
+        if isinstance(row[0], Paragraph) and len(row) > 1 and row[1] == "":
+            # Es fila de observación, span completo
+            table_style.append(('SPAN', (0,i), (-1,i)))
+            table_style.append(('BACKGROUND', (0,i), (-1,i), HexColor("#f9f9f9")))
+        elif isinstance(row[0], Paragraph) and len(row[0].text) > 50:
+            # Texto largo en fila normal
+            table_style.append(('SPAN', (0,i), (-1,i)))
+            table_style.append(('BACKGROUND', (0,i), (-1,i), HexColor("#f9f9f9")))
+    calificaciones_table.setStyle(TableStyle(table_style))
+
+    # --- PUESTO Y PROMEDIO ---
+    promedio_str = f"{datos['promedio_general']:.2f}"
+
+    puesto_promedio = Table([
+        [Paragraph(f"PUESTO No [ {datos['puesto']} ]   PROM [ {promedio_str} ]   DESEMPEÑO: {datos['desempeno_general']}", estilo_centrado_negrita)],
+        [Paragraph(f"ASIGNATURAS REPROBADAS: {datos['asignaturas_reprobadas']}", estilo_centrado_negrita)]
+    ], colWidths=[7.5*inch])
+    puesto_promedio.setStyle(TableStyle([
+        ('BOX', (0,0), (-1,-1), 1, black),
+        ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+        ('LEFTPADDING', (0,0), (-1,-1), 4),
+        ('RIGHTPADDING', (0,0), (-1,-1), 4),
+        ('TOPPADDING', (0,0), (-1,-1), 4),
+        ('BOTTOMPADDING', (0,0), (-1,-1), 4),
+    ]))
+
+    # --- OBSERVACIONES ---
+    observaciones_table = Table([[Paragraph("OBSERVACIONES", estilo_negrita)]], colWidths=[7.5*inch])
+    observaciones_table.setStyle(TableStyle([
+        ('BOX', (0,0), (-1,-1), 1, black),
+        ('BACKGROUND', (0,0), (-1,-1), HexColor("#f0f0f0")),
+        ('LEFTPADDING', (0,0), (-1,-1), 4),
+        ('RIGHTPADDING', (0,0), (-1,-1), 4),
+        ('TOPPADDING', (0,0), (-1,-1), 4),
+        ('BOTTOMPADDING', (0,0), (-1,-1), 4),
+    ]))
+
+    # --- PIE ---
+    pie_info = Table([
+        [Paragraph("*** FIN DEL REPORTE DE CALIFICACIONES PARA EL ESTUDIANTE ***", estilo_centrado)],
+        [Paragraph(f"{datos['apellidos']} {datos['nombres']}", estilo_centrado),
+         Paragraph(f"Documento: {datos['documento']}", estilo_centrado)]
+    ], colWidths=[4.0*inch, 3.5*inch])
+    pie_info.setStyle(TableStyle([
+        ('BOX', (0,0), (-1,-1), 1, black),
+        ('SPAN', (0,0), (-1,0)),
+        ('INNERGRID', (0,1), (-1,-1), 1, black),
+        ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+        ('LEFTPADDING', (0,0), (-1,-1), 4),
+        ('RIGHTPADDING', (0,0), (-1,-1), 4),
+        ('TOPPADDING', (0,0), (-1,-1), 4),
+        ('BOTTOMPADDING', (0,0), (-1,-1), 4),
+    ]))
+
+    # --- FIRMAS ---
+    rector_nombre = datos['rector_nombre']
+    rector_firma_url = datos['rector_firma_url']
+    firma_img = None
+    if rector_firma_url:
+        firma_path = os.path.join(BASE_DIR, 'frontend', 'static', rector_firma_url.lstrip('/static/'))
+        if os.path.exists(firma_path):
+            firma_img = Image(firma_path, width=2.0*inch, height=0.8*inch, mask='auto')
+
+    firmas = [
+        # Primera fila: firma del rector y raya para director centradas
+        [firma_img if firma_img else Paragraph("", estilo_normal),
+         Paragraph("", estilo_normal)],
+
+        # Segunda fila: nombre del rector y raya para director
+        [Paragraph(rector_nombre or "RECTOR(A)", estilo_negrita),
+         Paragraph("___________________", estilo_normal)],
+
+        # Tercera fila: cargos
+        [Paragraph("RECTOR(A)", estilo_negrita),
+         Paragraph("DIRECTOR(A) DE GRUPO", estilo_negrita)]
+    ]
+
+    firmas_table = Table(firmas, colWidths=[2.5*inch, 2.5*inch])
+    firmas_table.setStyle(TableStyle([
+        ('ALIGN', (0,0), (-1,-1), 'CENTER'),   # centrar todo en cada celda
+        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),  # alinear vertical
+        ('TOPPADDING', (0,0), (-1,-1), 8),
+        ('BOTTOMPADDING', (0,0), (-1,-1), 4),
+    ]))
+
+    # Centrar la tabla de firmas en la página
+    centered_firmas = Table([[firmas_table]], colWidths=[7.5*inch])
+    centered_firmas.setStyle(TableStyle([
+        ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+        ('LEFTPADDING', (0,0), (-1,-1), 80),  # Desplazar más a la derecha
+    ]))
+
+    # --- MASTER TABLE: agrupa todas las tablas anteriores en UNA sola columna ---
+    master_rows = [
+        [header_table],
+        [info_estudiante],
+        [periodo_table],
+        [fecha_impresion],
+        [calificaciones_table],
+        [puesto_promedio],
+        [observaciones_table],
+        [pie_info],
+        [centered_firmas]
+    ]
+    master_table = Table(master_rows, colWidths=[7.5*inch])
+
+    # Estilos de la tabla maestra: sin borde global, padding por fila para separarlas
+    master_style = [('VALIGN', (0,0), (-1,-1), 'TOP')]
+    # aplicar padding consistente entre filas
+    for i in range(len(master_rows)):
+        master_style.append(('LEFTPADDING', (0,i), (0,i), 0))
+        master_style.append(('RIGHTPADDING', (0,i), (0,i), 0))
+        master_style.append(('TOPPADDING', (0,i), (0,i), 0))
+        master_style.append(('BOTTOMPADDING', (0,i), (0,i), 0))
+    master_table.setStyle(TableStyle(master_style))
+
+    # Construir Story con la tabla maestra
+    Story = [master_table]
+
+    # Renderizar el documento con la marca de agua
+    doc.build(Story, onFirstPage=add_background, onLaterPages=add_background)
+    return buffer.getvalue()
+
+
+def _renderizar_seguro(datos):
+    """Renderiza un boletín devolviendo (pdf, error) para que un fallo no detenga el lote"""
+    if 'error' in datos:
+        return None, datos['error']
+    try:
+        return renderizar_boletin_pdf(datos), None
+    except Exception as e:
+        return None, str(e)
+
+
+def _renderizar_pendientes(lista_datos, workers):
+    """
+    Renderiza en orden los boletines que no están en caché, en serie o en un pool de procesos.
+    En el pool hay a lo sumo 2 × workers boletines en curso o esperando a ser entregados: si
+    quien consume (por ejemplo, un ZIP que descarga un cliente lento) se atrasa, el pool espera
+    en lugar de acumular PDFs en memoria.
+    """
+    if workers <= 1 or len(lista_datos) <= 1:
+        for datos in lista_datos:
+            yield _renderizar_seguro(datos)
+        return
+
+    workers = min(workers, len(lista_datos))
+    en_curso = deque()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        try:
+            for datos in lista_datos:
+                if len(en_curso) >= workers * 2:
+                    yield en_curso.popleft().result()
+                en_curso.append(executor.submit(_renderizar_seguro, datos))
+            while en_curso:
+                yield en_curso.popleft().result()
+        finally:
+            # Si se abandona la descarga no se dibuja lo que aún no empezó
+            for futuro in en_curso:
+                futuro.cancel()
+
+
+def iterar_boletines_pdf(lista_datos, workers=1):
+    """
+    Renderiza varios boletines y entrega cada (pdf_bytes, error) a medida que termina,
+    en el mismo orden de entrada.
+
+    Los boletines cuyos datos no cambiaron salen de la caché de PDFs sin pasar por ReportLab;
+    cada uno se lee del disco justo antes de entregarlo, así en memoria solo está el que se
+    entrega. El resto se dibuja con workers > 1 repartido entre procesos (ReportLab es
+    intensivo en CPU y el GIL impide aprovechar hilos) o en el proceso actual con workers <= 1.
+    """
+    claves = [None if 'error' in datos else clave_pdf('boletin', VERSION_PLANTILLA_BOLETIN, datos) for datos in lista_datos]
+    en_cache = [bool(clave) and existe_pdf_cache(clave) for clave in claves]
+    pendientes = _renderizar_pendientes(
+        [datos for datos, cacheado in zip(lista_datos, en_cache) if not cacheado], workers
+    )
+
+    try:
+        for datos, clave, cacheado in zip(lista_datos, claves, en_cache):
+            pdf = leer_pdf_cache(clave) if cacheado else None
+            if pdf is not None:
+                yield pdf, None
+                continue
+            # Si el PDF se expulsó de la caché después de revisarla, se dibuja aquí mismo
+            pdf, error = next(pendientes) if not cacheado else _renderizar_seguro(datos)
+            if error is None and clave:
+                guardar_pdf_cache(clave, pdf)
+            yield pdf, error
+    finally:
+        pendientes.close()
+
+
+def renderizar_boletines_pdf(lista_datos, workers=1):
+    """Renderiza varios boletines y devuelve una lista de (pdf_bytes, error) en el mismo orden de entrada"""
+    return list(iterar_boletines_pdf(lista_datos, workers=workers))
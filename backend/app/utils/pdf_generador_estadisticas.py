@@ -16,7 +16,31 @@ class PDF(FPDF):
         self.set_font('Arial', 'I', 8)
         self.cell(0, 10, f'Página {self.page_no()}', 0, 0, 'C')
 
-def generate_statistics_pdf(graficas, grado):
+def _tabla_rendimiento(pdf, rendimiento):
+    """Tabla de promedios por curso y asignatura (filas de MatrizRendimiento.tabla())"""
+    pdf.add_page()
+    pdf.set_font('Arial', 'B', 12)
+    pdf.cell(0, 10, 'Rendimiento promedio por asignatura', 0, 1, 'L')
+    pdf.ln(2)
+
+    anchos = [40, 60, 30, 30, 30]
+    encabezados = ['Curso', 'Asignatura', 'Semana actual', 'Mes actual', 'Últimos 7 días']
+    pdf.set_font('Arial', 'B', 9)
+    pdf.set_fill_color(230, 230, 230)
+    for ancho, encabezado in zip(anchos, encabezados):
+        pdf.cell(ancho, 7, encabezado, 1, 0, 'C', True)
+    pdf.ln()
+
+    pdf.set_font('Arial', '', 9)
+    for curso, asignatura, *promedios in rendimiento:
+        pdf.cell(anchos[0], 6, curso[:24], 1, 0, 'L')
+        pdf.cell(anchos[1], 6, asignatura[:36], 1, 0, 'L')
+        for ancho, promedio in zip(anchos[2:], promedios):
+            pdf.cell(ancho, 6, '-' if promedio is None else f'{promedio:.2f}', 1, 0, 'C')
+        pdf.ln()
+
+
+def generate_statistics_pdf(graficas, grado, rendimiento=None):
     pdf = PDF()
     pdf.add_page()
     pdf.set_auto_page_break(auto=True, margin=15)
@@ -44,5 +68,8 @@ def generate_statistics_pdf(graficas, grado):
         
         # Eliminar archivo temporal
         os.remove(temp_img_path)
+
+    if rendimiento:
+        _tabla_rendimiento(pdf, rendimiento)
     
     return pdf.output(dest='S').encode('latin1')
\ No newline at end of file
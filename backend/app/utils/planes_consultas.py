@@ -0,0 +1,89 @@
+"""
+Planes de ejecución de las consultas más frecuentes sobre las tablas académicas
+(asistencias, calificacion, boletines, actividades, matricula y asistencias_resumen).
+
+consultas_frecuentes() lista cada consulta con la tabla que no debe recorrer completa y
+revisar_planes() devuelve, por consulta, los pasos del plan que sí la recorren. Usa EXPLAIN
+QUERY PLAN en SQLite, EXPLAIN con enable_seqscan desactivado en PostgreSQL (así en tablas
+pequeñas se comprueba que el índice existe y sirve, aunque el planificador prefiriera
+recorrer la tabla) y EXPLAIN en MySQL. Lo usan verificar_planes_consultas.py y las pruebas.
+"""
+import re
+from datetime import date, datetime, timedelta
+from app.extensions import db
+from app.models import Actividad, Asistencia, AsistenciaResumen, Boletin, Calificacion, Matricula
+
+DIALECTOS = ('sqlite', 'postgresql', 'mysql')
+
+
+def consultas_frecuentes():
+    """(descripción, tabla que no debe recorrerse completa, consulta)"""
+    hoy = date.today()
+    return [
+        ('Asistencias de una asignación en un día', 'asistencias', db.select(Asistencia.id).where(
+            Asistencia.id_asignacion == 1, Asistencia.fecha == hoy)),
+        ('Asistencia de un estudiante en un día', 'asistencias', db.select(Asistencia.id).where(
+            Asistencia.id_matricula == 1, Asistencia.id_asignacion == 1, Asistencia.fecha == hoy)),
+        ('Libro de notas de una fecha', 'calificacion', db.select(Calificacion.id).where(
+            Calificacion.id_asignacion == 1, Calificacion.fecha_calificacion == hoy)),
+        ('Calificaciones de una asignación en un período', 'calificacion', db.select(Calificacion.id).where(
+            Calificacion.id_asignacion == 1, Calificacion.id_periodo == 1)),
+        ('Calificaciones de un estudiante en un rango', 'calificacion', db.select(Calificacion.nota).where(
+            Calificacion.id_matricula == 1,
+            Calificacion.fecha_calificacion.between(hoy - timedelta(days=60), hoy))),
+        ('Boletines de un curso en un período', 'boletines', db.select(Boletin.id).where(
+            Boletin.id_curso == 1, Boletin.id_periodo == 1, Boletin.anio_lectivo == str(hoy.year))),
+        ('Boletín de un estudiante en un período', 'boletines', db.select(Boletin.id).where(
+            Boletin.id_matricula == 1, Boletin.id_periodo == 1)),
+        ('Actividades recientes', 'actividades', db.select(Actividad.id).where(
+            Actividad.creado_en > datetime.utcnow() - timedelta(days=7))),
+        ('Últimas actividades', 'actividades', db.select(Actividad.id).order_by(
+            Actividad.creado_en.desc()).limit(5)),
+        ('Matrículas activas de un curso', 'matricula', db.select(Matricula.id).where(
+            Matricula.año_lectivo == hoy.year, Matricula.estado == 'activo', Matricula.id_curso == 1)),
+        ('Resumen de asistencias de un rango', 'asistencias_resumen', db.select(AsistenciaResumen.total).where(
+            AsistenciaResumen.anio_lectivo == hoy.year,
+            AsistenciaResumen.fecha.between(hoy - timedelta(days=30), hoy))),
+    ]
+
+
+def explicar(conexion, consulta):
+    """Filas del plan de la consulta en el motor de la conexión"""
+    dialecto = conexion.dialect
+    compilada = consulta.compile(dialect=dialecto)
+    parametros = compilada.params
+    if compilada.positional:
+        parametros = tuple(parametros[nombre] for nombre in compilada.positiontup)
+    prefijo = 'EXPLAIN QUERY PLAN ' if dialecto.name == 'sqlite' else 'EXPLAIN '
+    return conexion.exec_driver_sql(prefijo + str(compilada), parametros).mappings().all()
+
+
+def recorridos_completos(dialecto, plan, tabla):
+    """Pasos del plan que leen `tabla` completa"""
+    if dialecto == 'sqlite':
+        # "SCAN tabla" sin "USING ... INDEX" recorre todas las filas
+        return [fila['detail'] for fila in plan
+                if re.match(rf'SCAN (TABLE )?{tabla}\b', fila['detail']) and 'USING' not in fila['detail']]
+    if dialecto == 'postgresql':
+        return [fila['QUERY PLAN'] for fila in plan if f'Seq Scan on {tabla}' in fila['QUERY PLAN']]
+    if dialecto == 'mysql':
+        return [str(dict(fila)) for fila in plan if fila.get('table') == tabla and fila.get('type') == 'ALL']
+    return []
+
+
+def revisar_planes(conexion, consultas=None):
+    """
+    [(descripción, tabla, recorridos completos)] de cada consulta (por defecto las de
+    consultas_frecuentes()). Deshace al final lo que haya cambiado en la sesión del motor.
+    Lanza ValueError si el motor no está en DIALECTOS.
+    """
+    dialecto = conexion.dialect.name
+    if dialecto not in DIALECTOS:
+        raise ValueError(f'Motor {dialecto} no soportado')
+    if dialecto == 'postgresql':
+        conexion.exec_driver_sql('SET enable_seqscan = off')
+    try:
+        return [(descripcion, tabla, recorridos_completos(dialecto, explicar(conexion, consulta), tabla))
+                for descripcion, tabla, consulta in (consultas_frecuentes() if consultas is None else consultas)]
+    finally:
+        conexion.rollback()
@@ -0,0 +1,53 @@
+import io
+import zipfile
+
+
+class _SalidaPorPartes(io.RawIOBase):
+    """
+    Destino de escritura para ZipFile que acumula solo lo escrito desde el último vaciado.
+    No permite seek, así que zipfile escribe cada entrada con descriptor de datos
+    y nunca necesita volver atrás en el archivo.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._partes = []
+        self._posicion = 0
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        datos = bytes(datos)
+        self._partes.append(datos)
+        self._posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self._posicion
+
+    def vaciar(self):
+        datos = b''.join(self._partes)
+        self._partes.clear()
+        return datos
+
+
+def generar_zip_streaming(entradas, compresion=zipfile.ZIP_DEFLATED):
+    """
+    Genera un ZIP por partes a partir de un iterable de (nombre_archivo, contenido).
+
+    Cada entrada se comprime y se entrega apenas se produce, de modo que la memoria usada
+    es la de un solo archivo y no la del ZIP completo. Pensado para usarse con
+    `Response(stream_with_context(...))` en descargas masivas.
+    """
+    salida = _SalidaPorPartes()
+    with zipfile.ZipFile(salida, 'w', compresion) as zf:
+        for nombre, contenido in entradas:
+            zf.writestr(nombre, contenido)
+            datos = salida.vaciar()
+            if datos:
+                yield datos
+    # Directorio central del ZIP, escrito al cerrar el archivo
+    datos = salida.vaciar()
+    if datos:
+        yield datos
@@ -63,6 +63,43 @@ class Config:
     MAIL_PASSWORD = os.getenv("MAIL_PASSWORD", None)
     MAIL_DEFAULT_SENDER = ("Infojis Admin", MAIL_USERNAME)
     MAIL_DEBUG = False
+    # Bandeja de salida: los correos los entrega el worker (`python worker.py`) por lotes
+    CORREO_LOTE = int(os.getenv("CORREO_LOTE", 50))  # Correos por conexión SMTP
+    CORREO_INTERVALO = float(os.getenv("CORREO_INTERVALO", 5))  # Segundos entre revisiones de la bandeja
+    CORREO_MAX_INTENTOS = int(os.getenv("CORREO_MAX_INTENTOS", 5))
+    CORREO_REINTENTO_SEGUNDOS = int(os.getenv("CORREO_REINTENTO_SEGUNDOS", 60))  # Se duplica en cada intento
+
+    # 12. Generación de PDFs
+    # Procesos para renderizar boletines en las descargas masivas (1 = sin paralelismo)
+    BOLETINES_PDF_WORKERS = int(os.getenv("BOLETINES_PDF_WORKERS", 1))
+    # Caché en disco de PDFs ya generados (boletines, certificados, constancias y comprobantes)
+    PDF_CACHE_ENABLED = os.getenv("PDF_CACHE_ENABLED", "True").lower() == "true"
+    PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", str(BACKEND_DIR / 'cache' / 'pdf'))
+    PDF_CACHE_MAX_MB = int(os.getenv("PDF_CACHE_MAX_MB", 500))
+
+    # 13. Trabajos en segundo plano (se ejecutan con `python worker.py`)
+    TRABAJOS_DIR = os.getenv("TRABAJOS_DIR", str(BACKEND_DIR / 'cache' / 'trabajos'))
+    TRABAJOS_WORKERS = int(os.getenv("TRABAJOS_WORKERS", 2))  # Procesos del worker
+    TRABAJOS_INTERVALO = float(os.getenv("TRABAJOS_INTERVALO", 2))  # Segundos entre consultas a la cola
+    TRABAJOS_INTERVALO_PROGRESO = 1  # Segundos mínimos entre escrituras de progreso
+    TRABAJOS_LATIDO_SEGUNDOS = 30  # Cada cuánto un trabajo en curso avisa que su worker sigue vivo
+    TRABAJOS_SIN_LATIDO_MINUTOS = int(os.getenv("TRABAJOS_SIN_LATIDO_MINUTOS", 10))  # Sin latido: se reintenta
+    TRABAJOS_MAX_INTENTOS = 3
+    TRABAJOS_RETENCION_HORAS = int(os.getenv("TRABAJOS_RETENCION_HORAS", 24))  # Se borran los resultados viejos
+
+    # 14. Caches de la aplicación (app/utils/cache.py)
+    CACHE_COMPARTIDA = os.getenv("CACHE_COMPARTIDA", "")  # '' solo memoria del proceso, 'redis' compartida entre workers, 'memoria' sustituto local para pruebas
+    CACHE_TTL_SEGUNDOS = 300  # Vencimiento por defecto
+    CACHE_LOCAL_MAX_ENTRADAS = int(os.getenv("CACHE_LOCAL_MAX_ENTRADAS", 1024))  # Tamaño del LRU de cada proceso
+    CACHE_LOCAL_SEGUNDOS = 5  # Con cache compartida, cuánto reutiliza cada proceso sus valores y la versión de cada espacio
+    CONFIG_VERIFICAR_SEGUNDOS = int(os.getenv("CONFIG_VERIFICAR_SEGUNDOS", 5))  # Cada cuánto se comprueba si cambió la configuración activa
+    DASHBOARD_CACHE_SEGUNDOS = int(os.getenv("DASHBOARD_CACHE_SEGUNDOS", 60))  # 0 desactiva la cache del dashboard
+    USUARIOS_CACHE_SEGUNDOS = int(os.getenv("USUARIOS_CACHE_SEGUNDOS", 30))  # Identidad del usuario en cada petición; 0 la desactiva
+
+    # 15. Eventos en vivo (SSE). Cada conexión abierta ocupa un worker síncrono: en producción usar gunicorn -k gevent
+    EVENTOS_INTERVALO = int(os.getenv("EVENTOS_INTERVALO", 2))  # Segundos entre revisiones de notificaciones y trabajos
+    EVENTOS_LATIDO = 15  # Segundos entre comentarios que mantienen viva la conexión
+    EVENTOS_DURACION_MAXIMA = int(os.getenv("EVENTOS_DURACION_MAXIMA", 300))  # El navegador se reconecta al cerrarse
     
 
 
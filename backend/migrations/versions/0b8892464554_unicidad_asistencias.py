@@ -0,0 +1,61 @@
+"""asistencias sin repetir por matrícula, asignación y fecha
+
+Revision ID: 0b8892464554
+Revises: 252111eb2bc4
+Create Date: 2026-10-17 21:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b8892464554'
+down_revision = '252111eb2bc4'
+branch_labels = None
+depends_on = None
+
+INDICE = 'uq_asistencia_matricula_asignacion_fecha'
+
+
+def _indices_unicos(tabla):
+    # Una base creada desde los modelos puede tener la clave como restricción y no como índice
+    inspector = sa.inspect(op.get_bind())
+    return ({indice['name'] for indice in inspector.get_indexes(tabla) if indice['unique']}
+            | {restriccion['name'] for restriccion in inspector.get_unique_constraints(tabla)})
+
+
+def upgrade():
+    if INDICE in _indices_unicos('asistencias'):
+        return
+    # De cada grupo repetido se conserva la asistencia más reciente (la de mayor id). La
+    # subconsulta va envuelta en una tabla derivada porque MySQL no deja leer en un DELETE
+    # la misma tabla que se borra.
+    op.execute(
+        'DELETE FROM asistencias WHERE id NOT IN ('
+        'SELECT id FROM (SELECT MAX(id) AS id FROM asistencias '
+        'GROUP BY id_matricula, id_asignacion, fecha) conservar)'
+    )
+    op.create_index(INDICE, 'asistencias', ['id_matricula', 'id_asignacion', 'fecha'], unique=True)
+    # El resumen se llenó contando también las repetidas: se rehace con la misma consulta de
+    # asistencia_service.reconstruir_resumen_asistencia
+    if sa.inspect(op.get_bind()).has_table('asistencias_resumen'):
+        op.execute('DELETE FROM asistencias_resumen')
+        op.execute(
+            'INSERT INTO asistencias_resumen (id_curso, id_asignacion, anio_lectivo, fecha, estado, total) '
+            'SELECT asignaciones.id_curso, asistencias.id_asignacion, asignaciones.anio_lectivo, '
+            'asistencias.fecha, asistencias.estado, COUNT(asistencias.id) '
+            'FROM asistencias '
+            'JOIN asignaciones ON asistencias.id_asignacion = asignaciones.id '
+            'JOIN matricula ON asistencias.id_matricula = matricula.id '
+            "WHERE matricula.estado = 'activo' "
+            'GROUP BY asignaciones.id_curso, asistencias.id_asignacion, asignaciones.anio_lectivo, '
+            'asistencias.fecha, asistencias.estado'
+        )
+
+
+def downgrade():
+    # Las asistencias borradas por repetidas no se recuperan
+    indices = {indice['name'] for indice in sa.inspect(op.get_bind()).get_indexes('asistencias')}
+    if INDICE in indices:
+        op.drop_index(INDICE, table_name='asistencias')
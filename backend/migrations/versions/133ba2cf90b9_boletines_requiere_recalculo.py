@@ -0,0 +1,32 @@
+"""boletines.requiere_recalculo
+
+Revision ID: 133ba2cf90b9
+Revises: 
+Create Date: 2026-10-17 20:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '133ba2cf90b9'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _columnas(tabla):
+    return {columna['name'] for columna in sa.inspect(op.get_bind()).get_columns(tabla)}
+
+
+def upgrade():
+    # Los boletines existentes quedan marcados: se recalculan una vez al consultarlos
+    if 'requiere_recalculo' not in _columnas('boletines'):
+        op.add_column('boletines', sa.Column('requiere_recalculo', sa.Boolean(), nullable=False, server_default='1'))
+
+
+def downgrade():
+    if 'requiere_recalculo' in _columnas('boletines'):
+        with op.batch_alter_table('boletines') as batch_op:
+            batch_op.drop_column('requiere_recalculo')
@@ -0,0 +1,50 @@
+"""tablas notificaciones_estado y notificaciones_ocultas
+
+Revision ID: 252111eb2bc4
+Revises: f3641982bc23
+Create Date: 2026-10-17 21:50:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '252111eb2bc4'
+down_revision = 'f3641982bc23'
+branch_labels = None
+depends_on = None
+
+
+def _existe(tabla):
+    return sa.inspect(op.get_bind()).has_table(tabla)
+
+
+def upgrade():
+    # Empiezan vacías: el estado de cada usuario se crea al consultar sus notificaciones
+    if not _existe('notificaciones_estado'):
+        op.create_table(
+            'notificaciones_estado',
+            sa.Column('id_usuario', sa.Integer(), nullable=False),
+            sa.Column('vistas_hasta', sa.DateTime(), nullable=False),
+            sa.Column('no_leidas', sa.Integer(), nullable=False),
+            sa.Column('actualizado_en', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['id_usuario'], ['usuarios.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id_usuario'),
+        )
+    if not _existe('notificaciones_ocultas'):
+        op.create_table(
+            'notificaciones_ocultas',
+            sa.Column('id_usuario', sa.Integer(), nullable=False),
+            sa.Column('id_actividad', sa.Integer(), nullable=False),
+            sa.Column('creado_en', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['id_usuario'], ['usuarios.id'], ondelete='CASCADE'),
+            sa.ForeignKeyConstraint(['id_actividad'], ['actividades.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id_usuario', 'id_actividad'),
+        )
+
+
+def downgrade():
+    for tabla in ('notificaciones_ocultas', 'notificaciones_estado'):
+        if _existe(tabla):
+            op.drop_table(tabla)
@@ -0,0 +1,47 @@
+"""indices compuestos de las tablas académicas
+
+Revision ID: 3f9c1a7d52e8
+Revises: ca67e0c6efe1
+Create Date: 2026-10-17 19:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9c1a7d52e8'
+down_revision = 'ca67e0c6efe1'
+branch_labels = None
+depends_on = None
+
+# (tabla, nombre, columnas): los mismos índices que declaran los modelos
+INDICES = (
+    ('asistencias', 'ix_asistencias_asignacion_fecha', ['id_asignacion', 'fecha']),
+    ('calificacion', 'ix_calificacion_asignacion_fecha', ['id_asignacion', 'fecha_calificacion']),
+    ('calificacion', 'ix_calificacion_asignacion_periodo', ['id_asignacion', 'id_periodo']),
+    ('calificacion', 'ix_calificacion_matricula_fecha', ['id_matricula', 'fecha_calificacion']),
+    ('boletines', 'ix_boletines_curso_periodo_anio', ['id_curso', 'id_periodo', 'anio_lectivo']),
+    ('boletines', 'ix_boletines_matricula_periodo', ['id_matricula', 'id_periodo']),
+    ('actividades', 'ix_actividades_creado_en', ['creado_en']),
+    ('matricula', 'ix_matricula_anio_estado_curso', ['año_lectivo', 'estado', 'id_curso']),
+)
+
+
+def _existentes(tabla):
+    return {indice['name'] for indice in sa.inspect(op.get_bind()).get_indexes(tabla)}
+
+
+def upgrade():
+    # Las bases creadas desde los modelos ya pueden tener algunos de estos índices
+    for tabla, nombre, columnas in INDICES:
+        if nombre not in _existentes(tabla):
+            op.create_index(nombre, tabla, columnas)
+    # El índice único de asistencias requiere eliminar antes los registros repetidos:
+    # ver la revisión 0b8892464554
+
+
+def downgrade():
+    for tabla, nombre, columnas in reversed(INDICES):
+        if nombre in _existentes(tabla):
+            op.drop_index(nombre, table_name=tabla)
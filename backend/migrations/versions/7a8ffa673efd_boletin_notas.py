@@ -0,0 +1,141 @@
+"""tabla boletin_notas y conversión de boletines.grades_data
+
+Revision ID: 7a8ffa673efd
+Revises: 9683d4372b0e
+Create Date: 2026-10-17 20:35:00.000000
+
+"""
+import json
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a8ffa673efd'
+down_revision = '9683d4372b0e'
+branch_labels = None
+depends_on = None
+
+TAMANO_LOTE = 500
+CAMPOS_REALES = ('p1', 'p2', 'p3', 'p4', 'pf', 'nota')
+CAMPOS_ENTEROS = ('fl', 'ih')
+
+boletines = sa.table(
+    'boletines',
+    sa.column('id', sa.Integer),
+    sa.column('grades_data', sa.Text),
+    sa.column('requiere_recalculo', sa.Boolean),
+)
+boletin_notas = sa.table(
+    'boletin_notas',
+    sa.column('id_boletin', sa.Integer),
+    sa.column('id_asignatura', sa.Integer),
+    sa.column('orden', sa.Integer),
+    *(sa.column(campo, sa.Float) for campo in CAMPOS_REALES),
+    *(sa.column(campo, sa.Integer) for campo in CAMPOS_ENTEROS),
+    sa.column('observacion', sa.Text),
+    sa.column('desempeno', sa.String),
+)
+
+
+def _numero(valor, tipo):
+    try:
+        return tipo(valor) if valor is not None and valor != '' else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _fila(id_boletin, id_asignatura, orden, datos):
+    fila = {'id_boletin': id_boletin, 'id_asignatura': id_asignatura, 'orden': orden,
+            'observacion': datos.get('observacion', '') or '', 'desempeno': datos.get('desempeno', '') or ''}
+    fila.update({campo: _numero(datos.get(campo), float) for campo in CAMPOS_REALES})
+    fila.update({campo: _numero(datos.get(campo), int) for campo in CAMPOS_ENTEROS})
+    return fila
+
+
+def _convertir_grades_data(conexion):
+    """Pasa el JSON de cada boletín a filas de boletin_notas y vacía la columna"""
+    asignaturas_ids = {asig_id for (asig_id,) in conexion.execute(sa.text('SELECT id FROM asignaturas'))}
+    ultimo_id = 0
+    while True:
+        lote = conexion.execute(
+            sa.select(boletines.c.id, boletines.c.grades_data)
+            .where(boletines.c.grades_data.isnot(None), boletines.c.id > ultimo_id)
+            .order_by(boletines.c.id).limit(TAMANO_LOTE)
+        ).all()
+        if not lote:
+            break
+
+        filas, invalidos = [], []
+        for id_boletin, grades_data in lote:
+            try:
+                grades = json.loads(grades_data)
+            except (TypeError, ValueError):
+                grades = None
+            if not isinstance(grades, dict):
+                # JSON dañado: se descarta y el boletín se recalcula al consultarlo
+                invalidos.append(id_boletin)
+                continue
+            # Se omiten asignaturas que ya no existen o entradas sin el formato esperado
+            validas = [(int(asig_id), datos) for asig_id, datos in grades.items()
+                       if str(asig_id).isdigit() and int(asig_id) in asignaturas_ids and isinstance(datos, dict)]
+            filas.extend(_fila(id_boletin, asig_id, orden, datos) for orden, (asig_id, datos) in enumerate(validas))
+
+        ids = [id_boletin for id_boletin, _ in lote]
+        conexion.execute(boletin_notas.delete().where(boletin_notas.c.id_boletin.in_(ids)))
+        if filas:
+            conexion.execute(boletin_notas.insert(), filas)
+        if invalidos:
+            conexion.execute(boletines.update().where(boletines.c.id.in_(invalidos)).values(requiere_recalculo=True))
+        conexion.execute(boletines.update().where(boletines.c.id.in_(ids)).values(grades_data=None))
+        ultimo_id = ids[-1]
+
+
+def upgrade():
+    if not sa.inspect(op.get_bind()).has_table('boletin_notas'):
+        op.create_table(
+            'boletin_notas',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('id_boletin', sa.Integer(), nullable=False),
+            sa.Column('id_asignatura', sa.Integer(), nullable=False),
+            sa.Column('orden', sa.Integer(), nullable=False),
+            sa.Column('p1', sa.Float(), nullable=True),
+            sa.Column('p2', sa.Float(), nullable=True),
+            sa.Column('p3', sa.Float(), nullable=True),
+            sa.Column('p4', sa.Float(), nullable=True),
+            sa.Column('pf', sa.Float(), nullable=True),
+            sa.Column('fl', sa.Integer(), nullable=True),
+            sa.Column('ih', sa.Integer(), nullable=True),
+            sa.Column('observacion', sa.Text(), nullable=True),
+            sa.Column('desempeno', sa.String(length=20), nullable=True),
+            sa.Column('nota', sa.Float(), nullable=True),
+            sa.ForeignKeyConstraint(['id_boletin'], ['boletines.id'], ondelete='CASCADE'),
+            sa.ForeignKeyConstraint(['id_asignatura'], ['asignaturas.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('id_boletin', 'id_asignatura', name='uq_boletin_nota_asignatura'),
+        )
+        op.create_index('ix_boletin_notas_id_boletin', 'boletin_notas', ['id_boletin'])
+
+    _convertir_grades_data(op.get_bind())
+
+
+def _reconstruir_grades_data(conexion):
+    """Vuelve a escribir el JSON de cada boletín a partir de sus filas de boletin_notas"""
+    campos = ('p1', 'p2', 'p3', 'p4', 'pf', 'fl', 'ih')
+    grades_por_boletin = {}
+    filas = conexion.execute(sa.select(boletin_notas).order_by(boletin_notas.c.id_boletin, boletin_notas.c.orden)).mappings()
+    for fila in filas:
+        datos = {campo: fila[campo] for campo in campos if fila[campo] is not None}
+        datos.update(observacion=fila['observacion'] or '', desempeno=fila['desempeno'] or '', nota=fila['nota'])
+        grades_por_boletin.setdefault(fila['id_boletin'], {})[str(fila['id_asignatura'])] = datos
+    if grades_por_boletin:
+        conexion.execute(
+            boletines.update().where(boletines.c.id == sa.bindparam('b_id')).values(grades_data=sa.bindparam('json')),
+            [{'b_id': id_boletin, 'json': json.dumps(grades)} for id_boletin, grades in grades_por_boletin.items()]
+        )
+
+
+def downgrade():
+    if sa.inspect(op.get_bind()).has_table('boletin_notas'):
+        _reconstruir_grades_data(op.get_bind())
+        op.drop_table('boletin_notas')
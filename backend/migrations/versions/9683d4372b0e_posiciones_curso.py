@@ -0,0 +1,48 @@
+"""tabla posiciones_curso
+
+Revision ID: 9683d4372b0e
+Revises: 133ba2cf90b9
+Create Date: 2026-10-17 20:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9683d4372b0e'
+down_revision = '133ba2cf90b9'
+branch_labels = None
+depends_on = None
+
+
+def _existe(tabla):
+    return sa.inspect(op.get_bind()).has_table(tabla)
+
+
+def upgrade():
+    # Empieza vacía: los puestos se calculan y guardan al consultarlos
+    if _existe('posiciones_curso'):
+        return
+    op.create_table(
+        'posiciones_curso',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('id_curso', sa.Integer(), nullable=False),
+        sa.Column('id_periodo', sa.Integer(), nullable=False),
+        sa.Column('anio_lectivo', sa.Integer(), nullable=False),
+        sa.Column('id_matricula', sa.Integer(), nullable=False),
+        sa.Column('puesto', sa.Integer(), nullable=False),
+        sa.Column('promedio', sa.Float(), nullable=False),
+        sa.Column('cantidad_asignaturas', sa.Integer(), nullable=False),
+        sa.Column('actualizado_en', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['id_curso'], ['cursos.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['id_periodo'], ['periodos.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['id_matricula'], ['matricula.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('id_curso', 'id_periodo', 'anio_lectivo', 'id_matricula', name='uq_posicion_curso_matricula'),
+    )
+
+
+def downgrade():
+    if _existe('posiciones_curso'):
+        op.drop_table('posiciones_curso')
@@ -0,0 +1,37 @@
+"""posiciones_curso.promedio como decimal exacto
+
+Revision ID: a4ebe2a051d5
+Revises: e303b11714f3
+Create Date: 2026-10-18 09:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4ebe2a051d5'
+down_revision = 'e303b11714f3'
+branch_labels = None
+depends_on = None
+
+
+def _tipo_promedio():
+    columnas = sa.inspect(op.get_bind()).get_columns('posiciones_curso')
+    return next(columna['type'] for columna in columnas if columna['name'] == 'promedio')
+
+
+def upgrade():
+    # El cursor de pagina_posiciones compara el promedio por igualdad; en MySQL un FLOAT de
+    # precisión simple no es igual al double del cursor. Los valores se redondean a 2 decimales.
+    if not isinstance(_tipo_promedio(), sa.Float):
+        return
+    with op.batch_alter_table('posiciones_curso') as batch_op:
+        batch_op.alter_column('promedio', type_=sa.Numeric(5, 2), existing_nullable=False)
+
+
+def downgrade():
+    if isinstance(_tipo_promedio(), sa.Float):
+        return
+    with op.batch_alter_table('posiciones_curso') as batch_op:
+        batch_op.alter_column('promedio', type_=sa.Float(), existing_nullable=False)
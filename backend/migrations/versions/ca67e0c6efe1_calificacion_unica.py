@@ -0,0 +1,47 @@
+"""calificaciones sin repetir por matrícula, asignación y fecha
+
+Revision ID: ca67e0c6efe1
+Revises: 0b8892464554
+Create Date: 2026-10-17 22:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ca67e0c6efe1'
+down_revision = '0b8892464554'
+branch_labels = None
+depends_on = None
+
+INDICE = 'uq_calificacion_matricula_asignacion_fecha'
+
+
+def _indices_unicos(tabla):
+    # Una base creada desde los modelos puede tener la clave como restricción y no como índice
+    inspector = sa.inspect(op.get_bind())
+    return ({indice['name'] for indice in inspector.get_indexes(tabla) if indice['unique']}
+            | {restriccion['name'] for restriccion in inspector.get_unique_constraints(tabla)})
+
+
+def upgrade():
+    if INDICE in _indices_unicos('calificacion'):
+        return
+    # Dos guardados simultáneos pudieron dejar la misma calificación repetida; se conserva
+    # la más reciente (la de mayor id). La tabla derivada es por la misma limitación de MySQL
+    # que en la revisión de asistencias.
+    op.execute(
+        'DELETE FROM calificacion WHERE id NOT IN ('
+        'SELECT id FROM (SELECT MAX(id) AS id FROM calificacion '
+        'GROUP BY id_matricula, id_asignacion, fecha_calificacion) conservar)'
+    )
+    op.create_index(INDICE, 'calificacion', ['id_matricula', 'id_asignacion', 'fecha_calificacion'],
+                    unique=True)
+
+
+def downgrade():
+    # Las calificaciones borradas por repetidas no se recuperan
+    indices = {indice['name'] for indice in sa.inspect(op.get_bind()).get_indexes('calificacion')}
+    if INDICE in indices:
+        op.drop_index(INDICE, table_name='calificacion')
@@ -0,0 +1,56 @@
+"""tabla trabajos
+
+Revision ID: ceaf7afe010a
+Revises: 7a8ffa673efd
+Create Date: 2026-10-17 20:50:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ceaf7afe010a'
+down_revision = '7a8ffa673efd'
+branch_labels = None
+depends_on = None
+
+ESTADO_TRABAJO = sa.Enum('pendiente', 'en_proceso', 'completado', 'error', 'cancelado', name='estado_trabajo')
+
+
+def _existe(tabla):
+    return sa.inspect(op.get_bind()).has_table(tabla)
+
+
+def upgrade():
+    if _existe('trabajos'):
+        return
+    op.create_table(
+        'trabajos',
+        sa.Column('id', sa.String(length=36), nullable=False),
+        sa.Column('tipo', sa.String(length=50), nullable=False),
+        sa.Column('parametros', sa.Text(), nullable=False),
+        sa.Column('estado', ESTADO_TRABAJO, nullable=False),
+        sa.Column('progreso', sa.Integer(), nullable=False),
+        sa.Column('mensaje', sa.String(length=255), nullable=True),
+        sa.Column('archivo', sa.String(length=255), nullable=True),
+        sa.Column('nombre_descarga', sa.String(length=255), nullable=True),
+        sa.Column('cancelacion_solicitada', sa.Boolean(), nullable=False),
+        sa.Column('intentos', sa.Integer(), nullable=False),
+        sa.Column('worker', sa.String(length=100), nullable=True),
+        sa.Column('id_usuario', sa.Integer(), nullable=False),
+        sa.Column('creado_en', sa.DateTime(), nullable=True),
+        sa.Column('iniciado_en', sa.DateTime(), nullable=True),
+        sa.Column('actualizado_en', sa.DateTime(), nullable=True),
+        sa.Column('finalizado_en', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['id_usuario'], ['usuarios.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_trabajos_estado', 'trabajos', ['estado'])
+    op.create_index('ix_trabajos_creado_en', 'trabajos', ['creado_en'])
+
+
+def downgrade():
+    if _existe('trabajos'):
+        op.drop_table('trabajos')
+        ESTADO_TRABAJO.drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,61 @@
+"""tabla correos_salientes
+
+Revision ID: e303b11714f3
+Revises: ceaf7afe010a
+Create Date: 2026-10-17 21:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e303b11714f3'
+down_revision = 'ceaf7afe010a'
+branch_labels = None
+depends_on = None
+
+ESTADO_CORREO = sa.Enum('pendiente', 'enviando', 'enviado', 'error', name='estado_correo')
+
+
+def _existe(tabla):
+    return sa.inspect(op.get_bind()).has_table(tabla)
+
+
+def upgrade():
+    if _existe('correos_salientes'):
+        # Las tablas creadas por el worker en MySQL tienen un BLOB de 64 KB
+        if op.get_bind().dialect.name == 'mysql':
+            op.alter_column('correos_salientes', 'adjunto', type_=mysql.LONGBLOB(), existing_nullable=True)
+        return
+    op.create_table(
+        'correos_salientes',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('destinatario', sa.String(length=120), nullable=False),
+        sa.Column('asunto', sa.String(length=255), nullable=False),
+        sa.Column('cuerpo_html', sa.Text(), nullable=False),
+        sa.Column('adjunto_nombre', sa.String(length=255), nullable=True),
+        sa.Column('adjunto_tipo', sa.String(length=100), nullable=True),
+        sa.Column('adjunto', sa.LargeBinary(length=2**32 - 1), nullable=True),
+        sa.Column('referencia', sa.String(length=100), nullable=True),
+        sa.Column('estado', ESTADO_CORREO, nullable=False),
+        sa.Column('intentos', sa.Integer(), nullable=False),
+        sa.Column('proximo_intento', sa.DateTime(), nullable=False),
+        sa.Column('ultimo_error', sa.String(length=255), nullable=True),
+        sa.Column('lote', sa.String(length=36), nullable=True),
+        sa.Column('id_usuario', sa.Integer(), nullable=True),
+        sa.Column('creado_en', sa.DateTime(), nullable=True),
+        sa.Column('actualizado_en', sa.DateTime(), nullable=True),
+        sa.Column('enviado_en', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['id_usuario'], ['usuarios.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_correos_salientes_referencia', 'correos_salientes', ['referencia'])
+    op.create_index('ix_correos_salientes_estado_proximo', 'correos_salientes', ['estado', 'proximo_intento'])
+
+
+def downgrade():
+    if _existe('correos_salientes'):
+        op.drop_table('correos_salientes')
+        ESTADO_CORREO.drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,55 @@
+"""tabla asistencias_resumen
+
+Revision ID: f3641982bc23
+Revises: a4ebe2a051d5
+Create Date: 2026-10-17 21:35:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3641982bc23'
+down_revision = 'a4ebe2a051d5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if not sa.inspect(op.get_bind()).has_table('asistencias_resumen'):
+        op.create_table(
+            'asistencias_resumen',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('id_curso', sa.Integer(), nullable=False),
+            sa.Column('id_asignacion', sa.Integer(), nullable=False),
+            sa.Column('anio_lectivo', sa.Integer(), nullable=False),
+            sa.Column('fecha', sa.Date(), nullable=False),
+            sa.Column('estado', sa.String(length=20), nullable=False),
+            sa.Column('total', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['id_curso'], ['cursos.id'], ondelete='CASCADE'),
+            sa.ForeignKeyConstraint(['id_asignacion'], ['asignaciones.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('id_asignacion', 'fecha', 'estado', name='uq_asistencia_resumen'),
+        )
+        op.create_index('ix_asistencias_resumen_anio_fecha', 'asistencias_resumen', ['anio_lectivo', 'fecha'])
+
+    # Se llena (o se rehace, si ya existía) con las asistencias de matrículas activas; es la
+    # misma consulta que asistencia_service.reconstruir_resumen_asistencia
+    op.execute('DELETE FROM asistencias_resumen')
+    op.execute(
+        'INSERT INTO asistencias_resumen (id_curso, id_asignacion, anio_lectivo, fecha, estado, total) '
+        'SELECT asignaciones.id_curso, asistencias.id_asignacion, asignaciones.anio_lectivo, '
+        'asistencias.fecha, asistencias.estado, COUNT(asistencias.id) '
+        'FROM asistencias '
+        'JOIN asignaciones ON asistencias.id_asignacion = asignaciones.id '
+        'JOIN matricula ON asistencias.id_matricula = matricula.id '
+        "WHERE matricula.estado = 'activo' "
+        'GROUP BY asignaciones.id_curso, asistencias.id_asignacion, asignaciones.anio_lectivo, '
+        'asistencias.fecha, asistencias.estado'
+    )
+
+
+def downgrade():
+    if sa.inspect(op.get_bind()).has_table('asistencias_resumen'):
+        op.drop_table('asistencias_resumen')
@@ -0,0 +1,37 @@
+"""
+Recalcula desde cero la tabla asistencias_resumen a partir de las asistencias registradas.
+
+Uso:
+    python reconstruir_resumen_asistencias.py [año_lectivo]
+
+La tabla la crea y la llena `flask db upgrade`. Sin argumentos reconstruye todos los años
+lectivos; con un año, solo ese. Es seguro ejecutarlo varias veces (por ejemplo, tras
+importar asistencias a mano).
+"""
+import sys
+from app import create_app
+from app.extensions import db
+from app.models import AsistenciaResumen
+from app.services.asistencia_service import reconstruir_resumen_asistencia
+
+app = create_app()
+
+
+def reconstruir(anio_lectivo=None):
+    print("=== RECONSTRUYENDO RESUMEN DE ASISTENCIAS ===")
+    try:
+        reconstruir_resumen_asistencia(anio_lectivo)
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error al reconstruir el resumen: {str(e)}")
+        raise
+
+    consulta = AsistenciaResumen.query
+    if anio_lectivo is not None:
+        consulta = consulta.filter_by(anio_lectivo=anio_lectivo)
+    print(f"Filas de resumen: {consulta.count()}")
+
+
+if __name__ == '__main__':
+    with app.app_context():
+        reconstruir(int(sys.argv[1]) if len(sys.argv) > 1 else None)
@@ -0,0 +1,131 @@
+"""
+Fixtures de las pruebas: una aplicación sobre una base SQLite temporal con todas las tablas
+de los modelos y un curso de ejemplo con notas, observaciones e inasistencias.
+"""
+import random
+from datetime import date
+import pytest
+from config import Config
+from app import create_app, db
+from app.models import (
+    AnioPeriodo, Asignacion, Asignatura, Asistencia, Calificacion, ConfiguracionLibro, Curso,
+    Matricula, Periodo, SystemConfig, User
+)
+from app.models.configuracion import RectorConfig
+from app.services.configuracion_service import reload_active_config
+
+ANIO = date.today().year
+PERIODOS = [('PRIMERO', '01-01', '03-31'), ('SEGUNDO', '04-01', '06-30'),
+            ('TERCERO', '07-01', '09-30'), ('CUARTO', '10-01', '12-31')]
+CLAVE = 'Password123'
+
+
+@pytest.fixture
+def app(tmp_path):
+    class ConfigPruebas(Config):
+        TESTING = True
+        WTF_CSRF_ENABLED = False
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'pruebas.db'}"
+        PDF_CACHE_DIR = str(tmp_path / 'pdf')
+        TRABAJOS_DIR = str(tmp_path / 'trabajos')
+
+    app = create_app(ConfigPruebas)
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def base(app):
+    """Base con todas las tablas de los modelos, vacía"""
+    db.create_all()
+    return db
+
+
+@pytest.fixture
+def curso(base):
+    return sembrar_curso()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def iniciar_sesion(client, email='admin@pruebas.com'):
+    return client.post('/auth/login', data={'email': email, 'password': CLAVE})
+
+
+def sembrar_curso(estudiantes=6, asignaturas=3, periodo_activo='PRIMERO'):
+    """
+    Crea la configuración del año, los cuatro períodos, un curso con sus asignaciones y
+    estudiantes activos con dos notas por asignatura en cada uno de los dos primeros períodos.
+    El último estudiante no tiene notas del segundo período; algunas notas llevan observación
+    y hay inasistencias en ambos períodos. Devuelve un diccionario con lo creado.
+    """
+    rnd = random.Random(1)
+    admin = User(nombre='Admin', apellidos='Pruebas', documento='1', email='admin@pruebas.com',
+                 rol='admin', estado='activo', genero='masculino')
+    admin.set_password(CLAVE)
+    docente = User(nombre='Docente', apellidos='Pruebas', documento='2', email='docente@pruebas.com',
+                   rol='docente', estado='activo', genero='femenino')
+    docente.set_password(CLAVE)
+    db.session.add_all([admin, docente])
+    db.session.add(SystemConfig(anio=ANIO, estado='activo'))
+    db.session.add(ConfiguracionLibro(año_lectivo_actual=ANIO))
+    db.session.add(RectorConfig(nombre='Rector'))
+    curso = Curso(nombre='PRIMERO A')
+    db.session.add(curso)
+
+    periodos = [Periodo(nombre=nombre, fecha_inicio=inicio, fecha_fin=fin) for nombre, inicio, fin in PERIODOS]
+    db.session.add_all(periodos)
+    db.session.flush()
+    for periodo in periodos:
+        db.session.add(AnioPeriodo(
+            anio_lectivo=ANIO, periodo_id=periodo.id, fecha_inicio=periodo.fecha_inicio,
+            fecha_fin=periodo.fecha_fin, estado='activo' if periodo.nombre == periodo_activo else 'inactivo'
+        ))
+
+    asignaciones = []
+    for j in range(asignaturas):
+        asignatura = Asignatura(nombre=f'ASIGNATURA {j}')
+        db.session.add(asignatura)
+        db.session.flush()
+        asignacion = Asignacion(id_docente=docente.id, id_asignatura=asignatura.id, id_curso=curso.id,
+                                anio_lectivo=ANIO, estado='activo', horas_impartidas=2 + j)
+        db.session.add(asignacion)
+        asignaciones.append(asignacion)
+    db.session.flush()
+
+    matriculas = []
+    for k in range(estudiantes):
+        matricula = Matricula(nombres=f'Estudiante{k}', apellidos=f'Apellido{k}', genero='femenino',
+                              documento=f'9{k:03d}', email=f'e{k}@pruebas.com', fecha_nacimiento=date(2015, 1, 1),
+                              id_curso=curso.id, año_lectivo=ANIO, estado='activo')
+        db.session.add(matricula)
+        matriculas.append(matricula)
+    db.session.flush()
+
+    # (período, mes, días de las notas)
+    fechas = [(periodos[0], 2, (5, 20)), (periodos[1], 5, (6, 21))]
+    for k, matricula in enumerate(matriculas):
+        for asignacion in asignaciones:
+            for periodo, mes, dias in fechas:
+                if periodo is periodos[1] and k == estudiantes - 1:
+                    continue
+                for dia in dias:
+                    observacion = f'Observación {k}-{asignacion.id}-{mes}-{dia}' if rnd.random() < 0.3 else rnd.choice([None, ''])
+                    db.session.add(Calificacion(
+                        id_matricula=matricula.id, id_asignacion=asignacion.id, id_periodo=periodo.id,
+                        fecha_calificacion=date(ANIO, mes, dia), nota=round(rnd.uniform(1, 5), 1),
+                        observacion=observacion, creado_por=admin.id
+                    ))
+                for dia in (3, 10, 17):
+                    estado = rnd.choice(['presente', 'presente', 'ausente', 'justificado'])
+                    db.session.add(Asistencia(id_matricula=matricula.id, id_asignacion=asignacion.id,
+                                              fecha=date(ANIO, mes, dia), estado=estado, creado_por=admin.id))
+    db.session.commit()
+    reload_active_config()
+    return {'admin': admin, 'docente': docente, 'curso': curso, 'periodos': periodos,
+            'asignaciones': asignaciones, 'matriculas': matriculas}
@@ -0,0 +1,73 @@
+"""
+El resumen de asistencias (asistencias_resumen) debe coincidir siempre con contar la tabla
+asistencias de las matrículas activas: al reconstruirlo, al guardar asistencias y cuando una
+matrícula cambia de estado.
+"""
+from datetime import date
+from sqlalchemy import func
+from app import db
+from app.models import Asistencia, AsistenciaResumen, Matricula
+from app.services.asistencia_service import (
+    actualizar_resumen_asistencia, actualizar_resumen_matriculas, guardar_asistencias_masivo,
+    reconstruir_resumen_asistencia
+)
+from tests.conftest import ANIO, iniciar_sesion
+
+
+def _resumen():
+    return {(r.id_asignacion, r.fecha, r.estado): r.total for r in AsistenciaResumen.query.all()}
+
+
+def _conteo_directo(solo_activas=True):
+    consulta = db.session.query(
+        Asistencia.id_asignacion, Asistencia.fecha, Asistencia.estado, func.count(Asistencia.id)
+    ).join(Matricula, Asistencia.id_matricula == Matricula.id)
+    if solo_activas:
+        consulta = consulta.filter(Matricula.estado == 'activo')
+    filas = consulta.group_by(Asistencia.id_asignacion, Asistencia.fecha, Asistencia.estado).all()
+    return {(asignacion, fecha, estado): total for asignacion, fecha, estado, total in filas}
+
+
+def test_reconstruir_cuenta_solo_matriculas_activas(curso):
+    curso['matriculas'][0].estado = 'retirado'
+    db.session.commit()
+
+    reconstruir_resumen_asistencia()
+
+    assert _resumen() == _conteo_directo()
+    assert _resumen() != _conteo_directo(solo_activas=False)
+
+
+def test_cambio_de_estado_de_matricula_actualiza_el_resumen(curso):
+    reconstruir_resumen_asistencia()
+    matricula = curso['matriculas'][2]
+
+    matricula.estado = 'transferido'
+    actualizar_resumen_matriculas([matricula.id])
+    db.session.commit()
+    assert _resumen() == _conteo_directo()
+
+    matricula.estado = 'activo'
+    actualizar_resumen_matriculas([matricula.id])
+    db.session.commit()
+    assert _resumen() == _conteo_directo()
+
+
+def test_guardar_asistencias_actualiza_el_resumen(curso):
+    reconstruir_resumen_asistencia()
+    asignacion, admin = curso['asignaciones'][1], curso['admin']
+    fecha = date(ANIO, 2, 24)
+    registros = [(m.id, 'ausente' if i % 2 else 'presente', '') for i, m in enumerate(curso['matriculas'])]
+
+    guardar_asistencias_masivo(asignacion, fecha, registros, admin.id)
+    actualizar_resumen_asistencia([(asignacion.id, fecha), (asignacion.id, date(ANIO, 2, 3))])
+    db.session.commit()
+
+    assert _resumen() == _conteo_directo()
+    assert _resumen()[(asignacion.id, fecha, 'ausente')] == len(registros) // 2
+
+
+def test_dashboard_lee_el_resumen(client, curso):
+    reconstruir_resumen_asistencia()
+    iniciar_sesion(client)
+    assert client.get('/dashboard/').status_code == 200
@@ -0,0 +1,149 @@
+"""
+calcular_grades_data_curso debe producir exactamente el mismo grades_data que el cálculo
+anterior, hecho estudiante por estudiante con una consulta por asignatura y período. Las
+funciones _grades_data_estudiante* reproducen ese cálculo (calcular_datos_boletin y la
+generación de boletines de app/routes/boletines.py antes de agruparlo) y se compara el JSON.
+"""
+import json
+from datetime import datetime
+import pytest
+from sqlalchemy import func
+from app import db
+from app.models import AnioPeriodo, Asignacion, Asignatura, Asistencia, Calificacion, ConfiguracionLibro, Periodo
+from app.services.boletin_service import calcular_grades_data_curso
+from tests.conftest import ANIO, sembrar_curso
+
+
+def _desempeno(nota):
+    if nota is None:
+        return ''
+    config = ConfiguracionLibro.obtener_configuracion_actual()
+    if nota >= config.nota_superior:
+        return 'Superior'
+    elif nota >= config.nota_alto:
+        return 'Alto'
+    elif nota >= config.nota_basico:
+        return 'Básico'
+    return 'Bajo'
+
+
+def _fechas(anio_periodo):
+    return (datetime.strptime(f"{ANIO}-{anio_periodo.fecha_inicio}", "%Y-%m-%d").date(),
+            datetime.strptime(f"{ANIO}-{anio_periodo.fecha_fin}", "%Y-%m-%d").date())
+
+
+def _contexto(curso_id, periodo_id):
+    anio_periodo = AnioPeriodo.query.filter_by(anio_lectivo=ANIO, periodo_id=periodo_id).first()
+    asignaturas = Asignatura.query.join(Asignacion).filter(
+        Asignacion.id_curso == curso_id,
+        Asignacion.estado == 'activo',
+        Asignacion.anio_lectivo == ANIO
+    ).all()
+    periods = Periodo.query.join(AnioPeriodo).filter(AnioPeriodo.anio_lectivo == ANIO).order_by(AnioPeriodo.fecha_inicio).all()
+    current_period_index = next((i for i, p in enumerate(periods) if p.id == periodo_id), 0)
+    return _fechas(anio_periodo), asignaturas, periods, current_period_index
+
+
+def _promedio(asignatura_id, matricula_id, anio_periodo):
+    fecha_inicio_p, fecha_fin_p = _fechas(anio_periodo)
+    return db.session.query(func.avg(Calificacion.nota)).join(
+        Asignacion, Calificacion.id_asignacion == Asignacion.id
+    ).filter(
+        Asignacion.id_asignatura == asignatura_id,
+        Calificacion.id_matricula == matricula_id,
+        Asignacion.anio_lectivo == ANIO,
+        Calificacion.fecha_calificacion.between(fecha_inicio_p, fecha_fin_p)
+    ).scalar()
+
+
+def _observacion(asignatura_id, matricula_id, fecha_inicio, fecha_fin):
+    registro = db.session.query(Calificacion.observacion).join(Asignacion).filter(
+        Asignacion.id_asignatura == asignatura_id,
+        Calificacion.id_matricula == matricula_id,
+        Asignacion.anio_lectivo == ANIO,
+        Calificacion.fecha_calificacion.between(fecha_inicio, fecha_fin),
+        Calificacion.observacion.isnot(None),
+        Calificacion.observacion != ''
+    ).order_by(Calificacion.fecha_calificacion.desc()).first()
+    return registro[0] if registro else ''
+
+
+def _grades_data_estudiante(curso_id, periodo_id, matricula_id):
+    """Cálculo anterior de calcular_datos_boletin para un estudiante"""
+    (fecha_inicio, fecha_fin), asignaturas, periods, current_period_index = _contexto(curso_id, periodo_id)
+    grades_data = {}
+    for asig in asignaturas:
+        grades_data[str(asig.id)] = {}
+        for i in range(current_period_index + 1):
+            anio_p = AnioPeriodo.query.filter_by(anio_lectivo=ANIO, periodo_id=periods[i].id).first()
+            if not anio_p or not anio_p.fecha_inicio or not anio_p.fecha_fin:
+                continue
+            cal_avg = _promedio(asig.id, matricula_id, anio_p)
+            grades_data[str(asig.id)][f'p{i+1}'] = round(cal_avg, 2) if cal_avg is not None else 0.0
+
+        grades_data[str(asig.id)]['observacion'] = _observacion(asig.id, matricula_id, fecha_inicio, fecha_fin)
+        nota_periodo_actual = grades_data[str(asig.id)].get(f'p{current_period_index + 1}', 0.0)
+        grades_data[str(asig.id)]['desempeno'] = _desempeno(nota_periodo_actual)
+        grades_data[str(asig.id)]['nota'] = nota_periodo_actual
+    return grades_data
+
+
+def _grades_data_estudiante_con_detalle(curso_id, periodo_id, matricula_id):
+    """Cálculo anterior de la generación de boletines para un estudiante (con pf, fl e ih)"""
+    (fecha_inicio, fecha_fin), asignaturas, periods, current_period_index = _contexto(curso_id, periodo_id)
+    grades_data = {}
+    for asig in asignaturas:
+        grades_data[str(asig.id)] = {}
+        asignacion = Asignacion.query.filter_by(
+            id_curso=curso_id, id_asignatura=asig.id, estado='activo', anio_lectivo=ANIO
+        ).first()
+        inasistencias_asig = 0
+        if asignacion:
+            inasistencias_asig = db.session.query(func.count(Asistencia.id)).filter(
+                Asistencia.id_asignacion == asignacion.id,
+                Asistencia.id_matricula == matricula_id,
+                Asistencia.fecha.between(fecha_inicio, fecha_fin),
+                Asistencia.estado == 'ausente'
+            ).scalar() or 0
+
+        for i in range(current_period_index + 1):
+            anio_p = AnioPeriodo.query.filter_by(anio_lectivo=ANIO, periodo_id=periods[i].id).first()
+            if not anio_p:
+                continue
+            cal_avg = _promedio(asig.id, matricula_id, anio_p)
+            grades_data[str(asig.id)][f'p{i+1}'] = round(cal_avg, 2) if cal_avg is not None else 0
+
+        if current_period_index + 1 == 4:
+            p_values = [grades_data[str(asig.id)].get(f'p{j+1}', 0) for j in range(4)]
+            grades_data[str(asig.id)]['pf'] = round(sum(p_values) / len(p_values), 2)
+
+        grades_data[str(asig.id)]['fl'] = inasistencias_asig
+        grades_data[str(asig.id)]['ih'] = asignacion.horas_impartidas if asignacion and asignacion.horas_impartidas else 0
+        grades_data[str(asig.id)]['observacion'] = _observacion(asig.id, matricula_id, fecha_inicio, fecha_fin)
+
+    for asig in asignaturas:
+        subject_grade = grades_data[str(asig.id)].get(f'p{current_period_index + 1}', 0)
+        grades_data[str(asig.id)]['desempeno'] = _desempeno(subject_grade)
+        grades_data[str(asig.id)]['nota'] = subject_grade
+    return grades_data
+
+
+@pytest.mark.parametrize('periodo_activo', ['PRIMERO', 'SEGUNDO', 'CUARTO'])
+@pytest.mark.parametrize('incluir_detalle', [False, True])
+def test_grades_data_curso_igual_al_calculo_por_estudiante(base, periodo_activo, incluir_detalle):
+    datos = sembrar_curso(periodo_activo=periodo_activo)
+    curso_id = datos['curso'].id
+    periodo_id = next(p.id for p in datos['periodos'] if p.nombre == periodo_activo)
+    matriculas_ids = [m.id for m in datos['matriculas']]
+    por_estudiante = _grades_data_estudiante_con_detalle if incluir_detalle else _grades_data_estudiante
+
+    agrupado = calcular_grades_data_curso(curso_id, periodo_id, ANIO, matriculas_ids, incluir_detalle=incluir_detalle)
+
+    assert list(agrupado) == matriculas_ids
+    for matricula_id in matriculas_ids:
+        esperado = json.dumps(por_estudiante(curso_id, periodo_id, matricula_id))
+        assert json.dumps(agrupado[matricula_id]) == esperado
+
+
+def test_grades_data_curso_sin_periodo_configurado(curso):
+    assert calcular_grades_data_curso(curso['curso'].id, 999, ANIO, [m.id for m in curso['matriculas']]) == {}
@@ -0,0 +1,58 @@
+"""
+Cache en dos niveles con nivel compartido ('memoria', la misma interfaz que Redis): los
+aciertos locales no consultan el nivel compartido, ni siquiera por la versión del espacio, y
+las invalidaciones de otro proceso se notan después de CACHE_LOCAL_SEGUNDOS.
+"""
+import time
+import pytest
+from app.utils.cache import RedisEnMemoria, espacio
+
+
+class RedisContado(RedisEnMemoria):
+    """RedisEnMemoria que cuenta las lecturas"""
+
+    def __init__(self):
+        super().__init__()
+        self.lecturas = 0
+
+    def get(self, clave):
+        self.lecturas += 1
+        return super().get(clave)
+
+
+@pytest.fixture
+def compartida(app):
+    app.config.update(CACHE_COMPARTIDA='memoria', CACHE_LOCAL_SEGUNDOS=0.2)
+    app.extensions.pop('cache', None)
+    espacio('pruebas').get('nada')  # Crea el estado de la cache con el nivel compartido
+    compartida = app.extensions['cache'].compartida = RedisContado()
+    return compartida
+
+
+def test_aciertos_locales_no_consultan_el_nivel_compartido(compartida):
+    pruebas = espacio('pruebas')
+    pruebas.set('clave', 'valor')
+    lecturas = compartida.lecturas
+
+    assert all(pruebas.get('clave') == 'valor' for _ in range(20))
+    assert compartida.lecturas == lecturas
+
+
+def test_invalidar_en_el_mismo_proceso_se_nota_al_instante(compartida):
+    pruebas = espacio('pruebas')
+    pruebas.set('clave', 'valor')
+
+    pruebas.invalidar()
+
+    assert pruebas.get('clave') is None
+
+
+def test_invalidacion_de_otro_proceso_se_nota_tras_el_plazo_local(app, compartida):
+    pruebas = espacio('pruebas')
+    pruebas.set('clave', 'valor')
+
+    compartida.incr(f"{app.config.get('CACHE_PREFIJO', 'sge')}:pruebas:version")  # Otro proceso invalida
+    assert pruebas.get('clave') == 'valor'
+
+    time.sleep(0.25)
+    assert pruebas.get('clave') is None
@@ -0,0 +1,75 @@
+"""
+Guardado masivo de calificaciones: escribe las nuevas y las modificadas con un upsert sobre
+uq_calificacion_matricula_asignacion_fecha, así guardar dos veces la misma fecha nunca deja
+calificaciones repetidas.
+"""
+from datetime import date, datetime
+import pytest
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import Calificacion
+from app.services.calificacion_service import _upsert_calificaciones, guardar_calificaciones_masivo
+from tests.conftest import ANIO
+
+FECHA = date(ANIO, 3, 2)
+
+
+def _notas(asignacion, fecha=FECHA):
+    return {c.id_matricula: (c.nota, c.observacion) for c in Calificacion.query.filter_by(
+        id_asignacion=asignacion.id, fecha_calificacion=fecha)}
+
+
+def test_guardar_dos_veces_actualiza_sin_repetir(curso):
+    asignacion, periodo, admin = curso['asignaciones'][0], curso['periodos'][0], curso['admin']
+    matriculas = curso['matriculas']
+    entradas = [(m.id, '4.0', '') for m in matriculas]
+
+    primero = guardar_calificaciones_masivo(asignacion, periodo.id, FECHA, entradas, admin.id)
+    db.session.commit()
+    segundo = guardar_calificaciones_masivo(asignacion, periodo.id, FECHA,
+                                            [(matriculas[0].id, '2.5', 'Recuperó')] + entradas[1:],
+                                            curso['docente'].id)
+    db.session.commit()
+
+    assert primero['guardadas'] == [m.id for m in matriculas] and not primero['errores']
+    assert segundo['guardadas'] == [matriculas[0].id]
+    assert segundo['sin_cambios'] == len(matriculas) - 1
+    notas = _notas(asignacion)
+    assert len(notas) == len(matriculas)
+    assert notas[matriculas[0].id] == (2.5, 'Recuperó')
+    actualizada = Calificacion.query.filter_by(id_matricula=matriculas[0].id, id_asignacion=asignacion.id,
+                                               fecha_calificacion=FECHA).one()
+    assert actualizada.creado_por == admin.id and actualizada.actualizado_por == curso['docente'].id
+
+
+def test_upsert_cubre_una_calificacion_guardada_por_otra_peticion(curso):
+    asignacion, periodo = curso['asignaciones'][1], curso['periodos'][0]
+    admin, docente = curso['admin'], curso['docente']
+    matricula = curso['matriculas'][0]
+    guardar_calificaciones_masivo(asignacion, periodo.id, FECHA, [(matricula.id, '3.0', '')], admin.id)
+    db.session.commit()
+    fila = {'id_matricula': matricula.id, 'id_asignacion': asignacion.id, 'id_periodo': periodo.id,
+            'fecha_calificacion': FECHA, 'nota': 4.8, 'observacion': '',
+            'creado_en': datetime.utcnow(), 'creado_por': docente.id}
+
+    # Una petición que leyó antes de que la otra guardara trata la fila como nueva
+    assert _upsert_calificaciones([fila])
+    db.session.commit()
+    assert _notas(asignacion) == {matricula.id: (4.8, '')}
+
+    with pytest.raises(IntegrityError):
+        db.session.execute(Calificacion.__table__.insert(), [fila])
+    db.session.rollback()
+
+
+def test_errores_de_validacion_no_escriben_nada(curso):
+    asignacion, periodo, admin = curso['asignaciones'][2], curso['periodos'][0], curso['admin']
+    matriculas = curso['matriculas']
+
+    resultado = guardar_calificaciones_masivo(asignacion, periodo.id, FECHA,
+                                              [(matriculas[0].id, '4.0', ''), (matriculas[1].id, '7', '')],
+                                              admin.id)
+
+    assert resultado['guardadas'] == []
+    assert [e['matricula_id'] for e in resultado['errores']] == [matriculas[1].id]
+    assert _notas(asignacion) == {}
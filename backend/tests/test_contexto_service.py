@@ -0,0 +1,48 @@
+from sqlalchemy import event
+from app import db
+from app.models import AnioPeriodo
+from app.services.contexto_service import contexto_academico
+from tests.conftest import ANIO
+
+
+def _contar_selects():
+    sentencias = []
+
+    @event.listens_for(db.engine, 'before_cursor_execute')
+    def contar(conexion, cursor, sentencia, *args):
+        if sentencia.lstrip().upper().startswith('SELECT'):
+            sentencias.append(sentencia)
+
+    return sentencias, lambda: event.remove(db.engine, 'before_cursor_execute', contar)
+
+
+def test_contexto_se_resuelve_una_vez_por_peticion(app, curso):
+    with app.test_request_context():
+        contexto = contexto_academico()
+        assert contexto.periodo.nombre == 'PRIMERO'
+        assert [p.nombre for p in contexto.periodos] == ['PRIMERO', 'SEGUNDO', 'TERCERO', 'CUARTO']
+
+        sentencias, quitar = _contar_selects()
+        try:
+            assert contexto_academico() is contexto
+            segundo = contexto.anio_periodo_de(ANIO, curso['periodos'][1].id)
+            assert contexto.anio_periodo_de(ANIO, -1) is None
+            rango = contexto.rango
+        finally:
+            quitar()
+
+    assert sentencias == []
+    assert segundo.periodo.nombre == 'SEGUNDO'
+    assert rango == contexto.fechas(contexto.anio_periodo)
+
+
+def test_anio_periodo_de_otro_anio_se_consulta(app, curso):
+    periodo = curso['periodos'][0]
+    db.session.add(AnioPeriodo(anio_lectivo=ANIO - 1, periodo_id=periodo.id,
+                               fecha_inicio='02-01', fecha_fin='04-30', estado='inactivo'))
+    db.session.commit()
+
+    with app.test_request_context():
+        anterior = contexto_academico().anio_periodo_de(ANIO - 1, periodo.id)
+
+    assert anterior.anio_lectivo == ANIO - 1 and anterior.fecha_inicio == '02-01'
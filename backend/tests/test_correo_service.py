@@ -0,0 +1,108 @@
+"""
+Entrega de la bandeja de salida contra un servidor SMTP local (aiosmtpd): los correos de
+un lote viajan por una sola conexión y cada uno queda con el estado que corresponde.
+"""
+import socket
+from email import message_from_bytes, policy
+import pytest
+from aiosmtpd.controller import Controller
+from app.models import CorreoSaliente
+from app.services.correo_service import encolar_correo, entregar_lote
+from app.utils.email_utils import ConexionSMTP
+
+RECHAZADO = 'rechazado@pruebas.com'
+
+
+class Buzon:
+    """Handler de aiosmtpd que guarda cada mensaje con la conexión por la que llegó"""
+
+    def __init__(self):
+        self.mensajes = []  # [(puerto del cliente, mensaje)]
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address == RECHAZADO:
+            return '550 Buzon inexistente'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        self.mensajes.append((session.peer[1], message_from_bytes(envelope.content, policy=policy.default)))
+        return '250 OK'
+
+    @property
+    def conexiones(self):
+        return {puerto for puerto, _ in self.mensajes}
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def buzon(app, base):
+    buzon = Buzon()
+    controlador = Controller(buzon, hostname='127.0.0.1', port=_puerto_libre())
+    controlador.start()
+    app.config.update(MAIL_SERVER='127.0.0.1', MAIL_PORT=controlador.port, MAIL_USE_TLS=False,
+                      MAIL_USERNAME=None, MAIL_DEFAULT_SENDER=('Pruebas', 'pruebas@pruebas.com'), CORREO_LOTE=50)
+    yield buzon
+    controlador.stop()
+
+
+def _encolar(cantidad, **kwargs):
+    return [encolar_correo(f'destino{i}@pruebas.com', f'Asunto {i}', f'<p>Correo {i}</p>', **kwargs).id
+            for i in range(cantidad)]
+
+
+def test_lote_se_entrega_por_una_sola_conexion(buzon):
+    adjunto = bytes(range(256)) * 400  # 100 KB: más de lo que cabe en un BLOB de MySQL
+    ids = _encolar(4) + [encolar_correo('destino@pruebas.com', 'Boletín', '<p>Adjunto</p>',
+                                        adjunto_nombre='boletin.pdf', adjunto=adjunto).id]
+
+    conexion = ConexionSMTP()
+    try:
+        assert entregar_lote(conexion) == 5
+    finally:
+        conexion.cerrar()
+
+    assert len(buzon.mensajes) == 5
+    assert len(buzon.conexiones) == 1
+    assert [m['Subject'] for _, m in buzon.mensajes] == [f'Asunto {i}' for i in range(4)] + ['Boletín']
+    recibido = next(p for p in buzon.mensajes[-1][1].walk() if p.get_filename() == 'boletin.pdf')
+    assert recibido.get_payload(decode=True) == adjunto
+    correos = CorreoSaliente.query.filter(CorreoSaliente.id.in_(ids)).all()
+    assert {c.estado for c in correos} == {'enviado'}
+    assert all(c.adjunto is None and c.enviado_en for c in correos)
+
+
+def test_lotes_sucesivos_reutilizan_la_conexion(app, buzon):
+    app.config['CORREO_LOTE'] = 2
+    _encolar(5)
+
+    conexion = ConexionSMTP()
+    try:
+        entregados = [entregar_lote(conexion) for _ in range(4)]
+    finally:
+        conexion.cerrar()
+
+    assert entregados == [2, 2, 1, 0]
+    assert len(buzon.mensajes) == 5
+    assert len(buzon.conexiones) == 1
+
+
+def test_destinatario_rechazado_no_detiene_el_lote(buzon):
+    ids = _encolar(2)
+    rechazado = encolar_correo(RECHAZADO, 'Rechazado', '<p>No llega</p>').id
+
+    conexion = ConexionSMTP()
+    try:
+        assert entregar_lote(conexion) == 3
+    finally:
+        conexion.cerrar()
+
+    estados = {c.id: c.estado for c in CorreoSaliente.query.all()}
+    assert estados == {ids[0]: 'enviado', ids[1]: 'enviado', rechazado: 'error'}
+    assert len(buzon.mensajes) == 2
+    assert len(buzon.conexiones) == 1
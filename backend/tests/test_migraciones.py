@@ -0,0 +1,238 @@
+"""
+Las revisiones de migrations/versions llevan una base anterior a ellas (tablas de siempre,
+sin lo que agregaron los cambios recientes) al esquema de los modelos, convierten los datos
+que hagan falta y no tocan nada en una base que ya lo tiene todo.
+"""
+import json
+from pathlib import Path
+from datetime import date
+import pytest
+import sqlalchemy as sa
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from flask_migrate import downgrade, upgrade
+from app import db
+from app.services.asistencia_service import guardar_asistencias_masivo, reconstruir_resumen_asistencia
+from app.services.calificacion_service import guardar_calificaciones_masivo
+from tests.conftest import ANIO, iniciar_sesion, sembrar_curso
+
+MIGRACIONES = str(Path(__file__).resolve().parent.parent / 'migrations')
+
+# Lo que agregan las revisiones sobre una base creada antes de ellas
+TABLAS_NUEVAS = ('boletin_notas', 'posiciones_curso', 'trabajos', 'correos_salientes', 'asistencias_resumen',
+                 'notificaciones_estado', 'notificaciones_ocultas')
+COLUMNAS_NUEVAS = (('boletines', 'requiere_recalculo'),)
+UNICOS_NUEVOS = (('asistencias', 'uq_asistencia_matricula_asignacion_fecha'),
+                 ('calificacion', 'uq_calificacion_matricula_asignacion_fecha'))
+INDICES_NUEVOS = (
+    ('asistencias', 'ix_asistencias_asignacion_fecha'),
+    ('calificacion', 'ix_calificacion_asignacion_fecha'),
+    ('calificacion', 'ix_calificacion_asignacion_periodo'),
+    ('calificacion', 'ix_calificacion_matricula_fecha'),
+    ('boletines', 'ix_boletines_curso_periodo_anio'),
+    ('boletines', 'ix_boletines_matricula_periodo'),
+    ('actividades', 'ix_actividades_creado_en'),
+    ('matricula', 'ix_matricula_anio_estado_curso'),
+)
+
+
+def _quitar_esquema_nuevo():
+    with db.engine.begin() as conexion:
+        op = Operations(MigrationContext.configure(conexion))
+        for tabla in TABLAS_NUEVAS:
+            op.drop_table(tabla)
+        for tabla, indice in INDICES_NUEVOS:
+            op.drop_index(indice, table_name=tabla)
+        # SQLite no altera restricciones: el modo batch reconstruye la tabla
+        for tabla, columna in COLUMNAS_NUEVAS:
+            with op.batch_alter_table(tabla) as batch_op:
+                batch_op.drop_column(columna)
+        for tabla, restriccion in UNICOS_NUEVOS:
+            with op.batch_alter_table(tabla) as batch_op:
+                batch_op.drop_constraint(restriccion, type_='unique')
+
+
+def _esquema():
+    """{tabla: (columnas, índices, claves únicas)} de la base, sin la tabla de Alembic"""
+    inspector = sa.inspect(db.engine)
+    esquema = {}
+    for tabla in inspector.get_table_names():
+        if tabla == 'alembic_version':
+            continue
+        # Las claves únicas sin nombre (columnas unique=True) no se comparan
+        unicos = {u['name'] for u in inspector.get_unique_constraints(tabla) if u['name']}
+        unicos |= {i['name'] for i in inspector.get_indexes(tabla) if i['unique']}
+        esquema[tabla] = (
+            {c['name'] for c in inspector.get_columns(tabla)},
+            {i['name'] for i in inspector.get_indexes(tabla) if not i['unique']},
+            unicos,
+        )
+    return esquema
+
+
+def _esquema_modelos():
+    esquema = {}
+    for tabla in db.metadata.sorted_tables:
+        unicos = {u.name for u in tabla.constraints if isinstance(u, sa.UniqueConstraint) and u.name}
+        unicos |= {i.name for i in tabla.indexes if i.unique}
+        esquema[tabla.name] = (
+            {c.name for c in tabla.columns},
+            {i.name for i in tabla.indexes if not i.unique},
+            unicos,
+        )
+    return esquema
+
+
+def _insertar_boletin(matricula, periodo, admin, grades_data):
+    return db.session.execute(sa.text(
+        'INSERT INTO boletines (id_matricula, id_periodo, id_curso, grades_data, anio_lectivo, generated_by_user_id, eliminado) '
+        'VALUES (:matricula, :periodo, :curso, :grades_data, :anio, :admin, 0)'
+    ), {'matricula': matricula.id, 'periodo': periodo.id, 'curso': matricula.id_curso,
+        'grades_data': grades_data, 'anio': str(ANIO), 'admin': admin.id}).lastrowid
+
+
+@pytest.fixture
+def base_anterior(base):
+    """Base con los datos del curso de ejemplo y el esquema previo a las revisiones"""
+    datos = sembrar_curso()
+    _quitar_esquema_nuevo()
+    return datos
+
+
+def test_upgrade_lleva_una_base_anterior_al_esquema_de_los_modelos(base_anterior):
+    upgrade(directory=MIGRACIONES)
+    assert _esquema() == _esquema_modelos()
+
+
+def test_paginas_funcionan_tras_upgrade(client, base_anterior):
+    upgrade(directory=MIGRACIONES)
+    iniciar_sesion(client)
+    assert client.get('/dashboard/').status_code == 200
+
+
+def test_upgrade_no_cambia_una_base_creada_desde_los_modelos(base):
+    sembrar_curso()
+    upgrade(directory=MIGRACIONES)
+    assert _esquema() == _esquema_modelos()
+
+
+def test_promedio_de_posiciones_queda_como_decimal_exacto(base_anterior):
+    upgrade(directory=MIGRACIONES)
+    columnas = {c['name']: c['type'] for c in sa.inspect(db.engine).get_columns('posiciones_curso')}
+    assert isinstance(columnas['promedio'], sa.Numeric) and not isinstance(columnas['promedio'], sa.Float)
+    assert (columnas['promedio'].precision, columnas['promedio'].scale) == (5, 2)
+
+
+def test_upgrade_convierte_grades_data_a_boletin_notas(base):
+    datos = sembrar_curso()
+    asignaturas = [str(a.id_asignatura) for a in datos['asignaciones']]
+    matriculas, periodo, admin = datos['matriculas'], datos['periodos'][0], datos['admin']
+    grades = {
+        asignaturas[1]: {'p1': 3.5, 'fl': 2, 'ih': 3, 'observacion': 'Bien', 'desempeno': 'Básico', 'nota': 3.5},
+        asignaturas[0]: {'p1': 4.75, 'observacion': '', 'desempeno': 'Superior', 'nota': 4.75},
+        '9999': {'p1': 1.0, 'nota': 1.0},
+    }
+    _quitar_esquema_nuevo()
+    convertido = _insertar_boletin(matriculas[0], periodo, admin, json.dumps(grades))
+    danado = _insertar_boletin(matriculas[1], periodo, admin, '{no es json')
+    db.session.commit()
+
+    upgrade(directory=MIGRACIONES)
+
+    notas = db.session.execute(sa.text(
+        'SELECT id_boletin, id_asignatura, orden, p1, p2, fl, ih, observacion, desempeno, nota '
+        'FROM boletin_notas ORDER BY id_boletin, orden'
+    )).all()
+    assert [tuple(n) for n in notas] == [
+        (convertido, int(asignaturas[1]), 0, 3.5, None, 2, 3, 'Bien', 'Básico', 3.5),
+        (convertido, int(asignaturas[0]), 1, 4.75, None, None, None, '', 'Superior', 4.75),
+    ]
+    boletines = dict(db.session.execute(sa.text(
+        'SELECT id, requiere_recalculo FROM boletines WHERE grades_data IS NULL'
+    )).all())
+    assert boletines == {convertido: 1, danado: 1}
+
+
+def test_downgrade_de_boletin_notas_reconstruye_grades_data(base):
+    datos = sembrar_curso()
+    asignatura = str(datos['asignaciones'][0].id_asignatura)
+    grades = {asignatura: {'p1': 3.5, 'fl': 1, 'observacion': 'Bien', 'desempeno': 'Básico', 'nota': 3.5}}
+    _quitar_esquema_nuevo()
+    boletin = _insertar_boletin(datos['matriculas'][0], datos['periodos'][0], datos['admin'], json.dumps(grades))
+    db.session.commit()
+    upgrade(directory=MIGRACIONES, revision='7a8ffa673efd')
+
+    downgrade(directory=MIGRACIONES, revision='9683d4372b0e')
+
+    assert not sa.inspect(db.engine).has_table('boletin_notas')
+    grades_data = db.session.execute(sa.text('SELECT grades_data FROM boletines WHERE id = :id'), {'id': boletin}).scalar()
+    assert json.loads(grades_data) == grades
+
+
+def test_upgrade_elimina_asistencias_repetidas_y_permite_el_upsert(base_anterior):
+    asignacion, admin = base_anterior['asignaciones'][0], base_anterior['admin']
+    matricula = base_anterior['matriculas'][0]
+    fecha = date(ANIO, 2, 3)
+    repetida = {'matricula': matricula.id, 'asignacion': asignacion.id, 'fecha': fecha, 'admin': admin.id}
+    for estado in ('ausente', 'justificado'):
+        db.session.execute(sa.text(
+            'INSERT INTO asistencias (id_matricula, id_asignacion, fecha, estado, creado_por) '
+            'VALUES (:matricula, :asignacion, :fecha, :estado, :admin)'
+        ), dict(repetida, estado=estado))
+    db.session.commit()
+
+    upgrade(directory=MIGRACIONES)
+
+    sql = 'SELECT estado FROM asistencias WHERE id_matricula = :matricula AND id_asignacion = :asignacion AND fecha = :fecha'
+    assert db.session.execute(sa.text(sql), repetida).scalars().all() == ['justificado']
+    resumen = db.session.execute(sa.text(
+        'SELECT total FROM asistencias_resumen WHERE id_asignacion = :asignacion AND fecha = :fecha'
+    ), repetida).scalars().all()
+    assert sum(resumen) == len(base_anterior['matriculas'])
+    guardar_asistencias_masivo(asignacion, fecha, [(matricula.id, 'presente', '')], admin.id)
+    db.session.commit()
+    assert db.session.execute(sa.text(sql), repetida).scalars().all() == ['presente']
+
+
+def test_upgrade_elimina_calificaciones_repetidas_y_permite_el_upsert(base_anterior):
+    asignacion, admin = base_anterior['asignaciones'][0], base_anterior['admin']
+    matricula, periodo = base_anterior['matriculas'][0], base_anterior['periodos'][0]
+    # El curso de ejemplo ya tiene una calificación en esta fecha; se agrega otra repetida
+    repetida = {'matricula': matricula.id, 'asignacion': asignacion.id, 'fecha': date(ANIO, 2, 5)}
+    db.session.execute(sa.text(
+        'INSERT INTO calificacion (id_matricula, id_asignacion, id_periodo, fecha_calificacion, nota, creado_por) '
+        'VALUES (:matricula, :asignacion, :periodo, :fecha, 4.5, :admin)'
+    ), dict(repetida, periodo=periodo.id, admin=admin.id))
+    db.session.commit()
+
+    upgrade(directory=MIGRACIONES)
+
+    sql = ('SELECT nota FROM calificacion '
+           'WHERE id_matricula = :matricula AND id_asignacion = :asignacion AND fecha_calificacion = :fecha')
+    assert db.session.execute(sa.text(sql), repetida).scalars().all() == [4.5]
+    guardar_calificaciones_masivo(asignacion, periodo.id, repetida['fecha'], [(matricula.id, '3.2', '')], admin.id)
+    db.session.commit()
+    assert db.session.execute(sa.text(sql), repetida).scalars().all() == [3.2]
+
+
+def test_upgrade_llena_el_resumen_de_asistencias_de_matriculas_activas(base_anterior):
+    retirada = base_anterior['matriculas'][0]
+    db.session.execute(sa.text("UPDATE matricula SET estado = 'retirado' WHERE id = :id"), {'id': retirada.id})
+    db.session.commit()
+
+    upgrade(directory=MIGRACIONES)
+
+    resumen = db.session.execute(sa.text(
+        'SELECT id_curso, id_asignacion, anio_lectivo, fecha, estado, total FROM asistencias_resumen'
+    )).all()
+    db.session.execute(sa.text('DELETE FROM asistencias_resumen'))
+    reconstruir_resumen_asistencia()
+    recalculado = db.session.execute(sa.text(
+        'SELECT id_curso, id_asignacion, anio_lectivo, fecha, estado, total FROM asistencias_resumen'
+    )).all()
+    assert resumen and sorted(resumen) == sorted(recalculado)
+    total_activas = db.session.execute(sa.text(
+        "SELECT COUNT(*) FROM asistencias JOIN matricula ON asistencias.id_matricula = matricula.id "
+        "WHERE matricula.estado = 'activo'"
+    )).scalar()
+    assert sum(fila.total for fila in resumen) == total_activas
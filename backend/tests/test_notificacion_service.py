@@ -0,0 +1,43 @@
+"""
+Contador de notificaciones no leídas guardado en notificaciones_estado: lo mantienen los
+eventos de Actividad y se reinicia al abrir o marcar como leídas las notificaciones.
+"""
+from app import db
+from app.models import Actividad
+from app.services.notificacion_service import contar_no_leidas, marcar_vistas, notificaciones_no_leidas, ocultar_todas
+
+
+def _actividad(curso, creado_por):
+    actividad = Actividad(tipo='calificacion', titulo='Notas registradas', detalle='Detalle',
+                          creado_por=creado_por.id, id_asignacion=curso['asignaciones'][0].id)
+    db.session.add(actividad)
+    db.session.commit()
+    return actividad
+
+
+def test_contador_sigue_a_las_actividades(curso):
+    admin, docente = curso['admin'], curso['docente']
+    assert notificaciones_no_leidas(admin) == 0
+
+    actividades = [_actividad(curso, docente) for _ in range(3)]
+    _actividad(curso, admin)  # Las propias no cuentan
+    assert notificaciones_no_leidas(admin) == 3
+
+    db.session.delete(actividades[0])
+    db.session.commit()
+    assert notificaciones_no_leidas(admin) == 2
+
+    marcar_vistas(admin)
+    assert notificaciones_no_leidas(admin) == 0
+
+
+def test_ocultar_todas_reinicia_el_contador(curso):
+    admin, docente = curso['admin'], curso['docente']
+    notificaciones_no_leidas(admin)
+    _actividad(curso, docente)
+    _actividad(curso, docente)
+
+    ocultar_todas(admin)
+
+    assert notificaciones_no_leidas(admin) == 0
+    assert contar_no_leidas(admin, admin.creado_en.replace(year=2000)) == 0
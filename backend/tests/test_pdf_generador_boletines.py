@@ -0,0 +1,80 @@
+"""
+Entrega de boletines en lote (iterar_boletines_pdf): los PDFs en caché se leen uno a uno al
+entregarlos y el pool de procesos no adelanta más de 2 × workers boletines.
+"""
+from concurrent.futures import Future
+import pytest
+from app.utils import pdf_generador_boletines as generador
+from app.utils.pdf_cache import clave_pdf, guardar_pdf_cache
+
+LISTA = [{'n': n} for n in range(10)]
+
+
+class PoolInmediato:
+    """Sustituto de ProcessPoolExecutor que ejecuta al recibir y cuenta lo enviado"""
+    enviados = 0
+
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def submit(self, funcion, *args):
+        PoolInmediato.enviados += 1
+        futuro = Future()
+        futuro.set_result(funcion(*args))
+        return futuro
+
+
+@pytest.fixture
+def renderizados(app, monkeypatch):
+    renderizados = []
+
+    def renderizar(datos):
+        renderizados.append(datos['n'])
+        return f"pdf {datos['n']}".encode()
+
+    monkeypatch.setattr(generador, 'renderizar_boletin_pdf', renderizar)
+    PoolInmediato.enviados = 0
+    monkeypatch.setattr(generador, 'ProcessPoolExecutor', PoolInmediato)
+    return renderizados
+
+
+def _guardar_en_cache(indices):
+    for n in indices:
+        guardar_pdf_cache(clave_pdf('boletin', generador.VERSION_PLANTILLA_BOLETIN, LISTA[n]), f"pdf {n}".encode())
+
+
+def test_lee_la_cache_al_entregar_cada_boletin(renderizados, monkeypatch):
+    _guardar_en_cache(range(0, 10, 2))
+    lecturas = []
+    leer = generador.leer_pdf_cache
+    monkeypatch.setattr(generador, 'leer_pdf_cache', lambda clave: lecturas.append(clave) or leer(clave))
+
+    pdfs = generador.iterar_boletines_pdf(LISTA, workers=1)
+    assert next(pdfs) == (b'pdf 0', None)
+    assert len(lecturas) == 1
+
+    assert list(pdfs) == [(f"pdf {n}".encode(), None) for n in range(1, 10)]
+    assert len(lecturas) == 5 and renderizados == [1, 3, 5, 7, 9]
+
+
+def test_el_pool_no_adelanta_mas_de_dos_por_worker(renderizados):
+    pdfs = generador.iterar_boletines_pdf(LISTA, workers=2)
+
+    assert next(pdfs) == (b'pdf 0', None)
+    assert PoolInmediato.enviados <= 4
+    assert [pdf for pdf, _ in pdfs] == [f"pdf {n}".encode() for n in range(1, 10)]
+    assert PoolInmediato.enviados == 10
+
+
+def test_pdf_expulsado_de_la_cache_se_renderiza(renderizados, monkeypatch):
+    _guardar_en_cache([0, 1])
+    monkeypatch.setattr(generador, 'leer_pdf_cache', lambda clave: None)
+
+    assert [pdf for pdf, _ in generador.iterar_boletines_pdf(LISTA[:3], workers=2)] == [b'pdf 0', b'pdf 1', b'pdf 2']
+    assert sorted(renderizados) == [0, 1, 2]
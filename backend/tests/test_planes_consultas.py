@@ -0,0 +1,36 @@
+"""
+Las consultas más frecuentes (app/utils/planes_consultas.py) deben usar un índice sobre una
+base SQLite con el curso de ejemplo; si una deja de hacerlo, porque se quitó un índice o
+cambió la consulta, la prueba falla con el paso del plan que recorre la tabla completa.
+"""
+import pytest
+from app import db
+from app.utils.planes_consultas import consultas_frecuentes, revisar_planes
+
+CONSULTAS = consultas_frecuentes()
+
+
+@pytest.fixture
+def conexion(curso):
+    # ANALYZE deja al planificador estadísticas reales de las tablas sembradas
+    with db.engine.connect() as conexion:
+        conexion.exec_driver_sql('ANALYZE')
+        conexion.commit()
+        yield conexion
+
+
+@pytest.mark.parametrize('consulta', CONSULTAS, ids=[descripcion for descripcion, _, _ in CONSULTAS])
+def test_consulta_frecuente_usa_un_indice(conexion, consulta):
+    [(descripcion, tabla, recorridos)] = revisar_planes(conexion, [consulta])
+    assert recorridos == [], f'{descripcion}: recorre la tabla {tabla} completa'
+
+
+def test_detecta_un_recorrido_completo_al_quitar_un_indice(conexion):
+    conexion.exec_driver_sql('DROP INDEX ix_actividades_creado_en')
+    conexion.commit()
+
+    recorridos = {descripcion: pasos for descripcion, _, pasos in revisar_planes(conexion)}
+
+    assert recorridos['Actividades recientes'] == ['SCAN actividades']
+    assert all(not pasos for descripcion, pasos in recorridos.items()
+               if descripcion not in ('Actividades recientes', 'Últimas actividades'))
@@ -0,0 +1,118 @@
+"""
+Ranking guardado en posiciones_curso: se vuelve a calcular cuando cambian las matrículas
+activas del curso (retiros, transferencias, matrículas nuevas) y coincide con lo que muestra
+/posiciones/datos.
+
+Las páginas del ranking general (pagina_posiciones), con y sin funciones de ventana, siguen
+la clave de orden del cursor aunque haya promedios empatados en el corte de página.
+"""
+from datetime import date
+import pytest
+from app import db
+from app.models import Curso, Matricula
+from app.services import posicion_service
+from app.services.posicion_service import codificar_cursor, obtener_posiciones_curso, pagina_posiciones
+from tests.conftest import ANIO, iniciar_sesion, sembrar_curso
+
+
+def _puestos(curso, periodo):
+    return {mid: p.puesto for mid, p in obtener_posiciones_curso(curso.id, periodo.id, ANIO).items()}
+
+
+def _primero(puestos):
+    return min(puestos, key=lambda mid: (puestos[mid], mid))
+
+
+def test_retiro_y_matricula_nueva_recalculan_el_ranking(client, curso):
+    periodo = curso['periodos'][0]
+    antes = _puestos(curso['curso'], periodo)
+    retirada = Matricula.query.get(_primero(antes))
+    retirada.estado = 'retirado'
+    nueva = Matricula(nombres='Nueva', apellidos='Estudiante', genero='femenino', documento='9999', email='nueva@pruebas.com',
+                      fecha_nacimiento=date(2015, 1, 1), id_curso=curso['curso'].id, año_lectivo=ANIO,
+                      estado='activo')
+    db.session.add(nueva)
+    db.session.commit()
+
+    despues = _puestos(curso['curso'], periodo)
+
+    assert retirada.id not in despues and nueva.id in despues
+    assert set(despues) == {m.id for m in curso['matriculas'] if m.id != retirada.id} | {nueva.id}
+    segundo = sorted(antes, key=lambda mid: (antes[mid], mid))[1]
+    assert despues[segundo] == 1
+    iniciar_sesion(client)
+    datos = client.get(f"/posiciones/datos?curso={curso['curso'].id}").get_json()['data']
+    assert {fila['id']: fila['posicion'] for fila in datos} == {
+        mid: puesto for mid, puesto in despues.items() if mid != nueva.id  # Sin notas no se lista
+    }
+
+
+def test_cambio_de_curso_recalcula_el_ranking_de_origen_y_destino(curso):
+    periodo = curso['periodos'][0]
+    destino = Curso(nombre='PRIMERO B')
+    db.session.add(destino)
+    db.session.commit()
+    antes = _puestos(curso['curso'], periodo)
+    transferida = Matricula.query.get(_primero(antes))
+
+    # Lo que hace matricula.editar_matricula al cambiar el curso
+    transferida.id_curso = destino.id
+    db.session.commit()
+
+    origen = _puestos(curso['curso'], periodo)
+    assert transferida.id not in origen and len(origen) == len(antes) - 1
+    assert min(origen.values()) == 1
+    assert _puestos(destino, periodo) == {transferida.id: 1}
+
+
+PROMEDIOS_EMPATADOS = [4.37, 4.37, 4.37, 3.1, 3.1, 2.0, 2.0]
+
+
+@pytest.fixture(params=[True, False], ids=['ventanas', 'sin_ventanas'])
+def ranking_empatado(request, base, monkeypatch):
+    """Curso con promedios empatados a ambos lados de los cortes de página de a 2"""
+    monkeypatch.setattr(posicion_service, '_soporta_funciones_ventana', lambda: request.param)
+    datos = sembrar_curso(estudiantes=len(PROMEDIOS_EMPATADOS))
+    periodo = datos['periodos'][0]
+    posiciones = obtener_posiciones_curso(datos['curso'].id, periodo.id, ANIO)
+    for matricula, promedio in zip(datos['matriculas'], PROMEDIOS_EMPATADOS):
+        posiciones[matricula.id].promedio = promedio
+    db.session.commit()
+    return datos
+
+
+def _orden_esperado(datos):
+    # promedio desc; los empates por apellidos, nombres e id
+    return [m.id for m, _ in sorted(zip(datos['matriculas'], PROMEDIOS_EMPATADOS),
+                                    key=lambda par: (-par[1], par[0].apellidos, par[0].nombres, par[0].id))]
+
+
+def test_paginas_por_cursor_no_repiten_ni_saltan_empates(ranking_empatado):
+    periodo = ranking_empatado['periodos'][0]
+    paginas = [pagina_posiciones(periodo.id, ANIO, por_pagina=2)]
+    while paginas[-1]['hay_siguiente']:
+        posicion, matricula = paginas[-1]['filas'][-1][:2]
+        paginas.append(pagina_posiciones(periodo.id, ANIO, por_pagina=2,
+                                         despues=codificar_cursor(posicion, matricula)))
+
+    filas = [fila for pagina in paginas for fila in pagina['filas']]
+    assert [matricula.id for _, matricula, _, _, _ in filas] == _orden_esperado(ranking_empatado)
+    assert [(puesto, denso) for _, _, _, puesto, denso in filas] == [
+        (1, 1), (1, 1), (1, 1), (4, 2), (4, 2), (6, 3), (6, 3)
+    ]
+    assert [pagina['desde'] for pagina in paginas] == [1, 3, 5, 7]
+
+
+def test_paginas_hacia_atras_con_antes(ranking_empatado):
+    periodo = ranking_empatado['periodos'][0]
+    pagina = pagina_posiciones(periodo.id, ANIO, por_pagina=2, pagina=4)
+    paginas = [pagina]
+    while pagina['hay_anterior']:
+        posicion, matricula = pagina['filas'][0][:2]
+        pagina = pagina_posiciones(periodo.id, ANIO, por_pagina=2, antes=codificar_cursor(posicion, matricula))
+        paginas.insert(0, pagina)
+
+    filas = [fila for pagina in paginas for fila in pagina['filas']]
+    assert [matricula.id for _, matricula, _, _, _ in filas] == _orden_esperado(ranking_empatado)
+    assert [pagina['desde'] for pagina in paginas] == [1, 3, 5, 7]
+    assert paginas[0]['total'] == len(PROMEDIOS_EMPATADOS)
@@ -0,0 +1,233 @@
+"""
+Cola de trabajos: reclamo con UPDATE condicional, cancelación antes y durante la ejecución,
+latido durante las fases sin progreso, reintento de trabajos abandonados sin que el worker
+anterior pise al nuevo, límite de intentos y limpieza de trabajos viejos.
+"""
+import os
+import time
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import event
+from app import db
+from app.models import CorreoSaliente, Trabajo
+from app.routes import boletines as rutas_boletines
+from app.services import trabajo_service
+from app.services.trabajo_service import (
+    cancelar_trabajo, directorio_trabajo, ejecutar_trabajo, encolar_trabajo, limpiar_trabajos_antiguos,
+    reclamar_trabajo, recuperar_trabajos_abandonados, ruta_resultado
+)
+from tests.conftest import ANIO
+
+
+@pytest.fixture
+def cola(app, curso, monkeypatch):
+    """Registra el tipo 'prueba', cuyo manejador es la función guardada en manejadores['prueba']"""
+    app.config.update(TRABAJOS_INTERVALO_PROGRESO=0, TRABAJOS_LATIDO_SEGUNDOS=0.05)
+    manejadores = {}
+    monkeypatch.setitem(trabajo_service._manejadores, 'prueba',
+                        lambda parametros, contexto: manejadores['prueba'](parametros, contexto))
+    return manejadores
+
+
+def _encolar(curso, **parametros):
+    return encolar_trabajo('prueba', parametros, curso['admin'].id)
+
+
+def _recargar(trabajo_id):
+    db.session.expire_all()
+    return db.session.get(Trabajo, trabajo_id)
+
+
+def _abandonar(trabajo_id):
+    """Deja el trabajo sin latido desde hace más de TRABAJOS_SIN_LATIDO_MINUTOS"""
+    Trabajo.query.filter_by(id=trabajo_id).update({'actualizado_en': datetime.utcnow() - timedelta(hours=1)})
+    db.session.commit()
+
+
+def _escribir_resultado(contexto, texto='resultado'):
+    with open(contexto.ruta('resultado.txt'), 'w') as archivo:
+        archivo.write(texto)
+    return 'resultado.txt', 'resultado.txt'
+
+
+def test_dos_workers_no_reclaman_el_mismo_trabajo(cola, curso):
+    primero, segundo = _encolar(curso, n=1), _encolar(curso, n=2)
+    robado = []
+
+    @event.listens_for(db.engine, 'before_cursor_execute')
+    def otro_worker_se_adelanta(conexion, cursor, sentencia, *args):
+        # Entre la consulta del candidato y el UPDATE del worker B, el worker A toma el trabajo
+        if sentencia.startswith('UPDATE trabajos') and not robado:
+            robado.append(True)
+            with db.engine.begin() as otra:
+                otra.exec_driver_sql("UPDATE trabajos SET estado = 'en_proceso', worker = 'A' WHERE id = ?",
+                                     (primero.id,))
+
+    try:
+        reclamado = reclamar_trabajo('B')
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', otro_worker_se_adelanta)
+
+    assert robado and reclamado.id == segundo.id and reclamado.worker == 'B'
+    assert _recargar(primero.id).worker == 'A'
+    assert reclamar_trabajo('C') is None
+
+
+def test_cancelar_antes_de_empezar(cola, curso):
+    trabajo = _encolar(curso)
+
+    assert cancelar_trabajo(trabajo)
+
+    assert trabajo.estado == 'cancelado'
+    assert reclamar_trabajo('A') is None
+    assert not cancelar_trabajo(trabajo)
+
+
+def test_cancelar_durante_la_ejecucion(cola, curso):
+    trabajo = _encolar(curso)
+
+    def manejador(parametros, contexto):
+        contexto.progreso(10)
+        cancelar_trabajo(_recargar(contexto.trabajo_id))
+        contexto.progreso(20)
+        return _escribir_resultado(contexto)
+
+    cola['prueba'] = manejador
+    ejecutar_trabajo(reclamar_trabajo('A'))
+
+    trabajo = _recargar(trabajo.id)
+    assert trabajo.estado == 'cancelado' and trabajo.archivo is None
+    assert os.listdir(directorio_trabajo(trabajo.id)) == []
+
+
+def test_latido_durante_una_fase_sin_progreso(cola, curso):
+    trabajo = _encolar(curso)
+    latidos = []
+
+    def manejador(parametros, contexto):
+        inicio = _recargar(contexto.trabajo_id).actualizado_en
+        time.sleep(0.3)  # Fase larga sin reportar progreso
+        latidos.append(_recargar(contexto.trabajo_id).actualizado_en > inicio)
+        return _escribir_resultado(contexto)
+
+    cola['prueba'] = manejador
+    ejecutar_trabajo(reclamar_trabajo('A'))
+
+    assert latidos == [True]
+    trabajo = _recargar(trabajo.id)
+    assert trabajo.estado == 'completado' and open(ruta_resultado(trabajo)).read() == 'resultado'
+
+
+def test_reintento_no_se_pisa_con_el_worker_anterior(app, cola, curso):
+    # Sin latidos de A durante la prueba: uno entre _abandonar y la recuperación lo reviviría
+    app.config['TRABAJOS_LATIDO_SEGUNDOS'] = 60
+    trabajo = _encolar(curso)
+
+    def manejador(parametros, contexto):
+        if contexto.worker_id == 'B':
+            return _escribir_resultado(contexto, 'de B')
+        _escribir_resultado(contexto, 'de A')
+        # A se quedó sin latir; la cola lo devuelve y B lo ejecuta completo mientras A sigue
+        _abandonar(contexto.trabajo_id)
+        recuperar_trabajos_abandonados()
+        ejecutar_trabajo(reclamar_trabajo('B'))
+        contexto.progreso(90)
+        return 'resultado.txt', 'resultado.txt'
+
+    cola['prueba'] = manejador
+    ejecutar_trabajo(reclamar_trabajo('A'))
+
+    trabajo = _recargar(trabajo.id)
+    assert (trabajo.estado, trabajo.worker, trabajo.intentos, trabajo.progreso) == ('completado', 'B', 2, 100)
+    assert open(ruta_resultado(trabajo)).read() == 'de B'
+    assert os.listdir(directorio_trabajo(trabajo.id)) == ['2']
+
+
+def test_trabajo_terminado_no_lo_cambia_el_worker_anterior(cola, curso):
+    trabajo = _encolar(curso)
+
+    def manejador(parametros, contexto):
+        # Otro worker terminó el trabajo mientras este seguía: su resultado no se guarda
+        Trabajo.query.filter_by(id=contexto.trabajo_id).update({'estado': 'completado', 'worker': 'B'})
+        db.session.commit()
+        return _escribir_resultado(contexto)
+
+    cola['prueba'] = manejador
+    ejecutar_trabajo(reclamar_trabajo('A'))
+
+    trabajo = _recargar(trabajo.id)
+    assert (trabajo.estado, trabajo.worker, trabajo.archivo) == ('completado', 'B', None)
+    assert not os.path.exists(os.path.join(directorio_trabajo(trabajo.id), '1'))
+
+
+def test_abandonados_se_reintentan_hasta_el_maximo(cola, curso):
+    reintentar, agotado, cancelado = _encolar(curso), _encolar(curso), _encolar(curso)
+    for trabajo in (reintentar, agotado, cancelado):
+        reclamar_trabajo('A')
+    Trabajo.query.filter_by(id=agotado.id).update({'intentos': 3})
+    Trabajo.query.filter_by(id=cancelado.id).update({'cancelacion_solicitada': True})
+    db.session.commit()
+    reciente = _encolar(curso)
+    reclamar_trabajo('A')
+    for trabajo in (reintentar, agotado, cancelado):
+        _abandonar(trabajo.id)
+
+    recuperar_trabajos_abandonados()
+
+    estados = {t: (_recargar(t.id).estado, _recargar(t.id).worker) for t in (reintentar, agotado, cancelado, reciente)}
+    assert estados == {
+        reintentar: ('pendiente', None),
+        agotado: ('error', 'A'),
+        cancelado: ('cancelado', 'A'),
+        reciente: ('en_proceso', 'A'),
+    }
+
+
+def test_limpieza_borra_solo_trabajos_finalizados_viejos(cola, curso):
+    cola['prueba'] = lambda parametros, contexto: _escribir_resultado(contexto)
+    viejo, nuevo = _encolar(curso).id, _encolar(curso).id
+    ejecutar_trabajo(reclamar_trabajo('A'))
+    ejecutar_trabajo(reclamar_trabajo('A'))
+    pendiente = _encolar(curso).id
+    Trabajo.query.filter_by(id=viejo).update({'finalizado_en': datetime.utcnow() - timedelta(days=2)})
+    db.session.commit()
+
+    limpiar_trabajos_antiguos()
+
+    assert _recargar(viejo) is None and not os.path.exists(directorio_trabajo(viejo))
+    assert ruta_resultado(_recargar(nuevo)) is not None
+    assert _recargar(pendiente).estado == 'pendiente'
+
+
+class CaidaDelWorker(BaseException):
+    """El proceso del worker muere a mitad del trabajo"""
+
+
+def test_reintento_de_correos_no_duplica_los_ya_encolados(app, curso, monkeypatch):
+    app.config.update(TRABAJOS_INTERVALO_PROGRESO=0)
+    caer = [True]
+
+    def pdfs_falsos(lista_datos, workers=1):
+        for indice, _ in enumerate(lista_datos):
+            if caer[0] and indice == 2:
+                caer[0] = False
+                raise CaidaDelWorker()
+            yield b'%PDF-falso', None
+
+    monkeypatch.setattr(rutas_boletines, 'iterar_boletines_pdf', pdfs_falsos)
+    trabajo = encolar_trabajo('boletines_correo', {
+        'curso_id': curso['curso'].id, 'periodo_id': curso['periodos'][0].id, 'anio_lectivo': ANIO
+    }, curso['admin'].id)
+
+    with pytest.raises(CaidaDelWorker):
+        ejecutar_trabajo(reclamar_trabajo('A'))
+    db.session.rollback()
+    assert CorreoSaliente.query.count() == 2
+    _abandonar(trabajo.id)
+    recuperar_trabajos_abandonados()
+    ejecutar_trabajo(reclamar_trabajo('B'))
+
+    correos = CorreoSaliente.query.all()
+    assert len(correos) == len(curso['matriculas'])
+    assert len({c.referencia for c in correos}) == len(correos)
+    assert _recargar(trabajo.id).mensaje.startswith(f"{len(correos)} boletines en la bandeja de salida.")
@@ -0,0 +1,31 @@
+"""
+Transferencia de varios estudiantes: marca las matrículas de origen, crea las de destino y
+descarta las caches y el resumen de asistencias que dependían de ellas.
+"""
+import json
+from app import db
+from app.models import Curso, Matricula
+from app.utils.cache import espacio
+from tests.conftest import ANIO, iniciar_sesion
+
+
+def test_transferir_multiples_invalida_caches(client, curso):
+    destino = Curso(nombre='SEGUNDO A')
+    db.session.add(destino)
+    db.session.commit()
+    transferidas = [m.id for m in curso['matriculas'][:2]]
+    for nombre in ('dashboard', 'matriculas'):
+        espacio(nombre).set('prueba', 'vieja')
+
+    iniciar_sesion(client)
+    respuesta = client.post('/transferir/transferir-multiples', data={
+        'estudiantes_ids_json': json.dumps(transferidas),
+        'curso_destino': destino.id,
+        'anio_destino': ANIO + 1,
+    })
+
+    assert respuesta.status_code == 302
+    assert {m.estado for m in Matricula.query.filter(Matricula.id.in_(transferidas))} == {'transferido'}
+    assert Matricula.query.filter_by(año_lectivo=ANIO + 1, id_curso=destino.id).count() == 2
+    assert espacio('dashboard').get('prueba') is None
+    assert espacio('matriculas').get('prueba') is None
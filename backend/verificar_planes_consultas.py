@@ -0,0 +1,46 @@
+"""
+Revisa el plan de ejecución de las consultas más frecuentes sobre las tablas académicas
+(ver app/utils/planes_consultas.py) y falla si alguna recorre completa una de esas tablas
+en lugar de usar un índice.
+
+Uso:
+    python verificar_planes_consultas.py
+
+Conviene ejecutarlo sobre una base con datos (por ejemplo, después de seed_database.py) y
+tras cambiar modelos, índices o consultas; tests/test_planes_consultas.py hace la misma
+revisión sobre una base SQLite de prueba. Termina con código 1 si alguna consulta recorre
+una tabla completa.
+"""
+import sys
+from app import create_app
+from app.extensions import db
+from app.utils.planes_consultas import DIALECTOS, revisar_planes
+
+app = create_app()
+
+
+def verificar_planes():
+    print("=== VERIFICANDO PLANES DE CONSULTA ===")
+    with db.engine.connect() as conexion:
+        if conexion.dialect.name not in DIALECTOS:
+            print(f"Motor {conexion.dialect.name} no soportado; no se revisan los planes")
+            return True
+        resultados = revisar_planes(conexion)
+
+    regresiones = 0
+    for descripcion, tabla, recorridos in resultados:
+        if recorridos:
+            regresiones += 1
+            print(f"[ERROR] {descripcion}: recorre la tabla {tabla} completa")
+            for paso in recorridos:
+                print(f"        {paso}")
+        else:
+            print(f"[OK] {descripcion}")
+
+    print(f"Consultas revisadas: {len(resultados)}, recorridos completos: {regresiones}")
+    return regresiones == 0
+
+
+if __name__ == '__main__':
+    with app.app_context():
+        sys.exit(0 if verificar_planes() else 1)
@@ -0,0 +1,68 @@
+"""
+Worker de la cola de trabajos en segundo plano (exportaciones de boletines, documentos y
+reportes) y de la bandeja de salida de correos.
+
+Uso:
+    python worker.py [procesos]
+
+Levanta TRABAJOS_WORKERS procesos (o los indicados) que toman trabajos de la tabla
+`trabajos` y un proceso que entrega los correos de `correos_salientes`, hasta recibir
+Ctrl+C o SIGTERM; el trabajo en curso de cada proceso se termina antes de salir. Puede
+ejecutarse en varias máquinas contra la misma base de datos. Las tablas se crean con
+`flask db upgrade`.
+"""
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+from config import Config
+
+
+def _ignorar_senales():
+    # Solo el proceso principal atiende Ctrl+C; los hijos terminan su trabajo y salen
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+
+def ejecutar_worker(numero, detener):
+    _ignorar_senales()
+
+    from app import create_app
+    from app.services.trabajo_service import procesar_cola
+
+    app = create_app()
+    with app.app_context():
+        worker_id = f"{socket.gethostname()}-{os.getpid()}-{numero}"
+        print(f"Worker {worker_id} esperando trabajos")
+        procesar_cola(worker_id, detener)
+
+
+def ejecutar_worker_correo(detener):
+    _ignorar_senales()
+
+    from app import create_app
+    from app.services.correo_service import procesar_correos
+
+    app = create_app()
+    with app.app_context():
+        print("Worker de correo esperando mensajes")
+        procesar_correos(detener)
+
+
+if __name__ == '__main__':
+    cantidad = int(sys.argv[1]) if len(sys.argv) > 1 else Config.TRABAJOS_WORKERS
+    detener = multiprocessing.Event()
+    procesos = [multiprocessing.Process(target=ejecutar_worker, args=(numero, detener)) for numero in range(cantidad)]
+    procesos.append(multiprocessing.Process(target=ejecutar_worker_correo, args=(detener,)))
+    for proceso in procesos:
+        proceso.start()
+
+    def terminar(*_):
+        print("Deteniendo workers al terminar sus trabajos en curso...")
+        detener.set()
+
+    signal.signal(signal.SIGINT, terminar)
+    signal.signal(signal.SIGTERM, terminar)
+    for proceso in procesos:
+        proceso.join()
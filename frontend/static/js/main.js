@@ -1,3 +1,24 @@
+/**
+ * Eventos del servidor (Server-Sent Events en /eventos/).
+ *
+ * Una sola conexión por pestaña recibe el contador de notificaciones ('notificaciones') y el
+ * progreso de los trabajos en segundo plano ('trabajo'); reemplaza las consultas periódicas.
+ * eventosServidor.on(evento, callback) abre la conexión la primera vez que se usa y devuelve
+ * una función para dejar de escuchar; el navegador reabre la conexión solo si se corta.
+ */
+window.eventosServidor = window.eventosServidor || (window.EventSource ? (() => {
+    let fuente = null;
+    return {
+        // Devuelve una función para dejar de escuchar
+        on(evento, callback) {
+            fuente = fuente || new EventSource('/eventos/');
+            const manejador = e => callback(JSON.parse(e.data));
+            fuente.addEventListener(evento, manejador);
+            return () => fuente.removeEventListener(evento, manejador);
+        }
+    };
+})() : null);
+
 document.addEventListener('DOMContentLoaded', () => {
     // Toggle sidebar móvil (mostrar u ocultar siddbar en teléfonos)
     const sidebar = document.getElementById('sidebar');
@@ -69,35 +90,37 @@ document.addEventListener('DOMContentLoaded', function () {
     });
 
     // Function to update notification badge
-    function updateNotificationBadge() {
-        fetch('/actividades/count_unread_notifications')
-            .then(response => response.json())
-            .then(data => {
-                const notificationBadge = document.querySelector('.notification-badge');
-                if (data.count > 0) {
-                    if (notificationBadge) {
-                        notificationBadge.textContent = data.count;
-                    } else {
-                        // Create badge if it doesn't exist
-                        const notificationBtn = document.querySelector('.notification-btn');
-                        if (notificationBtn) {
-                            const newBadge = document.createElement('span');
-                            newBadge.className = 'position-absolute top-0 start-100 translate-middle badge rounded-pill bg-danger notification-badge';
-                            newBadge.textContent = data.count;
-                            newBadge.innerHTML += '<span class="visually-hidden">nuevas notificaciones</span>';
-                            notificationBtn.appendChild(newBadge);
-                        }
-                    }
-                } else {
-                    if (notificationBadge) {
-                        notificationBadge.remove();
-                    }
+    function updateNotificationBadge(count) {
+        const notificationBadge = document.querySelector('.notification-badge');
+        if (count > 0) {
+            if (notificationBadge) {
+                notificationBadge.textContent = count;
+            } else {
+                // Create badge if it doesn't exist
+                const notificationBtn = document.querySelector('.notification-btn');
+                if (notificationBtn) {
+                    const newBadge = document.createElement('span');
+                    newBadge.className = 'position-absolute top-0 start-100 translate-middle badge rounded-pill bg-danger notification-badge';
+                    newBadge.textContent = count;
+                    newBadge.innerHTML += '<span class="visually-hidden">nuevas notificaciones</span>';
+                    notificationBtn.appendChild(newBadge);
                 }
-            })
-            .catch(error => console.error('Error fetching notification count:', error));
+            }
+        } else {
+            if (notificationBadge) {
+                notificationBadge.remove();
+            }
+        }
     }
 
-    // tiempo de espera para actualizar notificaciones
-    updateNotificationBadge();
-    setInterval(updateNotificationBadge, 5000);
+    // El servidor envía el contador cuando cambia; sin EventSource se consulta cada minuto
+    if (window.eventosServidor) {
+        eventosServidor.on('notificaciones', data => updateNotificationBadge(data.count));
+    } else {
+        const consultarContador = () => fetch('/actividades/count_unread_notifications')
+            .then(response => response.json())
+            .then(data => updateNotificationBadge(data.count))
+            .catch(error => console.error('Error fetching notification count:', error));
+        setInterval(consultarContador, 60000);
+    }
 });
@@ -0,0 +1,91 @@
+/**
+ * Exportaciones en segundo plano.
+ *
+ * iniciarTrabajo(urlInicio, datos, opciones) encola el trabajo en el servidor, sigue su
+ * progreso y descarga el resultado (si el trabajo genera un archivo) cuando termina.
+ * Devuelve un objeto con cancelar().
+ *
+ * El progreso llega por los eventos 'trabajo' del servidor (eventosServidor, en main.js).
+ * Igual se consulta /trabajos/<id> de vez en cuando por si se perdió un evento durante una
+ * reconexión, o con más frecuencia si el navegador no soporta EventSource.
+ *
+ * opciones:
+ *   onProgreso(trabajo)  -> cada vez que llega el estado ({estado, progreso, mensaje})
+ *   onFin(trabajo)       -> cuando el trabajo termina (y comienza la descarga, si la hay)
+ *   onError(mensaje)     -> si el trabajo falla o se cancela
+ */
+function iniciarTrabajo(urlInicio, datos, opciones = {}) {
+    const csrfToken = document.querySelector('meta[name="csrf-token"]')?.getAttribute('content')
+        || document.querySelector('input[name="csrf_token"]')?.value;
+    const eventos = window.eventosServidor;
+    const intervalo = opciones.intervalo || (eventos ? 10000 : 1000);
+    let trabajoId = null;
+    let terminado = false;
+    let dejarDeEscuchar = null;
+    let temporizador = null;
+
+    function finalizar() {
+        terminado = true;
+        clearTimeout(temporizador);
+        if (dejarDeEscuchar) dejarDeEscuchar();
+    }
+
+    function fallar(mensaje) {
+        finalizar();
+        if (opciones.onError) opciones.onError(mensaje);
+    }
+
+    function recibir(trabajo) {
+        if (terminado || trabajo.id !== trabajoId) return;
+        if (opciones.onProgreso) opciones.onProgreso(trabajo);
+        if (trabajo.estado === 'completado') {
+            finalizar();
+            if (trabajo.descargable) window.location.href = `/trabajos/${trabajoId}/descargar`;
+            if (opciones.onFin) opciones.onFin(trabajo);
+        } else if (trabajo.estado === 'error' || trabajo.estado === 'cancelado') {
+            fallar(trabajo.mensaje || 'La tarea no se pudo completar.');
+        }
+    }
+
+    async function consultar() {
+        if (terminado) return;
+        try {
+            const respuesta = await fetch(`/trabajos/${trabajoId}`, { headers: { 'X-Requested-With': 'XMLHttpRequest' } });
+            const trabajo = await respuesta.json();
+            if (!respuesta.ok) throw new Error(trabajo.message || 'No se pudo consultar la tarea.');
+            recibir(trabajo);
+            if (!terminado) temporizador = setTimeout(consultar, intervalo);
+        } catch (error) {
+            fallar(error.message);
+        }
+    }
+
+    fetch(urlInicio, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'X-CSRFToken': csrfToken
+        },
+        body: JSON.stringify(datos || {})
+    })
+        .then(async respuesta => {
+            const resultado = await respuesta.json();
+            if (!respuesta.ok || resultado.status !== 'ok') {
+                throw new Error(resultado.message || 'No se pudo iniciar la tarea.');
+            }
+            trabajoId = resultado.task_id;
+            if (eventos) dejarDeEscuchar = eventos.on('trabajo', recibir);
+            consultar();
+        })
+        .catch(error => fallar(error.message));
+
+    return {
+        cancelar() {
+            if (!trabajoId || terminado) return Promise.resolve();
+            return fetch(`/trabajos/${trabajoId}/cancelar`, {
+                method: 'POST',
+                headers: { 'X-CSRFToken': csrfToken }
+            });
+        }
+    };
+}
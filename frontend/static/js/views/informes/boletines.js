@@ -64,26 +64,51 @@ document.addEventListener('DOMContentLoaded', function () {
             progressBar.style.width = '0%';
             progresoTexto.textContent = 'Iniciando generación de boletines...';
     
-            // Simular progreso (en una implementación real, usarías WebSockets o polling)
-            let progreso = 0;
-            const intervalo = setInterval(() => {
-                progreso += 5;
-                progressBar.style.width = `${progreso}%`;
-                progresoTexto.textContent = `Generando boletines... ${progreso}%`;
-                
-                if (progreso >= 100) {
-                    clearInterval(intervalo);
-                    // Redirigir a la descarga real
-                    actualizarEnlaceDescarga(); // Asegurarse de que la URL está actualizada antes de hacer clic
-                    window.location.href = btnDescargarTodo.href;
+            // La descarga se genera en segundo plano y se sigue su progreso real
+            iniciarTrabajo('/boletines/start-task/descargar-todos', { curso, periodo }, {
+                onProgreso(trabajo) {
+                    progressBar.style.width = `${trabajo.progreso}%`;
+                    progresoTexto.textContent = trabajo.mensaje || `Generando boletines... ${trabajo.progreso}%`;
+                },
+                onFin() {
                     setTimeout(() => progresoModal.hide(), 1000);
+                },
+                onError(mensaje) {
+                    progresoModal.hide();
+                    Swal.fire('Error', mensaje, 'error');
                 }
-            }, 200);
+            });
         });
     }
 
    
 
+    // === Enviar por correo los boletines de todo el curso ===
+    const btnEnviarTodos = document.getElementById('btn-enviar-todos');
+    if (btnEnviarTodos) {
+        btnEnviarTodos.addEventListener('click', function () {
+            const curso = document.getElementById('select-curso')?.value;
+            const periodo = document.getElementById('select-periodo')?.value;
+
+            if (!curso || curso === 'todos') {
+                Swal.fire('Error', 'Seleccione un curso primero', 'warning');
+                return;
+            }
+
+            btnEnviarTodos.disabled = true;
+            iniciarTrabajo('/boletines/start-task/enviar-todos', { curso, periodo }, {
+                onFin(trabajo) {
+                    btnEnviarTodos.disabled = false;
+                    Swal.fire('Envío en curso', trabajo.mensaje, 'success');
+                },
+                onError(mensaje) {
+                    btnEnviarTodos.disabled = false;
+                    Swal.fire('Error', mensaje, 'error');
+                }
+            });
+        });
+    }
+
     // === Ver detalles del boletín en modal y Enviar por Correo ===
     const modalVerBoletin = document.getElementById('modalVerBoletin');
     if (modalVerBoletin) {
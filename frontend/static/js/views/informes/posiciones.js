@@ -11,7 +11,8 @@ $(document).ready(function () {
         cargarDatosPaginado();
     });
 
-    function cargarDatosPaginado(page = 1) {
+    // `cursor` ({despues} o {antes}) pide la página contigua a la actual sin recalcular desplazamientos
+    function cargarDatosPaginado(page = 1, cursor = null) {
         const grado = $('#select-grado').val();
         lastGrado = grado;
         $('#tabla-posiciones').html(`
@@ -27,11 +28,11 @@ $(document).ready(function () {
         $.ajax({
             url: baseUrl,
             type: 'GET',
-            data: {
+            data: Object.assign({
                 curso: grado,
                 page: page,
                 per_page: lastPerPage
-            },
+            }, cursor || {}),
             success: function (response) {
                 if (response.error) {
                     mostrarError(response.error);
@@ -79,13 +80,13 @@ $(document).ready(function () {
         }
         html += `<div class="d-flex justify-content-between align-items-center">
             <div class="text-muted small">
-                Mostrando ${(pagination.page - 1) * pagination.per_page + 1} - ${Math.min(pagination.page * pagination.per_page, pagination.total)} de ${pagination.total} registros
+                Mostrando ${pagination.desde} - ${Math.min(pagination.desde + pagination.per_page - 1, pagination.total)} de ${pagination.total} registros
             </div>
             <nav aria-label="Paginación">
                 <ul class="pagination pagination-sm mb-0">
         `;
         if (pagination.has_prev) {
-            html += `<li class="page-item"><a class="page-link" href="#" data-page="${pagination.prev_num}"><i class="fas fa-chevron-left"></i></a></li>`;
+            html += `<li class="page-item"><a class="page-link" href="#" data-page="${pagination.prev_num}" data-antes="${pagination.prev_cursor || ''}"><i class="fas fa-chevron-left"></i></a></li>`;
         } else {
             html += `<li class="page-item disabled"><span class="page-link"><i class="fas fa-chevron-left"></i></span></li>`;
         }
@@ -101,7 +102,7 @@ $(document).ready(function () {
             }
         });
         if (pagination.has_next) {
-            html += `<li class="page-item"><a class="page-link" href="#" data-page="${pagination.next_num}"><i class="fas fa-chevron-right"></i></a></li>`;
+            html += `<li class="page-item"><a class="page-link" href="#" data-page="${pagination.next_num}" data-despues="${pagination.next_cursor || ''}"><i class="fas fa-chevron-right"></i></a></li>`;
         } else {
             html += `<li class="page-item disabled"><span class="page-link"><i class="fas fa-chevron-right"></i></span></li>`;
         }
@@ -110,9 +111,11 @@ $(document).ready(function () {
         $('#pagination-container .page-link[data-page]').click(function (e) {
             e.preventDefault();
             const page = parseInt($(this).data('page'));
+            const despues = $(this).data('despues');
+            const antes = $(this).data('antes');
             if (!isNaN(page)) {
                 currentPage = page;
-                cargarDatosPaginado(page);
+                cargarDatosPaginado(page, despues ? { despues } : (antes ? { antes } : null));
             }
         });
     }